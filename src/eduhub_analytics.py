@@ -0,0 +1,476 @@
+# Import Useful Libraries
+from dataclasses import dataclass, field
+from typing import ClassVar, Dict, List, Optional
+
+from eduhub_archive import source_collection, with_archived
+from eduhub_execution import REPORT_POLICIES, run_with_policy
+from eduhub_pipelines import optimize_pipeline
+
+
+class _ResultRow:
+    """Maps between a result row's attributes and the field names of its pipeline output."""
+
+    FIELDS: ClassVar[Dict[str, str]] = {}
+
+    @classmethod
+    def from_document(cls, document):
+        return cls(**{attr: document.get(key) for attr, key in cls.FIELDS.items()})
+
+    def to_dict(self):
+        return {key: getattr(self, attr) for attr, key in self.FIELDS.items()}
+
+
+@dataclass
+class CourseEnrollmentStat(_ResultRow):
+    course_id: str
+    course_title: str
+    category: str
+    total_enrollments: int
+    average_grade: Optional[float]
+    average_completion: Optional[float]
+
+    FIELDS: ClassVar[Dict[str, str]] = {
+        "course_id": "courseId",
+        "course_title": "courseTitle",
+        "category": "category",
+        "total_enrollments": "totalEnrollments",
+        "average_grade": "averageGrade",
+        "average_completion": "averageCompletion",
+    }
+
+
+@dataclass
+class CourseEnrollmentReport:
+    courses: List[CourseEnrollmentStat] = field(default_factory=list)
+    execution: Dict[str, dict] = field(default_factory=dict)
+
+    @property
+    def most_popular(self):
+        # Rows come sorted by totalEnrollments
+        return self.courses[0] if self.courses else None
+
+
+@dataclass
+class StudentPerformance(_ResultRow):
+    student_id: str
+    student_name: str
+    courses_enrolled: int
+    courses_with_submissions: int
+    average_grade: Optional[float]
+    average_completion: Optional[float]
+    submission_count: int
+
+    FIELDS: ClassVar[Dict[str, str]] = {
+        "student_id": "studentId",
+        "student_name": "studentName",
+        "courses_enrolled": "coursesEnrolled",
+        "courses_with_submissions": "coursesWithSubmissions",
+        "average_grade": "averageGrade",
+        "average_completion": "averageCompletion",
+        "submission_count": "submissionCount",
+    }
+
+
+@dataclass
+class CourseCompletion(_ResultRow):
+    course_id: str
+    course_title: str
+    average_completion: Optional[float]
+    total_students: int
+
+    FIELDS: ClassVar[Dict[str, str]] = {
+        "course_id": "courseId",
+        "course_title": "courseTitle",
+        "average_completion": "averageCompletion",
+        "total_students": "totalStudents",
+    }
+
+
+@dataclass
+class StudentPerformanceReport:
+    students: List[StudentPerformance] = field(default_factory=list)
+    course_completion: List[CourseCompletion] = field(default_factory=list)
+    execution: Dict[str, dict] = field(default_factory=dict)
+
+    @property
+    def top_student(self):
+        # Rows come sorted by averageGrade
+        return self.students[0] if self.students else None
+
+
+@dataclass
+class InstructorStat(_ResultRow):
+    instructor_id: str
+    instructor_name: str
+    total_students: int
+    total_revenue: float
+    courses_taught: int
+    avg_course_rating: Optional[float]
+
+    FIELDS: ClassVar[Dict[str, str]] = {
+        "instructor_id": "instructorId",
+        "instructor_name": "instructorName",
+        "total_students": "totalStudents",
+        "total_revenue": "totalRevenue",
+        "courses_taught": "coursesTaught",
+        "avg_course_rating": "avgCourseRating",
+    }
+
+
+@dataclass
+class InstructorReport:
+    instructors: List[InstructorStat] = field(default_factory=list)
+    execution: Dict[str, dict] = field(default_factory=dict)
+
+    def find(self, instructor_name):
+        return next((i for i in self.instructors if i.instructor_name == instructor_name), None)
+
+
+def course_enrollment_pipeline():
+    """Builds the per-course enrollment statistics pipeline (run on enrollments)."""
+    return [
+        # Join with courses collection
+        {
+            "$lookup": {
+                "from": "courses",
+                "localField": "courseId",
+                "foreignField": "courseId",
+                "as": "course"
+            }
+        },
+        {"$unwind": "$course"},
+
+        # Join with submissions for ratings (assuming rating is in submissions)
+        {
+            "$lookup": {
+                "from": "submissions",
+                "localField": "studentId",
+                "foreignField": "studentId",
+                "as": "submissions"
+            }
+        },
+
+        # Group by course and calculate metrics
+        {
+            "$group": {
+                "_id": {
+                    "courseId": "$courseId",
+                    "title": "$course.title",
+                    "category": "$course.category"
+                },
+                "totalEnrollments": {"$sum": 1},
+                "averageGrade": {"$avg": "$submissions.grade"},
+                "completionRate": {"$avg": "$completionStatus"}
+            }
+        },
+
+        # Project for cleaner output
+        {
+            "$project": {
+                "courseId": "$_id.courseId",
+                "courseTitle": "$_id.title",
+                "category": "$_id.category",
+                "totalEnrollments": 1,
+                "averageGrade": {"$round": ["$averageGrade", 2]},
+                "averageCompletion": {"$round": ["$completionRate", 2]},
+                "_id": 0
+            }
+        },
+
+        # Sort by enrollments (descending)
+        {"$sort": {"totalEnrollments": -1}}
+    ]
+
+
+def student_performance_pipeline():
+    """Builds the per-student performance pipeline (run on enrollments)."""
+    return [
+        # Join with users collection
+        {
+            "$lookup": {
+                "from": "users",
+                "localField": "studentId",
+                "foreignField": "userId",
+                "as": "student"
+            }
+        },
+        {"$unwind": "$student"},
+
+        # Join with submissions (preserving enrollments without submissions)
+        {
+            "$lookup": {
+                "from": "submissions",
+                "localField": "studentId",
+                "foreignField": "studentId",
+                "as": "submissions"
+            }
+        },
+
+        # Add field to check if student has submissions
+        {
+            "$addFields": {
+                "hasSubmissions": {"$gt": [{"$size": "$submissions"}, 0]}
+            }
+        },
+
+        # Calculate average grade per enrollment (handling empty arrays)
+        {
+            "$addFields": {
+                "enrollmentAvgGrade": {
+                    "$cond": [
+                        {"$eq": [{"$size": "$submissions"}, 0]},
+                        None,
+                        {"$avg": "$submissions.grade"}
+                    ]
+                }
+            }
+        },
+
+        # Group by student
+        {
+            "$group": {
+                "_id": {
+                    "studentId": "$studentId",
+                    "name": {"$concat": ["$student.firstName", " ", "$student.lastName"]}
+                },
+                "coursesEnrolled": {"$sum": 1},
+                "coursesWithSubmissions": {"$sum": {"$cond": ["$hasSubmissions", 1, 0]}},
+                "averageGrade": {"$avg": "$enrollmentAvgGrade"},
+                "averageCompletion": {"$avg": "$completionStatus"},
+                "submissionCount": {"$sum": {"$size": "$submissions"}}
+            }
+        },
+
+        # Format output
+        {
+            "$project": {
+                "studentId": "$_id.studentId",
+                "studentName": "$_id.name",
+                "coursesEnrolled": 1,
+                "coursesWithSubmissions": 1,
+                "averageGrade": {
+                    "$ifNull": [
+                        {"$round": ["$averageGrade", 2]},
+                        None
+                    ]
+                },
+                "averageCompletion": {"$round": ["$averageCompletion", 2]},
+                "submissionCount": 1,
+                "_id": 0
+            }
+        },
+
+        # Sort by average grade (descending), putting nulls last
+        {
+            "$sort": {
+                "averageGrade": -1,
+                "submissionCount": -1
+            }
+        }
+    ]
+
+
+def course_completion_pipeline():
+    """Builds the per-course completion rate pipeline (run on enrollments)."""
+    return [
+        # Join with courses
+        {
+            "$lookup": {
+                "from": "courses",
+                "localField": "courseId",
+                "foreignField": "courseId",
+                "as": "course"
+            }
+        },
+        {"$unwind": "$course"},
+
+        # Group by course
+        {
+            "$group": {
+                "_id": {
+                    "courseId": "$courseId",
+                    "title": "$course.title"
+                },
+                "averageCompletion": {"$avg": "$completionStatus"},
+                "totalStudents": {"$sum": 1}
+            }
+        },
+
+        # Format output
+        {
+            "$project": {
+                "courseId": "$_id.courseId",
+                "courseTitle": "$_id.title",
+                "averageCompletion": {"$round": ["$averageCompletion", 2]},
+                "totalStudents": 1,
+                "_id": 0
+            }
+        },
+
+        # Sort by completion rate
+        {"$sort": {"averageCompletion": -1}}
+    ]
+
+
+def instructor_pipeline():
+    """Builds the per-instructor analytics pipeline (run on courses)."""
+    return [
+        # Join with instructors
+        {
+            "$lookup": {
+                "from": "users",
+                "localField": "instructorId",
+                "foreignField": "userId",
+                "as": "instructor"
+            }
+        },
+        {"$unwind": "$instructor"},
+
+        # Join with enrollments
+        {
+            "$lookup": {
+                "from": "enrollments",
+                "localField": "courseId",
+                "foreignField": "courseId",
+                "as": "enrollments"
+            }
+        },
+
+        # Join with submissions for ratings
+        {
+            "$lookup": {
+                "from": "submissions",
+                "localField": "enrollments.studentId",
+                "foreignField": "studentId",
+                "as": "submissions"
+            }
+        },
+
+        # Calculate metrics per instructor-course combination
+        {
+            "$project": {
+                "instructorId": 1,
+                "instructorName": {"$concat": ["$instructor.firstName", " ", "$instructor.lastName"]},
+                "courseTitle": "$title",
+                "studentCount": {"$size": "$enrollments"},
+                "courseRevenue": {"$multiply": ["$price", {"$size": "$enrollments"}]},
+                "avgGrade": {"$avg": "$submissions.grade"}
+            }
+        },
+
+        # Group by instructor
+        {
+            "$group": {
+                "_id": "$instructorId",
+                "instructorName": {"$first": "$instructorName"},
+                "totalStudents": {"$sum": "$studentCount"},
+                "totalRevenue": {"$sum": "$courseRevenue"},
+                "coursesTaught": {"$sum": 1},
+                "avgCourseRating": {"$avg": "$avgGrade"}
+            }
+        },
+
+        # Format output (missing ratings stay null; the renderer labels them)
+        {
+            "$project": {
+                "instructorId": "$_id",
+                "instructorName": 1,
+                "totalStudents": 1,
+                "totalRevenue": {"$round": ["$totalRevenue", 2]},
+                "coursesTaught": 1,
+                "avgCourseRating": {"$round": ["$avgCourseRating", 2]},
+                "_id": 0
+            }
+        },
+
+        # Sort by total students (descending)
+        {"$sort": {"totalStudents": -1}}
+    ]
+
+
+# Name -> (collection, pipeline builder) of every analytics pipeline
+ANALYTICS_PIPELINES = {
+    "course_enrollment": ("enrollments", course_enrollment_pipeline),
+    "student_performance": ("enrollments", student_performance_pipeline),
+    "course_completion": ("enrollments", course_completion_pipeline),
+    "instructor": ("courses", instructor_pipeline),
+}
+
+
+def _run(db, name, optimize, policy, execution, include_archived=False):
+    """Runs one analytics pipeline under its execution policy and records how it ran."""
+    collection_name, build = ANALYTICS_PIPELINES[name]
+    pipeline = optimize_pipeline(build()) if optimize else build()
+    if include_archived:
+        pipeline = with_archived(pipeline)
+    collection = source_collection(db, collection_name, include_archived)
+    documents, execution[name] = run_with_policy(collection, pipeline, policy or REPORT_POLICIES[name])
+    return documents
+
+
+def compute_course_enrollment_stats(db, optimize=True, policy=None, include_archived=False):
+    """
+    Computes enrollment count, average grade and completion rate per course.
+    Runs a single aggregation; nothing is printed.
+
+    Args:
+        db: MongoDB database connection object
+        optimize: Send the pipeline through optimize_pipeline() first (default: True)
+        policy: ExecutionPolicy overriding REPORT_POLICIES (default: the report's policy)
+        include_archived: Also read archived enrollments and submissions (default: False)
+
+    Returns:
+        CourseEnrollmentReport: Courses, most enrollments first
+    """
+    execution = {}
+    rows = _run(db, "course_enrollment", optimize, policy, execution, include_archived)
+    return CourseEnrollmentReport([CourseEnrollmentStat.from_document(d) for d in rows], execution)
+
+
+def compute_student_performance(db, optimize=True, policy=None, include_archived=False):
+    """
+    Computes per-student performance and per-course completion rates.
+    Runs two aggregations; nothing is printed.
+
+    Args:
+        db: MongoDB database connection object
+        optimize: Send the pipelines through optimize_pipeline() first (default: True)
+        policy: ExecutionPolicy overriding REPORT_POLICIES for both pipelines (default: their policies)
+        include_archived: Also read archived enrollments and submissions (default: False)
+
+    Returns:
+        StudentPerformanceReport: Students (best average grade first) and course completion rates
+    """
+    execution = {}
+    students = _run(db, "student_performance", optimize, policy, execution, include_archived)
+    completion = _run(db, "course_completion", optimize, policy, execution, include_archived)
+    return StudentPerformanceReport(
+        [StudentPerformance.from_document(d) for d in students],
+        [CourseCompletion.from_document(d) for d in completion],
+        execution
+    )
+
+
+def compute_instructor_analytics(db, optimize=True, policy=None, include_archived=False):
+    """
+    Computes students, revenue, courses taught and average rating per instructor.
+    Runs a single aggregation; nothing is printed.
+
+    Args:
+        db: MongoDB database connection object
+        optimize: Send the pipeline through optimize_pipeline() first (default: True)
+        policy: ExecutionPolicy overriding REPORT_POLICIES (default: the report's policy)
+        include_archived: Also read archived enrollments and submissions (default: False)
+
+    Returns:
+        InstructorReport: Instructors, most students first
+    """
+    execution = {}
+    rows = _run(db, "instructor", optimize, policy, execution, include_archived)
+    return InstructorReport([InstructorStat.from_document(d) for d in rows], execution)
+
+# Example usage:
+# report = compute_instructor_analytics(db)
+# report.find("Chinwe Okonkwo").total_revenue
+# [s.student_name for s in compute_student_performance(db).students[:5]]
+# compute_course_enrollment_stats(db, policy=ExecutionPolicy(max_time_ms=5_000, chunk_field="enrollmentDate"))
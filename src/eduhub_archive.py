@@ -0,0 +1,401 @@
+# Import Useful Libraries
+import copy
+import gzip
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from bson import json_util
+from pymongo import ASCENDING, ReplaceOne
+from pymongo.errors import CollectionInvalid, OperationFailure
+
+from eduhub_indexes import ARCHIVE_TTL_INDEX, ensure_index, retention_manifest
+
+# Archived documents move to "<collection>_archive"; "<collection>_all" is a
+# view over both, used by the analytics when archived data is included
+ARCHIVE_SUFFIX = "_archive"
+ALL_SUFFIX = "_all"
+ARCHIVED_COLLECTIONS = ("enrollments", "submissions")
+ARCHIVED_AT_FIELD = "archivedAt"
+
+# Databases whose <collection>_all views are known to exist, keyed by (id(client), database name)
+_views_ready = set()
+
+
+@dataclass
+class ArchivePolicy:
+    """
+    What is archived and where.
+
+    Enrollments whose enrollmentDate (and lastAccessed, when set) are older than
+    horizon_days, submissions older than horizon_days, and every enrollment and
+    submission of a soft-deleted user are moved out of the hot collections,
+    batch_size documents at a time. target "collection" moves them to
+    <collection>_archive (expired after retention_days when set); target "file"
+    appends them to gzip-compressed extended-JSON files under archive_dir.
+    """
+    horizon_days: int = 730
+    batch_size: int = 500
+    target: str = "collection"
+    archive_dir: str = "archive"
+    retention_days: Optional[int] = None
+    pause_seconds: float = 0.0
+
+
+def archive_name(collection_name):
+    """Name of the archive collection of a hot collection."""
+    return collection_name + ARCHIVE_SUFFIX
+
+
+def all_name(collection_name):
+    """Name of the view over a hot collection and its archive."""
+    return collection_name + ALL_SUFFIX
+
+
+def create_archive_indexes(db, policy=None):
+    """
+    Creates the indexes the archival queries rely on, and on the archive
+    collections the natural keys plus a TTL index when retention is set.
+
+    Args:
+        db: MongoDB database connection object
+        policy: ArchivePolicy (default: ArchivePolicy())
+
+    Returns:
+        list: Names of the indexes created
+    """
+    policy = policy or ArchivePolicy()
+    manifest = retention_manifest(archive_retention_days=policy.retention_days)
+    created = [
+        ensure_index(db, "enrollments", "enrollment_date_idx"),
+        ensure_index(db, "submissions", "submission_student_idx"),
+        ensure_index(db, "submissions", "submission_date_idx"),
+    ]
+    for name in ARCHIVED_COLLECTIONS:
+        archive = db[archive_name(name)]
+        created += [ensure_index(db, archive.name, index_name, manifest) for index_name, _, _ in manifest[archive.name]]
+        if not policy.retention_days and ARCHIVE_TTL_INDEX in archive.index_information():
+            archive.drop_index(ARCHIVE_TTL_INDEX)
+    return created
+
+
+def create_archive_views(db, replace=True):
+    """
+    Creates the <collection>_all views, each the hot collection followed by
+    its archive collection.
+
+    Args:
+        db: MongoDB database connection object
+        replace: Drop and recreate views that already exist (default: True);
+            False only creates the missing ones
+
+    Returns:
+        list: Names of the views created
+    """
+    existing = set(db.list_collection_names())
+    views = []
+    for name in ARCHIVED_COLLECTIONS:
+        view = all_name(name)
+        if view in existing:
+            if not replace:
+                continue
+            db.drop_collection(view)
+        try:
+            db.create_collection(view, viewOn=name, pipeline=[{"$unionWith": archive_name(name)}])
+        except (CollectionInvalid, OperationFailure):
+            # Created concurrently by another process
+            if replace or view not in db.list_collection_names():
+                raise
+            continue
+        views.append(view)
+    _views_ready.add((id(db.client), db.name))
+    return views
+
+
+def archive_queries(db, policy=None, now=None):
+    """
+    Builds the filters selecting what a run archives from each hot collection.
+
+    Args:
+        db: MongoDB database connection object
+        policy: ArchivePolicy (default: ArchivePolicy())
+        now: Reference time for the horizon (default: now)
+
+    Returns:
+        dict: {collection name: filter}
+    """
+    policy = policy or ArchivePolicy()
+    cutoff = (now or datetime.now(timezone.utc)) - timedelta(days=policy.horizon_days)
+    inactive = [user["userId"] for user in db.users.find({"isActive": False}, {"userId": 1, "_id": 0})]
+    return {
+        "enrollments": {"$or": [
+            {"studentId": {"$in": inactive}},
+            {"enrollmentDate": {"$lt": cutoff},
+             "$or": [{"lastAccessed": {"$exists": False}}, {"lastAccessed": {"$lt": cutoff}}]},
+        ]},
+        "submissions": {"$or": [
+            {"studentId": {"$in": inactive}},
+            {"submittedDate": {"$lt": cutoff}},
+        ]},
+    }
+
+
+class _FileArchive:
+    """
+    Appends archived documents to one gzip file per collection and run, synced after every batch.
+    A batch is first staged in a pending file and only appended once its delete ran, keeping
+    the documents that stayed hot out of the archive. A pending file left by an interrupted
+    run is settled when the next run opens the collection.
+    """
+
+    def __init__(self, directory, source):
+        os.makedirs(directory, exist_ok=True)
+        self.source = source
+        self.path = os.path.join(directory, f"{source.name}-{datetime.now():%Y%m%d-%H%M%S}.jsonl.gz")
+        self.pending_path = os.path.join(directory, f"{source.name}.pending.jsonl.gz")
+        self.recovered = self.commit(list(read_archive_file(self.pending_path))) \
+            if os.path.exists(self.pending_path) else 0
+
+    @staticmethod
+    def _write(path, mode, documents):
+        with open(path, mode) as raw:
+            # Each batch is its own gzip member; readers see one continuous stream
+            with gzip.GzipFile(fileobj=raw, mode="wb") as f:
+                for document in documents:
+                    f.write(json_util.dumps(document).encode("utf-8") + b"\n")
+            raw.flush()
+            os.fsync(raw.fileno())
+
+    def stage(self, documents):
+        """Writes a batch to the pending file, before it is deleted from the hot collection."""
+        self._write(self.pending_path, "wb", documents)
+
+    def commit(self, documents):
+        """Appends the staged documents that left the hot collection and clears the pending file."""
+        ids = [document["_id"] for document in documents]
+        still_hot = {document["_id"] for document in self.source.find({"_id": {"$in": ids}}, {"_id": 1})}
+        archived = [document for document in documents if document["_id"] not in still_hot]
+        if archived:
+            self._write(self.path, "ab", archived)
+        os.remove(self.pending_path)
+        return len(archived)
+
+
+def _move_batch(db, collection_name, query, ids, policy, file_archive):
+    """Copies one batch to the archive, then deletes what still matches from the hot collection."""
+    source = db[collection_name]
+    documents = list(source.find({"_id": {"$in": ids}}))
+    archived_at = datetime.now(timezone.utc)
+    for document in documents:
+        document[ARCHIVED_AT_FIELD] = archived_at
+
+    if file_archive is not None:
+        file_archive.stage(documents)
+    elif documents:
+        # Replacing by _id makes a retried batch idempotent
+        db[archive_name(collection_name)].bulk_write(
+            [ReplaceOne({"_id": document["_id"]}, document, upsert=True) for document in documents],
+            ordered=False
+        )
+
+    # Re-check the filter so documents changed since they were read stay hot
+    deleted = source.delete_many({"$and": [{"_id": {"$in": ids}}, query]}).deleted_count
+    if file_archive is not None:
+        file_archive.commit(documents)
+    elif deleted < len(documents):
+        still_hot = [document["_id"] for document in source.find({"_id": {"$in": ids}}, {"_id": 1})]
+        db[archive_name(collection_name)].delete_many({"_id": {"$in": still_hot}})
+    return deleted
+
+
+def run_archival(db, policy=None, now=None):
+    """
+    Moves stale and inactive-user data out of the hot collections in small
+    batches. Each batch is copied to the archive before it is deleted, so an
+    interrupted run loses nothing and the next run picks up where it stopped.
+
+    Args:
+        db: MongoDB database connection object
+        policy: ArchivePolicy (default: ArchivePolicy())
+        now: Reference time for the horizon (default: now)
+
+    Returns:
+        dict: Documents archived per collection, plus "files" for the file target
+    """
+    policy = policy or ArchivePolicy()
+    if policy.target not in ("collection", "file"):
+        raise ValueError(f"Unknown archive target: {policy.target}")
+    if policy.target == "collection":
+        create_archive_indexes(db, policy)
+    create_archive_views(db, replace=False)
+
+    summary = {"files": []}
+    for collection_name, query in archive_queries(db, policy, now).items():
+        file_archive = _FileArchive(policy.archive_dir, db[collection_name]) if policy.target == "file" else None
+        moved = file_archive.recovered if file_archive is not None else 0
+        last_id = None
+        while True:
+            batch_query = {"$and": [query, {"_id": {"$gt": last_id}}]} if last_id is not None else query
+            ids = [document["_id"] for document in
+                   db[collection_name].find(batch_query, {"_id": 1}).sort("_id", ASCENDING).limit(policy.batch_size)]
+            if not ids:
+                break
+            moved += _move_batch(db, collection_name, query, ids, policy, file_archive)
+            last_id = ids[-1]
+            if policy.pause_seconds:
+                time.sleep(policy.pause_seconds)
+        summary[collection_name] = moved
+        if file_archive is not None and moved:
+            summary["files"].append(file_archive.path)
+        print(f"Archived {moved} {collection_name}")
+    return summary
+
+
+def archive_periodically(db, interval_seconds=86400, policy=None, stop_event=None):
+    """
+    Runs run_archival() every interval_seconds on a daemon thread.
+
+    Args:
+        db: MongoDB database connection object
+        interval_seconds: Seconds between runs (default: one day)
+        policy: ArchivePolicy (default: ArchivePolicy())
+        stop_event: threading.Event that stops the loop (default: a new one)
+
+    Returns:
+        tuple: (thread, stop_event)
+    """
+    stop_event = stop_event or threading.Event()
+
+    def loop():
+        while not stop_event.is_set():
+            try:
+                run_archival(db, policy)
+            except Exception as e:
+                print(f"Archival run failed: {e}")
+            stop_event.wait(interval_seconds)
+
+    thread = threading.Thread(target=loop, name="eduhub-archival", daemon=True)
+    thread.start()
+    return thread, stop_event
+
+
+def read_archive_file(path):
+    """
+    Streams the documents of an archive file written with target "file".
+
+    Args:
+        path: Path of a .jsonl.gz archive file
+
+    Yields:
+        dict: Archived documents
+    """
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json_util.loads(line)
+
+
+def restore_from_archive(db, collection_name, query):
+    """
+    Moves archived documents matching `query` back into the hot collection,
+    e.g. when a user is reactivated.
+
+    Args:
+        db: MongoDB database connection object
+        collection_name: "enrollments" or "submissions"
+        query: Filter on the archive collection, e.g. {"studentId": "user020"}
+
+    Returns:
+        int: Number of documents restored
+    """
+    archive = db[archive_name(collection_name)]
+    documents = list(archive.find(query))
+    if not documents:
+        return 0
+    for document in documents:
+        document.pop(ARCHIVED_AT_FIELD, None)
+    db[collection_name].bulk_write(
+        [ReplaceOne({"_id": document["_id"]}, document, upsert=True) for document in documents],
+        ordered=False
+    )
+    archive.delete_many({"_id": {"$in": [document["_id"] for document in documents]}})
+    return len(documents)
+
+
+def with_archived(stages):
+    """
+    Rewrites a pipeline so every $lookup / $unionWith of an archived collection
+    reads its <collection>_all view (hot and archived documents).
+
+    Args:
+        stages: Aggregation pipeline
+
+    Returns:
+        list: Rewritten copy of the pipeline
+    """
+    def rewrite(stage):
+        if "$lookup" in stage:
+            lookup = stage["$lookup"]
+            if lookup.get("from") in ARCHIVED_COLLECTIONS:
+                lookup["from"] = all_name(lookup["from"])
+            if "pipeline" in lookup:
+                lookup["pipeline"] = [rewrite(inner) for inner in lookup["pipeline"]]
+        elif "$unionWith" in stage:
+            union = stage["$unionWith"]
+            if isinstance(union, str):
+                stage["$unionWith"] = all_name(union) if union in ARCHIVED_COLLECTIONS else union
+            else:
+                if union.get("coll") in ARCHIVED_COLLECTIONS:
+                    union["coll"] = all_name(union["coll"])
+                if "pipeline" in union:
+                    union["pipeline"] = [rewrite(inner) for inner in union["pipeline"]]
+        elif "$facet" in stage:
+            for name, inner in stage["$facet"].items():
+                stage["$facet"][name] = [rewrite(s) for s in inner]
+        return stage
+
+    return [rewrite(stage) for stage in copy.deepcopy(stages)]
+
+
+def including_archive(collection_name, stages):
+    """
+    Rewrites a pipeline over a hot collection so it also reads the documents
+    archived from it, as its <collection>_all view does but without needing
+    the view to exist. A leading $match is applied to both collections, so
+    each side uses its own indexes.
+
+    Args:
+        collection_name: Hot collection the pipeline runs on, e.g. "submissions"
+        stages: Aggregation pipeline
+
+    Returns:
+        list: Rewritten copy of the pipeline
+    """
+    stages = copy.deepcopy(stages)
+    if collection_name not in ARCHIVED_COLLECTIONS:
+        return stages
+    head = [stages.pop(0)] if stages and "$match" in stages[0] else []
+    return head + [{"$unionWith": {"coll": archive_name(collection_name), "pipeline": copy.deepcopy(head)}}] + stages
+
+
+def source_collection(db, collection_name, include_archived=False):
+    """
+    Returns the collection a report should read: the hot one, or its
+    <collection>_all view. With include_archived, missing views are created
+    first (once per process), since reading a view that does not exist
+    silently returns no documents.
+    """
+    if include_archived and (id(db.client), db.name) not in _views_ready:
+        create_archive_views(db, replace=False)
+    if include_archived and collection_name in ARCHIVED_COLLECTIONS:
+        return db[all_name(collection_name)]
+    return db[collection_name]
+
+# Example usage:
+# create_archive_views(db)           # after changing the view pipeline; runs create the missing views
+# run_archival(db, ArchivePolicy(horizon_days=365, batch_size=200, pause_seconds=0.05))
+# run_archival(db, ArchivePolicy(target="file", archive_dir="archive"))
+# compute_course_enrollment_stats(db, include_archived=True)
@@ -0,0 +1,522 @@
+# Import Useful Libraries
+import copy
+import time
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+from pymongo import InsertOne
+
+from eduhub_archive import including_archive, source_collection, with_archived
+from eduhub_indexes import INDEX_MANIFEST
+from eduhub_watchdog import untagged
+
+# One document per (studentId, courseId, bucket) holding up to BUCKET_SIZE submissions:
+# {studentId, courseId, count, submissions: [{submissionId, assignmentId, submittedDate, grade, isGraded}],
+#  gradeSum, gradedCount, firstSubmittedDate, lastSubmittedDate}
+# gradeSum / gradedCount cover the submissions that carry a grade, as $avg over grades does.
+# Buckets keep archived submissions: archival leaves them, and rebuilds read submissions_archive too.
+SUBMISSION_BUCKETS_COLLECTION = "submission_buckets"
+BUCKET_SIZE = 50
+
+# Bucket mode is stored in the database, so every process maintains the buckets once
+# enable_submission_buckets() ran anywhere: {_id: "submission_buckets", enabled, bucketSize, updatedAt}
+SETTINGS_COLLECTION = "settings"
+_BUCKET_SETTINGS_ID = "submission_buckets"
+
+# Seconds a process reuses the bucket mode it read before reading it again
+BUCKET_SETTINGS_CACHE_SECONDS = 30
+
+# Rebuilds write here and rename over SUBMISSION_BUCKETS_COLLECTION, so readers never see it empty
+_REBUILD_COLLECTION = SUBMISSION_BUCKETS_COLLECTION + "_rebuild"
+
+# After enabling, submissions inserted from this long before the rebuild started (client clock
+# skew) are re-checked, and appended if no bucket holds them yet
+RESCAN_MARGIN_SECONDS = 60
+
+# (client id, database name) -> (read at, settings or None)
+_bucket_settings_cache = {}
+
+_SUBMISSION_FIELDS = ("submissionId", "assignmentId", "submittedDate", "grade", "isGraded")
+
+# Recomputes the per-bucket aggregates from the bucket's own (bounded) array
+_BUCKET_AGGREGATES_STAGE = {
+    "$set": {
+        "count": {"$size": "$submissions"},
+        "gradeSum": {"$sum": "$submissions.grade"},
+        "gradedCount": {"$size": {"$filter": {
+            "input": "$submissions",
+            "cond": {"$ne": [{"$ifNull": ["$$this.grade", None]}, None]}
+        }}},
+        "firstSubmittedDate": {"$min": "$submissions.submittedDate"},
+        "lastSubmittedDate": {"$max": "$submissions.submittedDate"},
+    }
+}
+
+
+def create_bucket_indexes(db, collection_name=SUBMISSION_BUCKETS_COLLECTION):
+    """
+    Creates the indexes the bucket writes and reads rely on (the
+    submission_buckets entries of INDEX_MANIFEST), also on a rebuild collection.
+
+    Args:
+        db: MongoDB database connection object
+        collection_name: Collection to index (default: SUBMISSION_BUCKETS_COLLECTION)
+
+    Returns:
+        list: Names of the indexes created
+    """
+    buckets = db[collection_name]
+    return [buckets.create_index(keys, name=name, **options)
+            for name, keys, options in INDEX_MANIFEST[SUBMISSION_BUCKETS_COLLECTION]]
+
+
+def _summary(submission):
+    return {field: submission.get(field) for field in _SUBMISSION_FIELDS}
+
+
+def _has_grade(submission):
+    return submission.get("grade") is not None
+
+
+def append_submission_to_bucket(db, submission, course_id, bucket_size=BUCKET_SIZE):
+    """
+    Appends a submission to its student's open bucket for the course, opening a
+    new bucket when the current one is full, and updates the bucket aggregates
+    in the same atomic update.
+
+    Args:
+        db: MongoDB database connection object
+        submission: The submission document that was inserted
+        course_id: Course of the submission's assignment
+        bucket_size: Maximum submissions per bucket (default: BUCKET_SIZE)
+
+    Returns:
+        UpdateResult: Result of the bucket upsert
+    """
+    has_grade = _has_grade(submission)
+    update = {
+        "$push": {"submissions": _summary(submission)},
+        "$inc": {"count": 1, "gradeSum": submission["grade"] if has_grade else 0, "gradedCount": int(has_grade)},
+    }
+    if submission.get("submittedDate") is not None:
+        update["$min"] = {"firstSubmittedDate": submission["submittedDate"]}
+        update["$max"] = {"lastSubmittedDate": submission["submittedDate"]}
+    # The count filter is a range, so an upsert opens a new bucket with only studentId/courseId set
+    return db[SUBMISSION_BUCKETS_COLLECTION].update_one(
+        {"studentId": submission["studentId"], "courseId": course_id, "count": {"$lt": bucket_size}},
+        update,
+        upsert=True
+    )
+
+
+def update_bucketed_grade(db, submission_id, grade, is_graded=True):
+    """
+    Sets the grade of a bucketed submission and recomputes its bucket's aggregates.
+
+    Args:
+        db: MongoDB database connection object
+        submission_id: ID of the submission
+        grade: The new grade
+        is_graded: New isGraded flag (default: True)
+
+    Returns:
+        UpdateResult: Result of the bucket update
+    """
+    return db[SUBMISSION_BUCKETS_COLLECTION].update_one(
+        {"submissions.submissionId": submission_id},
+        [
+            {
+                "$set": {
+                    "submissions": {
+                        "$map": {
+                            "input": "$submissions",
+                            "in": {
+                                "$cond": [
+                                    {"$eq": ["$$this.submissionId", submission_id]},
+                                    {"$mergeObjects": ["$$this", {"grade": grade, "isGraded": is_graded}]},
+                                    "$$this"
+                                ]
+                            }
+                        }
+                    }
+                }
+            },
+            _BUCKET_AGGREGATES_STAGE,
+        ]
+    )
+
+
+def rebuild_submission_buckets(db, bucket_size=BUCKET_SIZE, batch_size=1000):
+    """
+    Rebuilds every bucket from the hot and archived submissions: submissions are
+    streamed in (studentId, courseId, submittedDate) order and cut into
+    buckets of bucket_size. The buckets are written to a separate collection
+    that then replaces submission_buckets in one rename, so readers keep the
+    old buckets until the new ones are complete. Appends made to the old
+    buckets meanwhile are lost; enable_submission_buckets() re-checks them.
+
+    Args:
+        db: MongoDB database connection object
+        bucket_size: Maximum submissions per bucket (default: BUCKET_SIZE)
+        batch_size: Buckets per bulk write (default: 1000)
+
+    Returns:
+        int: Number of buckets written
+    """
+    buckets = db[_REBUILD_COLLECTION]
+    buckets.drop()
+    create_bucket_indexes(db, _REBUILD_COLLECTION)
+
+    cursor = db.submissions.aggregate(including_archive("submissions", [
+        {
+            "$lookup": {
+                "from": "assignments",
+                "localField": "assignmentId",
+                "foreignField": "assignmentId",
+                "as": "assignment"
+            }
+        },
+        {"$unwind": "$assignment"},
+        {"$sort": {"studentId": 1, "assignment.courseId": 1, "submittedDate": 1, "submissionId": 1}},
+        {"$project": {"_id": 0, "studentId": 1, "courseId": "$assignment.courseId",
+                      **{field: 1 for field in _SUBMISSION_FIELDS}}}
+    ]), allowDiskUse=True)
+
+    requests, written, current = [], 0, None
+
+    def close(bucket):
+        graded = [s["grade"] for s in bucket["submissions"] if _has_grade(s)]
+        dates = [s["submittedDate"] for s in bucket["submissions"] if s.get("submittedDate") is not None]
+        bucket.update(count=len(bucket["submissions"]), gradeSum=sum(graded), gradedCount=len(graded))
+        if dates:
+            bucket.update(firstSubmittedDate=min(dates), lastSubmittedDate=max(dates))
+        requests.append(InsertOne(bucket))
+
+    for row in cursor:
+        key = (row["studentId"], row["courseId"])
+        if current is None or (current["studentId"], current["courseId"]) != key \
+                or len(current["submissions"]) >= bucket_size:
+            if current is not None:
+                close(current)
+            current = {"studentId": row["studentId"], "courseId": row["courseId"], "submissions": []}
+        current["submissions"].append(_summary(row))
+        if len(requests) >= batch_size:
+            written += buckets.bulk_write(requests, ordered=False).inserted_count
+            requests = []
+    if current is not None:
+        close(current)
+    if requests:
+        written += buckets.bulk_write(requests, ordered=False).inserted_count
+    buckets.rename(SUBMISSION_BUCKETS_COLLECTION, dropTarget=True)
+    return written
+
+
+def _append_missing_submissions(db, since, bucket_size):
+    """Appends the submissions inserted since `since` that no bucket holds yet; returns how many."""
+    rows = list(db.submissions.aggregate([
+        {"$match": {"_id": {"$gte": ObjectId.from_datetime(since)}}},
+        {
+            "$lookup": {
+                "from": "assignments",
+                "localField": "assignmentId",
+                "foreignField": "assignmentId",
+                "as": "assignment"
+            }
+        },
+        {"$unwind": "$assignment"},
+        {"$sort": {"submittedDate": 1, "submissionId": 1}},
+        {"$project": {"_id": 0, "studentId": 1, "courseId": "$assignment.courseId",
+                      **{field: 1 for field in _SUBMISSION_FIELDS}}}
+    ]))
+    bucketed = set(db[SUBMISSION_BUCKETS_COLLECTION].distinct(
+        "submissions.submissionId", {"submissions.submissionId": {"$in": [row["submissionId"] for row in rows]}}))
+    missing = [row for row in rows if row["submissionId"] not in bucketed]
+    for row in missing:
+        append_submission_to_bucket(db, row, row["courseId"], bucket_size)
+    return len(missing)
+
+
+def _set_bucket_settings(db, settings):
+    """Stores the bucket mode and makes this process see it at once."""
+    db[SETTINGS_COLLECTION].replace_one(
+        {"_id": _BUCKET_SETTINGS_ID},
+        {**settings, "updatedAt": datetime.now(timezone.utc)},
+        upsert=True
+    )
+    db = untagged(db)
+    _bucket_settings_cache.pop((id(db.client), db.name), None)
+
+
+def bucket_settings(db):
+    """
+    Returns the stored bucket mode, re-read at most every BUCKET_SETTINGS_CACHE_SECONDS.
+
+    Args:
+        db: MongoDB database connection object
+
+    Returns:
+        dict: {"bucketSize": n} while buckets are maintained, otherwise None
+    """
+    raw_db = untagged(db)
+    key = (id(raw_db.client), raw_db.name)
+    cached = _bucket_settings_cache.get(key)
+    if cached is None or time.monotonic() - cached[0] > BUCKET_SETTINGS_CACHE_SECONDS:
+        stored = db[SETTINGS_COLLECTION].find_one({"_id": _BUCKET_SETTINGS_ID}, {"_id": 0})
+        settings = {"bucketSize": stored.get("bucketSize", BUCKET_SIZE)} if stored and stored.get("enabled") else None
+        cached = _bucket_settings_cache[key] = (time.monotonic(), settings)
+    return cached[1]
+
+
+def enable_submission_buckets(db, bucket_size=BUCKET_SIZE):
+    """
+    Records in the database that submit_assignment and update_assignment_grade
+    maintain the buckets from now on, in every process (others pick the change
+    up within BUCKET_SETTINGS_CACHE_SECONDS), then builds them. The mode is
+    recorded first, so no submission falls between the rebuild and the first
+    append. Once every process has seen it, submissions inserted since the
+    rebuild started that no bucket holds yet (appended to the replaced
+    buckets, or written by a process that still had the old mode) are appended.
+
+    Args:
+        db: MongoDB database connection object
+        bucket_size: Maximum submissions per bucket (default: BUCKET_SIZE)
+
+    Returns:
+        int: Number of buckets written by the rebuild
+    """
+    started = datetime.now(timezone.utc)
+    _set_bucket_settings(db, {"enabled": True, "bucketSize": bucket_size})
+    enabled_at = time.monotonic()
+    written = rebuild_submission_buckets(db, bucket_size)
+
+    remaining = BUCKET_SETTINGS_CACHE_SECONDS - (time.monotonic() - enabled_at)
+    if remaining > 0:
+        time.sleep(remaining)
+    appended = _append_missing_submissions(db, started - timedelta(seconds=RESCAN_MARGIN_SECONDS), bucket_size)
+    if appended:
+        print(f"Appended {appended} submissions written during the bucket rebuild")
+    return written
+
+
+def disable_submission_buckets(db):
+    """
+    Stops maintaining the buckets. They are left in place but go stale;
+    enable_submission_buckets() rebuilds them.
+
+    Args:
+        db: MongoDB database connection object
+    """
+    _set_bucket_settings(db, {"enabled": False})
+
+
+def bucketed_student_performance_pipeline():
+    """
+    Builds the student performance pipeline (run on enrollments) reading
+    submission_buckets instead of submissions. Its output matches
+    eduhub_analytics.student_performance_pipeline().
+    """
+    return [
+        {
+            "$lookup": {
+                "from": "users",
+                "localField": "studentId",
+                "foreignField": "userId",
+                "as": "student"
+            }
+        },
+        {"$unwind": "$student"},
+
+        # Joins a handful of bucket totals instead of every submission
+        {
+            "$lookup": {
+                "from": SUBMISSION_BUCKETS_COLLECTION,
+                "localField": "studentId",
+                "foreignField": "studentId",
+                "as": "buckets",
+                "pipeline": [{"$project": {"_id": 0, "count": 1, "gradeSum": 1, "gradedCount": 1}}]
+            }
+        },
+        {
+            "$addFields": {
+                "submissionTotal": {"$sum": "$buckets.count"},
+                "gradedTotal": {"$sum": "$buckets.gradedCount"},
+                "gradeTotal": {"$sum": "$buckets.gradeSum"}
+            }
+        },
+        {
+            "$addFields": {
+                "hasSubmissions": {"$gt": ["$submissionTotal", 0]},
+                "enrollmentAvgGrade": {
+                    "$cond": [{"$gt": ["$gradedTotal", 0]}, {"$divide": ["$gradeTotal", "$gradedTotal"]}, None]
+                }
+            }
+        },
+        {
+            "$group": {
+                "_id": {
+                    "studentId": "$studentId",
+                    "name": {"$concat": ["$student.firstName", " ", "$student.lastName"]}
+                },
+                "coursesEnrolled": {"$sum": 1},
+                "coursesWithSubmissions": {"$sum": {"$cond": ["$hasSubmissions", 1, 0]}},
+                "averageGrade": {"$avg": "$enrollmentAvgGrade"},
+                "averageCompletion": {"$avg": "$completionStatus"},
+                "submissionCount": {"$sum": "$submissionTotal"}
+            }
+        },
+        {
+            "$project": {
+                "studentId": "$_id.studentId",
+                "studentName": "$_id.name",
+                "coursesEnrolled": 1,
+                "coursesWithSubmissions": 1,
+                "averageGrade": {"$ifNull": [{"$round": ["$averageGrade", 2]}, None]},
+                "averageCompletion": {"$round": ["$averageCompletion", 2]},
+                "submissionCount": 1,
+                "_id": 0
+            }
+        },
+        {"$sort": {"averageGrade": -1, "submissionCount": -1}}
+    ]
+
+
+def course_grades_pipeline():
+    """Builds the per-course grade pipeline over individual submissions (run on submissions)."""
+    return [
+        {
+            "$lookup": {
+                "from": "assignments",
+                "localField": "assignmentId",
+                "foreignField": "assignmentId",
+                "as": "assignment"
+            }
+        },
+        {"$unwind": "$assignment"},
+        {
+            "$group": {
+                "_id": "$assignment.courseId",
+                "submissionCount": {"$sum": 1},
+                "averageGrade": {"$avg": "$grade"}
+            }
+        },
+        {"$project": {"_id": 0, "courseId": "$_id", "submissionCount": 1,
+                      "averageGrade": {"$round": ["$averageGrade", 2]}}},
+        {"$sort": {"courseId": 1}}
+    ]
+
+
+def bucketed_course_grades_pipeline():
+    """Builds the same per-course grade pipeline from bucket aggregates (run on submission_buckets)."""
+    return [
+        {
+            "$group": {
+                "_id": "$courseId",
+                "submissionCount": {"$sum": "$count"},
+                "gradeSum": {"$sum": "$gradeSum"},
+                "gradedCount": {"$sum": "$gradedCount"}
+            }
+        },
+        {
+            "$project": {
+                "_id": 0,
+                "courseId": "$_id",
+                "submissionCount": 1,
+                "averageGrade": {
+                    "$cond": [{"$gt": ["$gradedCount", 0]},
+                              {"$round": [{"$divide": ["$gradeSum", "$gradedCount"]}, 2]}, None]
+                }
+            }
+        },
+        {"$sort": {"courseId": 1}}
+    ]
+
+
+def _docs_examined(db, collection_name, pipeline):
+    """Documents examined by an aggregation, from explain (including $lookup sides when reported)."""
+    try:
+        explain = db.command("explain", {"aggregate": collection_name, "pipeline": pipeline, "cursor": {}},
+                             verbosity="executionStats")
+    except Exception:
+        return None
+
+    def walk(node):
+        if isinstance(node, dict):
+            return sum(value if key == "totalDocsExamined" and isinstance(value, int) else walk(value)
+                       for key, value in node.items())
+        if isinstance(node, list):
+            return sum(walk(item) for item in node)
+        return 0
+
+    return walk(explain)
+
+
+def _index_size(db, collection_name):
+    try:
+        return db.command("collStats", collection_name).get("totalIndexSize")
+    except Exception:
+        return None
+
+
+def benchmark_submission_buckets(db, repeat=5):
+    """
+    Compares the grade analytics over individual submissions with the same
+    analytics over submission buckets: index size, documents examined,
+    latency, and whether the results match. Buckets keep archived submissions,
+    so both sides read the archived documents as well (the _all views).
+
+    Args:
+        db: MongoDB database connection object (buckets must have been built)
+        repeat: Runs per pipeline; the fastest is kept (default: 5)
+
+    Returns:
+        list: Dictionaries with report, storage, index_bytes, docs_examined, ms and matches
+    """
+    from eduhub_analytics import student_performance_pipeline
+
+    cases = [
+        ("student_performance",
+         ("enrollments", student_performance_pipeline(), "submissions"),
+         ("enrollments", bucketed_student_performance_pipeline(), SUBMISSION_BUCKETS_COLLECTION)),
+        ("course_grades",
+         ("submissions", course_grades_pipeline(), "submissions"),
+         (SUBMISSION_BUCKETS_COLLECTION, bucketed_course_grades_pipeline(), SUBMISSION_BUCKETS_COLLECTION)),
+    ]
+
+    def canonical(documents):
+        return sorted(repr(sorted(d.items())) for d in documents)
+
+    results = []
+    for report, *variants in cases:
+        outputs = []
+        for storage, (collection_name, pipeline, storage_collection) in zip(("documents", "buckets"), variants):
+            source = source_collection(db, collection_name, include_archived=True)
+            pipeline = with_archived(pipeline)
+            timings = []
+            for _ in range(repeat):
+                start_time = time.perf_counter()
+                documents = list(source.aggregate(copy.deepcopy(pipeline)))
+                timings.append(time.perf_counter() - start_time)
+            outputs.append(canonical(documents))
+            results.append({
+                "report": report,
+                "storage": storage,
+                "documents": db[storage_collection].estimated_document_count(),
+                "index_bytes": _index_size(db, storage_collection),
+                "docs_examined": _docs_examined(db, source.name, pipeline),
+                "ms": min(timings) * 1000,
+            })
+        results[-1]["matches"] = results[-2]["matches"] = outputs[0] == outputs[1]
+
+    print(f"\n{'Report':<20} {'Storage':<10} {'Docs':>8} {'Index bytes':>12} {'Examined':>9} {'ms':>8}  Same")
+    for row in results:
+        index_bytes = f"{row['index_bytes']:,}" if row["index_bytes"] is not None else "n/a"
+        examined = row["docs_examined"] if row["docs_examined"] is not None else "n/a"
+        print(f"{row['report']:<20} {row['storage']:<10} {row['documents']:>8,} {index_bytes:>12} "
+              f"{examined:>9} {row['ms']:>8.1f}  {row['matches']}")
+    return results
+
+# Example usage:
+# enable_submission_buckets(db)            # build buckets, maintain them on submit/regrade
+# append_submission_to_bucket(db, submission, "course001")
+# list(db.submission_buckets.aggregate(bucketed_course_grades_pipeline()))
+# benchmark_submission_buckets(db)
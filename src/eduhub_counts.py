@@ -0,0 +1,98 @@
+# Import Useful Libraries
+from pymongo.errors import OperationFailure
+
+# Key of the whole-collection total in collection_counts() results
+TOTAL = "total"
+
+
+def collection_totals(db, collection_names):
+    """
+    Whole-collection totals from collection metadata (estimated_document_count),
+    without scanning documents or indexes. Estimates can be off after an unclean
+    shutdown and include orphaned documents on sharded clusters.
+
+    Args:
+        db: MongoDB database connection object
+        collection_names: Collections to count
+
+    Returns:
+        dict: {collection name: document count}
+    """
+    return {name: db[name].estimated_document_count() for name in collection_names}
+
+
+def _facet_stages(counts, first):
+    """$match on any of the filters, then one $facet branch per count and per first document."""
+    filters = list(counts.values()) + [query for query, _ in first.values()]
+    stages = []
+    # Narrow the input with the union of the filters so it can use indexes;
+    # an empty filter means every document reaches the $facet anyway
+    if all(filters):
+        stages.append({"$match": filters[0] if len(filters) == 1 else {"$or": filters}})
+    facet = {name: [{"$match": query}, {"$count": "n"}] for name, query in counts.items()}
+    for name, (query, projection) in first.items():
+        facet[name] = [{"$match": query}, {"$limit": 1}] + ([{"$project": projection}] if projection else [])
+    stages += [{"$facet": facet}, {"$project": {"facets": "$$ROOT"}}]
+    return stages
+
+
+def collection_counts(collection, counts=None, first=None, total=False, session=None):
+    """
+    Returns several numbers about one collection in one round trip: the
+    filtered counts and first matching documents come from a single $facet
+    aggregation, and the total (when asked for) from $collStats metadata in
+    the same command. Views and servers without $collStats fall back to
+    estimated_document_count() plus the $facet.
+
+    Args:
+        collection: MongoDB collection object
+        counts: {name: filter} of documents to count (optional)
+        first: {name: (filter, projection)} of documents to return, e.g. to check
+            existence (optional; projection may be None)
+        total: Also return the whole-collection total under "total" (default: False)
+        session: ClientSession, e.g. from causal_session() (optional)
+
+    Returns:
+        dict: {name: count} for counts, {name: document or None} for first,
+            plus "total" when asked for
+    """
+    counts, first = counts or {}, first or {}
+    if TOTAL in counts or TOTAL in first:
+        raise ValueError(f"'{TOTAL}' is reserved for the collection total")
+    results = {}
+
+    if not first and len(counts) == 1 and not total:
+        # A single count is one round trip on its own
+        (name, query), = counts.items()
+        return {name: collection.count_documents(query, session=session)}
+
+    stages = _facet_stages(counts, first) if counts or first else []
+    if total and not stages:
+        return {TOTAL: collection.estimated_document_count()}
+    if total:
+        try:
+            documents = list(collection.aggregate(
+                [{"$collStats": {"count": {}}}, {"$unionWith": {"coll": collection.name, "pipeline": stages}}],
+                session=session
+            ))
+        except OperationFailure:
+            documents = [{"count": collection.estimated_document_count()}] + list(
+                collection.aggregate(stages, session=session))
+        # $collStats returns one document per shard
+        results[TOTAL] = sum(document["count"] for document in documents if "facets" not in document)
+    else:
+        documents = list(collection.aggregate(stages, session=session))
+
+    facets = next((document["facets"] for document in documents if "facets" in document), {})
+    for name in counts:
+        results[name] = facets[name][0]["n"] if facets.get(name) else 0
+    for name in first:
+        results[name] = facets[name][0] if facets.get(name) else None
+    return results
+
+# Example usage:
+# collection_totals(db, ["users", "courses", "enrollments", "lessons"])
+# collection_counts(db.enrollments, {"active": {"completionStatus": {"$gt": 0}},
+#                                    "python": {"courseId": "course001"}}, total=True)
+# collection_counts(db.users, {"active": {"role": "student", "isActive": True}},
+#                   first={"user": ({"userId": "user020"}, {"isActive": 1})})
@@ -0,0 +1,490 @@
+# Import Useful Libraries
+import copy
+import os
+import re
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+import bson
+from bson import Decimal128, MaxKey, MinKey, ObjectId, Regex, Timestamp
+from bson.errors import InvalidDocument
+from pymongo.errors import ExecutionTimeout, OperationFailure
+
+# Server error codes meaning "this aggregation exceeded its time or memory budget"
+BUDGET_ERROR_CODES = {
+    50,     # MaxTimeMSExpired
+    146,    # ExceededMemoryLimit
+    292,    # QueryExceededMemoryLimitNoDiskUseAllowed
+    16819,  # Sort exceeded memory limit
+    16945,  # Exceeded memory limit for $group
+}
+
+# Merged rows above this many encoded bytes are not inlined into a $documents
+# stage: the whole command must stay under the 16MB BSON document limit
+DOCUMENTS_STAGE_MAX_BYTES = 12 * 1024 * 1024
+
+
+@dataclass
+class ExecutionPolicy:
+    """
+    How one report's aggregation is run.
+
+    allow_disk_use / max_time_ms / batch_size / hint are passed to aggregate().
+    When the server rejects the run for exceeding its budget (or the collection
+    is larger than chunk_above documents), the report is recomputed in
+    time buckets of chunk_days on chunk_field and the partial results are merged.
+    Buckets that still exceed the budget are split in half, down to min_chunk_days.
+
+    With partitions set, the report is instead scattered over that many
+    ranges of partition_field, run concurrently and gathered (see scatter_gather).
+    """
+    allow_disk_use: bool = True
+    max_time_ms: Optional[int] = 60_000
+    batch_size: Optional[int] = 1000
+    hint: Optional[object] = None
+    chunk_field: Optional[str] = None
+    chunk_days: int = 90
+    min_chunk_days: int = 1
+    chunk_above: Optional[int] = None
+    partitions: Optional[int] = None
+    partition_field: str = "_id"
+
+    def aggregate_options(self):
+        options = {"allowDiskUse": self.allow_disk_use}
+        if self.max_time_ms:
+            options["maxTimeMS"] = self.max_time_ms
+        if self.batch_size:
+            options["batchSize"] = self.batch_size
+        if self.hint:
+            options["hint"] = self.hint
+        return options
+
+
+# Policy of every analytics report (keys match eduhub_analytics.ANALYTICS_PIPELINES)
+REPORT_POLICIES = {
+    "course_enrollment": ExecutionPolicy(max_time_ms=60_000, chunk_field="enrollmentDate"),
+    "student_performance": ExecutionPolicy(max_time_ms=60_000, chunk_field="enrollmentDate"),
+    "course_completion": ExecutionPolicy(max_time_ms=30_000, chunk_field="enrollmentDate"),
+    "instructor": ExecutionPolicy(max_time_ms=60_000, chunk_field="createdAt"),
+}
+
+
+def is_budget_error(error):
+    """True if an aggregation failed because it ran out of time or memory."""
+    return isinstance(error, ExecutionTimeout) or (
+        isinstance(error, OperationFailure) and error.code in BUDGET_ERROR_CODES
+    )
+
+
+def _is_number(expression):
+    """Expression that is 1 when `expression` is numeric (what $avg counts), else 0."""
+    return {"$cond": [{"$isNumber": expression}, 1, 0]}
+
+
+def _split_group_pipeline(stages):
+    """Splits a pipeline at its first $group into (before, group spec, after)."""
+    for i, stage in enumerate(stages):
+        if "$group" in stage:
+            return stages[:i], stage["$group"], stages[i + 1:]
+    return None
+
+
+def _partial_group(group):
+    """
+    Rewrites a $group so per-chunk results can be merged: $avg becomes a sum
+    and a count. Returns (partial $group spec, merge plan) or None if an
+    accumulator cannot be merged.
+    """
+    partial = {"_id": group["_id"]}
+    plan = {}
+    for field, accumulator in group.items():
+        if field == "_id":
+            continue
+        (operator, expression), = accumulator.items()
+        if operator == "$avg":
+            partial[field + "__sum"] = {"$sum": expression}
+            partial[field + "__count"] = {"$sum": _is_number(expression)}
+        elif operator in ("$sum", "$min", "$max", "$first", "$last", "$push", "$addToSet"):
+            partial[field] = {operator: expression}
+        else:
+            return None
+        plan[field] = operator
+    return partial, plan
+
+
+def _bson_order(value):
+    """
+    Sort key following MongoDB's comparison order, so $min/$max merge values of
+    mixed types the way the server does: MinKey < null < numbers < strings <
+    objects < arrays < binary < ObjectId < booleans < dates < timestamps < regex < MaxKey.
+    """
+    if isinstance(value, MinKey):
+        return (1,)
+    if value is None:
+        return (2,)
+    if isinstance(value, bool):
+        return (9, value)
+    if isinstance(value, (int, float)):
+        return (3, value)
+    if isinstance(value, Decimal128):
+        return (3, value.to_decimal())
+    if isinstance(value, str):
+        return (4, value)
+    if isinstance(value, dict):
+        return (5, tuple((_bson_order(v)[0], k, _bson_order(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return (6, tuple(_bson_order(v) for v in value))
+    if isinstance(value, bytes):
+        return (7, len(value), getattr(value, "subtype", 0), bytes(value))
+    if isinstance(value, ObjectId):
+        return (8, value.binary)
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return (10, value)
+    if isinstance(value, Timestamp):
+        return (11, value.time, value.inc)
+    if isinstance(value, (Regex, re.Pattern)):
+        return (12, value.pattern, str(value.flags))
+    if isinstance(value, MaxKey):
+        return (13,)
+    return (14, str(value))
+
+
+def _merge_partials(rows_by_chunk, plan):
+    """Merges per-chunk partial group rows into final group rows, in chunk order."""
+    merged = {}
+    for rows in rows_by_chunk:
+        for row in rows:
+            key = bson.encode({"k": row["_id"]})
+            if key not in merged:
+                merged[key] = dict(row)
+                continue
+            current = merged[key]
+            for field, operator in plan.items():
+                if operator == "$avg":
+                    current[field + "__sum"] += row[field + "__sum"]
+                    current[field + "__count"] += row[field + "__count"]
+                elif operator == "$sum":
+                    current[field] += row[field]
+                elif operator in ("$min", "$max"):
+                    values = [v for v in (current.get(field), row.get(field)) if v is not None]
+                    current[field] = (min if operator == "$min" else max)(values, key=_bson_order) if values else None
+                elif operator == "$last":
+                    current[field] = row.get(field)
+                elif operator == "$push":
+                    current[field] = current[field] + row[field]
+                elif operator == "$addToSet":
+                    current[field] = current[field] + [v for v in row[field] if v not in current[field]]
+                # $first keeps the value of the earliest chunk
+
+    results = []
+    for row in merged.values():
+        for field, operator in plan.items():
+            if operator == "$avg":
+                count = row.pop(field + "__count")
+                total = row.pop(field + "__sum")
+                row[field] = total / count if count else None
+        results.append(row)
+    return results
+
+
+def _partial_pipeline(stages):
+    """
+    Splits a pipeline into (stages before $group, partial $group, merge plan,
+    stages after $group). Raises ValueError if its results cannot be merged.
+    """
+    split = _split_group_pipeline(stages)
+    # Row-count stages ahead of the $group would apply per chunk instead of overall
+    if split and any(name in stage for stage in split[0] for name in ("$limit", "$skip", "$sample")):
+        split = None
+    partial = _partial_group(split[1]) if split else None
+    if partial is None:
+        raise ValueError("Pipeline cannot be split: it needs a $group with mergeable accumulators")
+    before, _, after = split
+    group, plan = partial
+    return before, group, plan, after
+
+
+def _run_after_group(db, rows, stages, policy):
+    """
+    Runs the stages after $group on the merged rows, on the server: inlined in a
+    $documents stage when they fit in one command, otherwise through a scratch collection.
+    """
+    if not stages:
+        return rows
+    if sum(len(bson.encode(row)) for row in rows) <= DOCUMENTS_STAGE_MAX_BYTES:
+        try:
+            # $documents (MongoDB 5.1+) feeds the rows to the pipeline without writing them
+            return list(db.aggregate([{"$documents": rows}] + stages, **policy.aggregate_options()))
+        except (OperationFailure, InvalidDocument):
+            # Older servers, or a command pushed over the BSON limit by the stages themselves
+            pass
+    scratch = db[f"tmp_report_{uuid.uuid4().hex}"]
+    try:
+        if rows:
+            scratch.insert_many(rows)
+        return list(scratch.aggregate(stages, **policy.aggregate_options()))
+    finally:
+        scratch.drop()
+
+
+def _chunk_bounds(collection, field):
+    """Returns the earliest and latest date in `field`, or None if there are no dates."""
+    query = {field: {"$type": "date"}}
+    first = collection.find_one(query, {field: 1}, sort=[(field, 1)])
+    last = collection.find_one(query, {field: 1}, sort=[(field, -1)])
+    if not first:
+        return None
+    return first[field], last[field]
+
+
+def run_chunked(collection, stages, policy):
+    """
+    Runs a $group pipeline in time buckets on policy.chunk_field and merges the
+    partial results. Documents whose field is not a date form one extra bucket.
+
+    Args:
+        collection: MongoDB collection the pipeline runs on
+        stages: Aggregation pipeline containing a $group
+        policy: ExecutionPolicy with chunk_field set
+
+    Returns:
+        tuple: (documents, info) where info has "chunks" and "splits"
+    """
+    if not policy.chunk_field:
+        raise ValueError("Pipeline cannot be chunked without a chunk_field")
+    before, group, plan, after = _partial_pipeline(stages)
+    field = policy.chunk_field
+    options = policy.aggregate_options()
+    info = {"chunks": 0, "splits": 0}
+    rows_by_chunk = []
+
+    def run_chunk(match):
+        info["chunks"] += 1
+        return list(collection.aggregate([{"$match": match}] + before + [{"$group": group}], **options))
+
+    def run_range(start, end):
+        try:
+            rows_by_chunk.append(run_chunk({field: {"$gte": start, "$lt": end}}))
+        except OperationFailure as e:
+            if not is_budget_error(e) or end - start <= timedelta(days=policy.min_chunk_days):
+                raise
+            info["splits"] += 1
+            middle = start + (end - start) / 2
+            run_range(start, middle)
+            run_range(middle, end)
+
+    bounds = _chunk_bounds(collection, field)
+    if bounds:
+        start, last = bounds
+        step = timedelta(days=policy.chunk_days)
+        while start <= last:
+            run_range(start, min(start + step, last + timedelta(milliseconds=1)))
+            start += step
+    rows_by_chunk.append(run_chunk({field: {"$not": {"$type": "date"}}}))
+
+    rows = _merge_partials(rows_by_chunk, plan)
+    return _run_after_group(collection.database, rows, after, policy), info
+
+
+# $type aliases of the range key types scatter_gather() can split on
+_RANGE_TYPES = ((str, "string"), (datetime, "date"), (ObjectId, "objectId"), ((int, float), "number"))
+
+
+def _type_alias(value):
+    for types, alias in _RANGE_TYPES:
+        if isinstance(value, types) and not isinstance(value, bool):
+            return alias
+    return None
+
+
+def split_points(collection, field, partitions, sample_size=None):
+    """
+    Picks up to partitions - 1 boundaries that split `field` into ranges of
+    roughly equal document counts, from a random sample of the collection.
+
+    Args:
+        collection: MongoDB collection to split
+        field: Field to split on (_id, courseId, enrollmentDate, ...)
+        partitions: Number of ranges wanted
+        sample_size: Documents sampled (default: 100 per partition)
+
+    Returns:
+        tuple: (sorted boundaries, $type alias of the field) - boundaries may be
+            fewer than requested when the field has few distinct values
+    """
+    sample_size = sample_size or 100 * partitions
+    values = [doc["v"] for doc in collection.aggregate([
+        {"$sample": {"size": sample_size}},
+        {"$project": {"_id": 0, "v": "$" + field}}
+    ]) if "v" in doc]
+    aliases = [_type_alias(v) for v in values]
+    alias = max(set(aliases) - {None}, key=aliases.count, default=None)
+    if alias is None:
+        return [], None
+    values = sorted(v for v, a in zip(values, aliases) if a == alias)
+    points = []
+    for i in range(1, partitions):
+        value = values[i * len(values) // partitions]
+        if not points or value > points[-1]:
+            points.append(value)
+    return points, alias
+
+
+def key_ranges(collection, field, partitions, sample_size=None):
+    """
+    Splits a collection into `partitions` range filters on `field` that
+    together match every document exactly once. Values of another type
+    (or a missing field) form one extra range.
+
+    Returns:
+        list: $match filters
+    """
+    points, alias = split_points(collection, field, partitions, sample_size)
+    if alias is None:
+        return [{}]
+    bounds = [None] + points + [None]
+    ranges = []
+    for low, high in zip(bounds, bounds[1:]):
+        condition = {"$type": alias}
+        if low is not None:
+            condition["$gte"] = low
+        if high is not None:
+            condition["$lt"] = high
+        ranges.append({field: condition})
+    ranges.append({field: {"$not": {"$type": alias}}})
+    return ranges
+
+
+def scatter_gather(collection, stages, field="_id", partitions=None, max_workers=None, policy=None):
+    """
+    Runs a $group pipeline on key ranges of a collection concurrently and merges
+    the partial groups client-side (sums and counts add up, $avg is recombined
+    from its sum and count). Each range is a separate aggregate, so the server
+    works on several ranges at once instead of one thread scanning everything.
+
+    Args:
+        collection: MongoDB collection the pipeline runs on
+        stages: Aggregation pipeline containing a $group
+        field: Field the collection is split on: _id, courseId or a date field (default: "_id")
+        partitions: Number of ranges (default: number of CPUs)
+        max_workers: Concurrent aggregations (default: one per range)
+        policy: ExecutionPolicy supplying the aggregate options (default: ExecutionPolicy())
+
+    Returns:
+        tuple: (documents, info) where info has "mode", "partitions", "seconds"
+            and the per-range "partition_seconds"
+    """
+    policy = policy or ExecutionPolicy()
+    start_time = time.perf_counter()
+    before, group, plan, after = _partial_pipeline(stages)
+    ranges = key_ranges(collection, field, partitions or os.cpu_count() or 4)
+    options = policy.aggregate_options()
+
+    def run_range(match):
+        range_start = time.perf_counter()
+        rows = list(collection.aggregate([{"$match": match}] + copy.deepcopy(before) + [{"$group": group}],
+                                         **options))
+        return rows, time.perf_counter() - range_start
+
+    with ThreadPoolExecutor(max_workers=max_workers or len(ranges)) as pool:
+        results = list(pool.map(run_range, ranges))
+
+    rows = _merge_partials([rows for rows, _ in results], plan)
+    documents = _run_after_group(collection.database, rows, after, policy)
+    return documents, {
+        "mode": "parallel",
+        "partitions": len(ranges),
+        "partition_seconds": [seconds for _, seconds in results],
+        "seconds": time.perf_counter() - start_time,
+    }
+
+
+def benchmark_scatter_gather(collection, stages, field="_id", partitions=(1, 2, 4, 8), repeat=3):
+    """
+    Times a pipeline as a single aggregate and scattered over increasing numbers
+    of ranges, and checks every run returns the same groups.
+
+    Args:
+        collection: MongoDB collection the pipeline runs on
+        stages: Aggregation pipeline containing a $group
+        field: Field the collection is split on (default: "_id")
+        partitions: Range counts to try (default: 1, 2, 4, 8)
+        repeat: Runs per configuration; the fastest is kept (default: 3)
+
+    Returns:
+        list: Dictionaries with partitions, ms, speedup and matches
+    """
+    def canonical(documents):
+        return sorted(bson.encode({"d": {k: round(v, 9) if isinstance(v, float) else v for k, v in d.items()}})
+                      for d in documents)
+
+    def best(func):
+        timings, documents = [], None
+        for _ in range(repeat):
+            start_time = time.perf_counter()
+            documents = func()
+            timings.append(time.perf_counter() - start_time)
+        return min(timings) * 1000, documents
+
+    baseline_ms, expected = best(lambda: list(collection.aggregate(copy.deepcopy(stages), allowDiskUse=True)))
+    results = [{"partitions": "single", "ms": baseline_ms, "speedup": 1.0, "matches": True}]
+    for count in partitions:
+        ms, documents = best(lambda: scatter_gather(collection, stages, field, count)[0])
+        results.append({"partitions": count, "ms": ms, "speedup": baseline_ms / ms,
+                        "matches": canonical(documents) == canonical(expected)})
+
+    print(f"\nScatter-gather on {collection.name}.{field}:")
+    print(f"{'Partitions':>10} {'ms':>10} {'Speedup':>8}  Same result")
+    for row in results:
+        print(f"{row['partitions']:>10} {row['ms']:>10.1f} {row['speedup']:>7.2f}x  {row['matches']}")
+    return results
+
+
+def run_with_policy(collection, stages, policy=None):
+    """
+    Runs an aggregation under an execution policy, degrading to chunked
+    execution when it exceeds its time or memory budget.
+
+    Args:
+        collection: MongoDB collection the pipeline runs on
+        stages: Aggregation pipeline
+        policy: ExecutionPolicy (default: ExecutionPolicy())
+
+    Returns:
+        tuple: (documents, info) where info has "mode" ("single", "chunked" or
+            "parallel"), "seconds" and, for chunked runs, "chunks", "splits" and "reason"
+    """
+    policy = policy or ExecutionPolicy()
+    if policy.partitions:
+        return scatter_gather(collection, stages, policy.partition_field, policy.partitions, policy=policy)
+    start_time = time.perf_counter()
+    reason = None
+
+    if policy.chunk_above is not None and policy.chunk_field \
+            and collection.estimated_document_count() > policy.chunk_above:
+        reason = f"more than {policy.chunk_above:,} documents"
+    else:
+        try:
+            documents = list(collection.aggregate(copy.deepcopy(stages), **policy.aggregate_options()))
+            return documents, {"mode": "single", "seconds": time.perf_counter() - start_time}
+        except OperationFailure as e:
+            if not is_budget_error(e) or not policy.chunk_field:
+                raise
+            reason = f"{type(e).__name__}: {e}"
+            print(f"Aggregation on {collection.name} exceeded its budget, retrying in chunks ({reason})")
+
+    documents, info = run_chunked(collection, stages, policy)
+    info.update(mode="chunked", reason=reason, seconds=time.perf_counter() - start_time)
+    return documents, info
+
+# Example usage:
+# run_with_policy(db.enrollments, course_enrollment_pipeline(), REPORT_POLICIES["course_enrollment"])
+# run_with_policy(db.enrollments, pipeline, ExecutionPolicy(max_time_ms=5_000, chunk_field="enrollmentDate"))
+# scatter_gather(db.enrollments, course_enrollment_pipeline(), field="courseId", partitions=8)
+# benchmark_scatter_gather(db.enrollments, course_enrollment_pipeline(), field="_id")
@@ -0,0 +1,343 @@
+# Import Useful Libraries
+from pymongo import DESCENDING, ReplaceOne
+
+from eduhub_archive import including_archive
+from eduhub_indexes import ensure_index
+
+# One document per (studentId, courseId):
+# {studentId, courseId, submissionCount, gradeSum, gradedCount, averageGrade, lastSubmissionDate}
+# Rows cover archived submissions too: archival leaves them as they are, and rebuilds
+# also read submissions_archive.
+GRADEBOOK_COLLECTION = "gradebook"
+
+# Gradebook rows written per bulk_write when rebuilding
+REBUILD_BATCH_SIZE = 1000
+
+
+def _rounded_average(total, count):
+    """gradeSum / gradedCount rounded half up to 2 decimals; $floor works where $round (4.2+) does not."""
+    return {"$divide": [{"$floor": {"$add": [{"$multiply": [{"$divide": [total, count]}, 100]}, 0.5]}}, 100]}
+
+
+# Recomputes averageGrade from the counters in the same atomic update that changed them
+_AVERAGE_GRADE_STAGE = {
+    "$set": {
+        "averageGrade": {
+            "$cond": [
+                {"$gt": ["$gradedCount", 0]},
+                _rounded_average("$gradeSum", "$gradedCount"),
+                None
+            ]
+        }
+    }
+}
+
+
+def create_gradebook_indexes(db):
+    """
+    Creates the indexes the gradebook writes and reads rely on.
+
+    Args:
+        db: MongoDB database connection object
+
+    Returns:
+        list: Names of the indexes created
+    """
+    return [
+        ensure_index(db, GRADEBOOK_COLLECTION, "gradebook_student_course_idx"),
+        ensure_index(db, GRADEBOOK_COLLECTION, "gradebook_course_grade_idx"),
+        ensure_index(db, GRADEBOOK_COLLECTION, "gradebook_grade_idx"),
+        # Resolves a submission's course on every gradebook write
+        ensure_index(db, "assignments", "assignment_id_idx"),
+    ]
+
+
+def get_course_for_assignment(db, assignment_id):
+    """
+    Looks up the course an assignment belongs to.
+
+    Args:
+        db: MongoDB database connection object
+        assignment_id: ID of the assignment
+
+    Returns:
+        str: The courseId, or None if the assignment does not exist
+    """
+    assignment = db.assignments.find_one({"assignmentId": assignment_id}, {"courseId": 1, "_id": 0})
+    return assignment["courseId"] if assignment else None
+
+
+def _apply_gradebook_delta(db, student_id, course_id, submissions=0, grade_delta=0, graded=0,
+                           submitted_date=None, upsert=True):
+    """Atomically applies counter deltas to one gradebook row, creating it if upsert is set."""
+    counters = {
+        "submissionCount": {"$add": [{"$ifNull": ["$submissionCount", 0]}, submissions]},
+        "gradeSum": {"$add": [{"$ifNull": ["$gradeSum", 0]}, grade_delta]},
+        "gradedCount": {"$add": [{"$ifNull": ["$gradedCount", 0]}, graded]},
+    }
+    if submitted_date is not None:
+        counters["lastSubmissionDate"] = {
+            "$max": [{"$ifNull": ["$lastSubmissionDate", submitted_date]}, submitted_date]
+        }
+
+    return db[GRADEBOOK_COLLECTION].update_one(
+        {"studentId": student_id, "courseId": course_id},
+        [{"$set": counters}, _AVERAGE_GRADE_STAGE],
+        upsert=upsert
+    )
+
+
+def record_submission_in_gradebook(db, submission, course_id=None):
+    """
+    Adds a newly inserted submission to its student's gradebook row.
+
+    Args:
+        db: MongoDB database connection object
+        submission: The submission document that was inserted
+        course_id: Course of the submission's assignment (looked up when omitted)
+
+    Returns:
+        UpdateResult: Result of the gradebook upsert, or None if the course is unknown
+    """
+    course_id = course_id or get_course_for_assignment(db, submission["assignmentId"])
+    if course_id is None:
+        return None
+
+    is_graded = bool(submission.get("isGraded")) and submission.get("grade") is not None
+    return _apply_gradebook_delta(
+        db, submission["studentId"], course_id,
+        submissions=1,
+        grade_delta=submission["grade"] if is_graded else 0,
+        graded=1 if is_graded else 0,
+        submitted_date=submission.get("submittedDate")
+    )
+
+
+def record_grade_change_in_gradebook(db, previous_submission, new_grade, course_id=None):
+    """
+    Applies a (re)grade of an existing submission to the gradebook.
+
+    Args:
+        db: MongoDB database connection object
+        previous_submission: The submission as it was before the grade update
+            (needs studentId, assignmentId, grade and isGraded)
+        new_grade: The grade that was just assigned
+        course_id: Course of the submission's assignment (looked up when omitted)
+
+    Returns:
+        UpdateResult: Result of the gradebook update, or None if the course is unknown
+    """
+    course_id = course_id or get_course_for_assignment(db, previous_submission["assignmentId"])
+    if course_id is None:
+        return None
+
+    was_graded = bool(previous_submission.get("isGraded")) and previous_submission.get("grade") is not None
+    old_grade = previous_submission["grade"] if was_graded else 0
+    result = _apply_gradebook_delta(
+        db, previous_submission["studentId"], course_id,
+        grade_delta=new_grade - old_grade,
+        graded=0 if was_graded else 1,
+        upsert=False
+    )
+
+    # A delta is only meaningful against an existing row; otherwise recompute it
+    if result.matched_count == 0:
+        rebuild_gradebook_entry(db, previous_submission["studentId"], course_id)
+    return result
+
+
+def _gradebook_pipeline(student_id=None, course_id=None):
+    """Builds the pipeline that recomputes gradebook rows from submissions, optionally for one row."""
+    pipeline = [{"$match": {"studentId": student_id}}] if student_id else []
+    pipeline += [
+        {
+            "$lookup": {
+                "from": "assignments",
+                "localField": "assignmentId",
+                "foreignField": "assignmentId",
+                "as": "assignment"
+            }
+        },
+        {"$unwind": "$assignment"},
+    ]
+    if course_id:
+        pipeline.append({"$match": {"assignment.courseId": course_id}})
+    pipeline += [
+        {
+            "$addFields": {
+                "countedGrade": {
+                    "$cond": [{"$and": ["$isGraded", {"$ne": [{"$ifNull": ["$grade", None]}, None]}]},
+                              "$grade", None]
+                }
+            }
+        },
+        {
+            "$group": {
+                "_id": {"studentId": "$studentId", "courseId": "$assignment.courseId"},
+                "submissionCount": {"$sum": 1},
+                "gradeSum": {"$sum": {"$ifNull": ["$countedGrade", 0]}},
+                "gradedCount": {"$sum": {"$cond": [{"$eq": ["$countedGrade", None]}, 0, 1]}},
+                "lastSubmissionDate": {"$max": "$submittedDate"}
+            }
+        },
+        {
+            "$project": {
+                "_id": 0,
+                "studentId": "$_id.studentId",
+                "courseId": "$_id.courseId",
+                "submissionCount": 1,
+                "gradeSum": 1,
+                "gradedCount": 1,
+                "lastSubmissionDate": 1
+            }
+        },
+        _AVERAGE_GRADE_STAGE,
+    ]
+    return pipeline
+
+
+def _write_rows(db, rows):
+    """Replaces (or inserts) gradebook rows by (studentId, courseId), REBUILD_BATCH_SIZE per bulk write."""
+    gradebook = db[GRADEBOOK_COLLECTION]
+    written, batch = 0, []
+    for row in rows:
+        batch.append(ReplaceOne({"studentId": row["studentId"], "courseId": row["courseId"]}, row, upsert=True))
+        if len(batch) == REBUILD_BATCH_SIZE:
+            gradebook.bulk_write(batch, ordered=False)
+            written, batch = written + len(batch), []
+    if batch:
+        gradebook.bulk_write(batch, ordered=False)
+    return written + len(batch)
+
+
+def rebuild_gradebook(db):
+    """
+    Recomputes the whole gradebook from the hot and archived submissions.
+    Run it once as the initial backfill (and to repair drift); afterwards the
+    gradebook is maintained by submit_assignment and update_assignment_grade.
+    Rows are written by upsert on (studentId, courseId) rather than $merge, so
+    the rebuild does not depend on the unique index existing beforehand.
+
+    Args:
+        db: MongoDB database connection object
+
+    Returns:
+        int: Number of gradebook documents
+    """
+    create_gradebook_indexes(db)
+    _write_rows(db, db.submissions.aggregate(including_archive("submissions", _gradebook_pipeline())))
+    return db[GRADEBOOK_COLLECTION].count_documents({})
+
+
+def rebuild_gradebook_entry(db, student_id, course_id):
+    """
+    Recomputes a single gradebook row from the student's submissions,
+    archived ones included. Also
+    used by the regrade path on a gradebook that was never backfilled, so it
+    upserts the row instead of relying on $merge and its unique index.
+
+    Args:
+        db: MongoDB database connection object
+        student_id: ID of the student
+        course_id: ID of the course
+    """
+    _write_rows(db, db.submissions.aggregate(including_archive("submissions",
+                                                               _gradebook_pipeline(student_id, course_id))))
+
+
+def get_course_gradebook(db, course_id="course001", limit=None):
+    """
+    Ranks the students of one course by average grade with a single indexed sort.
+
+    Args:
+        db: MongoDB database connection object
+        course_id: ID of the course (default: "course001")
+        limit: Maximum number of students to return (default: all)
+
+    Returns:
+        list: Gradebook rows, best average grade first
+    """
+    cursor = db[GRADEBOOK_COLLECTION].find(
+        {"courseId": course_id, "averageGrade": {"$ne": None}},
+        {"_id": 0}
+    ).sort("averageGrade", DESCENDING)
+    if limit:
+        cursor = cursor.limit(limit)
+    return list(cursor)
+
+
+def get_student_rankings(db, limit=None):
+    """
+    Ranks students across all their courses by average grade, from the gradebook only.
+
+    Args:
+        db: MongoDB database connection object
+        limit: Maximum number of students to return (default: all)
+
+    Returns:
+        list: One row per student with averageGrade, submissionCount and coursesWithSubmissions
+    """
+    pipeline = [
+        {
+            "$group": {
+                "_id": "$studentId",
+                "gradeSum": {"$sum": "$gradeSum"},
+                "gradedCount": {"$sum": "$gradedCount"},
+                "submissionCount": {"$sum": "$submissionCount"},
+                "coursesWithSubmissions": {"$sum": 1}
+            }
+        },
+        {"$match": {"gradedCount": {"$gt": 0}}},
+        {
+            "$project": {
+                "_id": 0,
+                "studentId": "$_id",
+                "averageGrade": _rounded_average("$gradeSum", "$gradedCount"),
+                "submissionCount": 1,
+                "coursesWithSubmissions": 1
+            }
+        },
+        {"$sort": {"averageGrade": -1, "submissionCount": -1}}
+    ]
+    if limit:
+        pipeline.append({"$limit": limit})
+    return list(db[GRADEBOOK_COLLECTION].aggregate(pipeline))
+
+
+def get_course_grade_averages(db):
+    """
+    Computes the average grade of every course from the gradebook counters.
+
+    Args:
+        db: MongoDB database connection object
+
+    Returns:
+        list: One row per course with averageGrade and gradedCount, best first
+    """
+    return list(db[GRADEBOOK_COLLECTION].aggregate([
+        {
+            "$group": {
+                "_id": "$courseId",
+                "gradeSum": {"$sum": "$gradeSum"},
+                "gradedCount": {"$sum": "$gradedCount"},
+                "students": {"$sum": 1}
+            }
+        },
+        {"$match": {"gradedCount": {"$gt": 0}}},
+        {
+            "$project": {
+                "_id": 0,
+                "courseId": "$_id",
+                "averageGrade": _rounded_average("$gradeSum", "$gradedCount"),
+                "gradedCount": 1,
+                "students": 1
+            }
+        },
+        {"$sort": {"averageGrade": -1}}
+    ]))
+
+# Example usage:
+# rebuild_gradebook(db)                     # one-off backfill
+# get_course_gradebook(db, "course001")     # per-course ranking, single indexed sort
+# get_student_rankings(db, limit=10)
+# get_course_grade_averages(db)
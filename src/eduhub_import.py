@@ -0,0 +1,575 @@
+# Import Useful Libraries
+import codecs
+import hashlib
+import json
+import os
+from datetime import datetime
+
+from bson import json_util
+from pymongo import ReplaceOne, UpdateOne
+from pymongo.errors import BulkWriteError, OperationFailure
+
+from eduhub_dates import convert_date_fields
+from eduhub_indexes import ensure_index
+from eduhub_progress import RETRYABLE_WRITE_ERROR_CODES
+from eduhub_queries import db, DATE_FIELDS, DOCUMENT_CHECKERS
+from eduhub_validation import partition_documents, write_rejects
+
+# Business key of every collection; imports upsert on it, so replaying a batch is harmless
+NATURAL_KEYS = {
+    "users": "userId",
+    "courses": "courseId",
+    "enrollments": "enrollmentId",
+    "lessons": "lessonId",
+    "assignments": "assignmentId",
+    "submissions": "submissionId",
+}
+
+# Unique natural-key indexes of INDEX_MANIFEST
+_NATURAL_KEY_INDEXES = {
+    "users": "user_id_idx",
+    "courses": "course_id_idx",
+    "enrollments": "enrollment_id_idx",
+    "lessons": "lesson_id_idx",
+    "assignments": "assignment_id_idx",
+    "submissions": "submission_id_idx",
+}
+
+IMPORT_CHECKPOINT_COLLECTION = "import_checkpoints"
+
+# Digest of the source record a document was last synced from
+CONTENT_HASH_FIELD = "contentHash"
+
+_WHITESPACE = " \t\r\n"
+
+
+class _ExportReader:
+    """
+    Streams the elements of the top-level arrays of an EduHub export
+    ({"users": [...], "courses": [...], ...}) together with the byte offset just
+    past each element, so a reader can later be restarted at that offset.
+    """
+
+    def __init__(self, json_file_path, chunk_size=1 << 20):
+        self.file = open(json_file_path, "rb")
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.json_decoder = json.JSONDecoder()
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.offset = 0  # Byte offset of self.buffer[self.pos]
+        self.eof = False
+
+    def close(self):
+        self.file.close()
+
+    def _fill(self):
+        if self.eof:
+            return False
+        chunk = self.file.read(self.chunk_size)
+        self.eof = not chunk
+        # Drop consumed text before growing the buffer
+        self.buffer = self.buffer[self.pos:] + self.decoder.decode(chunk, final=self.eof)
+        self.pos = 0
+        return bool(chunk)
+
+    def _advance(self, end):
+        self.offset += len(self.buffer[self.pos:end].encode("utf-8"))
+        self.pos = end
+
+    def _peek(self):
+        """Skips whitespace and returns the next character ("" at end of file)."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+                self.offset += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ""
+
+    def _expect(self, characters):
+        char = self._peek()
+        if char not in characters or not char:
+            raise ValueError(f"Malformed export at byte {self.offset}: expected one of {characters!r}, got {char!r}")
+        self._advance(self.pos + 1)
+        return char
+
+    def _value(self):
+        """Decodes the next JSON value, reading more of the file until it is complete."""
+        self._peek()
+        while True:
+            try:
+                value, end = self.json_decoder.raw_decode(self.buffer, self.pos)
+                # A value ending exactly at the buffer edge may be truncated (e.g. a number)
+                if end < len(self.buffer) or self.eof:
+                    self._advance(end)
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+    def documents(self, start_collection=None, start_offset=0):
+        """
+        Yields (collection_name, document, end_offset) for every array element.
+
+        Args:
+            start_collection: Collection whose array the reader is resumed in
+            start_offset: Byte offset just past an element of that array (0 reads from the start)
+        """
+        if start_offset:
+            self.file.seek(start_offset)
+            self.offset = start_offset
+            collection_name = start_collection
+        else:
+            self._expect("{")
+            collection_name = None
+
+        while True:
+            if collection_name is not None:
+                # Inside an array, just past an element (or its opening bracket)
+                if self._expect(",]") == "]":
+                    collection_name = None
+                    if self._expect(",}") == "}":
+                        return
+                    continue
+                yield collection_name, self._value(), self.offset
+                continue
+
+            if self._peek() == "}":
+                return
+            key = self._value()
+            self._expect(":")
+            if self._peek() == "[":
+                self._advance(self.pos + 1)
+                if self._peek() == "]":
+                    self._advance(self.pos + 1)
+                else:
+                    collection_name = key
+                    yield collection_name, self._value(), self.offset
+                    continue
+            else:
+                self._value()  # Non-array members are skipped
+            if self._expect(",}") == "}":
+                return
+
+
+def iter_export_documents(json_file_path, start_collection=None, start_offset=0, chunk_size=1 << 20):
+    """
+    Streams the documents of an EduHub JSON export without loading the whole file.
+
+    Args:
+        json_file_path: Path to the JSON export
+        start_collection: Collection to resume in (from a checkpoint)
+        start_offset: Byte offset to resume at (from a checkpoint, default: start of file)
+        chunk_size: Bytes read from the file at a time (default: 1 MiB)
+
+    Yields:
+        tuple: (collection_name, document, end_offset)
+    """
+    reader = _ExportReader(json_file_path, chunk_size)
+    try:
+        yield from reader.documents(start_collection, start_offset)
+    finally:
+        reader.close()
+
+
+class FileCheckpointStore:
+    """Keeps import checkpoints in a local JSON file, rewritten atomically on every save."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def _read(self):
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path) as f:
+            return json.load(f)
+
+    def _write(self, checkpoints):
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(checkpoints, f, indent=2, default=str)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+
+    def load(self, import_id):
+        return self._read().get(import_id)
+
+    def save(self, import_id, state):
+        checkpoints = self._read()
+        checkpoints[import_id] = state
+        self._write(checkpoints)
+
+    def clear(self, import_id):
+        checkpoints = self._read()
+        checkpoints.pop(import_id, None)
+        self._write(checkpoints)
+
+
+class CollectionCheckpointStore:
+    """Keeps import checkpoints in a control collection, one document per import."""
+
+    def __init__(self, db, collection_name=IMPORT_CHECKPOINT_COLLECTION):
+        self.collection = db[collection_name]
+
+    def load(self, import_id):
+        return self.collection.find_one({"_id": import_id}, {"_id": 0})
+
+    def save(self, import_id, state):
+        self.collection.replace_one({"_id": import_id}, state, upsert=True)
+
+    def clear(self, import_id):
+        self.collection.delete_one({"_id": import_id})
+
+
+def create_import_key_indexes(db):
+    """
+    Builds the unique natural-key index of every collection (from INDEX_MANIFEST),
+    so each upsert is a point lookup and two concurrent upserts of one key
+    cannot both insert. A collection whose index cannot be built, because it
+    already holds duplicate keys or an older non-unique index under the same
+    name, is reported and imported without it; reconcile_indexes(apply=True)
+    rebuilds the index once the duplicates are resolved.
+
+    Args:
+        db: MongoDB database connection object
+
+    Returns:
+        list: Names of the indexes in use
+    """
+    names = []
+    for name in NATURAL_KEYS:
+        try:
+            names.append(ensure_index(db, name, _NATURAL_KEY_INDEXES[name]))
+        except OperationFailure as e:
+            print(f"Unique index {name}.{_NATURAL_KEY_INDEXES[name]} not built: {e}")
+    return names
+
+
+def _bulk_write_with_rejects(collection, requests, documents, reject_file):
+    """
+    Runs an unordered bulk write of one request per document. Documents the
+    server refuses (validator, unique index) go to the reject file instead of
+    aborting the run; transient and write concern errors still raise, so the
+    batch is retried from the last checkpoint.
+
+    Returns:
+        tuple: (upserted count, matched count, indexes of the rejected requests)
+    """
+    try:
+        result = collection.bulk_write(requests, ordered=False)
+        return result.upserted_count, result.matched_count, set()
+    except BulkWriteError as e:
+        write_errors = e.details["writeErrors"]
+        if e.details.get("writeConcernErrors") or any(
+                error["code"] in RETRYABLE_WRITE_ERROR_CODES for error in write_errors):
+            print(f"Batch for {collection.name} failed and will be retried: {len(write_errors)} errors")
+            raise
+        write_rejects(reject_file, collection.name,
+                      [(documents[error["index"]], error["errmsg"]) for error in write_errors])
+        return e.details["nUpserted"], e.details["nMatched"], {error["index"] for error in write_errors}
+
+
+def _source_fingerprint(json_file_path):
+    """Identifies the version of the source file a checkpoint belongs to."""
+    stat = os.stat(json_file_path)
+    return {"size": stat.st_size, "mtime": stat.st_mtime}
+
+
+def _upsert_batch(db, collection_name, documents, validate, reject_file, date_method):
+    """Converts, validates and upserts one batch; returns its counters."""
+    key = NATURAL_KEYS[collection_name]
+    if collection_name in DATE_FIELDS:
+        documents = convert_date_fields(documents, DATE_FIELDS[collection_name], method=date_method)
+
+    rejected = []
+    if validate and collection_name in DOCUMENT_CHECKERS:
+        documents, rejected = partition_documents(DOCUMENT_CHECKERS[collection_name], documents)
+        write_rejects(reject_file, collection_name, rejected)
+
+    # Documents without their key cannot be upserted idempotently
+    keyed = [doc for doc in documents if doc.get(key) is not None]
+    write_rejects(reject_file, collection_name,
+                  [(doc, f"missing natural key {key!r}") for doc in documents if doc.get(key) is None])
+    counts = {"upserted": 0, "matched": 0, "rejected": len(rejected) + len(documents) - len(keyed)}
+    if not keyed:
+        return counts
+
+    requests = [ReplaceOne({key: doc[key]}, doc, upsert=True) for doc in keyed]
+    counts["upserted"], counts["matched"], failed = _bulk_write_with_rejects(
+        db[collection_name], requests, keyed, reject_file)
+    counts["rejected"] += len(failed)
+    return counts
+
+
+def resumable_load_data_to_collections(json_file_path, target_db=None, checkpoint_store=None,
+                                       batch_size=1000, validate=True, reject_file=None,
+                                       date_method="cached", restart=False):
+    """
+    Loads an EduHub JSON export in batches of idempotent upserts, recording a
+    checkpoint (collection, byte offset, batch number) after every batch.
+    Rerunning after a crash resumes at the last checkpoint, and the batch that
+    was in flight is simply upserted again.
+
+    Unlike load_data_to_collections, the file is streamed rather than read into
+    memory, and collections are loaded in the order they appear in the file.
+    Documents sharing a natural key collapse into one (the last one wins).
+
+    Args:
+        json_file_path: Path to the JSON export
+        target_db: Database to load into (default: the module-level connection)
+        checkpoint_store: FileCheckpointStore or CollectionCheckpointStore
+            (default: "<input>.checkpoint.json" next to the source file)
+        batch_size: Documents per upsert batch and checkpoint (default: 1000)
+        validate: Pre-validate with the compiled checkers (default: True)
+        reject_file: JSON-lines file for rejected documents (default: "<input>_rejects.jsonl")
+        date_method: Passed to convert_date_fields (default: "cached")
+        restart: Ignore any existing checkpoint and start from the beginning (default: False)
+
+    Returns:
+        dict: The final checkpoint state, including per-collection counters
+    """
+    if target_db is None:
+        target_db = db
+    if checkpoint_store is None:
+        checkpoint_store = FileCheckpointStore(os.path.splitext(json_file_path)[0] + ".checkpoint.json")
+    if reject_file is None:
+        reject_file = os.path.splitext(json_file_path)[0] + "_rejects.jsonl"
+
+    import_id = os.path.abspath(json_file_path)
+    fingerprint = _source_fingerprint(json_file_path)
+    state = None if restart else checkpoint_store.load(import_id)
+
+    if state and state.get("source") != fingerprint:
+        print("Source file changed since the last checkpoint, starting over")
+        state = None
+    if state and state.get("completed"):
+        print(f"Import of {json_file_path} already completed at {state['updatedAt']}")
+        return state
+    if state:
+        print(f"Resuming {state['collection']} at byte {state['offset']:,} (after batch {state['batch']})")
+    else:
+        state = {"source": fingerprint, "collection": None, "offset": 0, "batch": 0,
+                 "counts": {}, "completed": False}
+
+    create_import_key_indexes(target_db)
+
+    def flush(collection_name, documents, end_offset):
+        counts = _upsert_batch(target_db, collection_name, documents, validate, reject_file, date_method)
+        totals = state["counts"].setdefault(collection_name, {"upserted": 0, "matched": 0, "rejected": 0})
+        for name, value in counts.items():
+            totals[name] += value
+        # The checkpoint is only written once the batch is durable on the server
+        state.update(collection=collection_name, offset=end_offset, batch=state["batch"] + 1,
+                     updatedAt=datetime.now().isoformat())
+        checkpoint_store.save(import_id, state)
+
+    batch, batch_collection, batch_end = [], None, 0
+    for collection_name, document, end_offset in iter_export_documents(
+            json_file_path, state["collection"], state["offset"]):
+        if collection_name not in NATURAL_KEYS:
+            continue
+        if batch and collection_name != batch_collection:
+            flush(batch_collection, batch, batch_end)
+            batch = []
+        batch.append(document)
+        batch_collection, batch_end = collection_name, end_offset
+        if len(batch) >= batch_size:
+            flush(batch_collection, batch, batch_end)
+            batch = []
+    if batch:
+        flush(batch_collection, batch, batch_end)
+
+    state.update(completed=True, updatedAt=datetime.now().isoformat())
+    checkpoint_store.save(import_id, state)
+
+    for collection_name, counts in state["counts"].items():
+        print(f"{collection_name}: {counts['upserted']} inserted, {counts['matched']} already present, "
+              f"{counts['rejected']} rejected")
+    print("Data loading completed!")
+    return state
+
+def content_hash(record):
+    """
+    Hashes a source record independently of key order.
+
+    Args:
+        record: Document as read from the JSON export (before date conversion)
+
+    Returns:
+        str: Hex digest of the record's canonical JSON form
+    """
+    canonical = json.dumps(record, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.blake2b(canonical.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _field_diff(current, incoming):
+    """Returns ($set, $unset) that turn the stored document into the incoming one."""
+    changed = {
+        field: value for field, value in incoming.items()
+        if field not in current
+        # Compared as Extended JSON, so stored naive and incoming UTC datetimes match
+        or json_util.dumps(current[field], sort_keys=True) != json_util.dumps(value, sort_keys=True)
+    }
+    removed = {field: "" for field in current
+               if field not in incoming and field not in ("_id", CONTENT_HASH_FIELD)}
+    return changed, removed
+
+
+class _CollectionSync:
+    """Classifies one collection's incoming records and writes only the differences."""
+
+    def __init__(self, db, collection_name, batch_size, validate, reject_file, date_method, dry_run):
+        self.collection = db[collection_name]
+        self.name = collection_name
+        self.key = NATURAL_KEYS[collection_name]
+        self.batch_size = batch_size
+        self.validate = validate
+        self.reject_file = reject_file
+        self.date_method = date_method
+        self.dry_run = dry_run
+        self.stats = {"unchanged": 0, "inserted": 0, "updated": 0, "deleted": 0, "rejected": 0,
+                      "fieldsSet": 0}
+        self.seen = set()
+        self.new, self.changed = [], []
+
+        # One projected pass over the stored hashes
+        self.stored_hashes = {
+            doc[self.key]: doc.get(CONTENT_HASH_FIELD)
+            for doc in self.collection.find({}, {self.key: 1, CONTENT_HASH_FIELD: 1, "_id": 0})
+            if self.key in doc
+        }
+
+    def add(self, record):
+        key_value = record.get(self.key)
+        if key_value is None:
+            write_rejects(self.reject_file, self.name, [(record, f"missing natural key {self.key!r}")])
+            self.stats["rejected"] += 1
+            return
+        if key_value in self.seen:
+            # Letting both through would rewrite the document on every sync
+            write_rejects(self.reject_file, self.name, [(record, f"duplicate natural key {self.key!r}")])
+            self.stats["rejected"] += 1
+            return
+        self.seen.add(key_value)
+        digest = content_hash(record)
+        if self.stored_hashes.get(key_value, None) == digest:
+            self.stats["unchanged"] += 1
+            return
+        record[CONTENT_HASH_FIELD] = digest
+        (self.changed if key_value in self.stored_hashes else self.new).append(record)
+        if len(self.new) + len(self.changed) >= self.batch_size:
+            self.flush()
+
+    def _prepare(self, records):
+        if self.name in DATE_FIELDS:
+            records = convert_date_fields(records, DATE_FIELDS[self.name], method=self.date_method)
+        if self.validate and self.name in DOCUMENT_CHECKERS:
+            records, rejected = partition_documents(DOCUMENT_CHECKERS[self.name], records)
+            write_rejects(self.reject_file, self.name, rejected)
+            self.stats["rejected"] += len(rejected)
+        return records
+
+    def flush(self):
+        new, changed = self._prepare(self.new), self._prepare(self.changed)
+        self.new, self.changed = [], []
+
+        # Upserts keep an interrupted sync safe to rerun
+        requests = [ReplaceOne({self.key: doc[self.key]}, doc, upsert=True) for doc in new]
+        documents = list(new)
+        if changed:
+            current = {
+                doc[self.key]: doc
+                for doc in self.collection.find({self.key: {"$in": [d[self.key] for d in changed]}})
+            }
+            for doc in changed:
+                to_set, to_unset = _field_diff(current.get(doc[self.key], {}), doc)
+                update = {"$set": to_set}
+                if to_unset:
+                    update["$unset"] = to_unset
+                requests.append(UpdateOne({self.key: doc[self.key]}, update, upsert=True))
+                documents.append(doc)
+                self.stats["fieldsSet"] += len(to_set)
+
+        failed = set()
+        if requests and not self.dry_run:
+            failed = _bulk_write_with_rejects(self.collection, requests, documents, self.reject_file)[2]
+        self.stats["inserted"] += len(new) - sum(1 for index in failed if index < len(new))
+        self.stats["updated"] += len(changed) - sum(1 for index in failed if index >= len(new))
+        self.stats["rejected"] += len(failed)
+
+    def finish(self, delete_missing):
+        self.flush()
+        missing = [key_value for key_value in self.stored_hashes if key_value not in self.seen]
+        if delete_missing and missing:
+            if not self.dry_run:
+                for start in range(0, len(missing), self.batch_size):
+                    self.collection.delete_many({self.key: {"$in": missing[start:start + self.batch_size]}})
+            self.stats["deleted"] = len(missing)
+        return self.stats
+
+
+def sync_data_to_collections(json_file_path, target_db=None, delete_missing=False, batch_size=1000,
+                             validate=True, reject_file=None, date_method="cached", dry_run=False):
+    """
+    Brings the collections in line with a new export while writing only what changed.
+    Each record's content hash is compared with the hash stored on its document
+    (the contentHash field): unchanged records cost no write, new records are
+    upserted, and changed records get a $set of just the fields that differ.
+
+    Documents loaded by other means have no stored hash, so the first sync
+    rewrites the fields that differ and records the hash; later syncs cost
+    O(changes) writes.
+
+    Args:
+        json_file_path: Path to the JSON export
+        target_db: Database to sync (default: the module-level connection)
+        delete_missing: Delete documents whose key is absent from the export (default: False).
+            Only collections present in the export are affected.
+        batch_size: Documents per bulk write (default: 1000)
+        validate: Pre-validate with the compiled checkers (default: True)
+        reject_file: JSON-lines file for rejected documents (default: "<input>_rejects.jsonl")
+        date_method: Passed to convert_date_fields (default: "cached")
+        dry_run: Classify and report without writing (default: False)
+
+    Returns:
+        dict: Collection name -> {"unchanged", "inserted", "updated", "deleted", "rejected", "fieldsSet"}
+    """
+    if target_db is None:
+        target_db = db
+    if reject_file is None:
+        reject_file = os.path.splitext(json_file_path)[0] + "_rejects.jsonl"
+    if not dry_run:
+        create_import_key_indexes(target_db)
+
+    results = {}
+    sync = None
+    for collection_name, record, _ in iter_export_documents(json_file_path):
+        if collection_name not in NATURAL_KEYS:
+            continue
+        if sync is None or sync.name != collection_name:
+            if sync is not None:
+                results[sync.name] = sync.finish(delete_missing)
+            sync = _CollectionSync(target_db, collection_name, batch_size, validate, reject_file,
+                                   date_method, dry_run)
+        sync.add(record)
+    if sync is not None:
+        results[sync.name] = sync.finish(delete_missing)
+
+    print(f"\n=== Delta Sync{' (dry run)' if dry_run else ''}: {json_file_path} ===")
+    for collection_name, stats in results.items():
+        print(f"{collection_name}: {stats['inserted']} inserted, {stats['updated']} updated "
+              f"({stats['fieldsSet']} fields), {stats['deleted']} deleted, "
+              f"{stats['unchanged']} unchanged, {stats['rejected']} rejected")
+    return results
+
+# Example usage:
+# resumable_load_data_to_collections('data/sample_data.json')              # rerun after a crash to resume
+# resumable_load_data_to_collections('data/sample_data.json',
+#                                    checkpoint_store=CollectionCheckpointStore(db))
+# resumable_load_data_to_collections('data/sample_data.json', restart=True)
+# sync_data_to_collections('data/sample_data.json')                        # daily delta sync
+# sync_data_to_collections('data/sample_data.json', delete_missing=True, dry_run=True)
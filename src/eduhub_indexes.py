@@ -0,0 +1,434 @@
+# Import Useful Libraries
+import time
+
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+from pymongo.errors import OperationFailure
+
+# Queries on the active-only and ungraded-only paths; the partial indexes below
+# contain only the documents matching them
+ACTIVE_STUDENTS_FILTER = {"role": "student", "isActive": True}
+UNGRADED_SUBMISSIONS_FILTER = {"isGraded": False}
+
+# Days telemetry snapshots are kept unless create_telemetry_indexes() is told otherwise
+TELEMETRY_RETENTION_DAYS = 30
+
+
+def _ttl_entry(name, field, retention_days):
+    """Manifest entry of a TTL index expiring documents retention_days after their date field."""
+    return (name, [(field, ASCENDING)], {"expireAfterSeconds": retention_days * 86400})
+
+
+# Every index the application relies on, by collection: (name, keys, options).
+# One name per definition - the functions that create indexes use these names,
+# and reconcile_indexes() makes the database match this manifest. Natural keys
+# are unique: imports and syncs upsert on them, and two concurrent upserts of
+# a key on a non-unique index can both insert. Derived stores (gradebook,
+# outlines, buckets, sketches), the archive collections and the telemetry
+# snapshots are listed too; retention_manifest() adds their configured TTLs.
+INDEX_MANIFEST = {
+    "users": [
+        ("email_lookup_idx", [("email", ASCENDING)], {"unique": True}),
+        ("user_id_idx", [("userId", ASCENDING)], {"unique": True}),
+        ("active_students_partial", [("isActive", ASCENDING), ("role", ASCENDING)],
+         {"partialFilterExpression": ACTIVE_STUDENTS_FILTER}),
+    ],
+    "courses": [
+        ("course_id_idx", [("courseId", ASCENDING)], {"unique": True}),
+        ("course_search_idx", [("title", TEXT), ("category", ASCENDING)], {}),
+        ("category_optimized", [("category", ASCENDING)], {}),
+        ("course_instructor_idx", [("instructorId", ASCENDING)], {}),
+    ],
+    "enrollments": [
+        ("enrollment_id_idx", [("enrollmentId", ASCENDING)], {"unique": True}),
+        ("student_course_idx", [("studentId", ASCENDING), ("courseId", ASCENDING)], {}),
+        ("enrollment_course_idx", [("courseId", ASCENDING)], {}),
+        ("enrollment_date_idx", [("enrollmentDate", ASCENDING)], {}),
+    ],
+    "lessons": [
+        ("lesson_id_idx", [("lessonId", ASCENDING)], {"unique": True}),
+        ("lesson_course_seq_idx", [("courseId", ASCENDING), ("sequence", ASCENDING)], {}),
+    ],
+    "assignments": [
+        ("assignment_id_idx", [("assignmentId", ASCENDING)], {"unique": True}),
+        ("due_date_idx", [("dueDate", ASCENDING)], {}),
+        ("assignment_course_due_idx", [("courseId", ASCENDING), ("dueDate", ASCENDING)], {}),
+    ],
+    "submissions": [
+        ("submission_id_idx", [("submissionId", ASCENDING)], {"unique": True}),
+        ("submission_student_idx", [("studentId", ASCENDING)], {}),
+        ("submission_date_idx", [("submittedDate", ASCENDING)], {}),
+        ("ungraded_submissions_partial", [("isGraded", ASCENDING), ("assignmentId", ASCENDING)],
+         {"partialFilterExpression": UNGRADED_SUBMISSIONS_FILTER}),
+    ],
+    "gradebook": [
+        ("gradebook_student_course_idx", [("studentId", ASCENDING), ("courseId", ASCENDING)], {"unique": True}),
+        ("gradebook_course_grade_idx", [("courseId", ASCENDING), ("averageGrade", DESCENDING)], {}),
+        ("gradebook_grade_idx", [("averageGrade", DESCENDING)], {}),
+    ],
+    "course_outlines": [
+        ("outline_course_idx", [("courseId", ASCENDING)], {"unique": True}),
+    ],
+    "submission_buckets": [
+        # Finds the open bucket of a (student, course) on every append
+        ("bucket_student_course_idx", [("studentId", ASCENDING), ("courseId", ASCENDING), ("count", ASCENDING)], {}),
+        ("bucket_course_idx", [("courseId", ASCENDING)], {}),
+        ("bucket_submission_idx", [("submissions.submissionId", ASCENDING)], {}),
+    ],
+    "engagement_sketches": [
+        ("sketch_metric_scope_bucket_idx", [("metric", ASCENDING), ("scope", ASCENDING), ("bucket", ASCENDING)],
+         {"unique": True}),
+    ],
+    # Archives keep what the hot collections held, duplicate keys included: not unique
+    "enrollments_archive": [
+        ("enrollment_id_idx", [("enrollmentId", ASCENDING)], {}),
+        ("student_course_idx", [("studentId", ASCENDING), ("courseId", ASCENDING)], {}),
+    ],
+    "submissions_archive": [
+        ("submission_id_idx", [("submissionId", ASCENDING)], {}),
+        ("submission_student_idx", [("studentId", ASCENDING)], {}),
+    ],
+    "telemetry_snapshots": [
+        _ttl_entry("telemetry_taken_at_idx", "takenAt", TELEMETRY_RETENTION_DAYS),
+    ],
+}
+
+# TTL index of the archive collections, present only while an ArchivePolicy sets retention_days
+ARCHIVE_TTL_INDEX = "archive_ttl_idx"
+
+# Suffix of the temporary index a rolling rebuild builds before dropping the old one
+RECONCILE_SUFFIX = "__reconcile"
+
+# Build errors of a unique index over documents that already share a key
+_DUPLICATE_KEY_CODES = (11000, 11001)
+
+# Options that change what an index contains or enforces
+_DEFINING_OPTIONS = ("unique", "sparse", "partialFilterExpression", "expireAfterSeconds", "collation")
+
+
+def manifest_entry(collection_name, index_name, manifest=None):
+    """Returns the (name, keys, options) manifest entry of an index, or raises KeyError."""
+    for entry in (manifest or INDEX_MANIFEST)[collection_name]:
+        if entry[0] == index_name:
+            return entry
+    raise KeyError(f"{collection_name}.{index_name} is not in the index manifest")
+
+
+def retention_manifest(archive_retention_days=None, telemetry_retention_days=TELEMETRY_RETENTION_DAYS,
+                       manifest=None):
+    """
+    The manifest with the TTL indexes of a retention configuration. Pass it to
+    reconcile_indexes() when an ArchivePolicy sets retention_days or snapshots
+    are kept other than TELEMETRY_RETENTION_DAYS; with INDEX_MANIFEST an archive
+    TTL index is reported as extra and a changed telemetry TTL as a rebuild.
+
+    Args:
+        archive_retention_days: Days archived documents are kept; None keeps them (default: None)
+        telemetry_retention_days: Days telemetry snapshots are kept (default: TELEMETRY_RETENTION_DAYS)
+        manifest: Index manifest (default: INDEX_MANIFEST)
+
+    Returns:
+        dict: A copy of the manifest with the TTL indexes set
+    """
+    manifest = {name: list(entries) for name, entries in (manifest or INDEX_MANIFEST).items()}
+    manifest["telemetry_snapshots"] = [_ttl_entry("telemetry_taken_at_idx", "takenAt", telemetry_retention_days)]
+    if archive_retention_days:
+        for name in ("enrollments_archive", "submissions_archive"):
+            manifest[name].append(_ttl_entry(ARCHIVE_TTL_INDEX, "archivedAt", archive_retention_days))
+    return manifest
+
+
+def _normalize_keys(info):
+    """Key spec of an index_information() entry, with text indexes in the form they are declared."""
+    keys = []
+    for field, direction in info["key"]:
+        if field == "_fts":
+            keys.extend((text_field, TEXT) for text_field in sorted(info.get("weights", {})))
+        elif field != "_ftsx":
+            keys.append((field, int(direction) if isinstance(direction, (int, float)) else direction))
+    return keys
+
+
+def _definition(keys, options):
+    """Comparable (keys, defining options) of an index."""
+    return (
+        [(field, int(d) if isinstance(d, (int, float)) else d) for field, d in keys],
+        {k: options[k] for k in _DEFINING_OPTIONS if options.get(k) not in (None, False)},
+    )
+
+
+def _existing_definitions(collection):
+    return {name: _definition(_normalize_keys(info), info)
+            for name, info in collection.index_information().items()}
+
+
+def _is_plain(keys, options):
+    return all(d in (ASCENDING, DESCENDING) for _, d in keys) and not options
+
+
+def find_redundant_indexes(definitions):
+    """
+    Finds indexes whose keys are a leading prefix of another index: every query
+    the shorter index serves, the longer one serves too, so the shorter one only
+    costs writes and memory. Unique, partial, sparse, TTL and text indexes are
+    never reported as redundant, and never count as covering.
+
+    Args:
+        definitions: {index name: (keys, defining options)}
+
+    Returns:
+        list: (redundant index, covering index) pairs
+    """
+    redundant = []
+    for name, (keys, options) in definitions.items():
+        if name == "_id_" or not _is_plain(keys, options):
+            continue
+        for other, (other_keys, other_options) in definitions.items():
+            if other == name or not _is_plain(other_keys, other_options):
+                continue
+            if len(other_keys) > len(keys) and other_keys[:len(keys)] == keys:
+                redundant.append((name, other))
+                break
+            if other_keys == keys and other < name:
+                redundant.append((name, other))  # exact duplicate; keep one of them
+                break
+    return redundant
+
+
+def index_usage(collection):
+    """
+    Reads $indexStats: operations that used each index since the stats were
+    last reset (server restart or index rebuild). Stats are per node.
+
+    Args:
+        collection: MongoDB collection
+
+    Returns:
+        dict: {index name: {"ops": int, "since": datetime}}, or {} if unavailable
+    """
+    try:
+        return {stats["name"]: {"ops": stats["accesses"]["ops"], "since": stats["accesses"]["since"]}
+                for stats in collection.aggregate([{"$indexStats": {}}])}
+    except OperationFailure:
+        return {}
+
+
+def plan_indexes(db, manifest=None):
+    """
+    Diffs the manifest against index_information() of every collection.
+
+    Actions:
+        ok        - present with the manifest name and definition
+        equivalent- the definition exists under another name (e.g. due_date_optimized for due_date_idx)
+        create    - missing
+        rebuild   - the name exists with a different definition
+        extra     - present but not in the manifest
+
+    Args:
+        db: MongoDB database connection object
+        manifest: Index manifest (default: INDEX_MANIFEST)
+
+    Returns:
+        list: Action dictionaries with collection, action, name, keys, options and existing
+    """
+    manifest = manifest or INDEX_MANIFEST
+    actions = []
+    for collection_name, entries in manifest.items():
+        existing = _existing_definitions(db[collection_name])
+        claimed = {"_id_"}
+        for name, keys, options in entries:
+            wanted = _definition(keys, options)
+            action = {"collection": collection_name, "name": name, "keys": keys, "options": options,
+                      "existing": None}
+            if existing.get(name) == wanted:
+                action["action"] = "ok"
+            elif name in existing:
+                action["action"] = "rebuild"
+                claimed.add(name + RECONCILE_SUFFIX)  # left over from an interrupted rebuild
+            else:
+                twin = next((other for other, definition in existing.items()
+                             if definition == wanted and other not in claimed), None)
+                action["action"] = "equivalent" if twin else "create"
+                action["existing"] = twin
+                claimed.add(twin)
+            claimed.add(name)
+            actions.append(action)
+        for name, (keys, options) in existing.items():
+            if name not in claimed:
+                actions.append({"collection": collection_name, "action": "extra", "name": name,
+                                "keys": keys, "options": options, "existing": name})
+    return actions
+
+
+def _set_hidden(collection, name, hidden):
+    collection.database.command("collMod", collection.name, index={"name": name, "hidden": hidden})
+
+
+def _build(collection, name, keys, options, hidden_build, commit_quorum):
+    """Builds one index; with hidden_build the planner only sees it once it is complete."""
+    model_options = dict(options, name=name)
+    if hidden_build:
+        model_options["hidden"] = True
+    kwargs = {"commit_quorum": commit_quorum} if commit_quorum is not None else {}
+    try:
+        collection.create_indexes([IndexModel(keys, **model_options)], **kwargs)
+    except OperationFailure as e:
+        # Servers before 4.4 reject "hidden": build it visible instead
+        if not hidden_build or e.code not in (2, 197):
+            raise
+        hidden_build = False
+        model_options.pop("hidden")
+        collection.create_indexes([IndexModel(keys, **model_options)], **kwargs)
+    if hidden_build:
+        _set_hidden(collection, name, False)
+
+
+def reconcile_indexes(db, manifest=None, apply=False, extra="report", rename_equivalent=False,
+                      hidden_build=True, commit_quorum=None, pause_seconds=0.0):
+    """
+    Makes the indexes match the manifest, one index build at a time.
+
+    Missing indexes are built hidden and unhidden once complete. An index whose
+    definition changed is rebuilt rolling: the new definition is built under
+    <name>__reconcile and the old index dropped, so queries are never left
+    without it. The server allows only one index per definition, so the new
+    index keeps the temporary name - later plans report it as "equivalent" -
+    unless rename_equivalent moves it to its real name (dropped, then built).
+    Extra indexes are reported, hidden ("hide": reversible, the planner stops
+    using them but writes still maintain them) or dropped ("drop").
+
+    Args:
+        db: MongoDB database connection object
+        manifest: Index manifest (default: INDEX_MANIFEST)
+        apply: Perform the changes; otherwise only report the plan (default: False)
+        extra: "report", "hide" or "drop" indexes not in the manifest (default: "report")
+        rename_equivalent: Drop and rebuild an equivalent index under its manifest name (default: False)
+        hidden_build: Build new indexes hidden, then unhide them (default: True)
+        commit_quorum: Replica-set commit quorum of each build, e.g. "votingMembers" (default: server's)
+        pause_seconds: Pause between builds to spread load (default: 0)
+
+    Returns:
+        dict: actions (the plan), applied (what was done), failed (unique indexes the
+            stored documents violate; nothing is dropped for them), redundant and unused indexes
+    """
+    if extra not in ("report", "hide", "drop"):
+        raise ValueError(f"Unknown extra-index mode: {extra}")
+    manifest = manifest or INDEX_MANIFEST
+    actions = plan_indexes(db, manifest)
+    applied, failed = [], []
+
+    if apply:
+        for action in actions:
+            collection = db[action["collection"]]
+            name, keys, options = action["name"], action["keys"], action["options"]
+            kind = action["action"]
+            if kind == "create":
+                try:
+                    _build(collection, name, keys, options, hidden_build, commit_quorum)
+                except OperationFailure as e:
+                    if e.code not in _DUPLICATE_KEY_CODES:
+                        raise
+                    failed.append((action["collection"], name, str(e)))
+                    continue
+            elif kind == "rebuild":
+                temporary = name + RECONCILE_SUFFIX
+                try:
+                    _build(collection, temporary, keys, options, hidden_build, commit_quorum)
+                except OperationFailure as e:
+                    if e.code in _DUPLICATE_KEY_CODES:
+                        # The documents violate the new unique definition: keep the old index
+                        failed.append((action["collection"], name, str(e)))
+                        continue
+                    temporary = None  # e.g. conflicting unique options: fall back to drop-then-build
+                collection.drop_index(name)
+                if temporary is None:
+                    _build(collection, name, keys, options, hidden_build, commit_quorum)
+                elif rename_equivalent:
+                    # The server refuses a second index with the same definition: drop the copy first
+                    collection.drop_index(temporary)
+                    _build(collection, name, keys, options, hidden_build, commit_quorum)
+            elif kind == "equivalent" and rename_equivalent:
+                collection.drop_index(action["existing"])
+                _build(collection, name, keys, options, hidden_build, commit_quorum)
+            elif kind == "extra" and extra == "hide":
+                _set_hidden(collection, name, True)
+            elif kind == "extra" and extra == "drop":
+                collection.drop_index(name)
+            else:
+                continue
+            applied.append(f"{kind} {action['collection']}.{name}")
+            if pause_seconds:
+                time.sleep(pause_seconds)
+
+    redundant, unused = [], []
+    for collection_name in manifest:
+        collection = db[collection_name]
+        definitions = _existing_definitions(collection)
+        redundant += [(collection_name, name, covering) for name, covering in find_redundant_indexes(definitions)]
+        for name, usage in index_usage(collection).items():
+            keys, options = definitions.get(name, ([], {}))
+            # Unique indexes enforce constraints even when no query reads them
+            if usage["ops"] == 0 and name != "_id_" and not options.get("unique"):
+                unused.append((collection_name, name, usage["since"]))
+
+    return {"actions": actions, "applied": applied, "failed": failed, "redundant": redundant, "unused": unused}
+
+
+def ensure_index(db, collection_name, index_name, manifest=None):
+    """
+    Builds one manifest index if no index with its definition exists.
+
+    Args:
+        db: MongoDB database connection object
+        collection_name: Collection of the index
+        index_name: Manifest name of the index
+        manifest: Index manifest (default: INDEX_MANIFEST)
+
+    Returns:
+        str: Name of the index serving the definition (an equivalent may already exist under another name)
+    """
+    name, keys, options = manifest_entry(collection_name, index_name, manifest)
+    wanted = _definition(keys, options)
+    for existing, definition in _existing_definitions(db[collection_name]).items():
+        if definition == wanted:
+            return existing
+    db[collection_name].create_index(keys, name=name, **options)
+    return name
+
+
+def print_index_report(report):
+    """
+    Prints a reconcile_indexes() report in a formatted way.
+
+    Args:
+        report: Dictionary returned from reconcile_indexes()
+    """
+    print("\n=== Index Plan ===")
+    for action in report["actions"]:
+        if action["action"] == "ok":
+            continue
+        note = f" (as {action['existing']})" if action["action"] == "equivalent" else ""
+        print(f"{action['action']:<11} {action['collection']}.{action['name']}{note} {action['keys']}")
+    ok = sum(1 for action in report["actions"] if action["action"] == "ok")
+    print(f"{ok} indexes already match the manifest")
+
+    if report["applied"]:
+        print("\nApplied:")
+        for change in report["applied"]:
+            print(f" - {change}")
+    if report.get("failed"):
+        print("\nNot built, duplicate keys in the collection:")
+        for collection_name, name, error in report["failed"]:
+            print(f" - {collection_name}.{name}: {error}")
+    if report["redundant"]:
+        print("\nRedundant prefix indexes:")
+        for collection_name, name, covering in report["redundant"]:
+            print(f" - {collection_name}.{name} is covered by {covering}")
+    if report["unused"]:
+        print("\nUnused since stats reset ($indexStats):")
+        for collection_name, name, since in report["unused"]:
+            print(f" - {collection_name}.{name} (since {since})")
+
+# Example usage:
+# print_index_report(reconcile_indexes(db))                           # dry run
+# print_index_report(reconcile_indexes(db, apply=True, extra="hide")) # build missing, hide extras
+# print_index_report(reconcile_indexes(db, apply=True, extra="drop", rename_equivalent=True))
@@ -0,0 +1,258 @@
+# Import Useful Libraries
+import heapq
+import itertools
+
+from pymongo.errors import OperationFailure
+
+from eduhub_gradebook import GRADEBOOK_COLLECTION
+from eduhub_indexes import ensure_index
+
+
+def heap_top_k(documents, k, key):
+    """
+    Returns the k largest documents of a stream while holding at most k of them.
+    Ties keep their arrival order, like a stable sort would.
+
+    Args:
+        documents: Iterable of documents, e.g. a PyMongo cursor
+        k: Number of documents to keep
+        key: Function returning the sort key of a document (larger is better)
+
+    Returns:
+        list: Top k documents, best first
+    """
+    heap = []
+    counter = itertools.count()
+    for document in documents:
+        # Negated arrival order makes earlier documents win ties
+        entry = (key(document), -next(counter), document)
+        if len(heap) < k:
+            heapq.heappush(heap, entry)
+        elif entry[:2] > heap[0][:2]:
+            heapq.heapreplace(heap, entry)
+    return [entry[2] for entry in sorted(heap, key=lambda e: e[:2], reverse=True)]
+
+
+def _run_leaderboard(collection, pipeline, sort, k, key, server_side):
+    """
+    Runs a leaderboard pipeline, finishing it with $sort + $limit on the server or a
+    heap-based top-K on the client. Falls back to the client when the server rejects
+    the pipeline.
+    """
+    if server_side:
+        try:
+            return list(collection.aggregate(pipeline + [{"$sort": sort}, {"$limit": k}]))
+        except OperationFailure as e:
+            print(f"Server-side top-K failed, using client-side heap: {str(e)}")
+    return heap_top_k(collection.aggregate(pipeline, batchSize=1000), k, key)
+
+
+def create_leaderboard_indexes(db):
+    """
+    Creates the indexes that keep the leaderboard pipelines index-backed.
+
+    Args:
+        db: MongoDB database connection object
+
+    Returns:
+        list: Names of the indexes created
+    """
+    return [
+        ensure_index(db, "enrollments", "enrollment_course_idx"),
+        ensure_index(db, "courses", "course_id_idx"),
+        ensure_index(db, "courses", "course_instructor_idx"),
+        ensure_index(db, "users", "user_id_idx"),
+        ensure_index(db, GRADEBOOK_COLLECTION, "gradebook_grade_idx"),
+    ]
+
+
+def top_students_by_grade(db, k=10, server_side=True):
+    """
+    Finds the k students with the highest average grade across their courses.
+    Reads the pre-aggregated gradebook, so it never touches submissions.
+
+    Args:
+        db: MongoDB database connection object
+        k: Number of students to return (default: 10)
+        server_side: Use $sort + $limit on the server instead of a client-side heap (default: True)
+
+    Returns:
+        list: Top students with averageGrade and submissionCount, best first
+    """
+    pipeline = [
+        {
+            "$group": {
+                "_id": "$studentId",
+                "gradeSum": {"$sum": "$gradeSum"},
+                "gradedCount": {"$sum": "$gradedCount"},
+                "submissionCount": {"$sum": "$submissionCount"}
+            }
+        },
+        {"$match": {"gradedCount": {"$gt": 0}}},
+        {
+            "$project": {
+                "_id": 0,
+                "studentId": "$_id",
+                "averageGrade": {"$divide": ["$gradeSum", "$gradedCount"]},
+                "submissionCount": 1
+            }
+        }
+    ]
+    top = _run_leaderboard(db[GRADEBOOK_COLLECTION], pipeline,
+                           {"averageGrade": -1, "submissionCount": -1}, k,
+                           lambda d: (d["averageGrade"], d["submissionCount"]), server_side)
+
+    # Names are looked up for the k winners only
+    names = {
+        u["userId"]: f"{u['firstName']} {u['lastName']}"
+        for u in db.users.find({"userId": {"$in": [s["studentId"] for s in top]}},
+                               {"userId": 1, "firstName": 1, "lastName": 1})
+    }
+    for student in top:
+        student["averageGrade"] = round(student["averageGrade"], 2)
+        student["studentName"] = names.get(student["studentId"], "Unknown")
+    return top
+
+
+def top_students_per_course(db, k=3):
+    """
+    Finds the k best students of every course in one pass using $topN.
+
+    Args:
+        db: MongoDB database connection object
+        k: Number of students per course (default: 3)
+
+    Returns:
+        list: One document per course with its top students
+    """
+    return list(db[GRADEBOOK_COLLECTION].aggregate([
+        {"$match": {"averageGrade": {"$ne": None}}},
+        {
+            "$group": {
+                "_id": "$courseId",
+                "topStudents": {
+                    "$topN": {
+                        "n": k,
+                        "sortBy": {"averageGrade": -1},
+                        "output": {"studentId": "$studentId", "averageGrade": "$averageGrade"}
+                    }
+                }
+            }
+        },
+        {"$project": {"_id": 0, "courseId": "$_id", "topStudents": 1}},
+        {"$sort": {"courseId": 1}}
+    ]))
+
+
+def top_courses_by_enrollments(db, k=5, server_side=True):
+    """
+    Finds the k courses with the most enrollments.
+
+    Args:
+        db: MongoDB database connection object
+        k: Number of courses to return (default: 5)
+        server_side: Use $sort + $limit on the server instead of a client-side heap (default: True)
+
+    Returns:
+        list: Top courses with courseTitle and totalEnrollments, most popular first
+    """
+    pipeline = [
+        {"$group": {"_id": "$courseId", "totalEnrollments": {"$sum": 1}}},
+        {"$project": {"_id": 0, "courseId": "$_id", "totalEnrollments": 1}}
+    ]
+    top = _run_leaderboard(db.enrollments, pipeline, {"totalEnrollments": -1, "courseId": 1}, k,
+                           lambda d: d["totalEnrollments"], server_side)
+
+    titles = {
+        c["courseId"]: c["title"]
+        for c in db.courses.find({"courseId": {"$in": [t["courseId"] for t in top]}},
+                                 {"courseId": 1, "title": 1})
+    }
+    for course in top:
+        course["courseTitle"] = titles.get(course["courseId"], "Unknown")
+    return top
+
+
+def top_instructors_by_revenue(db, k=5, server_side=True):
+    """
+    Finds the k instructors whose courses earned the most (price x enrollments).
+
+    Args:
+        db: MongoDB database connection object
+        k: Number of instructors to return (default: 5)
+        server_side: Use $sort + $limit on the server instead of a client-side heap (default: True)
+
+    Returns:
+        list: Top instructors with totalRevenue, totalStudents and coursesTaught, highest revenue first
+    """
+    pipeline = [
+        # Count enrollments per course before joining, so each course is joined once
+        {"$group": {"_id": "$courseId", "students": {"$sum": 1}}},
+        {
+            "$lookup": {
+                "from": "courses",
+                "localField": "_id",
+                "foreignField": "courseId",
+                "as": "course"
+            }
+        },
+        {"$unwind": "$course"},
+        {
+            "$group": {
+                "_id": "$course.instructorId",
+                "totalRevenue": {"$sum": {"$multiply": ["$course.price", "$students"]}},
+                "totalStudents": {"$sum": "$students"},
+                "coursesTaught": {"$sum": 1}
+            }
+        },
+        {
+            "$project": {
+                "_id": 0,
+                "instructorId": "$_id",
+                "totalRevenue": 1,
+                "totalStudents": 1,
+                "coursesTaught": 1
+            }
+        }
+    ]
+    top = _run_leaderboard(db.enrollments, pipeline, {"totalRevenue": -1}, k,
+                           lambda d: d["totalRevenue"], server_side)
+
+    names = {
+        u["userId"]: f"{u['firstName']} {u['lastName']}"
+        for u in db.users.find({"userId": {"$in": [i["instructorId"] for i in top]}},
+                               {"userId": 1, "firstName": 1, "lastName": 1})
+    }
+    for instructor in top:
+        instructor["totalRevenue"] = round(instructor["totalRevenue"], 2)
+        instructor["instructorName"] = names.get(instructor["instructorId"], "Unknown")
+    return top
+
+
+def print_leaderboards(db, k=5):
+    """
+    Prints all leaderboards in a formatted way.
+
+    Args:
+        db: MongoDB database connection object
+        k: Number of entries per leaderboard (default: 5)
+    """
+    print(f"\n=== Top {k} Students by Grade ===")
+    for i, student in enumerate(top_students_by_grade(db, k), 1):
+        print(f"{i}. {student['studentName']}: {student['averageGrade']} "
+              f"({student['submissionCount']} submissions)")
+
+    print(f"\n=== Top {k} Courses by Enrollments ===")
+    for i, course in enumerate(top_courses_by_enrollments(db, k), 1):
+        print(f"{i}. {course['courseTitle']}: {course['totalEnrollments']} enrollments")
+
+    print(f"\n=== Top {k} Instructors by Revenue ===")
+    for i, instructor in enumerate(top_instructors_by_revenue(db, k), 1):
+        print(f"{i}. {instructor['instructorName']}: ${instructor['totalRevenue']} "
+              f"({instructor['totalStudents']} students, {instructor['coursesTaught']} courses)")
+
+# Example usage:
+# create_leaderboard_indexes(db)
+# print_leaderboards(db)
+# top_students_per_course(db, k=3)
+# top_courses_by_enrollments(db, k=5, server_side=False)   # client-side heap
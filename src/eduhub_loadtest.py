@@ -0,0 +1,314 @@
+# Import Useful Libraries
+import asyncio
+import contextlib
+import io
+import itertools
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from eduhub_gradebook import rebuild_gradebook
+from eduhub_queries import (
+    db,
+    load_data_to_collections,
+    enroll_student_in_course,
+    update_assignment_grade,
+    add_lesson_to_course,
+    find_active_students,
+)
+from eduhub_sketches import build_engagement_sketches
+
+# Relative weight of each OLTP helper in the replayed workload
+DEFAULT_OPERATION_MIX = {
+    "enroll_student_in_course": 3,
+    "update_assignment_grade": 3,
+    "add_lesson_to_course": 1,
+    "find_active_students": 3,
+}
+
+SAMPLE_DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "sample_data.json")
+
+
+def get_standin_database(json_file_path=SAMPLE_DATA_PATH):
+    """
+    Creates an in-process stand-in database seeded with the sample data, with
+    the gradebook and engagement sketches backfilled as on a deployed database,
+    so regrades apply deltas instead of rebuilding rows.
+    Requires the optional `mongomock` package.
+
+    Args:
+        json_file_path: Path to the JSON file used to seed the database
+
+    Returns:
+        Database: mongomock database object with the EduHub collections loaded
+    """
+    try:
+        import mongomock
+    except ImportError:
+        raise ImportError("The in-process stand-in requires mongomock: pip install mongomock")
+
+    standin_db = mongomock.MongoClient()["eduhub_db"]
+    with contextlib.redirect_stdout(io.StringIO()):
+        load_data_to_collections(json_file_path, target_db=standin_db)
+    rebuild_gradebook(standin_db)
+    build_engagement_sketches(standin_db)
+    return standin_db
+
+
+def build_operation_pool(db):
+    """
+    Reads the IDs the replayed operations pick from, so every call targets existing data.
+
+    Args:
+        db: MongoDB database connection object
+
+    Returns:
+        dict: Lists of student IDs, course IDs and (submissionId, studentId) pairs
+    """
+    return {
+        "students": [u["userId"] for u in db.users.find({"role": "student"}, {"userId": 1})],
+        "courses": [c["courseId"] for c in db.courses.find({}, {"courseId": 1})],
+        "submissions": [
+            (s["submissionId"], s["studentId"])
+            for s in db.submissions.find({}, {"submissionId": 1, "studentId": 1})
+        ],
+    }
+
+
+def make_operations(db, pool, run_id=None):
+    """
+    Wraps each OLTP helper in a callable that draws randomized arguments from the pool.
+
+    Args:
+        db: MongoDB database connection object
+        pool: Dictionary returned from build_operation_pool()
+        run_id: Prefix used for generated enrollment and lesson IDs (default: current timestamp)
+
+    Returns:
+        dict: Operation name -> callable taking a random.Random instance
+    """
+    run_id = run_id or f"lt{int(time.time())}"
+    counter = itertools.count(1)  # next() on itertools.count is atomic under the GIL
+
+    def enroll(rng):
+        enroll_student_in_course(
+            db,
+            enrollment_id=f"{run_id}-enroll{next(counter)}",
+            student_id=rng.choice(pool["students"]),
+            course_id=rng.choice(pool["courses"])
+        )
+
+    def grade(rng):
+        submission_id, student_id = rng.choice(pool["submissions"])
+        update_assignment_grade(db, submission_id=submission_id, student_id=student_id,
+                                grade=rng.randint(50, 100))
+
+    def lesson(rng):
+        add_lesson_to_course(
+            db,
+            lesson_id=f"{run_id}-lesson{next(counter)}",
+            course_id=rng.choice(pool["courses"])
+        )
+
+    def active_students(rng):
+        find_active_students(db)
+
+    return {
+        "enroll_student_in_course": enroll,
+        "update_assignment_grade": grade,
+        "add_lesson_to_course": lesson,
+        "find_active_students": active_students,
+    }
+
+
+def _run_worker(operations, names, weights, deadline, seed, samples):
+    """Replays weighted random operations until the deadline, appending one sample per call."""
+    rng = random.Random(seed)
+    while time.perf_counter() < deadline:
+        name = rng.choices(names, weights)[0]
+        start = time.perf_counter()
+        error = None
+        try:
+            operations[name](rng)
+        except Exception as e:
+            error = type(e).__name__
+        samples.append((start, name, time.perf_counter() - start, error))
+
+
+def run_load_test(db, operation_mix=None, concurrency=8, duration=10, mode="threads",
+                  interval=1.0, seed=42):
+    """
+    Replays a weighted mix of the OLTP helpers from many concurrent workers.
+
+    Args:
+        db: MongoDB database connection object (a local mongod or get_standin_database())
+        operation_mix: Dictionary of operation name -> relative weight (default: DEFAULT_OPERATION_MIX)
+        concurrency: Number of threads or asyncio tasks issuing operations (default: 8)
+        duration: Length of the run in seconds (default: 10)
+        mode: "threads" or "asyncio" (default: "threads")
+        interval: Width of the time-series buckets in seconds (default: 1.0)
+        seed: Base random seed, so runs replay the same operation sequence (default: 42)
+
+    Returns:
+        dict: Load test report with overall, per-operation and per-interval metrics
+    """
+    operation_mix = operation_mix or DEFAULT_OPERATION_MIX
+    unknown = set(operation_mix) - set(DEFAULT_OPERATION_MIX)
+    if unknown:
+        raise ValueError(f"Unknown operations in mix: {sorted(unknown)}")
+
+    operations = make_operations(db, build_operation_pool(db))
+    names = list(operation_mix)
+    weights = [operation_mix[name] for name in names]
+    worker_samples = [[] for _ in range(concurrency)]
+
+    # The helpers print their results; silence them for the whole run
+    with contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        deadline = started + duration
+
+        if mode == "threads":
+            threads = [
+                threading.Thread(target=_run_worker,
+                                 args=(operations, names, weights, deadline, seed + i, worker_samples[i]))
+                for i in range(concurrency)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        elif mode == "asyncio":
+            # PyMongo is synchronous, so each task drives its worker in the loop's executor
+            async def run_tasks():
+                loop = asyncio.get_running_loop()
+                with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                    await asyncio.gather(*[
+                        loop.run_in_executor(executor, _run_worker, operations, names, weights,
+                                             deadline, seed + i, worker_samples[i])
+                        for i in range(concurrency)
+                    ])
+            asyncio.run(run_tasks())
+        else:
+            raise ValueError(f"Unknown mode: {mode!r} (expected 'threads' or 'asyncio')")
+
+        elapsed = time.perf_counter() - started
+
+    samples = sorted(itertools.chain.from_iterable(worker_samples), key=lambda s: s[0])
+    return summarize_samples(samples, started, elapsed, interval,
+                             {"mode": mode, "concurrency": concurrency, "operation_mix": operation_mix})
+
+
+def percentile(sorted_values, pct):
+    """
+    Returns the nearest-rank percentile of an already sorted list.
+
+    Args:
+        sorted_values: Values sorted ascending
+        pct: Percentile between 0 and 100
+
+    Returns:
+        float: The percentile value, or None for an empty list
+    """
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(pct / 100 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def _latency_stats(samples, elapsed):
+    """Computes count, throughput, error rate and latency percentiles (ms) for a list of samples."""
+    latencies = sorted(s[2] * 1000 for s in samples)
+    errors = sum(1 for s in samples if s[3] is not None)
+    return {
+        "operations": len(samples),
+        "errors": errors,
+        "error_rate": round(errors / len(samples), 4) if samples else 0.0,
+        "throughput": round(len(samples) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "max_ms": latencies[-1] if latencies else None,
+    }
+
+
+def summarize_samples(samples, started, elapsed, interval, config):
+    """
+    Builds the load test report from raw (start, operation, latency, error) samples.
+
+    Args:
+        samples: List of samples sorted by start time
+        started: perf_counter() value at the start of the run
+        elapsed: Total run time in seconds
+        interval: Width of the time-series buckets in seconds
+        config: Run configuration to include in the report
+
+    Returns:
+        dict: Report with 'config', 'overall', 'by_operation', 'timeline' and 'error_types'
+    """
+    by_operation = {}
+    for sample in samples:
+        by_operation.setdefault(sample[1], []).append(sample)
+
+    timeline = []
+    for bucket, bucket_samples in itertools.groupby(samples, key=lambda s: int((s[0] - started) // interval)):
+        # The last bucket ends with the run, usually before a full interval
+        width = min(interval, elapsed - bucket * interval)
+        stats = _latency_stats(list(bucket_samples), width if width > 0 else interval)
+        stats["t"] = round(bucket * interval, 3)
+        timeline.append(stats)
+
+    error_types = {}
+    for sample in samples:
+        if sample[3] is not None:
+            error_types[sample[3]] = error_types.get(sample[3], 0) + 1
+
+    return {
+        "config": {**config, "duration": round(elapsed, 3), "interval": interval},
+        "overall": _latency_stats(samples, elapsed),
+        "by_operation": {name: _latency_stats(s, elapsed) for name, s in sorted(by_operation.items())},
+        "timeline": timeline,
+        "error_types": error_types,
+    }
+
+
+def print_load_test_report(report):
+    """
+    Prints the load test report in a formatted way.
+
+    Args:
+        report: Dictionary returned from run_load_test()
+    """
+    config = report["config"]
+    overall = report["overall"]
+    print("\n=== Load Test Results ===")
+    print(f"Mode: {config['mode']}, concurrency: {config['concurrency']}, duration: {config['duration']}s")
+    print(f"Operations: {overall['operations']} ({overall['throughput']} ops/s), "
+          f"errors: {overall['errors']} ({overall['error_rate'] * 100:.2f}%)")
+    print(f"Latency p50/p95/p99/max: {overall['p50_ms']:.2f} / {overall['p95_ms']:.2f} / "
+          f"{overall['p99_ms']:.2f} / {overall['max_ms']:.2f} ms" if overall['operations'] else "No operations completed")
+
+    print("\n=== Per Operation ===")
+    for name, stats in report["by_operation"].items():
+        print(f"{name}: {stats['operations']} ops, {stats['throughput']} ops/s, "
+              f"p50 {stats['p50_ms']:.2f} ms, p99 {stats['p99_ms']:.2f} ms, errors {stats['errors']}")
+
+    print("\n=== Timeline ===")
+    for stats in report["timeline"]:
+        print(f"t={stats['t']:>6}s  {stats['throughput']:>8} ops/s  p95 {stats['p95_ms']:.2f} ms  "
+              f"errors {stats['errors']}")
+
+    if report["error_types"]:
+        print("\n=== Errors ===")
+        for error, count in report["error_types"].items():
+            print(f" - {error}: {count}")
+
+# Example usage:
+# report = run_load_test(db, concurrency=16, duration=30)
+# print_load_test_report(report)
+
+# Against the in-process stand-in:
+# standin_db = get_standin_database()
+# report = run_load_test(standin_db, concurrency=4, duration=5, mode="asyncio")
+# print_load_test_report(report)
@@ -0,0 +1,450 @@
+# Import Useful Libraries
+import time
+from datetime import datetime, timezone
+
+from pymongo import ASCENDING, ReplaceOne
+
+from eduhub_indexes import ensure_index
+from eduhub_profiling import profile_section
+
+# One document per course, holding everything a course page shows:
+# {courseId, title, description, category, level, price, isPublished, tags,
+#  instructor: {userId, name, bio},
+#  lessons: [{lessonId, title, sequence, duration}]          (by sequence)
+#  assignments: [{assignmentId, title, dueDate, maxPoints}]  (by dueDate)
+#  outlineUpdatedAt}
+OUTLINE_COLLECTION = "course_outlines"
+
+# Course fields copied into the outline; writes to them must update the outline too
+OUTLINE_COURSE_FIELDS = ("title", "description", "category", "level", "price", "isPublished", "tags")
+
+# Progress of the online migration, keyed by the collection it fills
+MIGRATION_COLLECTION = "migrations"
+
+_LESSON_SUMMARY = {"_id": 0, "lessonId": 1, "title": 1, "sequence": 1, "duration": 1}
+_ASSIGNMENT_SUMMARY = {"_id": 0, "assignmentId": 1, "title": 1, "dueDate": 1, "maxPoints": 1}
+
+
+def create_outline_indexes(db):
+    """
+    Creates the indexes the outline reads, writes and migration rely on.
+
+    Args:
+        db: MongoDB database connection object
+
+    Returns:
+        list: Names of the indexes created
+    """
+    return [
+        ensure_index(db, OUTLINE_COLLECTION, "outline_course_idx"),
+        # Each migration batch joins a course's lessons and assignments by courseId
+        ensure_index(db, "lessons", "lesson_course_seq_idx"),
+        ensure_index(db, "assignments", "assignment_course_due_idx"),
+    ]
+
+
+def _outline_pipeline(course_ids=None):
+    """Builds the pipeline that (re)computes outlines from the source collections, optionally for some courses."""
+    pipeline = [{"$match": {"courseId": {"$in": list(course_ids)}}}] if course_ids is not None else []
+    pipeline += [
+        {
+            "$lookup": {
+                "from": "users",
+                "localField": "instructorId",
+                "foreignField": "userId",
+                "as": "instructor",
+                "pipeline": [{"$project": {"_id": 0, "userId": 1, "firstName": 1, "lastName": 1,
+                                           "bio": "$profile.bio"}}]
+            }
+        },
+        {
+            "$lookup": {
+                "from": "lessons",
+                "localField": "courseId",
+                "foreignField": "courseId",
+                "as": "lessons",
+                "pipeline": [{"$sort": {"sequence": 1, "lessonId": 1}}, {"$project": _LESSON_SUMMARY}]
+            }
+        },
+        {
+            "$lookup": {
+                "from": "assignments",
+                "localField": "courseId",
+                "foreignField": "courseId",
+                "as": "assignments",
+                "pipeline": [{"$sort": {"dueDate": 1, "assignmentId": 1}}, {"$project": _ASSIGNMENT_SUMMARY}]
+            }
+        },
+        {"$unwind": {"path": "$instructor", "preserveNullAndEmptyArrays": True}},
+        {
+            "$project": {
+                "_id": 0,
+                "courseId": 1,
+                **dict.fromkeys(OUTLINE_COURSE_FIELDS, 1),
+                "instructor": {
+                    "userId": "$instructor.userId",
+                    "name": {"$concat": ["$instructor.firstName", " ", "$instructor.lastName"]},
+                    "bio": "$instructor.bio"
+                },
+                "lessons": 1,
+                "assignments": 1
+            }
+        },
+    ]
+    return pipeline
+
+
+def _write_outlines(db, course_ids):
+    """
+    Recomputes the outlines of some courses and stores them with one batch of
+    upserts on courseId. Client-side rather than $merge, so a course's outline
+    is created even before create_outline_indexes() ran.
+
+    Args:
+        db: MongoDB database connection object
+        course_ids: IDs of the courses
+
+    Returns:
+        int: Number of outlines written
+    """
+    now = datetime.now(timezone.utc)
+    requests = [ReplaceOne({"courseId": outline["courseId"]}, {**outline, "outlineUpdatedAt": now}, upsert=True)
+                for outline in db.courses.aggregate(_outline_pipeline(course_ids))]
+    if requests:
+        db[OUTLINE_COLLECTION].bulk_write(requests, ordered=False)
+    return len(requests)
+
+
+def refresh_course_outline(db, course_id):
+    """
+    Recomputes one course's outline from the source collections, e.g. after
+    its instructor's name or a lesson title changed, or creates it for a new course.
+
+    Args:
+        db: MongoDB database connection object
+        course_id: ID of the course
+
+    Returns:
+        int: 1 if the outline was written, 0 if the course does not exist
+    """
+    return _write_outlines(db, [course_id])
+
+
+def migrate_course_outlines(db, batch_size=100, restart=False, pause_seconds=0.0):
+    """
+    Builds the outline of every course online, in batches of courses in courseId
+    order. Progress is recorded after every batch, so an interrupted migration
+    resumes after the last finished batch. The source collections stay
+    authoritative and writable throughout; run verify_course_outlines(repair=True)
+    afterwards to catch writes that raced a batch. Once the ordered pass is done,
+    courses still without an outline (e.g. created after a resumed run passed
+    their courseId) are backfilled too.
+
+    Args:
+        db: MongoDB database connection object
+        batch_size: Courses per batch (default: 100)
+        restart: Ignore recorded progress and start from the first course (default: False)
+        pause_seconds: Sleep between batches to limit load on a live cluster (default: 0)
+
+    Returns:
+        int: Number of courses migrated by this call
+    """
+    create_outline_indexes(db)
+    migrations = db[MIGRATION_COLLECTION]
+    state = None if restart else migrations.find_one({"_id": OUTLINE_COLLECTION})
+    last_course_id = state.get("lastCourseId") if state else None
+    migrated = 0
+
+    while True:
+        query = {"courseId": {"$gt": last_course_id}} if last_course_id is not None else {}
+        course_ids = [course["courseId"] for course in
+                      db.courses.find(query, {"courseId": 1, "_id": 0}).sort("courseId", ASCENDING).limit(batch_size)]
+        if not course_ids:
+            break
+
+        _write_outlines(db, course_ids)
+        migrated += len(course_ids)
+        last_course_id = course_ids[-1]
+        migrations.update_one(
+            {"_id": OUTLINE_COLLECTION},
+            {"$set": {"lastCourseId": last_course_id, "updatedAt": datetime.now(timezone.utc)},
+             "$inc": {"migrated": len(course_ids)}, "$unset": {"completedAt": ""}},
+            upsert=True
+        )
+        print(f"Migrated {migrated} course outlines (through {last_course_id})")
+        if pause_seconds:
+            time.sleep(pause_seconds)
+
+    # lastCourseId only moves forward: sweep for courses the ordered pass could not see
+    missing = sorted(set(db.courses.distinct("courseId")) - set(db[OUTLINE_COLLECTION].distinct("courseId")))
+    for start in range(0, len(missing), batch_size):
+        migrated += _write_outlines(db, missing[start:start + batch_size])
+    if missing:
+        print(f"Backfilled {len(missing)} course outlines created behind the migration")
+
+    migrations.update_one({"_id": OUTLINE_COLLECTION},
+                          {"$set": {"completedAt": datetime.now(timezone.utc)}}, upsert=True)
+    return migrated
+
+
+def verify_course_outlines(db, repair=False):
+    """
+    Compares every stored outline with one recomputed from the source collections.
+
+    Args:
+        db: MongoDB database connection object
+        repair: Rebuild the outlines that differ or are missing (default: False)
+
+    Returns:
+        dict: Lists of "missing", "stale" and "orphaned" courseIds
+    """
+    expected = {outline["courseId"]: outline for outline in db.courses.aggregate(_outline_pipeline())}
+    stored = {outline["courseId"]: outline for outline in db[OUTLINE_COLLECTION].find({}, {"_id": 0})}
+
+    def comparable(outline):
+        return {k: v for k, v in outline.items() if k != "outlineUpdatedAt"}
+
+    report = {
+        "missing": sorted(set(expected) - set(stored)),
+        "stale": sorted(course_id for course_id in set(expected) & set(stored)
+                        if comparable(expected[course_id]) != comparable(stored[course_id])),
+        "orphaned": sorted(set(stored) - set(expected)),
+    }
+    if repair:
+        if report["missing"] or report["stale"]:
+            _write_outlines(db, report["missing"] + report["stale"])
+        if report["orphaned"]:
+            db[OUTLINE_COLLECTION].delete_many({"courseId": {"$in": report["orphaned"]}})
+    return report
+
+
+def update_outline_course_fields(db, course_id, course, session=None):
+    """
+    Copies a course's outline fields into its outline with one targeted $set,
+    e.g. after publishing it or changing its tags.
+
+    Args:
+        db: MongoDB database connection object
+        course_id: ID of the course
+        course: The course as written (fields outside OUTLINE_COURSE_FIELDS are ignored)
+        session: ClientSession of the course write (optional)
+
+    Returns:
+        UpdateResult: Result of the outline update, or None if no outline field was given
+    """
+    updates = {field: course[field] for field in OUTLINE_COURSE_FIELDS if field in course}
+    if not updates:
+        return None
+    return db[OUTLINE_COLLECTION].update_one(
+        {"courseId": course_id},
+        {"$set": updates, "$currentDate": {"outlineUpdatedAt": True}},
+        session=session
+    )
+
+
+def update_outline_instructor(db, user_id, user, session=None):
+    """
+    Copies an instructor's name and bio into the outlines of all their courses.
+
+    Args:
+        db: MongoDB database connection object
+        user_id: ID of the instructor
+        user: The user as written, with firstName, lastName and profile.bio
+        session: ClientSession of the user write (optional)
+
+    Returns:
+        UpdateResult: Result of the outline update
+    """
+    first_name, last_name = user.get("firstName"), user.get("lastName")
+    profile = user.get("profile") or {}
+    # Same values as the outline pipeline: $concat of a missing name part is null
+    update = {
+        "$set": {"instructor.name": f"{first_name} {last_name}"
+                 if isinstance(first_name, str) and isinstance(last_name, str) else None},
+        "$currentDate": {"outlineUpdatedAt": True},
+    }
+    if "bio" in profile:
+        update["$set"]["instructor.bio"] = profile["bio"]
+    else:
+        update["$unset"] = {"instructor.bio": ""}
+    return db[OUTLINE_COLLECTION].update_many({"instructor.userId": user_id}, update, session=session)
+
+
+def add_lesson_to_outline(db, lesson):
+    """
+    Adds a lesson summary to its course's outline, kept ordered by sequence.
+    Idempotent; courses not migrated yet are left to the migration.
+
+    Args:
+        db: MongoDB database connection object
+        lesson: The lesson document that was inserted
+
+    Returns:
+        UpdateResult: Result of the outline update
+    """
+    # Missing fields stay missing, as in the outline pipeline's $project
+    summary = {field: lesson[field] for field in _LESSON_SUMMARY if field != "_id" and field in lesson}
+    return db[OUTLINE_COLLECTION].update_one(
+        {"courseId": lesson["courseId"], "lessons.lessonId": {"$ne": lesson["lessonId"]}},
+        {"$push": {"lessons": {"$each": [summary], "$sort": {"sequence": 1, "lessonId": 1}}},
+         "$currentDate": {"outlineUpdatedAt": True}}
+    )
+
+
+def remove_lesson_from_outline(db, lesson_id, course_id):
+    """
+    Removes a lesson summary from its course's outline.
+
+    Args:
+        db: MongoDB database connection object
+        lesson_id: ID of the lesson that was removed
+        course_id: ID of its course
+
+    Returns:
+        UpdateResult: Result of the outline update
+    """
+    return db[OUTLINE_COLLECTION].update_one(
+        {"courseId": course_id},
+        {"$pull": {"lessons": {"lessonId": lesson_id}}, "$currentDate": {"outlineUpdatedAt": True}}
+    )
+
+
+def add_assignment_to_outline(db, assignment):
+    """
+    Adds an assignment summary to its course's outline, kept ordered by due date.
+    Idempotent; courses not migrated yet are left to the migration.
+
+    Args:
+        db: MongoDB database connection object
+        assignment: The assignment document that was inserted
+
+    Returns:
+        UpdateResult: Result of the outline update
+    """
+    summary = {field: assignment[field] for field in _ASSIGNMENT_SUMMARY if field != "_id" and field in assignment}
+    return db[OUTLINE_COLLECTION].update_one(
+        {"courseId": assignment["courseId"], "assignments.assignmentId": {"$ne": assignment["assignmentId"]}},
+        {"$push": {"assignments": {"$each": [summary], "$sort": {"dueDate": 1, "assignmentId": 1}}},
+         "$currentDate": {"outlineUpdatedAt": True}}
+    )
+
+
+def remove_assignment_from_outline(db, assignment_id, course_id):
+    """
+    Removes an assignment summary from its course's outline.
+
+    Args:
+        db: MongoDB database connection object
+        assignment_id: ID of the assignment that was removed
+        course_id: ID of its course
+
+    Returns:
+        UpdateResult: Result of the outline update
+    """
+    return db[OUTLINE_COLLECTION].update_one(
+        {"courseId": course_id},
+        {"$pull": {"assignments": {"assignmentId": assignment_id}}, "$currentDate": {"outlineUpdatedAt": True}}
+    )
+
+
+def get_course_outline(db, course_id="course001"):
+    """
+    Reads a full course page (course, instructor, ordered lessons and
+    assignments) with a single indexed read.
+
+    Args:
+        db: MongoDB database connection object
+        course_id: ID of the course (default: "course001")
+
+    Returns:
+        dict: The outline, or None if the course has none
+    """
+    return db[OUTLINE_COLLECTION].find_one({"courseId": course_id}, {"_id": 0, "outlineUpdatedAt": 0})
+
+
+def get_course_outlines(db, course_ids):
+    """
+    Reads the outlines of several courses with one indexed query.
+
+    Args:
+        db: MongoDB database connection object
+        course_ids: IDs of the courses
+
+    Returns:
+        list: Outlines, in courseId order
+    """
+    return list(db[OUTLINE_COLLECTION].find({"courseId": {"$in": list(course_ids)}},
+                                            {"_id": 0, "outlineUpdatedAt": 0}).sort("courseId", ASCENDING))
+
+
+def get_course_page(db, course_id="course001"):
+    """
+    Assembles the same course page from the separate collections
+    (course, instructor, lessons, assignments: four queries).
+
+    Args:
+        db: MongoDB database connection object
+        course_id: ID of the course (default: "course001")
+
+    Returns:
+        dict: The page in outline shape, or None if the course does not exist
+    """
+    course = db.courses.find_one({"courseId": course_id}, {"_id": 0, "courseId": 1, "instructorId": 1,
+                                                           **dict.fromkeys(OUTLINE_COURSE_FIELDS, 1)})
+    if course is None:
+        return None
+    instructor = db.users.find_one({"userId": course.pop("instructorId", None)},
+                                   {"_id": 0, "userId": 1, "firstName": 1, "lastName": 1, "profile.bio": 1}) or {}
+    course["instructor"] = {
+        "userId": instructor.get("userId"),
+        "name": f"{instructor['firstName']} {instructor['lastName']}" if instructor else None,
+        "bio": instructor.get("profile", {}).get("bio"),
+    }
+    course["lessons"] = list(db.lessons.find({"courseId": course_id}, _LESSON_SUMMARY)
+                             .sort([("sequence", ASCENDING), ("lessonId", ASCENDING)]))
+    course["assignments"] = list(db.assignments.find({"courseId": course_id}, _ASSIGNMENT_SUMMARY)
+                                 .sort([("dueDate", ASCENDING), ("assignmentId", ASCENDING)]))
+    return course
+
+
+def benchmark_course_page(db, course_ids=None, repeat=5):
+    """
+    Compares page loads from the separate collections with outline reads:
+    commands sent per page (from COMMAND_TIMER) and latency per page.
+
+    Args:
+        db: MongoDB database connection object; its client should be created with
+            event_listeners=[COMMAND_TIMER] for the command counts
+        course_ids: Courses to load (default: every course)
+        repeat: Times every page is loaded per model (default: 5)
+
+    Returns:
+        list: Dictionaries with model, commands_per_page and ms_per_page
+    """
+    course_ids = course_ids or [course["courseId"] for course in db.courses.find({}, {"courseId": 1, "_id": 0})]
+    pages = len(course_ids) * repeat
+    results = []
+    for model, loader in (("separate collections", get_course_page), ("embedded outline", get_course_outline)):
+        with profile_section(f"course_page_{model.split()[0]}") as report:
+            for _ in range(repeat):
+                for course_id in course_ids:
+                    loader(db, course_id)
+        commands = sum(report["commands"].values())
+        results.append({
+            "model": model,
+            "commands_per_page": commands / pages if commands else None,
+            "ms_per_page": report["wall_ms"] / pages,
+        })
+
+    print(f"\nCourse page load ({len(course_ids)} courses x {repeat}):")
+    print(f"{'Model':<22} {'Commands/page':>14} {'ms/page':>9}")
+    for row in results:
+        commands = f"{row['commands_per_page']:.1f}" if row["commands_per_page"] is not None else "n/a"
+        print(f"{row['model']:<22} {commands:>14} {row['ms_per_page']:>9.3f}")
+    return results
+
+# Example usage:
+# migrate_course_outlines(db, batch_size=50, pause_seconds=0.1)   # online backfill, resumable
+# verify_course_outlines(db, repair=True)
+# get_course_outline(db, "course001")                            # one indexed read per page
+# benchmark_course_page(db)
@@ -0,0 +1,439 @@
+# Import Useful Libraries
+import copy
+
+from bson import json_util
+
+# Stages that fix the shape of the documents after them; field usage is only
+# tracked up to (and including) the first of these
+_SHAPING_STAGES = ("$group", "$project")
+
+# Stages whose field dependencies are understood well enough to reorder around
+_TRACKED_STAGES = ("$match", "$lookup", "$unwind", "$addFields", "$set", "$sort", "$limit", "$skip")
+
+
+class Pipeline:
+    """
+    Small builder for aggregation pipelines. Stages are appended in call order and
+    the optimization rules of optimize_pipeline() are applied by build().
+
+    Example:
+        Pipeline().lookup("courses", "courseId", "courseId", "course").unwind("$course") \\
+                  .group({"_id": "$course.title", "students": {"$sum": 1}}).build()
+    """
+
+    def __init__(self, stages=None):
+        self.stages = list(stages or [])
+
+    def stage(self, stage):
+        self.stages.append(stage)
+        return self
+
+    def match(self, query):
+        return self.stage({"$match": query})
+
+    def project(self, spec):
+        return self.stage({"$project": spec})
+
+    def add_fields(self, spec):
+        return self.stage({"$addFields": spec})
+
+    def lookup(self, from_collection, local_field, foreign_field, as_field):
+        return self.stage({"$lookup": {"from": from_collection, "localField": local_field,
+                                       "foreignField": foreign_field, "as": as_field}})
+
+    def unwind(self, path, preserve_null_and_empty_arrays=False):
+        if preserve_null_and_empty_arrays:
+            return self.stage({"$unwind": {"path": path, "preserveNullAndEmptyArrays": True}})
+        return self.stage({"$unwind": path})
+
+    def group(self, spec):
+        return self.stage({"$group": spec})
+
+    def sort(self, spec):
+        return self.stage({"$sort": spec})
+
+    def limit(self, n):
+        return self.stage({"$limit": n})
+
+    def extend(self, stages):
+        self.stages.extend(stages.stages if isinstance(stages, Pipeline) else stages)
+        return self
+
+    def build(self, optimize=True, trace=None):
+        """
+        Returns the stage list, optimized unless told otherwise.
+
+        Args:
+            optimize: Apply the optimization rules (default: True)
+            trace: List receiving a description of every rewrite applied (default: not recorded)
+        """
+        if optimize:
+            return optimize_pipeline(self.stages, trace)
+        return copy.deepcopy(self.stages)
+
+
+def _stage_name(stage):
+    return next(iter(stage))
+
+
+def _overlaps(path, other):
+    """True when two dotted field paths refer to the same data (one contains the other)."""
+    return path == other or path.startswith(other + ".") or other.startswith(path + ".")
+
+
+def _is_field_operand(value):
+    """True for "$field" or ["$field"], the two spellings of a single field path operand."""
+    if isinstance(value, list) and len(value) == 1:
+        value = value[0]
+    return isinstance(value, str) and value.startswith("$") and not value.startswith("$$")
+
+
+def _expression_refs(expression, refs, in_size=False):
+    """
+    Collects (field_path, in_size) for every "$field" reference in an expression.
+    in_size marks references whose only use is being counted by $size, which is only
+    the case for a direct {"$size": "$field"}; the operand of any other expression
+    under $size ($filter, $map, $setUnion, ...) reads the elements themselves.
+    Returns False if the expression references the whole document ($$ROOT/$$CURRENT).
+    """
+    if isinstance(expression, str):
+        if expression.startswith("$$"):
+            return not expression.startswith(("$$ROOT", "$$CURRENT"))
+        if expression.startswith("$"):
+            refs.append((expression[1:], in_size))
+        return True
+    if isinstance(expression, dict):
+        return all(_expression_refs(value, refs, key == "$size" and _is_field_operand(value))
+                   for key, value in expression.items())
+    if isinstance(expression, list):
+        return all(_expression_refs(value, refs, in_size) for value in expression)
+    return True
+
+
+def _match_refs(query):
+    """Returns the field paths a $match filter reads, or None if it cannot be analyzed."""
+    fields = []
+    for key, value in query.items():
+        if key in ("$and", "$or", "$nor"):
+            for clause in value:
+                clause_fields = _match_refs(clause)
+                if clause_fields is None:
+                    return None
+                fields += clause_fields
+        elif key == "$expr":
+            refs = []
+            if not _expression_refs(value, refs):
+                return None
+            fields += [path for path, _ in refs]
+        elif key.startswith("$"):
+            return None  # $text, $where, ... depend on more than named fields
+        else:
+            fields.append(key)
+    return fields
+
+
+def _stage_refs(stage):
+    """
+    Returns (field_path, in_size) pairs a stage reads, or None if unknown.
+    Output field names of $group and $project are not references.
+    """
+    name = _stage_name(stage)
+    spec = stage[name]
+    refs = []
+    if name == "$match":
+        fields = _match_refs(spec)
+        return None if fields is None else [(field, False) for field in fields]
+    if name == "$lookup":
+        if "localField" in spec:
+            refs.append((spec["localField"], False))
+        if not _expression_refs(spec.get("let", {}), refs):
+            return None
+        return refs
+    if name == "$unwind":
+        path = spec if isinstance(spec, str) else spec["path"]
+        return [(path[1:], True)]  # Unwinding does not read the elements' fields
+    if name in ("$addFields", "$set"):
+        return refs if _expression_refs(list(spec.values()), refs) else None
+    if name == "$sort":
+        return [(field, False) for field in spec]
+    if name in ("$limit", "$skip"):
+        return []
+    if name == "$group":
+        return refs if _expression_refs(list(spec.values()), refs) else None
+    if name == "$project":
+        for field, value in spec.items():
+            if value in (1, True):
+                refs.append((field, False))
+            elif value in (0, False):
+                if field != "_id":
+                    return None  # Exclusion projections pass every other field through
+            elif not _expression_refs(value, refs):
+                return None
+        if spec.get("_id", 1) not in (0, False):
+            refs.append(("_id", False))
+        return refs
+    return None
+
+
+def _stage_outputs(stage):
+    """Returns the field paths a non-shaping stage creates or rewrites."""
+    name = _stage_name(stage)
+    spec = stage[name]
+    if name == "$lookup":
+        return [spec["as"]]
+    if name == "$unwind":
+        if isinstance(spec, str):
+            return [spec[1:]]
+        return [spec["path"][1:]] + ([spec["includeArrayIndex"]] if "includeArrayIndex" in spec else [])
+    if name in ("$addFields", "$set"):
+        return list(spec)
+    return []
+
+
+def _push_matches_up(stages, trace):
+    """Moves each $match ahead of $lookup/$unwind/$addFields/$sort stages it does not depend on."""
+    changed = True
+    while changed:
+        changed = False
+        for i in range(1, len(stages)):
+            if _stage_name(stages[i]) != "$match":
+                continue
+            fields = _match_refs(stages[i]["$match"])
+            previous = stages[i - 1]
+            if fields is None or _stage_name(previous) not in ("$lookup", "$unwind", "$addFields", "$set", "$sort"):
+                continue
+            if any(_overlaps(field, output) for field in fields for output in _stage_outputs(previous)):
+                continue
+            stages[i - 1], stages[i] = stages[i], stages[i - 1]
+            trace.append(f"moved $match on {sorted(set(fields))} ahead of {_stage_name(previous)}")
+            changed = True
+
+
+def _strip_prefix(expression, prefix):
+    """Rewrites "$<prefix>.x" references to "$x" (for moving filters into a lookup pipeline)."""
+    if isinstance(expression, str) and expression.startswith("$" + prefix + "."):
+        return "$" + expression[len(prefix) + 2:]
+    if isinstance(expression, dict):
+        return {key: _strip_prefix(value, prefix) for key, value in expression.items()}
+    if isinstance(expression, list):
+        return [_strip_prefix(value, prefix) for value in expression]
+    return expression
+
+
+def _is_plain_unwind(stage, path):
+    """True for an $unwind of `path` that drops documents without matches (the default)."""
+    if _stage_name(stage) != "$unwind":
+        return False
+    spec = stage["$unwind"]
+    if isinstance(spec, str):
+        return spec == "$" + path
+    return (spec.get("path") == "$" + path and not spec.get("preserveNullAndEmptyArrays")
+            and "includeArrayIndex" not in spec)
+
+
+def _correlate_lookups(stages, trace):
+    """
+    Turns $lookup + $unwind into a correlated $lookup pipeline and moves the
+    following $match predicates on the joined document into it, so non-matching
+    foreign documents are never joined.
+    """
+    for i, stage in enumerate(stages):
+        if _stage_name(stage) != "$lookup" or "let" in stage["$lookup"] or i + 1 >= len(stages):
+            continue
+        lookup = stage["$lookup"]
+        joined = lookup["as"]
+        if not _is_plain_unwind(stages[i + 1], joined):
+            continue
+
+        j = i + 2
+        while j < len(stages) and _stage_name(stages[j]) == "$match":
+            query = stages[j]["$match"]
+            inner, outer = {}, {}
+            for key, value in query.items():
+                # Field predicates and $expr can be rewritten; $and/$or clauses stay outside
+                key_fields = _match_refs({key: value}) if key == "$expr" or not key.startswith("$") else None
+                if key_fields and all(field.startswith(joined + ".") for field in key_fields):
+                    inner[key if key == "$expr" else key[len(joined) + 1:]] = _strip_prefix(value, joined)
+                else:
+                    outer[key] = value
+            if inner:
+                lookup.setdefault("pipeline", []).append({"$match": inner})
+                trace.append(f"moved $match on {sorted(inner)} into the {joined!r} lookup pipeline")
+            # Consecutive $match stages commute, so the rest are examined too
+            if outer:
+                stages[j] = {"$match": outer}
+                j += 1
+            else:
+                del stages[j]
+
+
+def _prune_lookup_fields(stages, trace):
+    """Adds a $project to each $lookup so only the joined fields used downstream are fetched."""
+    for i, stage in enumerate(stages):
+        if _stage_name(stage) != "$lookup" or "let" in stage["$lookup"]:
+            continue
+        lookup = stage["$lookup"]
+        if any(_stage_name(s) != "$match" for s in lookup.get("pipeline", [])):
+            continue
+        joined = lookup["as"]
+
+        needed, count_only, shaped = set(), False, False
+        for later in stages[i + 1:]:
+            refs = _stage_refs(later)
+            if refs is None:
+                break
+            name = _stage_name(later)
+            for path, in_size in refs:
+                if path == joined:
+                    if name == "$unwind" or in_size:
+                        count_only = True
+                    else:
+                        refs = None  # The joined documents are used whole
+                        break
+                elif path.startswith(joined + "."):
+                    needed.add(path[len(joined) + 1:].split(".")[0])
+            if refs is None:
+                break
+            if name in _SHAPING_STAGES:
+                shaped = True
+                break
+            # A stage that rewrites the joined field (other than unwinding it) ends its tracking
+            if name != "$unwind" and any(_overlaps(out, joined) for out in _stage_outputs(later)):
+                refs = None
+                break
+        if refs is None or not shaped or not (needed or count_only):
+            continue
+
+        projection = {field: 1 for field in sorted(needed)} or {"_id": 1}
+        if "_id" not in needed and needed:
+            projection["_id"] = 0
+        lookup.setdefault("pipeline", []).append({"$project": projection})
+        trace.append(f"pruned {joined!r} lookup to {sorted(needed) or ['_id']}")
+
+
+def _project_root_fields(stages, trace):
+    """
+    Inserts a $project of only the root fields the pipeline reads ahead of the first
+    $lookup, so the joined documents are built from slimmer inputs.
+    """
+    start = 0
+    while start < len(stages) and _stage_name(stages[start]) == "$match":
+        start += 1
+    if start >= len(stages) or _stage_name(stages[start]) != "$lookup":
+        return
+
+    needed, created = set(), []
+    for stage in stages[start:]:
+        name = _stage_name(stage)
+        if name not in _TRACKED_STAGES + _SHAPING_STAGES:
+            return
+        refs = _stage_refs(stage)
+        if refs is None:
+            return
+        for path, _ in refs:
+            if not any(_overlaps(path, out) for out in created):
+                needed.add(path.split(".")[0])
+        if name in _SHAPING_STAGES:
+            break
+        created += _stage_outputs(stage)
+    else:
+        return  # No shaping stage: every root field reaches the output
+
+    projection = {field: 1 for field in sorted(needed)}
+    if "_id" not in needed:
+        projection["_id"] = 0
+    stages.insert(start, {"$project": projection})
+    trace.append(f"projected root documents to {sorted(needed)} ahead of the first $lookup")
+
+
+def optimize_pipeline(stages, trace=None):
+    """
+    Rewrites an aggregation pipeline into an equivalent, cheaper one:
+      1. $match stages move ahead of $lookup/$unwind/$addFields/$sort stages they do not depend on
+      2. $lookup + $unwind become a correlated $lookup pipeline that absorbs the
+         following filters on the joined document
+      3. each $lookup only fetches the joined fields that are used downstream
+      4. root documents are projected to the fields the pipeline reads before the first $lookup
+
+    The rewritten $lookup stages combine localField/foreignField with a pipeline,
+    which needs MongoDB 5.0+. Stages the rules do not understand are left alone
+    and stop any rewrite that would have to look past them.
+
+    Args:
+        stages: List of aggregation stages (not modified)
+        trace: List receiving a description of every rewrite applied (default: not recorded)
+
+    Returns:
+        list: Optimized stages
+    """
+    stages = copy.deepcopy(stages)
+    trace = trace if trace is not None else []
+    _push_matches_up(stages, trace)
+    _correlate_lookups(stages, trace)
+    # Filters left behind by a split can now move ahead of the join as well
+    _push_matches_up(stages, trace)
+    _prune_lookup_fields(stages, trace)
+    _project_root_fields(stages, trace)
+    return stages
+
+
+def _canonical(documents):
+    return sorted(json_util.dumps(document, sort_keys=True) for document in documents)
+
+
+def check_equivalence(collection, stages):
+    """
+    Runs a pipeline as written and optimized and compares the results.
+    Documents are compared as multisets; when the pipeline ends in $sort, the
+    sequence of sort keys must match as well (ties may come back in any order).
+
+    Args:
+        collection: MongoDB collection the pipeline runs on
+        stages: Aggregation pipeline
+
+    Returns:
+        dict: {"equivalent", "original_count", "optimized_count", "rewrites"}
+    """
+    rewrites = []
+    optimized = optimize_pipeline(stages, rewrites)
+    original_docs = list(collection.aggregate(stages))
+    optimized_docs = list(collection.aggregate(optimized))
+
+    equivalent = _canonical(original_docs) == _canonical(optimized_docs)
+    if equivalent and stages and _stage_name(stages[-1]) == "$sort":
+        sort_fields = list(stages[-1]["$sort"])
+        sort_keys = lambda docs: [[d.get(f) for f in sort_fields] for d in docs]
+        equivalent = sort_keys(original_docs) == sort_keys(optimized_docs)
+
+    return {"equivalent": equivalent, "original_count": len(original_docs),
+            "optimized_count": len(optimized_docs), "rewrites": rewrites}
+
+
+def verify_pipeline_equivalence(db, pipelines=None):
+    """
+    Checks that optimization preserves the output of the module's pipelines.
+
+    Args:
+        db: MongoDB database connection object
+        pipelines: Name -> (collection name, stages) (default: the analytics pipelines)
+
+    Returns:
+        dict: Name -> result of check_equivalence()
+    """
+    if pipelines is None:
+        from eduhub_analytics import ANALYTICS_PIPELINES
+        pipelines = {name: (collection, build()) for name, (collection, build) in ANALYTICS_PIPELINES.items()}
+
+    results = {name: check_equivalence(db[collection], stages) for name, (collection, stages) in pipelines.items()}
+
+    print("\n=== Pipeline Optimization Equivalence ===")
+    for name, result in results.items():
+        status = "OK" if result["equivalent"] else "MISMATCH"
+        print(f"{name}: {status} ({result['original_count']} vs {result['optimized_count']} documents)")
+        for rewrite in result["rewrites"]:
+            print(f"   - {rewrite}")
+    return results
+
+# Example usage:
+# optimize_pipeline(instructor_pipeline(), trace := [])
+# verify_pipeline_equivalence(db)
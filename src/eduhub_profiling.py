@@ -0,0 +1,382 @@
+# Import Useful Libraries
+import contextlib
+import contextvars
+import cProfile
+import functools
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from pymongo import monitoring
+from pymongo.collection import Collection
+from pymongo.command_cursor import CommandCursor
+from pymongo.cursor import Cursor
+from pymongo.database import Database
+
+# Driver entry points timed while a profile is active. Time inside them is
+# "driver" time; the command round trips they issue are measured separately.
+_DRIVER_METHODS = {
+    Collection: ["find", "find_one", "aggregate", "count_documents", "estimated_document_count",
+                 "distinct", "insert_one", "insert_many", "update_one", "update_many", "replace_one",
+                 "delete_one", "delete_many", "find_one_and_update", "find_one_and_delete",
+                 "find_one_and_replace", "bulk_write", "create_index", "index_information"],
+    Cursor: ["next", "__next__"],
+    CommandCursor: ["next", "__next__"],
+    Database: ["command", "list_collection_names"],
+}
+
+
+class _SectionTimes:
+    """Command round trips and driver time accumulated for one profile_section."""
+
+    def __init__(self):
+        self.driver_seconds = 0.0
+        self.total_micros = 0
+        self.by_command = Counter()
+        self.counts = Counter()
+
+
+# Sections active in the current thread / asyncio task; a context only ever
+# records into its own sections, so concurrent and nested sections stay apart
+_active_sections = contextvars.ContextVar("eduhub_profile_sections", default=())
+_driver_depth = contextvars.ContextVar("eduhub_driver_depth", default=0)
+
+
+class CommandTimer(monitoring.CommandListener):
+    """
+    Attributes command round-trip times (request sent to reply received) to the
+    profile sections active where each command was started, matched by request id.
+    Pass it to MongoClient(event_listeners=[...]).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight = {}
+
+    def started(self, event):
+        sections = _active_sections.get()
+        if sections:
+            with self._lock:
+                self._in_flight[(event.connection_id, event.request_id)] = sections
+
+    def _record(self, event):
+        with self._lock:
+            sections = self._in_flight.pop((event.connection_id, event.request_id), ())
+            for section in sections:
+                section.total_micros += event.duration_micros
+                section.by_command[event.command_name] += event.duration_micros
+                section.counts[event.command_name] += 1
+
+    def succeeded(self, event):
+        self._record(event)
+
+    def failed(self, event):
+        self._record(event)
+
+
+# Shared by every client that should be profiled
+COMMAND_TIMER = CommandTimer()
+
+# Driver methods stay patched while any section is active in any thread
+_patch_lock = threading.Lock()
+_patch_count = 0
+
+
+def _timed_driver_method(method):
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        sections = _active_sections.get()
+        # Only the outermost driver call is timed (find_one iterates a cursor, etc.)
+        if not sections or _driver_depth.get():
+            return method(*args, **kwargs)
+        token = _driver_depth.set(1)
+        start_time = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start_time
+            _driver_depth.reset(token)
+            for section in sections:
+                section.driver_seconds += elapsed
+    wrapper.__wrapped_driver_method__ = method
+    return wrapper
+
+
+def _patch_driver():
+    global _patch_count
+    with _patch_lock:
+        if _patch_count == 0:
+            for cls, names in _DRIVER_METHODS.items():
+                for name in names:
+                    setattr(cls, name, _timed_driver_method(cls.__dict__[name]))
+        _patch_count += 1
+
+
+def _unpatch_driver():
+    global _patch_count
+    with _patch_lock:
+        _patch_count -= 1
+        if _patch_count == 0:
+            for cls, names in _DRIVER_METHODS.items():
+                for name in names:
+                    setattr(cls, name, cls.__dict__[name].__wrapped_driver_method__)
+
+
+def measure_round_trip(client, samples=5):
+    """
+    Measures the network round trip to the server as the fastest of a few pings.
+
+    Args:
+        client: MongoClient
+        samples: Number of pings (default: 5)
+
+    Returns:
+        float: Round-trip time in seconds
+    """
+    timings = []
+    for _ in range(samples):
+        start_time = time.perf_counter()
+        client.admin.command("ping")
+        timings.append(time.perf_counter() - start_time)
+    return min(timings)
+
+
+class _StackSampler:
+    """Samples one thread's Python stack at a fixed interval into collapsed-stack counts."""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if names:
+                self.stacks[";".join(reversed(names))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path):
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+@contextlib.contextmanager
+def profile_section(name, client=None, output_dir=None, cprofile=False, pyinstrument=False,
+                    collapsed=False, sample_interval=0.001):
+    """
+    Profiles a block and breaks its wall time down into:
+      - server: command round trips minus the network round trip of each command
+      - network: one ping round trip per command (only when a client is given)
+      - wire/decode: time inside PyMongo beyond the round trips (BSON encoding and
+        decoding, cursor bookkeeping, connection checkout)
+      - python: everything else (pipeline building, pandas, printing)
+
+    Command round trips come from COMMAND_TIMER, so the client must have been
+    created with event_listeners=[COMMAND_TIMER]. Sections may nest and may run
+    concurrently in other threads or asyncio tasks: each counts only the commands
+    and driver calls made in its own context (work handed to other threads, e.g.
+    a ThreadPoolExecutor, is not counted).
+
+    Args:
+        name: Label used in the report and output file names
+        client: MongoClient used to measure the network round trip (default: not split out)
+        output_dir: Directory receiving profiler output (default: "profiles")
+        cprofile: Write a cProfile .prof file and a cumulative-time summary (default: False)
+        pyinstrument: Write a pyinstrument HTML report; requires pyinstrument (default: False)
+        collapsed: Write a sampled, flame-graph-ready collapsed stack file (default: False)
+        sample_interval: Seconds between stack samples for the collapsed file (default: 0.001)
+
+    Yields:
+        dict: Filled with the breakdown (in milliseconds) and output paths when the block exits
+    """
+    report = {"name": name}
+    rtt = measure_round_trip(client) if client is not None else 0.0
+    output_dir = output_dir or "profiles"
+    stem = os.path.join(output_dir, f"{name}-{datetime.now():%Y%m%d-%H%M%S-%f}")
+    if cprofile or pyinstrument or collapsed:
+        os.makedirs(output_dir, exist_ok=True)
+
+    profiler = cProfile.Profile() if cprofile else None
+    instrument = None
+    if pyinstrument:
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            raise ImportError("pyinstrument output requires pyinstrument: pip install pyinstrument")
+        instrument = Profiler()
+    sampler = _StackSampler(threading.get_ident(), sample_interval) if collapsed else None
+
+    times = _SectionTimes()
+    _patch_driver()
+    token = _active_sections.set(_active_sections.get() + (times,))
+    try:
+        if sampler:
+            sampler.start()
+        if instrument:
+            instrument.start()
+        if profiler:
+            profiler.enable()
+        start_time = time.perf_counter()
+        try:
+            yield report
+        finally:
+            wall = time.perf_counter() - start_time
+            if profiler:
+                profiler.disable()
+            if instrument:
+                instrument.stop()
+            if sampler:
+                sampler.stop()
+    finally:
+        _active_sections.reset(token)
+        _unpatch_driver()
+
+    round_trips = times.total_micros / 1e6
+    commands = sum(times.counts.values())
+    network = min(rtt * commands, round_trips)
+    driver = max(times.driver_seconds, round_trips)
+    report.update({
+        "wall_ms": wall * 1000,
+        "server_ms": (round_trips - network) * 1000,
+        "network_ms": network * 1000,
+        "wire_decode_ms": (driver - round_trips) * 1000,
+        "python_ms": max(wall - driver, 0.0) * 1000,
+        "commands": dict(times.counts),
+        "command_ms": {cmd: micros / 1000 for cmd, micros in times.by_command.items()},
+        "files": {},
+    })
+
+    if profiler:
+        report["files"]["cprofile"] = stem + ".prof"
+        profiler.dump_stats(report["files"]["cprofile"])
+        summary = io.StringIO()
+        pstats.Stats(profiler, stream=summary).sort_stats("cumulative").print_stats(20)
+        report["files"]["cprofile_summary"] = stem + ".txt"
+        with open(report["files"]["cprofile_summary"], "w") as f:
+            f.write(summary.getvalue())
+    if instrument:
+        report["files"]["pyinstrument"] = stem + ".html"
+        with open(report["files"]["pyinstrument"], "w") as f:
+            f.write(instrument.output_html())
+    if sampler:
+        report["files"]["collapsed"] = stem + ".folded"
+        sampler.write(report["files"]["collapsed"])
+
+
+def print_profile_report(report):
+    """
+    Prints a profile breakdown in a formatted way.
+
+    Args:
+        report: Dictionary filled by profile_section()
+    """
+    wall = report["wall_ms"] or 1e-9
+    print(f"\n=== Profile: {report['name']} ({report['wall_ms']:.1f} ms) ===")
+    for label, key in (("Server", "server_ms"), ("Network", "network_ms"),
+                       ("Wire/decode", "wire_decode_ms"), ("Python", "python_ms")):
+        print(f"{label:<12} {report[key]:>9.1f} ms  {report[key] / wall:>6.1%}")
+    if report["commands"]:
+        print("Commands: " + ", ".join(
+            f"{cmd} x{count} ({report['command_ms'][cmd]:.1f} ms)" for cmd, count in report["commands"].items()))
+    for kind, path in report["files"].items():
+        print(f"{kind}: {path}")
+
+
+def profiled(func=None, *, client=None, quiet=False, **options):
+    """
+    Decorator that profiles every call of a function with profile_section().
+    The last report is kept on the wrapper as `last_profile`.
+
+    Args:
+        func: Function to wrap
+        client: MongoClient used to measure the network round trip
+        quiet: Do not print the report after each call (default: False)
+        **options: Passed to profile_section (output_dir, cprofile, pyinstrument, collapsed, ...)
+    """
+    if func is None:
+        return functools.partial(profiled, client=client, quiet=quiet, **options)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        # Calls made from inside another profiled call are part of the outer profile
+        if _active_sections.get():
+            return func(*args, **kwargs)
+        with profile_section(func.__name__, client=client, **options) as report:
+            result = func(*args, **kwargs)
+        wrapper.last_profile = report
+        if not quiet:
+            print_profile_report(report)
+        return result
+
+    wrapper.last_profile = None
+    wrapper.__profiled__ = func
+    return wrapper
+
+
+def enable_profiling(module, names=None, **options):
+    """
+    Wraps a module's public functions with @profiled in place.
+    Functions already wrapped are left alone.
+
+    Args:
+        module: Module whose functions are wrapped, e.g. eduhub_queries
+        names: Function names to wrap (default: every public function defined in the module)
+        **options: Passed to profiled()
+
+    Returns:
+        list: Names of the functions wrapped
+    """
+    options.setdefault("client", getattr(module, "client", None))
+    if names is None:
+        names = [
+            name for name, value in vars(module).items()
+            if callable(value) and not name.startswith("_") and not isinstance(value, type)
+            and getattr(value, "__module__", None) == module.__name__
+        ]
+    wrapped = []
+    for name in names:
+        function = getattr(module, name)
+        if not hasattr(function, "__profiled__"):
+            setattr(module, name, profiled(function, **options))
+            wrapped.append(name)
+    return wrapped
+
+
+def disable_profiling(module):
+    """
+    Restores the functions wrapped by enable_profiling().
+
+    Args:
+        module: Module passed to enable_profiling()
+    """
+    for name, value in list(vars(module).items()):
+        if hasattr(value, "__profiled__"):
+            setattr(module, name, value.__profiled__)
+
+# Example usage:
+# enable_profiling(eduhub_queries, ["instructor_analysis", "student_performance_analysis"], collapsed=True)
+# eduhub_queries.instructor_analysis()
+#
+# with profile_section("course_stats", client=client, cprofile=True) as report:
+#     course_enrollment_stat()
+# print_profile_report(report)
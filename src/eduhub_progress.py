@@ -0,0 +1,351 @@
+# Import Useful Libraries
+import atexit
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+from pymongo.write_concern import WriteConcern
+
+# Durability guarantees of the enrollment progress buffer
+# ------------------------------------------------------
+# * Events live only in process memory until the next flush. A crash or a kill -9
+#   loses up to `flush_interval` seconds (or `max_pending` enrollments) of progress.
+#   close() -- also called from the context manager and, by default, at interpreter
+#   exit -- flushes everything still pending on a clean shutdown.
+# * Once flushed, durability is whatever the configured write concern provides:
+#     w=0                  fire-and-forget, errors are never reported
+#     w=1 (default)        acknowledged by the primary, may roll back on failover
+#     w="majority", j=True acknowledged by a majority and journaled, survives failover
+# * Flushes use $max for both fields, so replaying a batch, overlapping flushes or
+#   out-of-order batches can never move completionStatus or lastAccessed backwards.
+# * Failed writes of an unordered batch with a transient error code (failover,
+#   interruption, write conflict, ...) are re-queued and retried on the next flush, up
+#   to max_retries times; the rest of the batch is still applied. Other write errors
+#   (e.g. a validator rejecting completionStatus > 100) never succeed on retry: those
+#   updates go to `dead_letters` instead. If the bulk write fails as a whole (network
+#   error, failover, timeout) the entire batch is re-queued -- replaying $max updates
+#   that did reach the server is harmless.
+# * Write concern errors (applied on the primary, not yet replicated as asked) are
+#   counted in stats["write_concern_errors"] and kept in `write_concern_errors`.
+# * Timestamps are stored as UTC; naive datetimes passed in are taken to be UTC.
+# * Each flush also counts the students of the applied updates as active on their
+#   lastAccessed day in the engagement sketches (one extra query per flush, buffered
+#   sketch writes); pass sketches=False to skip it.
+
+PROGRESS_WRITE_CONCERNS = {
+    "fast": WriteConcern(w=0),
+    "acknowledged": WriteConcern(w=1),
+    "durable": WriteConcern(w="majority", j=True),
+}
+
+# Write error codes worth retrying: the same write can succeed once the condition passes
+RETRYABLE_WRITE_ERROR_CODES = frozenset({
+    6, 7, 89, 91, 112, 189, 262, 9001, 10107, 11600, 11602, 13435, 13436,
+})
+
+# Write concern errors kept per buffer for inspection
+MAX_WRITE_CONCERN_ERRORS = 100
+
+
+def _utc(timestamp):
+    """Returns an aware UTC datetime: now when timestamp is None, naive values taken as UTC."""
+    if timestamp is None:
+        return datetime.now(timezone.utc)
+    if timestamp.tzinfo is None:
+        return timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.astimezone(timezone.utc)
+
+
+class EnrollmentProgressBuffer:
+    """
+    Coalesces enrollment progress events and flushes them as unordered bulk writes.
+
+    Multiple events for the same enrollment within one flush window are merged into
+    a single update that keeps the highest completionStatus and the latest lastAccessed.
+
+    Args:
+        db: MongoDB database connection object
+        flush_interval: Seconds between background flushes; None disables the timer (default: 1.0)
+        max_pending: Flush early once this many enrollments are buffered (default: 1000)
+        write_concern: WriteConcern or a key of PROGRESS_WRITE_CONCERNS (default: "acknowledged")
+        flush_on_exit: Register close() to run at interpreter exit (default: True)
+        max_retries: Flushes a transient write error is retried on before the update is
+            dead-lettered (default: 5)
+        sketches: Record flushed activity in the daily active-students sketches (default: True)
+    """
+
+    def __init__(self, db, flush_interval=1.0, max_pending=1000, write_concern="acknowledged",
+                 flush_on_exit=True, max_retries=5, sketches=True):
+        if isinstance(write_concern, str):
+            write_concern = PROGRESS_WRITE_CONCERNS[write_concern]
+        self.collection = db.enrollments.with_options(write_concern=write_concern)
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        self.sketches = sketches
+        self.stats = {"events": 0, "flushes": 0, "writes": 0, "matched": 0, "errors": 0,
+                      "retried": 0, "dead_lettered": 0, "write_concern_errors": 0}
+        # Updates that failed for good: {"enrollmentId", "update", "code", "errmsg"}
+        self.dead_letters = []
+        self.write_concern_errors = deque(maxlen=MAX_WRITE_CONCERN_ERRORS)
+
+        self._pending = {}
+        self._attempts = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._closed = threading.Event()
+        self._timer = None
+
+        if flush_interval:
+            self._timer = threading.Thread(target=self._flush_periodically, daemon=True)
+            self._timer.start()
+        if flush_on_exit:
+            atexit.register(self.close)
+
+    def record(self, enrollment_id, completion_status=None, last_accessed=None):
+        """
+        Buffers one progress event for an enrollment.
+
+        Args:
+            enrollment_id: ID of the enrollment the event belongs to
+            completion_status: New completion percentage (optional)
+            last_accessed: Access timestamp (default: now)
+        """
+        if self._closed.is_set():
+            raise RuntimeError("EnrollmentProgressBuffer is closed")
+        last_accessed = _utc(last_accessed)
+
+        with self._lock:
+            merged = self._pending.setdefault(enrollment_id, {})
+            if completion_status is not None:
+                merged["completionStatus"] = max(merged.get("completionStatus", completion_status),
+                                                 completion_status)
+            merged["lastAccessed"] = max(merged.get("lastAccessed", last_accessed), last_accessed)
+            self.stats["events"] += 1
+            should_flush = len(self._pending) >= self.max_pending
+
+        if should_flush:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes all buffered progress as one unordered bulk write.
+
+        Returns:
+            int: Number of enrollment updates sent
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return 0
+
+            ids = list(batch)
+            requests = [
+                UpdateOne({"enrollmentId": enrollment_id}, {"$max": batch[enrollment_id]})
+                for enrollment_id in ids
+            ]
+            failed = set()
+            try:
+                result = self.collection.bulk_write(requests, ordered=False)
+                if result.acknowledged:
+                    self.stats["matched"] += result.matched_count
+            except BulkWriteError as e:
+                self.stats["matched"] += e.details.get("nMatched", 0)
+                failed = self._handle_write_errors(ids, batch, e.details.get("writeErrors", []))
+                self._record_write_concern_errors(e.details.get("writeConcernErrors", []))
+            except PyMongoError:
+                # Unknown how much was applied: retry the whole batch on the next flush
+                self.stats["errors"] += len(batch)
+                for enrollment_id, update in batch.items():
+                    self._requeue(enrollment_id, update)
+                raise
+
+            # Whatever did not fail was applied: its retry count starts over
+            applied = [enrollment_id for enrollment_id in ids if enrollment_id not in failed]
+            for enrollment_id in applied:
+                self._attempts.pop(enrollment_id, None)
+            if self.sketches and applied:
+                self._record_activity(applied, batch)
+            self.stats["flushes"] += 1
+            self.stats["writes"] += len(requests)
+            return len(requests)
+
+    def _handle_write_errors(self, ids, batch, write_errors):
+        """
+        Re-queues updates with a transient error, within max_retries; dead-letters the others.
+
+        Returns:
+            set: IDs of the enrollments whose update failed
+        """
+        self.stats["errors"] += len(write_errors)
+        failed = set()
+        for error in write_errors:
+            enrollment_id = ids[error["index"]]
+            failed.add(enrollment_id)
+            attempts = self._attempts.get(enrollment_id, 0) + 1
+            if error.get("code") in RETRYABLE_WRITE_ERROR_CODES and attempts <= self.max_retries:
+                self._attempts[enrollment_id] = attempts
+                self.stats["retried"] += 1
+                self._requeue(enrollment_id, batch[enrollment_id])
+            else:
+                self._attempts.pop(enrollment_id, None)
+                self.stats["dead_lettered"] += 1
+                self.dead_letters.append({"enrollmentId": enrollment_id, "update": batch[enrollment_id],
+                                          "code": error.get("code"), "errmsg": error.get("errmsg")})
+        return failed
+
+    def _record_write_concern_errors(self, write_concern_errors):
+        """Keeps write concern errors: the writes were applied but may not be durable as asked."""
+        if write_concern_errors:
+            self.stats["write_concern_errors"] += len(write_concern_errors)
+            self.write_concern_errors.extend(write_concern_errors)
+            print(f"Progress flush not acknowledged as requested: {write_concern_errors[0].get('errmsg')}")
+
+    def _record_activity(self, enrollment_ids, batch):
+        """Feeds the applied lastAccessed values to the active-students sketches."""
+        # Imported here: the sketch module imports this one's error codes
+        from eduhub_sketches import record_progress_activity, sketch_buffer
+
+        db = self.collection.database
+        try:
+            enrollments = [
+                dict(enrollment, lastAccessed=batch[enrollment["enrollmentId"]]["lastAccessed"])
+                for enrollment in self.collection.find({"enrollmentId": {"$in": enrollment_ids}},
+                                                       {"enrollmentId": 1, "studentId": 1, "courseId": 1, "_id": 0})
+            ]
+            record_progress_activity(db, enrollments, buffer=sketch_buffer(db))
+        except PyMongoError as e:
+            # The progress itself is written; only the engagement metrics miss this flush
+            print(f"Progress activity not recorded in the sketches: {str(e)}")
+
+    def _requeue(self, enrollment_id, update):
+        """Merges a failed update back into the pending buffer."""
+        with self._lock:
+            merged = self._pending.setdefault(enrollment_id, {})
+            for field, value in update.items():
+                merged[field] = max(merged.get(field, value), value)
+
+    def _flush_periodically(self):
+        """Background loop that flushes the buffer every flush_interval seconds."""
+        while not self._closed.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Progress flush failed, will retry: {str(e)}")
+
+    def pending_count(self):
+        """
+        Returns the number of enrollments with unflushed progress.
+
+        Returns:
+            int: Number of buffered enrollments
+        """
+        with self._lock:
+            return len(self._pending)
+
+    def close(self):
+        """
+        Stops the background timer and flushes everything still buffered,
+        retrying transient write errors until they succeed or are dead-lettered.
+        Safe to call more than once.
+
+        Returns:
+            list: The dead-lettered updates (also kept in `dead_letters`)
+        """
+        if self._closed.is_set():
+            return self.dead_letters
+        self._closed.set()
+        if self._timer is not None:
+            self._timer.join()
+        self.flush()
+        while self.pending_count():
+            time.sleep(min(self.flush_interval or 0.1, 1.0))
+            self.flush()
+        if self.dead_letters:
+            print(f"Progress buffer closed with {len(self.dead_letters)} dead-lettered updates")
+        atexit.unregister(self.close)
+        return self.dead_letters
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def update_enrollment_progress(db, enrollment_id="enroll001", completion_status=None, last_accessed=None):
+    """
+    Applies a single progress event with an individual acknowledged update.
+    Use EnrollmentProgressBuffer for high-volume event streams.
+
+    Args:
+        db: MongoDB database connection object
+        enrollment_id: ID of the enrollment to update (default: "enroll001")
+        completion_status: New completion percentage (optional)
+        last_accessed: Access timestamp (default: now)
+
+    Returns:
+        UpdateResult: Result of the update
+    """
+    update = {"lastAccessed": _utc(last_accessed)}
+    if completion_status is not None:
+        update["completionStatus"] = completion_status
+    return db.enrollments.update_one({"enrollmentId": enrollment_id}, {"$max": update})
+
+
+def compare_progress_write_modes(db, events=10000, enrollments=50, flush_interval=0.5):
+    """
+    Times the same stream of progress events written one-by-one and through the buffer.
+
+    Args:
+        db: MongoDB database connection object
+        events: Number of progress events to replay (default: 10000)
+        enrollments: Number of distinct enrollments the events are spread over (default: 50)
+        flush_interval: Flush window of the buffer in seconds (default: 0.5)
+
+    Returns:
+        dict: Timing and write counts for both modes
+    """
+    enrollment_ids = [e["enrollmentId"] for e in db.enrollments.find({}, {"enrollmentId": 1}).limit(enrollments)]
+    stream = [(enrollment_ids[i % len(enrollment_ids)], i * 100 // events) for i in range(events)]
+
+    start_time = time.time()
+    for enrollment_id, status in stream:
+        update_enrollment_progress(db, enrollment_id, completion_status=status)
+    individual_time = time.time() - start_time
+
+    start_time = time.time()
+    with EnrollmentProgressBuffer(db, flush_interval=flush_interval, flush_on_exit=False) as buffer:
+        for enrollment_id, status in stream:
+            buffer.record(enrollment_id, completion_status=status)
+    buffered_time = time.time() - start_time
+
+    results = {
+        "events": events,
+        "individual_time": individual_time,
+        "individual_writes": events,
+        "buffered_time": buffered_time,
+        "buffered_writes": buffer.stats["writes"],
+        "buffered_flushes": buffer.stats["flushes"],
+    }
+
+    print("\n=== Progress Write Modes ===")
+    print(f"Individual updates: {results['individual_writes']} writes in {individual_time * 1000:.2f} ms")
+    print(f"Buffered updates: {results['buffered_writes']} writes in {results['buffered_flushes']} flushes, "
+          f"{buffered_time * 1000:.2f} ms")
+    if buffered_time:
+        print(f"Speedup: {individual_time / buffered_time:.1f}x")
+
+    return results
+
+# Example usage:
+# with EnrollmentProgressBuffer(db, flush_interval=1.0, write_concern="durable") as progress:
+#     progress.record("enroll001", completion_status=40)
+#     progress.record("enroll001", completion_status=35)  # merged: completionStatus stays 40
+#     progress.record("enroll002")                        # lastAccessed only
+# progress.dead_letters                                   # updates the server rejected for good
+# compare_progress_write_modes(db)
@@ -1,258 +1,289 @@
 # Import Useful Libraries
-from pymongo import MongoClient, ASCENDING, DESCENDING, TEXT
-from datetime import datetime, timedelta
+from pymongo import MongoClient, ASCENDING, DESCENDING, TEXT, ReturnDocument
+from pymongo.results import DeleteResult, UpdateResult
+from datetime import datetime, timedelta, timezone
 import pandas as pd
 from bson import json_util
 import json
+import contextlib
+import copy
+import io
+import os
+import random
 import time
 from pymongo.errors import OperationFailure, DuplicateKeyError
 from pprint import pprint
+from eduhub_gradebook import (get_course_for_assignment, record_submission_in_gradebook,
+                              record_grade_change_in_gradebook)
+from eduhub_sketches import record_enrollment_activity, record_submission_activity, record_grade, sketch_buffer
+from eduhub_validation import compile_validators, validated_insert_many
+from eduhub_dates import convert_date_fields
+from eduhub_profiling import COMMAND_TIMER, profile_section
+from eduhub_analytics import (CourseEnrollmentReport, CourseEnrollmentStat, StudentPerformanceReport,
+                              StudentPerformance, CourseCompletion, InstructorReport, InstructorStat,
+                              compute_course_enrollment_stats, compute_student_performance,
+                              compute_instructor_analytics)
+from eduhub_archive import source_collection, with_archived
+from eduhub_buckets import append_submission_to_bucket, bucket_settings, update_bucketed_grade
+from eduhub_counts import collection_counts, collection_totals
+from eduhub_execution import scatter_gather
+from eduhub_indexes import ACTIVE_STUDENTS_FILTER, INDEX_MANIFEST, UNGRADED_SUBMISSIONS_FILTER, ensure_index
+from eduhub_outlines import (add_lesson_to_outline, refresh_course_outline, remove_lesson_from_outline,
+                             update_outline_course_fields, update_outline_instructor)
+from eduhub_rendering import render_course_enrollment_stats, render_student_performance, render_instructor_analytics
+from eduhub_watchdog import tag_queries
 
 # Establish connection
-client = MongoClient('mongodb://localhost:27017/')
+client = MongoClient('mongodb://localhost:27017/', event_listeners=[COMMAND_TIMER])
 db = client['eduhub_db']
 
-def create_collections_with_validation():
-   
-    # List of all collections with their validation schemas
-    collections = {
-        "users": {
-            "$jsonSchema": {
-                "bsonType": "object",
-                "required": ["userId", "email", "firstName", "lastName", "role", "dateJoined", "isActive"],
-                "properties": {
-                    "userId": {
-                        "bsonType": "string",
-                        "description": "must be a string and is required"
-                    },
-                    "email": {
-                        "bsonType": "string",
-                        "pattern": "^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\\.[a-zA-Z]{2,}$",
-                        "description": "must be a valid email and is required"
-                    },
-                    "firstName": {
-                        "bsonType": "string",
-                        "description": "must be a string and is required"
-                    },
-                    "lastName": {
-                        "bsonType": "string",
-                        "description": "must be a string and is required"
-                    },
-                    "role": {
-                        "enum": ["student", "instructor"],
-                        "description": "must be either 'student' or 'instructor' and is required"
-                    },
-                    "dateJoined": {
-                        "bsonType": "date",
-                        "description": "must be a date and is required"
-                    },
-                    "profile": {
-                        "bsonType": "object",
-                        "properties": {
-                            "bio": {"bsonType": "string"},
-                            "avatar": {"bsonType": "string"},
-                            "skills": {
-                                "bsonType": "array",
-                                "items": {"bsonType": "string"}
-                            }
+# $jsonSchema validators for every collection, shared by the server-side
+# collection setup and the client-side checkers compiled from them
+COLLECTION_VALIDATORS = {
+    "users": {
+        "$jsonSchema": {
+            "bsonType": "object",
+            "required": ["userId", "email", "firstName", "lastName", "role", "dateJoined", "isActive"],
+            "properties": {
+                "userId": {
+                    "bsonType": "string",
+                    "description": "must be a string and is required"
+                },
+                "email": {
+                    "bsonType": "string",
+                    "pattern": "^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\\.[a-zA-Z]{2,}$",
+                    "description": "must be a valid email and is required"
+                },
+                "firstName": {
+                    "bsonType": "string",
+                    "description": "must be a string and is required"
+                },
+                "lastName": {
+                    "bsonType": "string",
+                    "description": "must be a string and is required"
+                },
+                "role": {
+                    "enum": ["student", "instructor"],
+                    "description": "must be either 'student' or 'instructor' and is required"
+                },
+                "dateJoined": {
+                    "bsonType": "date",
+                    "description": "must be a date and is required"
+                },
+                "profile": {
+                    "bsonType": "object",
+                    "properties": {
+                        "bio": {"bsonType": "string"},
+                        "avatar": {"bsonType": "string"},
+                        "skills": {
+                            "bsonType": "array",
+                            "items": {"bsonType": "string"}
                         }
-                    },
-                    "isActive": {
-                        "bsonType": "bool",
-                        "description": "must be a boolean"
                     }
+                },
+                "isActive": {
+                    "bsonType": "bool",
+                    "description": "must be a boolean"
                 }
             }
-        },
-
-        "courses": {
-            "$jsonSchema": {
-                "bsonType": "object",
-                "required": ['courseId', 'title', 'description', 'instructorId', 'category', 
-                     'level', 'duration', 'price', 'createdAt', 'isPublished'],
-                "properties": {
-                    "courseId": {
-                        "bsonType": "string",
-                        "description": "must be a string and is required"
-                    },
-                    "title": {
-                        "bsonType": "string",
-                        "description": "must be a string and is required"
-                    },
-                    "description": {"bsonType": "string"},
-                    "instructorId": {
-                        "bsonType": "string",
-                        "description": "must reference a user and is required"
-                    },
-                    "category": {"bsonType": "string"},
-                    "level": {
-                        "enum": ["beginner", "intermediate", "advanced"],
-                        "description": "must be one of the defined levels"
-                    },
-                    "duration": {
-                        "bsonType": "number",
-                        "minimum": 0,
-                        "description": "must be a positive number"
-                    },
-                    "price": {
-                        "bsonType": "number",
-                        "minimum": 0,
-                        "description": "must be a positive number"
-                    },
-                    "tags": {
-                        "bsonType": "array",
-                        "items": {"bsonType": "string"}
-                    },
-                    "createdAt": {
-                        "bsonType": "date",
-                        "description": "must be a date and is required"
-                    },
-                    "updatedAt": {"bsonType": "date"},
-                    "isPublished": {"bsonType": "bool"}
-                }
+        }
+    },
+
+    "courses": {
+        "$jsonSchema": {
+            "bsonType": "object",
+            "required": ['courseId', 'title', 'description', 'instructorId', 'category', 
+                 'level', 'duration', 'price', 'createdAt', 'isPublished'],
+            "properties": {
+                "courseId": {
+                    "bsonType": "string",
+                    "description": "must be a string and is required"
+                },
+                "title": {
+                    "bsonType": "string",
+                    "description": "must be a string and is required"
+                },
+                "description": {"bsonType": "string"},
+                "instructorId": {
+                    "bsonType": "string",
+                    "description": "must reference a user and is required"
+                },
+                "category": {"bsonType": "string"},
+                "level": {
+                    "enum": ["beginner", "intermediate", "advanced"],
+                    "description": "must be one of the defined levels"
+                },
+                "duration": {
+                    "bsonType": "number",
+                    "minimum": 0,
+                    "description": "must be a positive number"
+                },
+                "price": {
+                    "bsonType": "number",
+                    "minimum": 0,
+                    "description": "must be a positive number"
+                },
+                "tags": {
+                    "bsonType": "array",
+                    "items": {"bsonType": "string"}
+                },
+                "createdAt": {
+                    "bsonType": "date",
+                    "description": "must be a date and is required"
+                },
+                "updatedAt": {"bsonType": "date"},
+                "isPublished": {"bsonType": "bool"}
             }
-        },
-
-        "enrollments": {
-            "$jsonSchema": {
-                "bsonType": "object",
-                "required": ['enrollmentId', 'studentId', 'courseId', 'enrollmentDate', 
-                    'completionStatus', 'lastAccessed'],
-                "properties": {
-                    "enrollmentId": {
-                        "bsonType": "string",
-                        "description": "must be a string and is required"
-                    },
-                    "studentId": {
-                        "bsonType": "string",
-                        "description": "must reference a user and is required"
-                    },
-                    "courseId": {
-                        "bsonType": "string",
-                        "description": "must reference a course and is required"
-                    },
-                    "enrollmentDate": {
-                        "bsonType": "date",
-                        "description": "must be a date and is required"
-                    },
-                    "completionStatus": {
-                        "bsonType": "number",
-                        "minimum": 0,
-                        "maximum": 100,
-                        "description": "must be a percentage between 0 and 100"
-                    },
-                    "lastAccessed": {"bsonType": "date"}
-                }
+        }
+    },
+
+    "enrollments": {
+        "$jsonSchema": {
+            "bsonType": "object",
+            "required": ['enrollmentId', 'studentId', 'courseId', 'enrollmentDate', 
+                'completionStatus', 'lastAccessed'],
+            "properties": {
+                "enrollmentId": {
+                    "bsonType": "string",
+                    "description": "must be a string and is required"
+                },
+                "studentId": {
+                    "bsonType": "string",
+                    "description": "must reference a user and is required"
+                },
+                "courseId": {
+                    "bsonType": "string",
+                    "description": "must reference a course and is required"
+                },
+                "enrollmentDate": {
+                    "bsonType": "date",
+                    "description": "must be a date and is required"
+                },
+                "completionStatus": {
+                    "bsonType": "number",
+                    "minimum": 0,
+                    "maximum": 100,
+                    "description": "must be a percentage between 0 and 100"
+                },
+                "lastAccessed": {"bsonType": "date"}
             }
-        },
-        
-        "lessons": {
-            "$jsonSchema": {
-                "bsonType": "object",
-                "required": ['lessonId', 'courseId', 'title', 'content', 'sequence', 'duration'],
-                "properties": {
-                    "lessonId": {
-                        "bsonType": "string",
-                        "description": "must be a string and is required"
-                    },
-                    "courseId": {
-                        "bsonType": "string",
-                        "description": "must reference a course and is required"
-                    },
-                    "title": {
-                        "bsonType": "string",
-                        "description": "must be a string and is required"
-                    },
-                    "content": {"bsonType": "string"},
-                    "sequence": {
-                        "bsonType": "number",
-                        "minimum": 1,
-                        "description": "must be a positive integer and is required"
-                    },
-                    "duration": {
-                        "bsonType": "number",
-                        "minimum": 0,
-                        "description": "must be a positive number"
-                    },
-                    "resources": {
-                        "bsonType": "array",
-                        "items": {"bsonType": "string"}
-                    }
+        }
+    },
+
+    "lessons": {
+        "$jsonSchema": {
+            "bsonType": "object",
+            "required": ['lessonId', 'courseId', 'title', 'content', 'sequence', 'duration'],
+            "properties": {
+                "lessonId": {
+                    "bsonType": "string",
+                    "description": "must be a string and is required"
+                },
+                "courseId": {
+                    "bsonType": "string",
+                    "description": "must reference a course and is required"
+                },
+                "title": {
+                    "bsonType": "string",
+                    "description": "must be a string and is required"
+                },
+                "content": {"bsonType": "string"},
+                "sequence": {
+                    "bsonType": "number",
+                    "minimum": 1,
+                    "description": "must be a positive integer and is required"
+                },
+                "duration": {
+                    "bsonType": "number",
+                    "minimum": 0,
+                    "description": "must be a positive number"
+                },
+                "resources": {
+                    "bsonType": "array",
+                    "items": {"bsonType": "string"}
                 }
             }
-        },
-
-        "assignments": {
-            "$jsonSchema": {
-                "bsonType": "object",
-                "required": ['assignmentId', 'courseId', 'title', 'description', 'dueDate', 'maxPoints', 'instructions'],
-                "properties": {
-                    "assignmentId": {
-                        "bsonType": "string",
-                        "description": "must be a string and is required"
-                    },
-                    "courseId": {
-                        "bsonType": "string",
-                        "description": "must reference a course and is required"
-                    },
-                    "title": {
-                        "bsonType": "string",
-                        "description": "must be a string and is required"
-                    },
-                    "description": {"bsonType": "string"},
-                    "dueDate": {
-                        "bsonType": "date",
-                        "description": "must be a date and is required"
-                    },
-                    "maxPoints": {
-                        "bsonType": "number",
-                        "minimum": 0,
-                        "description": "must be a positive number"
-                    },
-                    "instructions": {"bsonType": "string"}
-                }
+        }
+    },
+
+    "assignments": {
+        "$jsonSchema": {
+            "bsonType": "object",
+            "required": ['assignmentId', 'courseId', 'title', 'description', 'dueDate', 'maxPoints', 'instructions'],
+            "properties": {
+                "assignmentId": {
+                    "bsonType": "string",
+                    "description": "must be a string and is required"
+                },
+                "courseId": {
+                    "bsonType": "string",
+                    "description": "must reference a course and is required"
+                },
+                "title": {
+                    "bsonType": "string",
+                    "description": "must be a string and is required"
+                },
+                "description": {"bsonType": "string"},
+                "dueDate": {
+                    "bsonType": "date",
+                    "description": "must be a date and is required"
+                },
+                "maxPoints": {
+                    "bsonType": "number",
+                    "minimum": 0,
+                    "description": "must be a positive number"
+                },
+                "instructions": {"bsonType": "string"}
             }
-        },
-
-        "submissions": {
-            "$jsonSchema": {
-                "bsonType": "object",
-                "required": ['submissionId', 'assignmentId', 'studentId', 'submittedDate', 'content', 'isGraded'],
-                "properties": {
-                    "submissionId": {
-                        "bsonType": "string",
-                        "description": "must be a string and is required"
-                    },
-                    "assignmentId": {
-                        "bsonType": "string",
-                        "description": "must reference an assignment and is required"
-                    },
-                    "studentId": {
-                        "bsonType": "string",
-                        "description": "must reference a user and is required"
-                    },
-                    "submittedDate": {
-                        "bsonType": "date",
-                        "description": "must be a date and is required"
-                    },
-                    "content": {"bsonType": "string"},
-                    "grade": {
-                        "bsonType": "number",
-                        "minimum": 0,
-                        "description": "must be a positive number"
-                    },
-                    "feedback": {"bsonType": "string"},
-                    "isGraded": {"bsonType": "bool"}
-                }
+        }
+    },
+
+    "submissions": {
+        "$jsonSchema": {
+            "bsonType": "object",
+            "required": ['submissionId', 'assignmentId', 'studentId', 'submittedDate', 'content', 'isGraded'],
+            "properties": {
+                "submissionId": {
+                    "bsonType": "string",
+                    "description": "must be a string and is required"
+                },
+                "assignmentId": {
+                    "bsonType": "string",
+                    "description": "must reference an assignment and is required"
+                },
+                "studentId": {
+                    "bsonType": "string",
+                    "description": "must reference a user and is required"
+                },
+                "submittedDate": {
+                    "bsonType": "date",
+                    "description": "must be a date and is required"
+                },
+                "content": {"bsonType": "string"},
+                "grade": {
+                    "bsonType": "number",
+                    "minimum": 0,
+                    "description": "must be a positive number"
+                },
+                "feedback": {"bsonType": "string"},
+                "isGraded": {"bsonType": "bool"}
             }
-        },
-    }
+        }
+    },
+}
+
+# Client-side checkers generated once from the validators above
+DOCUMENT_CHECKERS = compile_validators(COLLECTION_VALIDATORS)
+
 
+@tag_queries
+def create_collections_with_validation(db=None):
+   
     # Get list of existing collections
     existing_collections = db.list_collection_names()
     
     # Create each collection if it doesn't exist
-    for collection_name, validator in collections.items():
+    for collection_name, validator in COLLECTION_VALIDATORS.items():
         if collection_name not in existing_collections:
             db.create_collection(collection_name, validator=validator)
             print(f"Collection '{collection_name}' created with validation rules.")
@@ -289,41 +320,52 @@ def list_document_schema_example():
     print(f"Submissions Sample Document: {json.dumps(submissions_sample_document[0], indent=4)}")
 
 
-def load_data_to_collections(json_file_path):
+# Date fields for each collection
+DATE_FIELDS = {
+    'users': ['dateJoined'],
+    'courses': ['createdAt', 'updatedAt'],
+    'enrollments': ['enrollmentDate', 'lastAccessed'],
+    'assignments': ['dueDate'],
+    'submissions': ['submittedDate']
+}
+
+
+@tag_queries(db_arg="target_db")
+def load_data_to_collections(json_file_path, target_db=None, validate=True, reject_file=None,
+                             date_method="cached"):
+    
+    # Default to the module-level database connection
+    if target_db is None:
+        target_db = db
+    
+    # Invalid documents are written next to the source file unless told otherwise
+    if reject_file is None:
+        reject_file = os.path.splitext(json_file_path)[0] + "_rejects.jsonl"
     
     # Load JSON data
     with open(json_file_path) as file:
         data = json.load(file)
     
-    # Date fields for each collection
-    date_fields = {
-        'users': ['dateJoined'],
-        'courses': ['createdAt', 'updatedAt'],
-        'enrollments': ['enrollmentDate', 'lastAccessed'],
-        'assignments': ['dueDate'],
-        'submissions': ['submittedDate']
-    }
-    
-    # Convert date strings to datetime objects
-    def convert_dates(document, fields):
-        for field in fields:
-            if field in document and document[field]:
-                document[field] = datetime.strptime(document[field], "%Y-%m-%dT%H:%M:%SZ")
-        return document
-    
     # Load data into each collection
     for collection_name in ['users', 'courses', 'enrollments', 'lessons', 'assignments', 'submissions']:
         if collection_name in data:
-            collection = db[collection_name]
+            collection = target_db[collection_name]
             
-            # Convert dates for documents in this collection
+            # Convert date strings to UTC datetimes for documents in this collection
             documents = data[collection_name]
-            if collection_name in date_fields:
-                documents = [convert_dates(doc, date_fields[collection_name]) for doc in documents]
+            if collection_name in DATE_FIELDS:
+                documents = convert_date_fields(documents, DATE_FIELDS[collection_name], method=date_method)
             
-            # Insert documents
-            if documents:  # Only insert if there are documents
-                result = collection.insert_many(documents)
+            # Pre-validate with the compiled checkers so invalid rows never reach the server
+            if validate and collection_name in DOCUMENT_CHECKERS:
+                result, rejected = validated_insert_many(collection, DOCUMENT_CHECKERS[collection_name],
+                                                         documents, reject_file)
+                if rejected:
+                    print(f"Rejected {len(rejected)} invalid documents from {collection_name} (see {reject_file})")
+            else:
+                result = collection.insert_many(documents) if documents else None
+            
+            if result is not None:
                 print(f"Inserted {len(result.inserted_ids)} documents into {collection_name} collection")
     
     print("Data loading completed!")
@@ -332,6 +374,7 @@ def load_data_to_collections(json_file_path):
 # load_data_to_collections('C:/Users/USER/Desktop/mongodb-eduhub-project/data/sample_data.json')
 
 
+@tag_queries
 def add_new_student(db):
     """
     Adds a new student user to the database.
@@ -361,6 +404,7 @@ def add_new_student(db):
     print(f"   - Name: {new_student['firstName']} {new_student['lastName']}")
     print(f"   - Email: {new_student['email']}\n")
 
+@tag_queries
 def create_new_course(db):
     """
     Creates a new course in the database.
@@ -387,49 +431,67 @@ def create_new_course(db):
     }
 
     course_result = db.courses.insert_one(new_course)
+    # The outline exists from the start, so lesson and field updates have a document to land on
+    refresh_course_outline(db, new_course["courseId"])
     print(f"2. Created new course (ID: {course_result.inserted_id}):")
     print(f"   - Title: {new_course['title']}")
     print(f"   - Instructor ID: {new_course['instructorId']}")
     print(f"   - Price: ${new_course['price']}\n")
 
-def enroll_student_in_course(db):
+@tag_queries
+def enroll_student_in_course(db, enrollment_id="enroll017", student_id="user021", course_id="course009"):
     """
     Enrolls a student in a course by creating an enrollment record.
     
     Args:
         db: MongoDB database connection object
+        enrollment_id: ID of the new enrollment (default: "enroll017")
+        student_id: ID of the student to enroll (default: our new student "user021")
+        course_id: ID of the course to enroll in (default: our new course "course009")
         
     Returns:
         None
     """
+    # UTC, as EnrollmentProgressBuffer writes lastAccessed: $max compares the same instants
+    now = datetime.now(timezone.utc)
     new_enrollment = {
-        "enrollmentId": "enroll017",
-        "studentId": "user021",  # Our new student
-        "courseId": "course009",  # Our new course
-        "enrollmentDate": datetime.now(),
+        "enrollmentId": enrollment_id,
+        "studentId": student_id,
+        "courseId": course_id,
+        "enrollmentDate": now,
         "completionStatus": 0,
-        "lastAccessed": datetime.now()
+        "lastAccessed": now
     }
 
-    enrollment_result = db.enrollments.insert_one(new_enrollment)
-    print(f"3. Created new enrollment (ID: {enrollment_result.inserted_id}):")
+    # Checked client-side first: an invalid enrollment costs no round trip
+    enrollment_result, rejected = validated_insert_many(db.enrollments, DOCUMENT_CHECKERS["enrollments"],
+                                                        [new_enrollment])
+    if rejected:
+        print(f"3. Enrollment {enrollment_id} rejected: {rejected[0][1]}\n")
+        return
+    # Sketch updates are buffered and flushed in the background: no extra round trips here
+    record_enrollment_activity(db, new_enrollment, buffer=sketch_buffer(db))
+    print(f"3. Created new enrollment (ID: {enrollment_result.inserted_ids[0]}):")
     print(f"   - Student: {new_enrollment['studentId']}")
     print(f"   - Course: {new_enrollment['courseId']}")
     print(f"   - Status: {new_enrollment['completionStatus']}% complete\n")
 
-def add_lesson_to_course(db):
+@tag_queries
+def add_lesson_to_course(db, lesson_id="lesson026", course_id="course009"):
     """
     Adds a new lesson to an existing course in the database.
     
     Args:
         db: MongoDB database connection object
+        lesson_id: ID of the new lesson (default: "lesson026")
+        course_id: ID of the course to add the lesson to (default: our new course "course009")
         
     Returns:
         None
     """
     new_lesson = {
-        "lessonId": "lesson026",
-        "courseId": "course009",  # Our new course
+        "lessonId": lesson_id,
+        "courseId": course_id,
         "title": "Pandas Advanced Features",
         "content": "Master multi-indexing, groupby operations, and performance optimization",
         "sequence": 1,
@@ -438,35 +500,88 @@ def add_lesson_to_course(db):
     }
 
     lesson_result = db.lessons.insert_one(new_lesson)
+    add_lesson_to_outline(db, new_lesson)
     print(f"4. Added new lesson (ID: {lesson_result.inserted_id}):")
     print(f"   - Course: {new_lesson['courseId']}")
     print(f"   - Title: {new_lesson['title']}")
     print(f"   - Duration: {new_lesson['duration']} minutes")
 
-def verify_database_counts(db):
+@tag_queries
+def submit_assignment(db, submission_id="sub016", assignment_id="assign002", student_id="user021",
+                      content="Completed all tasks.", grade=None):
     """
-    Verifies and prints the total counts of documents in each collection.
+    Records a student's submission for an assignment and updates their gradebook entry.
     
     Args:
         db: MongoDB database connection object
+        submission_id: ID of the new submission (default: "sub016")
+        assignment_id: ID of the assignment being submitted (default: "assign002")
+        student_id: ID of the submitting student (default: our new student "user021")
+        content: Submission content
+        grade: Grade, if the submission is graded on arrival (default: None, ungraded)
         
     Returns:
         None
     """
+    new_submission = {
+        "submissionId": submission_id,
+        "assignmentId": assignment_id,
+        "studentId": student_id,
+        "submittedDate": datetime.now(),
+        "content": content,
+        "isGraded": grade is not None
+    }
+    if grade is not None:
+        new_submission["grade"] = grade
+
+    # Checked client-side first: an invalid submission costs no round trip
+    submission_result, rejected = validated_insert_many(db.submissions, DOCUMENT_CHECKERS["submissions"],
+                                                        [new_submission])
+    if rejected:
+        print(f"5. Submission {submission_id} rejected: {rejected[0][1]}\n")
+        return
+    course_id = get_course_for_assignment(db, assignment_id)
+    if course_id:
+        record_submission_in_gradebook(db, new_submission, course_id)
+        record_submission_activity(db, new_submission, course_id, buffer=sketch_buffer(db))
+        buckets = bucket_settings(db)
+        if buckets:
+            append_submission_to_bucket(db, new_submission, course_id, buckets["bucketSize"])
+    print(f"5. Added new submission (ID: {submission_result.inserted_ids[0]}):")
+    print(f"   - Student: {new_submission['studentId']}")
+    print(f"   - Assignment: {new_submission['assignmentId']}")
+    print(f"   - Graded: {new_submission['isGraded']}")
+
+@tag_queries
+def verify_database_counts(db):
+    """
+    Verifies and prints the total counts of documents in each collection,
+    read from collection metadata rather than counted.
+    
+    Args:
+        db: MongoDB database connection object
+        
+    Returns:
+        dict: {collection name: document count}
+    """
+    totals = collection_totals(db, ["users", "courses", "enrollments", "lessons"])
     print("\n=== Verification ===")
-    print(f"Total users: {db.users.count_documents({})}")
-    print(f"Total courses: {db.courses.count_documents({})}")
-    print(f"Total enrollments: {db.enrollments.count_documents({})}")
-    print(f"Total lessons: {db.lessons.count_documents({})}")
+    print(f"Total users: {totals['users']}")
+    print(f"Total courses: {totals['courses']}")
+    print(f"Total enrollments: {totals['enrollments']}")
+    print(f"Total lessons: {totals['lessons']}")
+    return totals
 
 # Example usage:
 # add_new_student(db)
 # create_new_course(db)
 # enroll_student_in_course(db)
 # add_lesson_to_course(db)
+# submit_assignment(db)
 # verify_database_counts(db)
 
 
+@tag_queries
 def find_active_students(db):
     """
     Finds and displays all active student users in the system.
@@ -477,10 +592,9 @@ def find_active_students(db):
     Returns:
         list: All active student documents with selected fields
     """
-    active_students = list(db.users.find({
-        "role": "student",
-        "isActive": True
-    }, {"userId": 1, "firstName": 1, "lastName": 1, "email": 1}))
+    active_students = _find_with_index(db.users, ACTIVE_STUDENTS_FILTER,
+                                       {"userId": 1, "firstName": 1, "lastName": 1, "email": 1},
+                                       "active_students_partial")
 
     print("1. Active Students (Total:", len(active_students), "):")
     for student in active_students[:3]:  # Display first 3 for brevity
@@ -489,6 +603,7 @@ def find_active_students(db):
     
     return active_students
 
+@tag_queries
 def get_course_with_instructor(db, course_id="course001"):
     """
     Retrieves detailed course information including instructor details using aggregation.
@@ -535,6 +650,7 @@ def get_course_with_instructor(db, course_id="course001"):
     
     return course_with_instructor[0] if course_with_instructor else None
 
+@tag_queries
 def get_courses_by_category(db, category="Data Science"):
     """
     Finds all courses in a specified category.
@@ -558,6 +674,7 @@ def get_courses_by_category(db, category="Data Science"):
     
     return courses
 
+@tag_queries
 def get_students_in_course(db, course_id="course001"):
     """
     Retrieves all students enrolled in a specific course with their progress.
@@ -600,6 +717,7 @@ def get_students_in_course(db, course_id="course001"):
     
     return students
 
+@tag_queries
 def search_courses_by_title(db, search_term="data"):
     """
     Performs a case-insensitive partial match search on course titles.
@@ -622,20 +740,28 @@ def search_courses_by_title(db, search_term="data"):
     
     return matched_courses
 
+@tag_queries
 def print_verification_counts(db):
     """
-    Prints verification counts for important collections and queries.
+    Prints verification counts for important collections and queries,
+    one count per collection.
     
     Args:
         db: MongoDB database connection object
         
     Returns:
-        None
+        dict: active_students, data_science_courses and python_enrollments
     """
+    counts = {
+        "active_students": count_active_students(db),
+        **collection_counts(db.courses, {"data_science_courses": {"category": "Data Science"}}),
+        **collection_counts(db.enrollments, {"python_enrollments": {"courseId": "course001"}}),
+    }
     print("\n=== Verification Counts ===")
-    print("Total active students:", db.users.count_documents({"role": "student", "isActive": True}))
-    print("Total Data Science courses:", db.courses.count_documents({"category": "Data Science"}))
-    print("Total enrollments in Python course:", db.enrollments.count_documents({"courseId": "course001"}))
+    print("Total active students:", counts["active_students"])
+    print("Total Data Science courses:", counts["data_science_courses"])
+    print("Total enrollments in Python course:", counts["python_enrollments"])
+    return counts
 
 # Example usage:
 # find_active_students(db)
@@ -647,17 +773,61 @@ def print_verification_counts(db):
 
 
 
-def update_user_profile(db, user_id="user001", updates=None):
+@contextlib.contextmanager
+def causal_session(db):
+    """
+    Opens a causally consistent session. Reads passed the session see the
+    session's earlier writes, also when they are served by a secondary.
+    
+    Args:
+        db: MongoDB database connection object
+        
+    Yields:
+        ClientSession: Pass it as session= to the update, delete and verification functions
+    """
+    with db.client.start_session(causal_consistency=True) as session:
+        yield session
+
+
+def _update_result(matched, modified):
+    """UpdateResult for a find_one_and_update, which returns a document instead of counts."""
+    return UpdateResult({"n": int(matched), "nModified": int(modified), "updatedExisting": matched},
+                        acknowledged=True)
+
+
+def _apply_set(document, updates):
+    """Copy of a document with a $set of (dotted) fields applied, to report the new state without a re-read."""
+    document = copy.deepcopy(document)
+    for path, value in updates.items():
+        target = document
+        *parents, field = path.split(".")
+        for parent in parents:
+            target = target.setdefault(parent, {})
+        target[field] = value
+    return document
+
+
+def _without_covered_paths(paths):
+    """Dotted paths minus those inside another listed path ("profile.bio" when "profile" is there)."""
+    paths = list(dict.fromkeys(paths))
+    return [path for path in paths if not any(path.startswith(other + ".") for other in paths)]
+
+
+@tag_queries
+def update_user_profile(db, user_id="user001", updates=None, session=None):
     """
     Updates a user's profile information with the specified changes.
+    The previous values come back from the update itself, so no re-read is needed.
     
     Args:
         db: MongoDB database connection object
         user_id: ID of the user to update (default: "user001")
         updates: Dictionary of fields to update (will be merged with default updates)
+        session: ClientSession, e.g. from causal_session() (optional)
         
     Returns:
-        tuple: (update_result, updated_user_document)
+        tuple: (update_result, updated_user_document) - the document holds the
+        name, role, bio, skills and updated fields only
     """
     # Default updates (can be overridden or extended by passing updates parameter)
     default_updates = {
@@ -666,48 +836,76 @@ def update_user_profile(db, user_id="user001", updates=None):
         "lastName": "Adesanya-Jones"  # Married name change
     }
     
-    # Merge with any provided updates
-    final_updates = {**default_updates, **(updates or {})}
+    # Merge with any provided updates; a default inside a field the caller replaces
+    # (e.g. "profile.bio" under "profile") would conflict with it in the $set
+    updates = updates or {}
+    final_updates = {**{path: value for path, value in default_updates.items()
+                        if path in _without_covered_paths([path, *updates])}, **updates}
     
-    # Perform the update
-    update_result = db.users.update_one(
+    # Perform the update, reading the previous values in the same round trip
+    projection = dict.fromkeys(_without_covered_paths(
+        ["firstName", "lastName", "role", "profile.bio", "profile.skills", *final_updates]), 1)
+    previous_user = db.users.find_one_and_update(
         {"userId": user_id},
-        {"$set": final_updates}
+        {"$set": final_updates},
+        projection={"_id": 0, **projection},
+        return_document=ReturnDocument.BEFORE,
+        session=session
     )
+    if previous_user is None:
+        print(f"1. User {user_id} not found\n")
+        return _update_result(False, False), None
+    updated_user = _apply_set(previous_user, final_updates)
+    update_result = _update_result(True, updated_user != previous_user)
+
+    # Instructors' names and bios are copied into their course outlines; students have none
+    is_instructor = "instructor" in (previous_user.get("role"), updated_user.get("role"))
+    if is_instructor and any(field in ("firstName", "lastName", "profile", "profile.bio") for field in final_updates):
+        update_outline_instructor(db, user_id, updated_user, session=session)
 
     # Verification
-    updated_user = db.users.find_one({"userId": user_id})
+    profile = updated_user.get("profile") or {}
     print("1. Updated User Profile:")
-    print(f"   - Name: {updated_user['firstName']} {updated_user['lastName']}")
-    print(f"   - New Bio: {updated_user['profile']['bio']}")
-    print(f"   - Skills: {', '.join(updated_user['profile']['skills'])}")
+    print(f"   - Name: {updated_user.get('firstName')} {updated_user.get('lastName')}")
+    print(f"   - New Bio: {profile.get('bio')}")
+    print(f"   - Skills: {', '.join(profile.get('skills') or [])}")
     print(f"   - Documents modified: {update_result.modified_count}\n")
     
     return update_result, updated_user
 
-def publish_course(db, course_id="course008"):
+@tag_queries
+def publish_course(db, course_id="course008", session=None):
     """
     Marks a course as published and updates the timestamp.
     
     Args:
         db: MongoDB database connection object
         course_id: ID of the course to publish (default: "course008")
+        session: ClientSession, e.g. from causal_session() (optional)
         
     Returns:
-        tuple: (update_result, updated_course_document)
+        tuple: (update_result, updated_course_document) - title, isPublished and updatedAt
     """
-    update_result = db.courses.update_one(
+    updated_course = db.courses.find_one_and_update(
         {"courseId": course_id},
         {
             "$set": {
                 "isPublished": True,
                 "updatedAt": datetime.utcnow()
             }
-        }
+        },
+        projection={"_id": 0, "title": 1, "isPublished": 1, "updatedAt": 1},
+        return_document=ReturnDocument.AFTER,
+        session=session
     )
+    if updated_course is None:
+        print(f"2. Course {course_id} not found\n")
+        return _update_result(False, False), None
+    # updatedAt changes on every call, so a matched course is always modified
+    update_result = _update_result(True, True)
+    update_outline_course_fields(db, course_id, updated_course, session=session)
 
     # Verification
-    updated_course = db.courses.find_one({"courseId": course_id})
     print("2. Course Publishing Status:")
     print(f"   - Course: {updated_course['title']}")
     print(f"   - Published: {updated_course['isPublished']}")
@@ -716,7 +914,9 @@ def publish_course(db, course_id="course008"):
     
     return update_result, updated_course
 
-def update_assignment_grade(db, submission_id="sub002", student_id="user001", grade=95, feedback=None):
+@tag_queries
+def update_assignment_grade(db, submission_id="sub002", student_id="user001", grade=95, feedback=None,
+                            session=None):
     """
     Updates an assignment submission with a new grade and feedback.
     
@@ -726,14 +926,17 @@ def update_assignment_grade(db, submission_id="sub002", student_id="user001", gr
         student_id: ID of the student (default: "user001")
         grade: New grade to assign (default: 95)
         feedback: Feedback comments (defaults to preset message)
+        session: ClientSession, e.g. from causal_session() (optional)
         
     Returns:
-        tuple: (update_result, updated_submission_document)
+        tuple: (update_result, updated_submission_document) - studentId, assignmentId,
+        grade, feedback and isGraded
     """
     if feedback is None:
         feedback = "Excellent work! Fixed all edge cases."
 
-    update_result = db.submissions.update_one(
+    # Read the previous grade in the same atomic operation so the gradebook delta is exact
+    previous_submission = db.submissions.find_one_and_update(
         {
             "submissionId": submission_id,
             "studentId": student_id
@@ -744,11 +947,31 @@ def update_assignment_grade(db, submission_id="sub002", student_id="user001", gr
                 "feedback": feedback,
                 "isGraded": True
             }
-        }
+        },
+        projection={"_id": 0, "studentId": 1, "assignmentId": 1, "grade": 1, "feedback": 1, "isGraded": 1},
+        return_document=ReturnDocument.BEFORE,
+        session=session
     )
+    if previous_submission is None:
+        print(f"3. Submission {submission_id} of {student_id} not found\n")
+        return _update_result(False, False), None
+    updated_submission = {**previous_submission, "grade": grade, "feedback": feedback, "isGraded": True}
+    modified = updated_submission != previous_submission
+    update_result = _update_result(True, modified)
+
+    # Keep the pre-aggregated gradebook and grade sketches in step with the new grade
+    if modified:
+        course_id = get_course_for_assignment(db, previous_submission["assignmentId"])
+        if course_id:
+            record_grade_change_in_gradebook(db, previous_submission, grade, course_id)
+            if previous_submission.get("isGraded") is not True:
+                # Sketches only count first-time grades
+                record_grade(db, course_id, grade, buffer=sketch_buffer(db))
+            # Buckets only hold submissions whose assignment resolves to a course
+            if bucket_settings(db):
+                update_bucketed_grade(db, submission_id, grade)
 
     # Verification
-    updated_submission = db.submissions.find_one({"submissionId": submission_id})
     print("3. Updated Assignment Grade:")
     print(f"   - Student: {updated_submission['studentId']}")
     print(f"   - New Grade: {updated_submission['grade']}/100")
@@ -757,7 +980,8 @@ def update_assignment_grade(db, submission_id="sub002", student_id="user001", gr
     
     return update_result, updated_submission
 
-def add_course_tags(db, course_id="course005", new_tags=None):
+@tag_queries
+def add_course_tags(db, course_id="course005", new_tags=None, session=None):
     """
     Adds tags to an existing course without creating duplicates.
     
@@ -765,14 +989,15 @@ def add_course_tags(db, course_id="course005", new_tags=None):
         db: MongoDB database connection object
         course_id: ID of the course to update (default: "course005")
         new_tags: List of tags to add (defaults to ["deep learning", "neural networks"])
+        session: ClientSession, e.g. from causal_session() (optional)
         
     Returns:
-        tuple: (update_result, updated_course_document)
+        tuple: (update_result, updated_course_document) - title, tags and updatedAt
     """
     if new_tags is None:
         new_tags = ["deep learning", "neural networks"]
 
-    update_result = db.courses.update_one(
+    updated_course = db.courses.find_one_and_update(
         {"courseId": course_id},
         {
             "$addToSet": {  # Prevents duplicate tags
@@ -781,11 +1006,19 @@ def add_course_tags(db, course_id="course005", new_tags=None):
             "$set": {
                 "updatedAt": datetime.utcnow()
             }
-        }
+        },
+        projection={"_id": 0, "title": 1, "tags": 1, "updatedAt": 1},
+        return_document=ReturnDocument.AFTER,
+        session=session
     )
+    if updated_course is None:
+        print(f"4. Course {course_id} not found")
+        return _update_result(False, False), None
+    # updatedAt changes on every call, so a matched course is always modified
+    update_result = _update_result(True, True)
+    update_outline_course_fields(db, course_id, updated_course, session=session)
 
     # Verification
-    updated_course = db.courses.find_one({"courseId": course_id})
     print("4. Added Course Tags:")
     print(f"   - Course: {updated_course['title']}")
     print(f"   - Updated Tags: {', '.join(updated_course['tags'])}")
@@ -794,6 +1027,7 @@ def add_course_tags(db, course_id="course005", new_tags=None):
     
     return update_result, updated_course
 
+@tag_queries
 def verify_updates(db, *update_results):
     """
     Prints verification counts for all update operations performed.
@@ -817,66 +1051,76 @@ def verify_updates(db, *update_results):
 # verify_updates(db, user_result, course_result, grade_result, tags_result)
 
 
-def soft_delete_user(db, user_id="user020"):
+@tag_queries
+def soft_delete_user(db, user_id="user020", session=None):
     """
     Performs a soft delete on a user by setting isActive to False.
     Maintains the user record while deactivating their account.
+    The active-student count is reported by verify_deletions().
     
     Args:
         db: MongoDB database connection object
         user_id: ID of the user to soft delete (default: "user020")
+        session: ClientSession, e.g. from causal_session() (optional)
         
     Returns:
-        tuple: (update_result, deleted_user_document)
+        tuple: (update_result, deleted_user_document) - name and isActive
     """
-    # Perform the soft delete update
-    update_result = db.users.update_one(
+    # Perform the soft delete update, reading the previous status in the same round trip
+    previous_user = db.users.find_one_and_update(
         {"userId": user_id},
-        {"$set": {"isActive": False}}
+        {"$set": {"isActive": False}},
+        projection={"_id": 0, "firstName": 1, "lastName": 1, "isActive": 1},
+        return_document=ReturnDocument.BEFORE,
+        session=session
     )
+    if previous_user is None:
+        print(f"1. User {user_id} not found\n")
+        return _update_result(False, False), None
+    deleted_user = {**previous_user, "isActive": False}
+    update_result = _update_result(True, previous_user.get("isActive") is not False)
 
     # Verification
-    deleted_user = db.users.find_one({"userId": user_id})
     print("1. Soft Deleted User:")
     print(f"   - Name: {deleted_user['firstName']} {deleted_user['lastName']}")
     print(f"   - isActive Status: {deleted_user['isActive']}")
-    print(f"   - Documents modified: {update_result.modified_count}")
-    print(f"   - Active users count: {db.users.count_documents({'isActive': True, 'role': 'student'})}\n")
+    print(f"   - Documents modified: {update_result.modified_count}\n")
     
     return update_result, deleted_user
 
-def delete_enrollment(db, enrollment_id="enroll016"):
+@tag_queries
+def delete_enrollment(db, enrollment_id="enroll016", session=None):
     """
     Permanently deletes an enrollment record from the database.
     
     Args:
         db: MongoDB database connection object
         enrollment_id: ID of the enrollment to delete (default: "enroll016")
+        session: ClientSession, e.g. from causal_session() (optional)
         
     Returns:
-        tuple: (delete_result, remaining_enrollments_count)
-    """
-    # First get course ID for verification
-    enrollment = db.enrollments.find_one({"enrollmentId": enrollment_id})
-    course_id = enrollment["courseId"] if enrollment else None
-    
-    # Perform the deletion
-    delete_result = db.enrollments.delete_one(
-        {"enrollmentId": enrollment_id}
+        tuple: (delete_result, remaining_enrollments_count) - the count is the
+        collection's metadata estimate
+    """
+    # Delete and read the course ID in one round trip
+    enrollment = db.enrollments.find_one_and_delete(
+        {"enrollmentId": enrollment_id},
+        projection={"_id": 0, "courseId": 1},
+        session=session
     )
+    delete_result = DeleteResult({"n": int(enrollment is not None)}, acknowledged=True)
+    remaining = db.enrollments.estimated_document_count()
 
     # Verification
     print("2. Deleted Enrollment:")
     print(f"   - Enrollment ID: {enrollment_id}")
+    print(f"   - Course: {enrollment['courseId'] if enrollment else 'N/A'}")
     print(f"   - Documents deleted: {delete_result.deleted_count}")
-    print(f"   - Remaining enrollments: {db.enrollments.count_documents({})}")
-    
-    if course_id:
-        print(f"   - Course {course_id} enrollments: {db.enrollments.count_documents({'courseId': course_id})}")
-    print()
+    print(f"   - Remaining enrollments (estimated): {remaining}\n")
     
-    return delete_result, db.enrollments.count_documents({})
+    return delete_result, remaining
 
+@tag_queries
 def remove_lesson(db, lesson_id="lesson025", course_id="course001"):
     """
     Removes a lesson from a course in the database.
@@ -896,6 +1140,8 @@ def remove_lesson(db, lesson_id="lesson025", course_id="course001"):
             "courseId": course_id
         }
     )
+    if delete_result.deleted_count:
+        remove_lesson_from_outline(db, lesson_id, course_id)
 
     # Verification
     print("3. Removed Lesson:")
@@ -906,26 +1152,40 @@ def remove_lesson(db, lesson_id="lesson025", course_id="course001"):
     
     return delete_result, db.lessons.count_documents({})
 
-def verify_deletions(db, user_id="user020", enrollment_id="enroll016", lesson_id="lesson025"):
+@tag_queries
+def verify_deletions(db, user_id="user020", enrollment_id="enroll016", lesson_id="lesson025",
+                     session=None, read_preference=None):
     """
-    Performs comprehensive verification of deletion operations.
+    Performs comprehensive verification of deletion operations with one round
+    trip per collection. Pass the causal_session() used for the deletions to read them back from
+    secondaries (read_preference) without missing the session's own writes.
     
     Args:
         db: MongoDB database connection object
         user_id: ID of soft-deleted user to verify
         enrollment_id: ID of deleted enrollment to verify
         lesson_id: ID of removed lesson to verify
+        session: ClientSession, e.g. from causal_session() (optional)
+        read_preference: e.g. ReadPreference.SECONDARY_PREFERRED (default: the client's)
         
     Returns:
         dict: Verification results
     """
+    if read_preference is not None:
+        db = db.with_options(read_preference=read_preference)
+    users = collection_counts(db.users, {"active_students": ACTIVE_STUDENTS_FILTER},
+                              first={"user_status": ({"userId": user_id}, {"isActive": 1})}, session=session)
+    enrollments = collection_counts(db.enrollments, first={"enrollment": ({"enrollmentId": enrollment_id}, {"_id": 1})},
+                                    total=True, session=session)
+    lessons = collection_counts(db.lessons, first={"lesson": ({"lessonId": lesson_id}, {"_id": 1})},
+                                total=True, session=session)
     verification_results = {
-        "active_students": db.users.count_documents({'role': 'student', 'isActive': True}),
-        "total_enrollments": db.enrollments.count_documents({}),
-        "total_lessons": db.lessons.count_documents({}),
-        "user_status": db.users.find_one({"userId": user_id}, {"isActive": 1}),
-        "enrollment_exists": bool(db.enrollments.find_one({"enrollmentId": enrollment_id})),
-        "lesson_exists": bool(db.lessons.find_one({"lessonId": lesson_id}))
+        "active_students": users["active_students"],
+        "total_enrollments": enrollments["total"],
+        "total_lessons": lessons["total"],
+        "user_status": users["user_status"],
+        "enrollment_exists": enrollments["enrollment"] is not None,
+        "lesson_exists": lessons["lesson"] is not None
     }
 
     print("\n=== Final Verification ===")
@@ -945,9 +1205,93 @@ def verify_deletions(db, user_id="user020", enrollment_id="enroll016", lesson_id
 # enrollment_delete_result, enrollments_count = delete_enrollment(db)
 # lesson_delete_result, lessons_count = remove_lesson(db)
 # verification = verify_deletions(db)
+#
+# with causal_session(db) as session:            # read-your-writes on secondaries
+#     soft_delete_user(db, session=session)
+#     verify_deletions(db, session=session, read_preference=ReadPreference.SECONDARY_PREFERRED)
+
+
+# Scratch collection used by benchmark_write_paths(), dropped afterwards
+WRITE_BENCHMARK_COLLECTION = "write_path_benchmark"
+
+
+@tag_queries
+def benchmark_write_paths(db, repeat=20):
+    """
+    Compares the write-then-re-read pattern the update and delete functions
+    used with single round-trip find_one_and_update / find_one_and_delete,
+    on a scratch collection: commands sent per operation (from COMMAND_TIMER)
+    and latency per operation.
+    
+    Args:
+        db: MongoDB database connection object; its client should be created with
+            event_listeners=[COMMAND_TIMER] for the command counts
+        repeat: Operations per pattern (default: 20)
+        
+    Returns:
+        list: Dictionaries with operation, pattern, commands_per_op and ms_per_op
+    """
+    scratch = db[WRITE_BENCHMARK_COLLECTION]
+    scratch.drop()
+    scratch.insert_many([{"key": i, "courseId": f"course{i % 5:03d}", "firstName": "Test", "lastName": "User",
+                          "profile": {"bio": "", "skills": []}} for i in range(2 * repeat)])
+    scratch.create_index([("key", ASCENDING)], name="key_idx")
+
+    def update_then_read(i):
+        scratch.update_one({"key": i}, {"$set": {"profile.bio": f"bio {i}"}})
+        return scratch.find_one({"key": i})
+
+    def update_returning(i):
+        return scratch.find_one_and_update({"key": i}, {"$set": {"profile.bio": f"bio {i}"}},
+                                           projection={"_id": 0, "firstName": 1, "lastName": 1, "profile.bio": 1},
+                                           return_document=ReturnDocument.AFTER)
+
+    def read_delete_count(i):
+        document = scratch.find_one({"key": i})
+        scratch.delete_one({"key": i})
+        scratch.count_documents({"courseId": document["courseId"]})
+        scratch.count_documents({})
+        return scratch.count_documents({})
+
+    def delete_returning(i):
+        scratch.find_one_and_delete({"key": i}, projection={"_id": 0, "courseId": 1})
+        return scratch.estimated_document_count()
+
+    cases = [
+        ("update", "update_one + find_one", update_then_read, range(repeat)),
+        ("update", "find_one_and_update", update_returning, range(repeat)),
+        ("delete", "find_one + delete_one + 3 counts", read_delete_count, range(repeat)),
+        ("delete", "find_one_and_delete + estimate", delete_returning, range(repeat, 2 * repeat)),
+    ]
+    results = []
+    try:
+        for operation, pattern, run, keys in cases:
+            with profile_section(f"write_path_{operation}") as report:
+                for i in keys:
+                    run(i)
+            commands = sum(report["commands"].values())
+            results.append({
+                "operation": operation,
+                "pattern": pattern,
+                "commands_per_op": commands / repeat if commands else None,
+                "ms_per_op": report["wall_ms"] / repeat,
+            })
+    finally:
+        scratch.drop()
+
+    print(f"\nWrite paths ({repeat} operations each):")
+    print(f"{'Operation':<10} {'Pattern':<34} {'Commands/op':>12} {'ms/op':>8}")
+    for row in results:
+        commands = f"{row['commands_per_op']:.1f}" if row["commands_per_op"] is not None else "n/a"
+        print(f"{row['operation']:<10} {row['pattern']:<34} {commands:>12} {row['ms_per_op']:>8.3f}")
+    return results
 
+# Example usage:
+# benchmark_write_paths(db, repeat=50)
 
 
+
+@tag_queries
 def find_courses_by_price_range(db, min_price=50, max_price=200):
     """
     Finds courses within a specified price range and sorts them by price.
@@ -982,6 +1326,7 @@ def find_courses_by_price_range(db, min_price=50, max_price=200):
     
     return courses
 
+@tag_queries
 def find_recent_students(db, months=6):
     """
     Finds students who joined within the specified number of months.
@@ -1015,6 +1360,7 @@ def find_recent_students(db, months=6):
     
     return students
 
+@tag_queries
 def find_courses_by_tags(db, tags=None):
     """
     Finds courses that have any of the specified tags.
@@ -1048,6 +1394,7 @@ def find_courses_by_tags(db, tags=None):
     
     return courses
 
+@tag_queries
 def find_upcoming_assignments(db, days=7):
     """
     Finds assignments with due dates within the specified number of days.
@@ -1091,6 +1438,7 @@ def find_upcoming_assignments(db, days=7):
     
     return assignments
 
+@tag_queries
 def verify_query_results(db, price_courses=None, recent_students=None, 
                        tagged_courses=None, upcoming_assignments=None):
     """
@@ -1141,88 +1489,28 @@ def verify_query_results(db, price_courses=None, recent_students=None,
 
 
 
-def course_enrollment_stat():
+@tag_queries
+def course_enrollment_stat(include_archived=False, db=None):
     
-    # 1. Course Enrollment Statistics Pipeline
-    enrollment_stats = db.enrollments.aggregate([
-        # Join with courses collection
-        {
-            "$lookup": {
-                "from": "courses",
-                "localField": "courseId",
-                "foreignField": "courseId",
-                "as": "course"
-            }
-        },
-        {"$unwind": "$course"},
-        
-        # Join with submissions for ratings (assuming rating is in submissions)
-        {
-            "$lookup": {
-                "from": "submissions",
-                "localField": "studentId",
-                "foreignField": "studentId",
-                "as": "submissions"
-            }
-        },
-        
-        # Group by course and calculate metrics
-        {
-            "$group": {
-                "_id": {
-                    "courseId": "$courseId",
-                    "title": "$course.title",
-                    "category": "$course.category"
-                },
-                "totalEnrollments": {"$sum": 1},
-                "averageGrade": {"$avg": "$submissions.grade"},
-                "completionRate": {"$avg": "$completionStatus"}
-            }
-        },
-        
-        # Project for cleaner output
-        {
-            "$project": {
-                "courseTitle": "$_id.title",
-                "category": "$_id.category",
-                "totalEnrollments": 1,
-                "averageGrade": {"$round": ["$averageGrade", 2]},
-                "averageCompletion": {"$round": ["$completionRate", 2]},
-                "_id": 0
-            }
-        },
-        
-        # Sort by enrollments (descending)
-        {"$sort": {"totalEnrollments": -1}}
-    ])
-
-    # Convert to list for display
-    stats_list = list(enrollment_stats)
-
-    print("1. Course Enrollment Statistics:")
-    print("=" * 50)
-    pprint(stats_list)
-
-    # Display as a table using pandas
-    print("\nFormatted Results:")
-    print("=" * 100)
-    df = pd.DataFrame(stats_list)
-    print(df.to_string(index=False))
+    # 1. Course Enrollment Statistics (computation only, see eduhub_analytics)
+    report = compute_course_enrollment_stats(db, include_archived=include_archived)
+    render_course_enrollment_stats(report)
 
     # Verification metrics
     total_courses = db.courses.count_documents({})
     print("\n=== Verification ===")
     print(f"Total courses in system: {total_courses}")
-    print(f"Courses with enrollment data: {len(stats_list)}")
+    print(f"Courses with enrollment data: {len(report.courses)}")
     print(f"Sample course stats:")
-    pprint(stats_list[0] if stats_list else "No results")
+    pprint(report.courses[0].to_dict() if report.courses else "No results")
 
     # Additional verification queries
-    most_popular = max(stats_list, key=lambda x: x['totalEnrollments']) if stats_list else None
+    # Results are already sorted by totalEnrollments, so the first row is the most popular
+    most_popular = report.most_popular
     print("\nMost Popular Course:")
-    print(f" - Title: {most_popular['courseTitle'] if most_popular else 'N/A'}")
-    print(f" - Enrollments: {most_popular['totalEnrollments'] if most_popular else 'N/A'}")
-    print(f" - Avg Grade: {most_popular['averageGrade'] if most_popular else 'N/A'}")
+    print(f" - Title: {most_popular.course_title if most_popular else 'N/A'}")
+    print(f" - Enrollments: {most_popular.total_enrollments if most_popular else 'N/A'}")
+    print(f" - Avg Grade: {most_popular.average_grade if most_popular else 'N/A'}")
 
     # Compare with raw counts
     print("\nRaw Enrollment Counts per Course:")
@@ -1233,155 +1521,19 @@ def course_enrollment_stat():
         c = db.courses.find_one({"courseId": course["_id"]}, {"title": 1})
         print(f" - {c['title'] if c else 'Unknown'}: {course['count']}")
 
-def student_performance_analysis():
+@tag_queries
+def student_performance_analysis(include_archived=False, db=None):
     
-    student_performance = db.enrollments.aggregate([
-        # Join with users collection
-        {
-            "$lookup": {
-                "from": "users",
-                "localField": "studentId",
-                "foreignField": "userId",
-                "as": "student"
-            }
-        },
-        {"$unwind": "$student"},
-        
-        # Join with submissions (preserving enrollments without submissions)
-        {
-            "$lookup": {
-                "from": "submissions",
-                "localField": "studentId",
-                "foreignField": "studentId",
-                "as": "submissions"
-            }
-        },
-        
-        # Add field to check if student has submissions
-        {
-            "$addFields": {
-                "hasSubmissions": {"$gt": [{"$size": "$submissions"}, 0]}
-            }
-        },
-        
-        # Calculate average grade per enrollment (handling empty arrays)
-        {
-            "$addFields": {
-                "enrollmentAvgGrade": {
-                    "$cond": [
-                        {"$eq": [{"$size": "$submissions"}, 0]},
-                        None,
-                        {"$avg": "$submissions.grade"}
-                    ]
-                }
-            }
-        },
-        
-        # Group by student
-        {
-            "$group": {
-                "_id": {
-                    "studentId": "$studentId",
-                    "name": {"$concat": ["$student.firstName", " ", "$student.lastName"]}
-                },
-                "coursesEnrolled": {"$sum": 1},
-                "coursesWithSubmissions": {"$sum": {"$cond": ["$hasSubmissions", 1, 0]}},
-                "averageGrade": {"$avg": "$enrollmentAvgGrade"},
-                "averageCompletion": {"$avg": "$completionStatus"},
-                "submissionCount": {"$sum": {"$size": "$submissions"}}
-            }
-        },
-        
-        # Format output
-        {
-            "$project": {
-                "studentName": "$_id.name",
-                "coursesEnrolled": 1,
-                "coursesWithSubmissions": 1,
-                "averageGrade": {
-                    "$ifNull": [
-                        {"$round": ["$averageGrade", 2]},
-                        None
-                    ]
-                },
-                "averageCompletion": {"$round": ["$averageCompletion", 2]},
-                "submissionCount": 1,
-                "_id": 0
-            }
-        },
-        
-        # Sort by average grade (descending), putting nulls last
-        {
-            "$sort": {
-                "averageGrade": -1,
-                "submissionCount": -1
-            }
-        }
-    ])
-
-    # Convert to list and display
-    performance_data = list(student_performance)
-
-    print("Student Performance Analysis:")
-    print("=" * 60)
-    pprint(performance_data)
-
-    # Display as table
-    print("\nTop Performing Students:")
-    print("=" * 120)
-    df = pd.DataFrame(performance_data)
-    print(df.to_string(index=False))
-
-    # 2. Completion Rate by Course
-    completion_by_course = db.enrollments.aggregate([
-        # Join with courses
-        {
-            "$lookup": {
-                "from": "courses",
-                "localField": "courseId",
-                "foreignField": "courseId",
-                "as": "course"
-            }
-        },
-        {"$unwind": "$course"},
-        
-        # Group by course
-        {
-            "$group": {
-                "_id": {
-                    "courseId": "$courseId",
-                    "title": "$course.title"
-                },
-                "averageCompletion": {"$avg": "$completionStatus"},
-                "totalStudents": {"$sum": 1}
-            }
-        },
-        
-        # Format output
-        {
-            "$project": {
-                "courseTitle": "$_id.title",
-                "averageCompletion": {"$round": ["$averageCompletion", 2]},
-                "totalStudents": 1,
-                "_id": 0
-            }
-        },
-        
-        # Sort by completion rate
-        {"$sort": {"averageCompletion": -1}}
-    ])
-
-    print("\nCourse Completion Rates:")
-    print("=" * 60)
-    for course in completion_by_course:
-        print(f"{course['courseTitle']}: {course['averageCompletion']}% ({course['totalStudents']} students)")
+    # Student performance and course completion (computation only, see eduhub_analytics)
+    report = compute_student_performance(db, include_archived=include_archived)
+    render_student_performance(report)
 
     # Verification
     print("\n=== Verification ===")
-    top_student = performance_data[0] if performance_data else None
-    print(f"Top student: {top_student['studentName'] if top_student else 'N/A'}")
-    print(f"Avg grade: {top_student['averageGrade'] if top_student else 'N/A'}")
-    print(f"Enrollments analyzed: {len(performance_data)}")
+    top_student = report.top_student
+    print(f"Top student: {top_student.student_name if top_student else 'N/A'}")
+    print(f"Avg grade: {top_student.average_grade if top_student else 'N/A'}")
+    print(f"Enrollments analyzed: {len(report.students)}")
 
     # Verify with raw data
     sample_student = db.users.find_one({"userId": "user001"})
@@ -1394,99 +1546,12 @@ def student_performance_analysis():
     print(f"Submissions: {len(student_grades)}")
 
 
-def instructor_analysis():
+@tag_queries
+def instructor_analysis(include_archived=False, db=None):
     
-    # Instructor Analytics Pipeline
-    instructor_analytics = db.courses.aggregate([
-        # Join with instructors
-        {
-            "$lookup": {
-                "from": "users",
-                "localField": "instructorId",
-                "foreignField": "userId",
-                "as": "instructor"
-            }
-        },
-        {"$unwind": "$instructor"},
-        
-        # Join with enrollments
-        {
-            "$lookup": {
-                "from": "enrollments",
-                "localField": "courseId",
-                "foreignField": "courseId",
-                "as": "enrollments"
-            }
-        },
-        
-        # Join with submissions for ratings
-        {
-            "$lookup": {
-                "from": "submissions",
-                "localField": "enrollments.studentId",
-                "foreignField": "studentId",
-                "as": "submissions"
-            }
-        },
-        
-        # Calculate metrics per instructor-course combination
-        {
-            "$project": {
-                "instructorId": 1,
-                "instructorName": {"$concat": ["$instructor.firstName", " ", "$instructor.lastName"]},
-                "courseTitle": "$title",
-                "studentCount": {"$size": "$enrollments"},
-                "courseRevenue": {"$multiply": ["$price", {"$size": "$enrollments"}]},
-                "avgGrade": {"$avg": "$submissions.grade"}
-            }
-        },
-        
-        # Group by instructor
-        {
-            "$group": {
-                "_id": "$instructorId",
-                "instructorName": {"$first": "$instructorName"},
-                "totalStudents": {"$sum": "$studentCount"},
-                "totalRevenue": {"$sum": "$courseRevenue"},
-                "coursesTaught": {"$sum": 1},
-                "avgCourseRating": {"$avg": "$avgGrade"}
-            }
-        },
-        
-        # Format output
-        {
-            "$project": {
-                "instructorName": 1,
-                "totalStudents": 1,
-                "totalRevenue": {"$round": ["$totalRevenue", 2]},
-                "coursesTaught": 1,
-                "avgCourseRating": {
-                    "$ifNull": [
-                        {"$round": ["$avgCourseRating", 2]},
-                        "No ratings yet"
-                    ]
-                },
-                "_id": 0
-            }
-        },
-        
-        # Sort by total students (descending)
-        {"$sort": {"totalStudents": -1}}
-    ])
-
-
-    # Convert to list and display
-    analytics_data = list(instructor_analytics)
-
-    print("Instructor Analytics:")
-    print("=" * 60)
-    pprint(analytics_data)
-
-    # Display as table
-    print("\nFormatted Results:")
-    print("=" * 60)
-    df = pd.DataFrame(analytics_data)
-    print(df.to_string(index=False))
+    # Instructor Analytics (computation only, see eduhub_analytics)
+    report = compute_instructor_analytics(db, include_archived=include_archived)
+    render_instructor_analytics(report)
 
     # Verification
     print("\n=== Verification ===")
@@ -1502,15 +1567,97 @@ def instructor_analysis():
     print(f"Calculated revenue: ${chinwe_revenue:.2f}")
 
     # Check against aggregation results
-    chinwe_agg = next((i for i in analytics_data if i["instructorName"] == "Chinwe Okonkwo"), None)
+    chinwe_agg = report.find("Chinwe Okonkwo")
     print(f"\nAggregation results:")
-    print(f"Total students: {chinwe_agg['totalStudents'] if chinwe_agg else 'N/A'}")
-    print(f"Total revenue: ${chinwe_agg['totalRevenue'] if chinwe_agg else 'N/A'}")
+    print(f"Total students: {chinwe_agg.total_students if chinwe_agg else 'N/A'}")
+    print(f"Total revenue: ${chinwe_agg.total_revenue if chinwe_agg else 'N/A'}")
+
+
+def _synthetic_reports(n, seed=42):
+    """Builds reports of n rows each with realistic values, for rendering benchmarks."""
+    rng = random.Random(seed)
+    return {
+        "course_enrollment_stat": (render_course_enrollment_stats, CourseEnrollmentReport([
+            CourseEnrollmentStat(f"course{i:06d}", f"Course {i}", rng.choice(["Data Science", "Web Development"]),
+                                 rng.randint(1, 500), round(rng.uniform(50, 100), 2), round(rng.uniform(0, 100), 2))
+            for i in range(n)
+        ])),
+        "student_performance_analysis": (render_student_performance, StudentPerformanceReport(
+            [StudentPerformance(f"user{i:06d}", f"Student {i}", rng.randint(1, 6), rng.randint(0, 6),
+                                round(rng.uniform(50, 100), 2), round(rng.uniform(0, 100), 2), rng.randint(0, 30))
+             for i in range(n)],
+            [CourseCompletion(f"course{i:06d}", f"Course {i}", round(rng.uniform(0, 100), 2), rng.randint(1, 500))
+             for i in range(n)]
+        )),
+        "instructor_analysis": (render_instructor_analytics, InstructorReport([
+            InstructorStat(f"user{i:06d}", f"Instructor {i}", rng.randint(1, 2000), round(rng.uniform(0, 1e5), 2),
+                           rng.randint(1, 10), round(rng.uniform(50, 100), 2) if i % 10 else None)
+            for i in range(n)
+        ])),
+    }
+
+
+@tag_queries
+def benchmark_presentation_overhead(sizes=(1_000, 10_000, 100_000), repeat=3, include_live=True, db=None):
+    """
+    Measures what the printing report functions cost on top of the computation API.
+
+    Live: each legacy function (render + verification queries) against its
+    compute_* counterpart on the module database. Synthetic: rendering time of
+    reports with n rows, which is the latency a data-only caller saves per call.
+
+    Args:
+        sizes: Result sizes for the synthetic rendering runs (default: 1k, 10k, 100k rows)
+        repeat: Runs per measurement; the fastest is kept (default: 3)
+        include_live: Also time the legacy and compute functions on the database (default: True)
+        db: MongoDB database connection object (default: the module database)
+
+    Returns:
+        dict: {"live": {name: {"legacy_ms", "compute_ms", "saved_ms"}},
+               "rendering": {name: {n: render_ms}}}
+    """
+    def best_ms(func, *args):
+        timings = []
+        for _ in range(repeat):
+            start_time = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                func(*args)
+            timings.append((time.perf_counter() - start_time) * 1000)
+        return min(timings)
+
+    results = {"live": {}, "rendering": {}}
+    if include_live:
+        for legacy, compute in ((course_enrollment_stat, compute_course_enrollment_stats),
+                                (student_performance_analysis, compute_student_performance),
+                                (instructor_analysis, compute_instructor_analytics)):
+            legacy_ms, compute_ms = best_ms(lambda: legacy(db=db)), best_ms(compute, db)
+            results["live"][legacy.__name__] = {
+                "legacy_ms": round(legacy_ms, 2), "compute_ms": round(compute_ms, 2),
+                "saved_ms": round(legacy_ms - compute_ms, 2)
+            }
+
+    for n in sizes:
+        for name, (render, report) in _synthetic_reports(n).items():
+            results["rendering"].setdefault(name, {})[n] = round(best_ms(render, report), 2)
+
+    print("\n=== Presentation Overhead ===")
+    for name, live in results["live"].items():
+        print(f"{name}: legacy {live['legacy_ms']} ms, compute {live['compute_ms']} ms, "
+              f"saved {live['saved_ms']} ms per call")
+    for name, by_size in results["rendering"].items():
+        print(f"{name} rendering: " + ", ".join(f"{n:,} rows {ms} ms" for n, ms in by_size.items()))
+    return results
+
+# Example usage:
+# report = compute_instructor_analytics(db)      # data only, no printing
+# render_instructor_analytics(report)            # presentation, when needed
+# benchmark_presentation_overhead()
 
 
 
 
-def analyze_learning_trends(db):
+@tag_queries
+def analyze_learning_trends(db, partitions=None, include_archived=False):
     """
     Analyzes and reports on key learning trends including:
     - Monthly enrollment patterns
@@ -1519,14 +1666,26 @@ def analyze_learning_trends(db):
     
     Args:
         db: MongoDB database connection object
+        partitions: Run the trend aggregations concurrently over this many
+            _id ranges of enrollments with scatter_gather() (default: single aggregate)
+        include_archived: Also read archived enrollments and submissions (default: False)
         
     Returns:
         dict: Dictionary containing all analytics results
     """
     results = {}
+    enrollments = source_collection(db, "enrollments", include_archived)
+    submissions = source_collection(db, "submissions", include_archived)
+
+    def aggregate(stages):
+        if include_archived:
+            stages = with_archived(stages)
+        if partitions:
+            return scatter_gather(enrollments, stages, partitions=partitions)[0]
+        return list(enrollments.aggregate(stages))
     
     # 1. Monthly Enrollment Trends
-    monthly_enrollments = list(db.enrollments.aggregate([
+    monthly_enrollments = aggregate([
         {
             "$group": {
                 "_id": {
@@ -1537,11 +1696,11 @@ def analyze_learning_trends(db):
             }
         },
         {"$sort": {"_id.year": 1, "_id.month": 1}}
-    ]))
+    ])
     results['monthly_trends'] = monthly_enrollments
     
     # 2. Most Popular Course Categories
-    popular_categories = list(db.enrollments.aggregate([
+    popular_categories = aggregate([
         {
             "$lookup": {
                 "from": "courses",
@@ -1558,13 +1717,18 @@ def analyze_learning_trends(db):
             }
         },
         {"$sort": {"enrollmentCount": -1}}
-    ]))
+    ])
     results['popular_categories'] = popular_categories
     
-    # 3. Student Engagement Metrics
-    total_enrollments = db.enrollments.count_documents({})
-    active_enrollments = db.enrollments.count_documents({"completionStatus": {"$gt": 0}})
-    submission_count = db.submissions.count_documents({})
+    # 3. Student Engagement Metrics (one round trip per collection)
+    sample_course = db.courses.find_one({"category": "Programming"}, {"title": 1, "courseId": 1})
+    enrollment_counts = {"active": {"completionStatus": {"$gt": 0}}}
+    if sample_course:
+        enrollment_counts["sample_course"] = {"courseId": sample_course["courseId"]}
+    enrollment_numbers = collection_counts(enrollments, enrollment_counts, total=True)
+    total_enrollments = enrollment_numbers["total"]
+    active_enrollments = enrollment_numbers["active"]
+    submission_count = collection_counts(submissions, total=True)["total"]
     
     engagement_metrics = {
         'total_enrollments': total_enrollments,
@@ -1576,12 +1740,9 @@ def analyze_learning_trends(db):
     results['engagement_metrics'] = engagement_metrics
     
     # Verification data
-    sample_course = db.courses.find_one({"category": "Programming"})
     verification = {
         'sample_course': sample_course['title'] if sample_course else None,
-        'sample_course_enrollments': db.enrollments.count_documents(
-            {"courseId": sample_course["courseId"]}
-        ) if sample_course else None
+        'sample_course_enrollments': enrollment_numbers["sample_course"] if sample_course else None
     }
     results['verification'] = verification
     
@@ -1626,6 +1787,155 @@ def print_learning_trends(results):
 
 
 
+# The partial and sparse indexes of the manifest: {collection: [(index name, key spec, options)]}
+PARTIAL_INDEXES = {
+    collection_name: partial for collection_name, partial in (
+        (name, [entry for entry in entries if "partialFilterExpression" in entry[2] or entry[2].get("sparse")])
+        for name, entries in INDEX_MANIFEST.items()
+    ) if partial
+}
+
+
+@tag_queries
+def create_partial_indexes(db):
+    """
+    Creates the partial (and sparse) indexes of PARTIAL_INDEXES.
+
+    Args:
+        db: MongoDB database connection object
+
+    Returns:
+        list: Names of the indexes in use
+    """
+    return [
+        create_index_safely(db[collection_name], key, name, **options)
+        for collection_name, definitions in PARTIAL_INDEXES.items()
+        for name, key, options in definitions
+    ]
+
+
+def _count_with_index(collection, query, index_name, session=None):
+    """Counts through the given index, or unhinted when it has not been created."""
+    try:
+        return collection.count_documents(query, hint=index_name, session=session)
+    except OperationFailure as e:
+        if e.code != 2:  # BadValue: hint does not correspond to an existing index
+            raise
+        return collection.count_documents(query, session=session)
+
+
+def _find_with_index(collection, query, projection, index_name):
+    """Finds through the given index, or unhinted when it has not been created."""
+    try:
+        return list(collection.find(query, projection).hint(index_name))
+    except OperationFailure as e:
+        if e.code != 2:  # BadValue: hint does not correspond to an existing index
+            raise
+        return list(collection.find(query, projection))
+
+
+@tag_queries
+def count_active_students(db, session=None):
+    """
+    Counts active students through the active-students partial index.
+
+    Args:
+        db: MongoDB database connection object
+        session: ClientSession, e.g. from causal_session() (optional)
+
+    Returns:
+        int: Number of active students
+    """
+    return _count_with_index(db.users, ACTIVE_STUDENTS_FILTER, "active_students_partial", session)
+
+
+@tag_queries
+def find_ungraded_submissions(db, assignment_id=None):
+    """
+    Finds submissions still waiting for a grade through the ungraded-submissions partial index.
+
+    Args:
+        db: MongoDB database connection object
+        assignment_id: Only submissions of this assignment (default: all assignments)
+
+    Returns:
+        list: Ungraded submission documents
+    """
+    query = dict(UNGRADED_SUBMISSIONS_FILTER)
+    if assignment_id:
+        query["assignmentId"] = assignment_id
+    return _find_with_index(db.submissions, query, None, "ungraded_submissions_partial")
+
+
+def _index_sizes(collection):
+    """Index sizes in bytes by name, or {} if the server does not report them."""
+    try:
+        return collection.database.command("collStats", collection.name).get("indexSizes", {})
+    except OperationFailure:
+        return {}
+
+
+@tag_queries
+def compare_partial_indexes(db, repeat=20):
+    """
+    Compares each partial index with a full index over the same fields:
+    index size, keys and documents examined, and query latency.
+
+    Args:
+        db: MongoDB database connection object
+        repeat: Runs per query; the fastest is kept (default: 20)
+
+    Returns:
+        list: Dictionaries with query, index, size_bytes, keys_examined, docs_examined and ms
+    """
+    create_partial_indexes(db)
+    existing = {name for collection in (db.users, db.submissions) for name in collection.index_information()}
+    cases = [
+        ("Active students", db.users, ACTIVE_STUDENTS_FILTER,
+         create_index_safely(db.users, [("role", 1), ("isActive", 1)], "active_students_optimized"),
+         "active_students_partial"),
+        ("Ungraded submissions", db.submissions, UNGRADED_SUBMISSIONS_FILTER,
+         create_index_safely(db.submissions, [("assignmentId", 1), ("isGraded", 1)], "assignment_graded_idx"),
+         "ungraded_submissions_partial"),
+    ]
+
+    results = []
+    for query_name, collection, query, full_index, partial_index in cases:
+        sizes = _index_sizes(collection)
+        for index_name in (full_index, partial_index):
+            timings = []
+            for _ in range(repeat):
+                start_time = time.perf_counter()
+                list(collection.find(query).hint(index_name))
+                timings.append(time.perf_counter() - start_time)
+            explain = collection.find(query).hint(index_name).explain()
+            stats = explain.get('executionStats', {})
+            results.append({
+                "query": query_name,
+                "index": index_name,
+                "size_bytes": sizes.get(index_name),
+                "keys_examined": stats.get('totalKeysExamined'),
+                "docs_examined": stats.get('totalDocsExamined'),
+                "ms": min(timings) * 1000,
+            })
+
+    # The full indexes are only for comparison; keep them out of the write path
+    for _, collection, _, full_index, _ in cases:
+        if full_index not in existing:
+            collection.drop_index(full_index)
+
+    print(f"\n{'Query':<22} {'Index':<30} {'Size (bytes)':>12} {'Keys':>6} {'Docs':>6} {'ms':>8}")
+    for row in results:
+        print(f"{row['query']:<22} {row['index']:<30} {str(row['size_bytes']):>12} "
+              f"{str(row['keys_examined']):>6} {str(row['docs_examined']):>6} {row['ms']:>8.3f}")
+    return results
+
+# Example usage:
+# create_partial_indexes(db)
+# compare_partial_indexes(db)
+
+
+@tag_queries
 def create_database_indexes(db):
     """
     Creates optimized indexes for the learning management system database.
@@ -1702,6 +2012,7 @@ def create_database_indexes(db):
 def verify_index(collection, index_name):
     """
     Verifies if an index exists in the specified collection.
+    Whether it is actually used is reported by eduhub_telemetry.telemetry_report().
     
     Args:
         collection: MongoDB collection object
@@ -1740,31 +2051,35 @@ def print_index_results(results):
         status = "EXISTS" if exists else "MISSING"
         print(f"{index_name}: {status}")
 
-def drop_all_indexes(db):
+@tag_queries
+def drop_all_indexes(db, include_unique=False):
     """
-    Drops all custom indexes from the database collections.
+    Drops the custom indexes of the application collections, one by one.
+    Unique indexes enforce constraints and are kept unless include_unique is set.
+    To bring indexes back in line with the manifest, use eduhub_indexes.reconcile_indexes().
     
     Args:
         db: MongoDB database connection object
+        include_unique: Also drop unique indexes (default: False)
         
     Returns:
         dict: Dictionary of dropped indexes by collection
     """
     dropped = {}
-    collections = ['users', 'courses', 'assignments', 'enrollments']
     
-    for collection_name in collections:
+    for collection_name in INDEX_MANIFEST:
         collection = db[collection_name]
         current_indexes = collection.index_information()
         
-        # Skip the default _id_ index
+        # Skip the default _id_ index and, unless asked, unique constraints
         indexes_to_drop = [
-            name for name in current_indexes.keys() 
-            if name != '_id_'
+            name for name, spec in current_indexes.items()
+            if name != '_id_' and (include_unique or not spec.get('unique'))
         ]
         
+        for name in indexes_to_drop:
+            collection.drop_index(name)
         if indexes_to_drop:
-            collection.drop_indexes()
             dropped[collection_name] = indexes_to_drop
     
     return dropped
@@ -1779,7 +2094,7 @@ def drop_all_indexes(db):
 
 
 
-def create_index_safely(collection, index_spec, index_name):
+def create_index_safely(collection, index_spec, index_name, **options):
     """
     Safely creates an index if it doesn't exist, or returns existing matching index.
     
@@ -1787,21 +2102,25 @@ def create_index_safely(collection, index_spec, index_name):
         collection: MongoDB collection object
         index_spec: List of tuples specifying index fields and directions
         index_name: Name for the new index
+        **options: Index options that must match too, e.g. partialFilterExpression, sparse, unique
         
     Returns:
         str: Name of the index being used
     """
     existing_indexes = collection.index_information()
+
+    def matches(spec):
+        return spec['key'] == index_spec and all(spec.get(k) == v for k, v in options.items())
     
     # Check if equivalent index exists
     for name, spec in existing_indexes.items():
-        if spec['key'] == index_spec:
+        if matches(spec):
             print(f"Using existing index {name} with same specification")
             return name
     
     # If not, create new index
     try:
-        collection.create_index(index_spec, name=index_name)
+        collection.create_index(index_spec, name=index_name, **options)
         print(f"Created new index: {index_name}")
         return index_name
     except OperationFailure as e:
@@ -1812,6 +2131,7 @@ def create_index_safely(collection, index_spec, index_name):
             return existing_name
         raise
 
+@tag_queries
 def test_query_performance(db):
     """
     Tests and optimizes query performance by:
@@ -1851,23 +2171,11 @@ def test_query_performance(db):
 
     # Create optimized indexes
     print("\n" + "="*20 + " CREATING INDEXES " + "="*20)
-    category_index = create_index_safely(
-        db.courses,
-        [("category", 1)],
-        "category_optimized"
-    )
-
-    student_status_index = create_index_safely(
-        db.users,
-        [("role", 1), ("isActive", 1)],
-        "active_students_optimized"
-    )
-
-    due_date_index = create_index_safely(
-        db.assignments,
-        [("dueDate", 1)],
-        "due_date_optimized"
-    )
+    # Manifest indexes, so this reuses (rather than duplicates) what create_database_indexes built
+    category_index = ensure_index(db, "courses", "category_optimized")
+    student_status_index = ensure_index(db, "users", "active_students_partial")
+    due_date_index = ensure_index(db, "assignments", "due_date_idx")
+    print(f"Using indexes: {category_index}, {student_status_index}, {due_date_index}")
 
     # Define optimized queries using hints
     def optimized_category_query():
@@ -1968,7 +2276,8 @@ def print_performance_results(results):
 
 
 
-def handle_errors():
+@tag_queries
+def handle_errors(db=None):
     print("=== ERROR HANDLING DEMONSTRATION ===")
     
     # 1. Handle duplicate key errors
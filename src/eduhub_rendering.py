@@ -0,0 +1,81 @@
+# Import Useful Libraries
+from pprint import pprint
+
+import pandas as pd
+
+
+def _rows(items, hidden=()):
+    """Converts result rows back to their pipeline-shaped dictionaries for display."""
+    return [{k: v for k, v in item.to_dict().items() if k not in hidden} for item in items]
+
+
+def render_course_enrollment_stats(report):
+    """
+    Prints a CourseEnrollmentReport as a raw listing and a table.
+
+    Args:
+        report: CourseEnrollmentReport from compute_course_enrollment_stats()
+    """
+    stats_list = _rows(report.courses, hidden=("courseId",))
+
+    print("1. Course Enrollment Statistics:")
+    print("=" * 50)
+    pprint(stats_list)
+
+    # Display as a table using pandas
+    print("\nFormatted Results:")
+    print("=" * 100)
+    df = pd.DataFrame(stats_list)
+    print(df.to_string(index=False))
+
+
+def render_student_performance(report):
+    """
+    Prints a StudentPerformanceReport: students as a raw listing and a table,
+    then the course completion rates.
+
+    Args:
+        report: StudentPerformanceReport from compute_student_performance()
+    """
+    performance_data = _rows(report.students, hidden=("studentId",))
+
+    print("Student Performance Analysis:")
+    print("=" * 60)
+    pprint(performance_data)
+
+    # Display as table
+    print("\nTop Performing Students:")
+    print("=" * 120)
+    df = pd.DataFrame(performance_data)
+    print(df.to_string(index=False))
+
+    print("\nCourse Completion Rates:")
+    print("=" * 60)
+    for course in report.course_completion:
+        print(f"{course.course_title}: {course.average_completion}% ({course.total_students} students)")
+
+
+def render_instructor_analytics(report):
+    """
+    Prints an InstructorReport as a raw listing and a table.
+
+    Args:
+        report: InstructorReport from compute_instructor_analytics()
+    """
+    analytics_data = _rows(report.instructors, hidden=("instructorId",))
+    for row in analytics_data:
+        if row["avgCourseRating"] is None:
+            row["avgCourseRating"] = "No ratings yet"
+
+    print("Instructor Analytics:")
+    print("=" * 60)
+    pprint(analytics_data)
+
+    # Display as table
+    print("\nFormatted Results:")
+    print("=" * 60)
+    df = pd.DataFrame(analytics_data)
+    print(df.to_string(index=False))
+
+# Example usage:
+# render_instructor_analytics(compute_instructor_analytics(db))
@@ -0,0 +1,476 @@
+# Import Useful Libraries
+import bisect
+from collections import Counter
+
+# Query shapes the eduhub_queries functions issue against the collections that will
+# outgrow a single node. `equality` lists the fields each call pins to a single value;
+# an empty tuple means the call reads the whole collection. `weight` is the relative
+# call frequency we expect in production. To check it against what the code really
+# sends, run the workload through RoutedDatabase and compare observed_query_shapes().
+QUERY_SHAPES = {
+    "enrollments": [
+        {"function": "get_students_in_course", "equality": ("courseId",), "weight": 20},
+        {"function": "print_verification_counts", "equality": ("courseId",), "weight": 2},
+        {"function": "instructor_analysis", "equality": ("courseId",), "weight": 2},
+        {"function": "enroll_student_in_course", "equality": ("studentId", "courseId"), "weight": 10},
+        {"function": "EnrollmentProgressBuffer.flush", "equality": ("enrollmentId",), "weight": 10},
+        {"function": "delete_enrollment", "equality": ("enrollmentId",), "weight": 2},
+        {"function": "verify_deletions", "equality": ("enrollmentId",), "weight": 1},
+        {"function": "student_performance_analysis", "equality": (), "weight": 1},
+        {"function": "course_enrollment_stat", "equality": (), "weight": 1},
+        {"function": "analyze_learning_trends", "equality": (), "weight": 1},
+    ],
+    "submissions": [
+        {"function": "update_assignment_grade", "equality": ("submissionId", "studentId"), "weight": 20},
+        {"function": "submit_assignment", "equality": ("studentId", "assignmentId"), "weight": 5},
+        {"function": "rebuild_gradebook_entry", "equality": ("studentId",), "weight": 1},
+        {"function": "student_performance_analysis ($lookup)", "equality": ("studentId",), "weight": 5},
+        {"function": "course_enrollment_stat ($lookup)", "equality": ("studentId",), "weight": 2},
+        {"function": "instructor_analysis ($lookup)", "equality": ("studentId",), "weight": 2},
+        {"function": "analyze_learning_trends", "equality": (), "weight": 1},
+    ],
+}
+
+# Candidate shard keys evaluated for each collection
+CANDIDATE_SHARD_KEYS = {
+    "enrollments": [("courseId",), ("studentId",), ("courseId", "studentId"),
+                    ("studentId", "courseId"), ("enrollmentId",)],
+    "submissions": [("studentId",), ("assignmentId",), ("studentId", "assignmentId"),
+                    ("submissionId",)],
+}
+
+
+def classify_filter(shard_key, query_filter):
+    """
+    Decides whether a filter can be routed to a subset of shards.
+    With range sharding, an equality match on the leading shard key field is enough
+    to target the chunks owning that value; an $in on it targets the chunks owning
+    any of the listed values (a multi-shard targeted query, not a broadcast).
+
+    Args:
+        shard_key: Tuple of shard key field names
+        query_filter: MongoDB filter document
+
+    Returns:
+        str: "targeted" or "scatter-gather"
+    """
+    return "targeted" if _equality_values(query_filter or {}, shard_key[0]) else "scatter-gather"
+
+
+def _equality_values(query_filter, field):
+    """Returns the list of values a filter pins `field` to ($eq or $in), or None when it does not."""
+    value = query_filter.get(field)
+    if isinstance(value, dict):
+        if isinstance(value.get("$in"), list):
+            return [v for v in value["$in"] if v is not None] or None
+        value = value.get("$eq")
+    if value is not None:
+        return [value]
+    for clause in query_filter.get("$and", []):
+        values = _equality_values(clause, field)
+        if values:
+            return values
+    return None
+
+
+def _equality_fields(query_filter):
+    """Fields a filter pins to one or a few values ($eq or $in), in filter order."""
+    fields = []
+    for field, value in (query_filter or {}).items():
+        if field == "$and":
+            fields += [f for clause in value for f in _equality_fields(clause) if f not in fields]
+        elif not field.startswith("$") and _equality_values({field: value}, field):
+            fields.append(field)
+    return tuple(dict.fromkeys(fields))
+
+
+def _request_filter(request):
+    """Filter of a bulk_write request (UpdateOne, DeleteMany, ReplaceOne, ...); None for InsertOne."""
+    return getattr(request, "_filter", None)
+
+
+def _pipeline_filter(pipeline):
+    """Returns the filter of a pipeline's leading $match stage, if any."""
+    if pipeline and "$match" in pipeline[0]:
+        return pipeline[0]["$match"]
+    return {}
+
+
+def analyze_shard_key(db, collection_name, shard_key, query_shapes=None):
+    """
+    Evaluates one candidate shard key against the data and the module's query shapes.
+
+    Args:
+        db: MongoDB database connection object
+        collection_name: Name of the collection to analyze
+        shard_key: Tuple of shard key field names
+        query_shapes: List of query shapes (default: QUERY_SHAPES[collection_name])
+
+    Returns:
+        dict: Cardinality, frequency and targeted vs broadcast ratio for the key
+    """
+    if query_shapes is None:
+        query_shapes = QUERY_SHAPES[collection_name]
+
+    key_counts = list(db[collection_name].aggregate([
+        {"$group": {"_id": {field: f"${field}" for field in shard_key}, "count": {"$sum": 1}}},
+        {"$sort": {"count": -1}}
+    ]))
+    total_docs = sum(k["count"] for k in key_counts)
+    cardinality = len(key_counts)
+    top_count = key_counts[0]["count"] if key_counts else 0
+
+    total_weight = sum(shape["weight"] for shape in query_shapes)
+    targeted = [shape["function"] for shape in query_shapes
+                if classify_filter(shard_key, {f: True for f in shape["equality"]}) == "targeted"]
+    targeted_weight = sum(shape["weight"] for shape in query_shapes if shape["function"] in targeted)
+
+    return {
+        "collection": collection_name,
+        "shard_key": shard_key,
+        "cardinality": cardinality,
+        "documents": total_docs,
+        "max_frequency": round(top_count / total_docs, 4) if total_docs else 0,
+        "avg_docs_per_value": round(total_docs / cardinality, 2) if cardinality else 0,
+        "targeted_ratio": round(targeted_weight / total_weight, 4) if total_weight else 0,
+        "broadcast_ratio": round(1 - targeted_weight / total_weight, 4) if total_weight else 0,
+        "targeted_functions": targeted,
+        "broadcast_functions": [shape["function"] for shape in query_shapes if shape["function"] not in targeted],
+    }
+
+
+def analyze_shard_key_candidates(db, collections=None):
+    """
+    Evaluates every candidate shard key for the given collections.
+    Candidates are ranked by targeted ratio, then by lowest hot-spot frequency.
+
+    Args:
+        db: MongoDB database connection object
+        collections: Collection names to analyze (default: all in CANDIDATE_SHARD_KEYS)
+
+    Returns:
+        dict: Collection name -> ranked list of analyze_shard_key() results
+    """
+    results = {}
+    for collection_name in collections or CANDIDATE_SHARD_KEYS:
+        analyses = [analyze_shard_key(db, collection_name, key) for key in CANDIDATE_SHARD_KEYS[collection_name]]
+        results[collection_name] = sorted(
+            analyses, key=lambda a: (-a["targeted_ratio"], a["max_frequency"], -a["cardinality"])
+        )
+    return results
+
+
+def print_shard_key_report(results):
+    """
+    Prints the shard key analysis in a formatted way.
+
+    Args:
+        results: Dictionary returned from analyze_shard_key_candidates()
+    """
+    for collection_name, analyses in results.items():
+        print(f"\n=== Shard Key Candidates: {collection_name} ===")
+        for analysis in analyses:
+            print(f" - {{{', '.join(f'{f}: 1' for f in analysis['shard_key'])}}}: "
+                  f"cardinality {analysis['cardinality']}, "
+                  f"max frequency {analysis['max_frequency'] * 100:.1f}%, "
+                  f"targeted {analysis['targeted_ratio'] * 100:.1f}% / "
+                  f"broadcast {analysis['broadcast_ratio'] * 100:.1f}%")
+            print(f"   Broadcast: {', '.join(analysis['broadcast_functions']) or 'none'}")
+
+# Example usage:
+# shard_results = analyze_shard_key_candidates(db)
+# print_shard_key_report(shard_results)
+
+
+class RoutedCollection:
+    """
+    Wraps a collection and tags every call as targeted or scatter-gather for a shard key.
+
+    Args:
+        collection: PyMongo collection (or LocalShardedCluster collection) to delegate to
+        shard_key: Tuple of shard key field names
+    """
+
+    def __init__(self, collection, shard_key):
+        self.collection = collection
+        self.shard_key = tuple(shard_key)
+        self.routing_stats = Counter()
+        self.observed_shapes = Counter()
+        self.last_routing = None
+
+    def _tag(self, operation, query_filter):
+        routing = classify_filter(self.shard_key, query_filter)
+        self.routing_stats[(operation, routing)] += 1
+        self.observed_shapes[(operation, _equality_fields(query_filter))] += 1
+        self.last_routing = routing
+        return routing
+
+    def _tag_insert(self, operation, count=1):
+        # Inserts always carry the full shard key and go to exactly one shard each
+        self.routing_stats[(operation, "targeted")] += count
+        self.observed_shapes[(operation, self.shard_key)] += count
+        self.last_routing = "targeted"
+
+    def find(self, filter=None, *args, **kwargs):
+        self._tag("find", filter)
+        return self.collection.find(filter, *args, **kwargs)
+
+    def find_one(self, filter=None, *args, **kwargs):
+        self._tag("find_one", filter)
+        return self.collection.find_one(filter, *args, **kwargs)
+
+    def count_documents(self, filter, **kwargs):
+        self._tag("count_documents", filter)
+        return self.collection.count_documents(filter, **kwargs)
+
+    def aggregate(self, pipeline, **kwargs):
+        self._tag("aggregate", _pipeline_filter(pipeline))
+        return self.collection.aggregate(pipeline, **kwargs)
+
+    def update_one(self, filter, update, **kwargs):
+        self._tag("update_one", filter)
+        return self.collection.update_one(filter, update, **kwargs)
+
+    def update_many(self, filter, update, **kwargs):
+        self._tag("update_many", filter)
+        return self.collection.update_many(filter, update, **kwargs)
+
+    def replace_one(self, filter, replacement, **kwargs):
+        self._tag("replace_one", filter)
+        return self.collection.replace_one(filter, replacement, **kwargs)
+
+    def delete_one(self, filter, **kwargs):
+        self._tag("delete_one", filter)
+        return self.collection.delete_one(filter, **kwargs)
+
+    def delete_many(self, filter, **kwargs):
+        self._tag("delete_many", filter)
+        return self.collection.delete_many(filter, **kwargs)
+
+    def find_one_and_update(self, filter, update, *args, **kwargs):
+        self._tag("find_one_and_update", filter)
+        return self.collection.find_one_and_update(filter, update, *args, **kwargs)
+
+    def find_one_and_replace(self, filter, replacement, *args, **kwargs):
+        self._tag("find_one_and_replace", filter)
+        return self.collection.find_one_and_replace(filter, replacement, *args, **kwargs)
+
+    def find_one_and_delete(self, filter, *args, **kwargs):
+        self._tag("find_one_and_delete", filter)
+        return self.collection.find_one_and_delete(filter, *args, **kwargs)
+
+    def insert_one(self, document, **kwargs):
+        self._tag_insert("insert_one")
+        return self.collection.insert_one(document, **kwargs)
+
+    def insert_many(self, documents, *args, **kwargs):
+        documents = list(documents)
+        self._tag_insert("insert_many", len(documents))
+        return self.collection.insert_many(documents, *args, **kwargs)
+
+    def bulk_write(self, requests, *args, **kwargs):
+        # Each request is routed on its own filter; mongos splits the batch per shard
+        requests = list(requests)
+        for request in requests:
+            request_filter = _request_filter(request)
+            if request_filter is None:
+                self._tag_insert("bulk_write")
+            else:
+                self._tag("bulk_write", request_filter)
+        return self.collection.bulk_write(requests, *args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+    def observed_query_shapes(self):
+        """
+        The shapes of the calls seen so far, in the QUERY_SHAPES format, so a
+        recorded workload can be passed to analyze_shard_key(query_shapes=...).
+
+        Returns:
+            list: {"function": operation, "equality": fields, "weight": calls} per shape
+        """
+        return [{"function": operation, "equality": fields, "weight": count}
+                for (operation, fields), count in sorted(self.observed_shapes.items())]
+
+    def routing_summary(self):
+        """
+        Summarizes how many calls were targeted vs scatter-gather.
+
+        Returns:
+            dict: Totals plus per-operation counts
+        """
+        targeted = sum(n for (op, routing), n in self.routing_stats.items() if routing == "targeted")
+        total = sum(self.routing_stats.values())
+        return {
+            "total": total,
+            "targeted": targeted,
+            "scatter_gather": total - targeted,
+            "targeted_ratio": round(targeted / total, 4) if total else 0,
+            "by_operation": {f"{op} ({routing})": n for (op, routing), n in sorted(self.routing_stats.items())},
+        }
+
+
+class RoutedDatabase:
+    """
+    Database proxy whose sharded collections are RoutedCollection wrappers.
+    Pass it anywhere the eduhub_queries functions expect `db`.
+
+    Args:
+        db: MongoDB database connection object
+        shard_keys: Collection name -> shard key tuple (default: best key per collection)
+    """
+
+    def __init__(self, db, shard_keys=None):
+        self.db = db
+        self.shard_keys = shard_keys or {"enrollments": ("courseId", "studentId"),
+                                         "submissions": ("studentId", "assignmentId")}
+        self.routed = {name: RoutedCollection(db[name], key) for name, key in self.shard_keys.items()}
+
+    def __getitem__(self, name):
+        return self.routed.get(name) or self.db[name]
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def routing_summary(self):
+        """
+        Returns the routing summary of every sharded collection.
+
+        Returns:
+            dict: Collection name -> RoutedCollection.routing_summary()
+        """
+        return {name: routed.routing_summary() for name, routed in self.routed.items()}
+
+    def observed_query_shapes(self):
+        """
+        Returns the observed query shapes of every sharded collection.
+
+        Returns:
+            dict: Collection name -> RoutedCollection.observed_query_shapes()
+        """
+        return {name: routed.observed_query_shapes() for name, routed in self.routed.items()}
+
+# Example usage:
+# routed_db = RoutedDatabase(db)
+# get_students_in_course(routed_db)    # enrollments find by courseId -> targeted
+# pprint(routed_db.routing_summary())
+# analyze_shard_key(db, "enrollments", ("courseId",), routed_db.observed_query_shapes()["enrollments"])
+
+
+class LocalShardedCluster:
+    """
+    In-process stand-in for a range-sharded collection, for tests and experiments.
+    Documents are split into `num_shards` contiguous chunks of the shard key, each
+    stored in its own mongomock collection, and every query reports how many shards
+    it had to contact. Requires the optional `mongomock` package.
+
+    Args:
+        documents: Documents of the collection to shard
+        shard_key: Tuple of shard key field names
+        num_shards: Number of shards to split the data across (default: 4)
+    """
+
+    def __init__(self, documents, shard_key, num_shards=4):
+        try:
+            import mongomock
+        except ImportError:
+            raise ImportError("LocalShardedCluster requires mongomock: pip install mongomock")
+
+        self.shard_key = tuple(shard_key)
+        client = mongomock.MongoClient()
+        self.shards = [client[f"shard{i}"]["data"] for i in range(num_shards)]
+
+        # Chunk boundaries on the leading shard key field, like balanced range chunks
+        values = sorted({str(doc.get(self.shard_key[0])) for doc in documents})
+        step = max(1, len(values) // num_shards)
+        self.split_points = values[step::step][:num_shards - 1]
+        self.shards_contacted = []
+
+        for doc in documents:
+            self.shards[self._shard_for(doc.get(self.shard_key[0]))].insert_one(dict(doc))
+
+    def _shard_for(self, value):
+        return bisect.bisect_right(self.split_points, str(value))
+
+    def _route(self, query_filter):
+        values = _equality_values(query_filter or {}, self.shard_key[0])
+        shards = sorted({self._shard_for(value) for value in values}) if values else list(range(len(self.shards)))
+        self.shards_contacted.append(len(shards))
+        return [self.shards[i] for i in shards]
+
+    def find(self, filter=None, projection=None):
+        return [doc for shard in self._route(filter) for doc in shard.find(filter or {}, projection)]
+
+    def find_one(self, filter=None, projection=None):
+        for shard in self._route(filter):
+            doc = shard.find_one(filter or {}, projection)
+            if doc is not None:
+                return doc
+        return None
+
+    def count_documents(self, filter):
+        return sum(shard.count_documents(filter) for shard in self._route(filter))
+
+    def aggregate(self, pipeline):
+        # Each shard runs the pipeline on its chunk; only the per-shard stages are
+        # merge-safe, which is all the routing experiments need
+        return [doc for shard in self._route(_pipeline_filter(pipeline)) for doc in shard.aggregate(pipeline)]
+
+    def update_one(self, filter, update):
+        for shard in self._route(filter):
+            result = shard.update_one(filter, update)
+            if result.matched_count:
+                return result
+        return result
+
+    def delete_one(self, filter):
+        for shard in self._route(filter):
+            result = shard.delete_one(filter)
+            if result.deleted_count:
+                return result
+        return result
+
+    def update_many(self, filter, update):
+        results = [shard.update_many(filter, update) for shard in self._route(filter)]
+        return sum(result.modified_count for result in results)
+
+    def delete_many(self, filter):
+        return sum(shard.delete_many(filter).deleted_count for shard in self._route(filter))
+
+    def find_one_and_update(self, filter, update, **kwargs):
+        for shard in self._route(filter):
+            doc = shard.find_one_and_update(filter, update, **kwargs)
+            if doc is not None:
+                return doc
+        return None
+
+    def find_one_and_delete(self, filter, **kwargs):
+        for shard in self._route(filter):
+            doc = shard.find_one_and_delete(filter, **kwargs)
+            if doc is not None:
+                return doc
+        return None
+
+    def insert_one(self, document):
+        self.shards_contacted.append(1)
+        return self.shards[self._shard_for(document.get(self.shard_key[0]))].insert_one(document)
+
+    def shard_distribution(self):
+        """
+        Returns the number of documents stored on each shard.
+
+        Returns:
+            list: Document count per shard
+        """
+        return [shard.count_documents({}) for shard in self.shards]
+
+# Example usage:
+# cluster = LocalShardedCluster(list(db.enrollments.find({}, {"_id": 0})), ("courseId", "studentId"))
+# routed = RoutedCollection(cluster, cluster.shard_key)
+# routed.find({"courseId": "course001"})   # contacts 1 shard
+# routed.find({"courseId": {"$in": ["course001", "course004"]}})   # contacts only the shards owning them
+# routed.aggregate([{"$group": {"_id": "$studentId"}}])   # contacts every shard
+# print(cluster.shard_distribution(), cluster.shards_contacted, routed.routing_summary())
@@ -0,0 +1,879 @@
+# Import Useful Libraries
+import hashlib
+import math
+import atexit
+import random
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from eduhub_indexes import ensure_index
+
+from eduhub_archive import archive_name
+from eduhub_progress import MAX_WRITE_CONCERN_ERRORS, RETRYABLE_WRITE_ERROR_CODES
+from eduhub_watchdog import untagged
+
+# Engagement sketches are stored one document per (metric, day bucket, scope), where
+# scope is a courseId or "all". Every sketch type is mergeable, so a range of days or
+# courses is answered by merging the stored buckets.
+#
+# Error bounds (defaults below):
+#   HyperLogLog, p=12 (4096 registers)  distinct counts within ~1.6% (1.04/sqrt(4096)) std. error
+#   KLL, k=200                          quantile ranks within ~1.65% with 99% confidence
+#   Count-min, 4 x 2048                 overestimates by at most 0.13% (e/2048) of all events
+#                                       with 98% probability (1 - e^-4); never underestimates
+SKETCH_COLLECTION = "engagement_sketches"
+
+HLL_PRECISION = 12
+KLL_K = 200
+CMS_DEPTH = 4
+CMS_WIDTH = 2048
+
+
+def _hash64(value, salt=b""):
+    """Stable 64-bit hash (Python's hash() is randomized per process)."""
+    return int.from_bytes(hashlib.blake2b(str(value).encode(), digest_size=8, salt=salt).digest(), "big")
+
+
+class HyperLogLog:
+    """
+    HyperLogLog distinct counter with sparse register storage.
+
+    Args:
+        p: Precision; the sketch uses 2**p registers (default: HLL_PRECISION)
+        registers: Existing {register index: rank} mapping to start from
+    """
+
+    def __init__(self, p=HLL_PRECISION, registers=None):
+        self.p = p
+        self.m = 1 << p
+        self.registers = {int(i): r for i, r in (registers or {}).items()}
+
+    @staticmethod
+    def register_for(value, p=HLL_PRECISION):
+        """
+        Returns the (register index, rank) a value sets, so callers can apply it with $max.
+
+        Args:
+            value: Item to count
+            p: Precision of the target sketch
+
+        Returns:
+            tuple: (index, rank)
+        """
+        h = _hash64(value)
+        index = h >> (64 - p)
+        remainder = h & ((1 << (64 - p)) - 1)
+        return index, (64 - p) - remainder.bit_length() + 1
+
+    def add(self, value):
+        index, rank = self.register_for(value, self.p)
+        if rank > self.registers.get(index, 0):
+            self.registers[index] = rank
+
+    def merge(self, other):
+        for index, rank in other.registers.items():
+            if rank > self.registers.get(index, 0):
+                self.registers[index] = rank
+        return self
+
+    def estimate(self):
+        """
+        Returns the estimated number of distinct items added.
+
+        Returns:
+            int: Estimated distinct count
+        """
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        zeros = self.m - len(self.registers)
+        harmonic = zeros + sum(2.0 ** -r for r in self.registers.values())
+        raw = alpha * self.m * self.m / harmonic
+        if raw <= 2.5 * self.m and zeros:
+            return int(round(self.m * math.log(self.m / zeros)))  # linear counting for small sets
+        return int(round(raw))
+
+    def to_document(self):
+        return {"p": self.p, "registers": {str(i): r for i, r in self.registers.items()}}
+
+    @classmethod
+    def from_document(cls, document):
+        return cls(document.get("p", HLL_PRECISION), document.get("registers"))
+
+
+class KLLSketch:
+    """
+    KLL quantile sketch (Karnin, Lang, Liberty 2016) over numeric values.
+
+    Args:
+        k: Accuracy parameter; rank error shrinks roughly as 1/k (default: KLL_K)
+        levels: Existing compactor levels to start from
+        n: Number of values the existing levels summarize
+    """
+
+    def __init__(self, k=KLL_K, levels=None, n=0):
+        self.k = k
+        self.levels = [list(level) for level in (levels or [[]])]
+        self.n = n
+        self._rng = random.Random(n)
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(2, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def _size(self):
+        return sum(len(level) for level in self.levels)
+
+    def _max_size(self):
+        return sum(self._capacity(h) for h in range(len(self.levels)))
+
+    def add(self, value):
+        self.levels[0].append(value)
+        self.n += 1
+        self.compact()
+
+    def compact(self):
+        """Compacts full levels until the sketch fits its size bound."""
+        while self._size() >= self._max_size():
+            for h, level in enumerate(self.levels):
+                if len(level) >= self._capacity(h):
+                    if h + 1 == len(self.levels):
+                        self.levels.append([])
+                    level.sort()
+                    # An odd item out stays behind so total weight is preserved
+                    keep = [level.pop()] if len(level) % 2 else []
+                    self.levels[h + 1].extend(level[self._rng.randint(0, 1)::2])
+                    self.levels[h] = keep
+                    break
+        return self
+
+    def merge(self, other):
+        while len(self.levels) < len(other.levels):
+            self.levels.append([])
+        for h, level in enumerate(other.levels):
+            self.levels[h].extend(level)
+        self.n += other.n
+        return self.compact()
+
+    def quantiles(self, fractions):
+        """
+        Returns approximate quantiles.
+
+        Args:
+            fractions: Iterable of quantile fractions between 0 and 1
+
+        Returns:
+            dict: Fraction -> estimated value (None when the sketch is empty)
+        """
+        weighted = sorted((value, 1 << h) for h, level in enumerate(self.levels) for value in level)
+        total = sum(weight for _, weight in weighted)
+        results = {}
+        for fraction in fractions:
+            if not weighted:
+                results[fraction] = None
+                continue
+            target, seen = fraction * total, 0
+            for value, weight in weighted:
+                seen += weight
+                if seen >= target:
+                    break
+            results[fraction] = value
+        return results
+
+    def to_document(self):
+        return {"k": self.k, "n": self.n, "levels": self.levels}
+
+    @classmethod
+    def from_document(cls, document):
+        levels = document.get("levels")
+        if isinstance(levels, dict):
+            # A $push upsert on "kll.levels.0" creates {"0": [...]} rather than an array
+            levels = [levels.get(str(h), []) for h in range(max(map(int, levels)) + 1)]
+        return cls(document.get("k", KLL_K), levels, document.get("n", 0))
+
+
+class CountMinSketch:
+    """
+    Count-min sketch for approximate frequencies, with sparse cell storage.
+
+    Args:
+        depth: Number of hash rows (default: CMS_DEPTH)
+        width: Number of counters per row (default: CMS_WIDTH)
+        cells: Existing {row: {column: count}} mapping to start from
+        n: Total count the existing cells hold
+    """
+
+    def __init__(self, depth=CMS_DEPTH, width=CMS_WIDTH, cells=None, n=0):
+        self.depth = depth
+        self.width = width
+        self.cells = {int(r): {int(c): v for c, v in cols.items()} for r, cols in (cells or {}).items()}
+        self.n = n
+
+    @staticmethod
+    def cells_for(item, depth=CMS_DEPTH, width=CMS_WIDTH):
+        """
+        Returns the (row, column) cells an item increments, so callers can apply them with $inc.
+
+        Args:
+            item: Item to count
+            depth: Number of rows of the target sketch
+            width: Number of columns of the target sketch
+
+        Returns:
+            list: (row, column) tuples, one per row
+        """
+        h1, h2 = _hash64(item), _hash64(item, salt=b"cms")
+        return [(row, (h1 + row * h2) % width) for row in range(depth)]
+
+    def add(self, item, count=1):
+        for row, column in self.cells_for(item, self.depth, self.width):
+            self.cells.setdefault(row, {})
+            self.cells[row][column] = self.cells[row].get(column, 0) + count
+        self.n += count
+
+    def merge(self, other):
+        for row, columns in other.cells.items():
+            target = self.cells.setdefault(row, {})
+            for column, count in columns.items():
+                target[column] = target.get(column, 0) + count
+        self.n += other.n
+        return self
+
+    def estimate(self, item):
+        return min(self.cells.get(row, {}).get(column, 0)
+                   for row, column in self.cells_for(item, self.depth, self.width))
+
+    def to_document(self):
+        return {"depth": self.depth, "width": self.width, "n": self.n,
+                "cells": {str(r): {str(c): v for c, v in cols.items()} for r, cols in self.cells.items()}}
+
+    @classmethod
+    def from_document(cls, document):
+        return cls(document.get("depth", CMS_DEPTH), document.get("width", CMS_WIDTH),
+                   document.get("cells"), document.get("n", 0))
+
+
+SKETCH_TYPES = {"hll": HyperLogLog, "kll": KLLSketch, "cms": CountMinSketch}
+
+# metric -> sketch type
+METRICS = {
+    "active_students": "hll",
+    "grades": "kll",
+    "completion": "kll",
+    "tag_popularity": "cms",
+}
+
+
+def create_sketch_indexes(db):
+    """
+    Creates the unique index sketch upserts and range reads rely on.
+
+    Args:
+        db: MongoDB database connection object
+
+    Returns:
+        str: Name of the index created
+    """
+    return ensure_index(db, SKETCH_COLLECTION, "sketch_metric_scope_bucket_idx")
+
+
+def _bucket(moment):
+    return (moment or datetime.utcnow()).strftime("%Y-%m-%d")
+
+
+def _sketch_filter(metric, bucket, scope):
+    return {"metric": metric, "bucket": bucket, "scope": scope}
+
+
+def _hll_update(metric, bucket, scope, value):
+    index, rank = HyperLogLog.register_for(value)
+    return _sketch_filter(metric, bucket, scope), {"$max": {f"hll.registers.{index}": rank}}
+
+
+def _activity_updates(bucket, course_id, student_id):
+    """HLL updates counting a student as active in a course, and overall, on one day."""
+    return [
+        _hll_update("active_students", bucket, course_id, student_id),
+        _hll_update("active_students", bucket, "all", student_id),
+    ]
+
+
+def _kll_push(value):
+    # Values land in level 0; writes compact it once it holds more than KLL_K values
+    return {"$push": {"kll.levels.0": value}, "$inc": {"kll.n": 1}}
+
+
+def _kll_update(metric, bucket, scope, value):
+    return _sketch_filter(metric, bucket, scope), _kll_push(value)
+
+
+def _cms_update(metric, bucket, scope, items):
+    increments = {"cms.n": len(items)}
+    for item in items:
+        for row, column in CountMinSketch.cells_for(item):
+            key = f"cms.cells.{row}.{column}"
+            increments[key] = increments.get(key, 0) + 1
+    return _sketch_filter(metric, bucket, scope), {"$inc": increments}
+
+
+def _merge_update(pending, sketch_filter, update):
+    """Folds one sketch update into the pending updates of its document ($max, $inc and $push merge)."""
+    ops = pending.setdefault((sketch_filter["metric"], sketch_filter["bucket"], sketch_filter["scope"]), {})
+    for field, value in update.get("$max", {}).items():
+        maxima = ops.setdefault("$max", {})
+        maxima[field] = max(maxima.get(field, value), value)
+    for field, value in update.get("$inc", {}).items():
+        increments = ops.setdefault("$inc", {})
+        increments[field] = increments.get(field, 0) + value
+    for field, value in update.get("$push", {}).items():
+        values = value["$each"] if isinstance(value, dict) else [value]
+        ops.setdefault("$push", {}).setdefault(field, {"$each": []})["$each"].extend(values)
+
+
+def _compact_sketch(collection, sketch_id, max_retries=5):
+    """Compacts one stored KLL sketch with optimistic concurrency; returns 1 if it was written."""
+    for _ in range(max_retries):
+        current = collection.find_one({"_id": sketch_id})
+        if current is None:
+            return 0
+        sketch = KLLSketch.from_document(current["kll"]).compact()
+        result = collection.update_one(
+            {"_id": sketch_id, "kll.n": current["kll"]["n"]},
+            {"$set": {"kll": sketch.to_document()}}
+        )
+        if result.matched_count:
+            return 1
+    return 0
+
+
+def _compact_full_levels(collection, sketch_filters, k=KLL_K):
+    """Compacts the KLL sketches among sketch_filters whose level 0 holds more than k values."""
+    if not sketch_filters:
+        return 0
+    full = collection.find({"$or": sketch_filters, f"kll.levels.0.{k}": {"$exists": True}}, {"_id": 1})
+    return sum(_compact_sketch(collection, doc["_id"]) for doc in full)
+
+
+def _write_updates(db, updates, buffer=None):
+    """Sends sketch updates through the buffer, or writes them now in one unordered bulk write."""
+    if buffer is not None:
+        buffer.add(updates)
+        return None
+    collection = db[SKETCH_COLLECTION]
+    result = collection.bulk_write([UpdateOne(f, u, upsert=True) for f, u in updates], ordered=False)
+    _compact_full_levels(collection, [f for f, u in updates if "$push" in u])
+    return result
+
+
+class SketchWriteBuffer:
+    """
+    Write-behind buffer for the record_* hooks. Sketch updates are merged in memory
+    (HLL registers by $max, count-min cells by $inc, KLL values appended) and
+    flushed as one unordered bulk write, so an OLTP write pays no extra round trip.
+    Course tags for tag_popularity are resolved at flush time with one query for all
+    pending courses. KLL sketches whose level 0 outgrows k are compacted after a flush.
+
+    Updates are applied at most once: a flush that fails as a whole is counted in
+    stats["errors"] and dropped, since replaying $inc/$push would double count. Writes
+    rejected individually in a BulkWriteError were not applied: those with a transient
+    error code are re-queued, up to max_retries times, the others go to `dead_letters`.
+    Write concern errors are counted and kept in `write_concern_errors`.
+
+    Args:
+        db: MongoDB database connection object
+        flush_interval: Seconds between background flushes; None disables the timer (default: 1.0)
+        max_pending: Flush early once this many events are buffered (default: 1000)
+        flush_on_exit: Register close() to run at interpreter exit (default: True)
+        max_retries: Flushes a transient write error is retried on before the update is
+            dead-lettered (default: 5)
+    """
+
+    def __init__(self, db, flush_interval=1.0, max_pending=1000, flush_on_exit=True, max_retries=5):
+        self.collection = db[SKETCH_COLLECTION]
+        self.courses = db.courses
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        self.stats = {"events": 0, "flushes": 0, "writes": 0, "compacted": 0, "errors": 0,
+                      "retried": 0, "dead_lettered": 0, "write_concern_errors": 0}
+        # Updates that failed for good: {"sketch": filter, "update", "code", "errmsg"}
+        self.dead_letters = []
+        self.write_concern_errors = deque(maxlen=MAX_WRITE_CONCERN_ERRORS)
+
+        self._pending = {}
+        self._attempts = {}
+        self._tag_events = Counter()
+        self._events = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._closed = threading.Event()
+        self._timer = None
+
+        if flush_interval:
+            self._timer = threading.Thread(target=self._flush_periodically, daemon=True)
+            self._timer.start()
+        if flush_on_exit:
+            atexit.register(self.close)
+
+    def add(self, updates, tag_events=()):
+        """
+        Buffers sketch updates.
+
+        Args:
+            updates: List of (sketch filter, update) pairs
+            tag_events: (bucket, courseId) pairs whose course tags count toward tag_popularity
+        """
+        with self._lock:
+            for sketch_filter, update in updates:
+                _merge_update(self._pending, sketch_filter, update)
+            self._tag_events.update(tag_events)
+            self._events += 1
+            self.stats["events"] += 1
+            should_flush = self._events >= self.max_pending
+
+        if should_flush:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes all buffered sketch updates as one unordered bulk write.
+
+        Returns:
+            int: Number of sketch documents updated
+        """
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                tag_events, self._tag_events = self._tag_events, Counter()
+                self._events = 0
+
+            if tag_events:
+                course_ids = sorted({course_id for _, course_id in tag_events})
+                tags = {c["courseId"]: c.get("tags", []) for c in
+                        self.courses.find({"courseId": {"$in": course_ids}}, {"courseId": 1, "tags": 1, "_id": 0})}
+                for (bucket, course_id), count in tag_events.items():
+                    if tags.get(course_id):
+                        _merge_update(pending, *_cms_update("tag_popularity", bucket, "all",
+                                                            tags[course_id] * count))
+            if not pending:
+                return 0
+
+            keys = list(pending)
+            filters = [_sketch_filter(*key) for key in keys]
+            failed = set()
+            try:
+                self.collection.bulk_write(
+                    [UpdateOne(f, pending[key], upsert=True) for f, key in zip(filters, keys)], ordered=False)
+            except BulkWriteError as e:
+                failed = self._handle_write_errors(keys, filters, pending, e.details.get("writeErrors", []))
+                write_concern_errors = e.details.get("writeConcernErrors", [])
+                if write_concern_errors:
+                    self.stats["write_concern_errors"] += len(write_concern_errors)
+                    self.write_concern_errors.extend(write_concern_errors)
+                    print(f"Sketch flush not acknowledged as requested: {write_concern_errors[0].get('errmsg')}")
+            except PyMongoError:
+                self.stats["errors"] += len(keys)
+                raise
+
+            for key in set(keys) - failed:
+                self._attempts.pop(key, None)
+            self.stats["compacted"] += _compact_full_levels(
+                self.collection, [f for f, key in zip(filters, keys) if "$push" in pending[key]])
+            self.stats["flushes"] += 1
+            self.stats["writes"] += len(keys)
+            return len(keys)
+
+    def _handle_write_errors(self, keys, filters, pending, write_errors):
+        """
+        Re-queues updates with a transient error, within max_retries; dead-letters the others.
+
+        Returns:
+            set: Keys of the sketch documents whose update failed
+        """
+        self.stats["errors"] += len(write_errors)
+        failed = set()
+        for error in write_errors:
+            key = keys[error["index"]]
+            failed.add(key)
+            attempts = self._attempts.get(key, 0) + 1
+            if error.get("code") in RETRYABLE_WRITE_ERROR_CODES and attempts <= self.max_retries:
+                self._attempts[key] = attempts
+                self.stats["retried"] += 1
+                with self._lock:
+                    _merge_update(self._pending, filters[error["index"]], pending[key])
+            else:
+                self._attempts.pop(key, None)
+                self.stats["dead_lettered"] += 1
+                self.dead_letters.append({"sketch": filters[error["index"]], "update": pending[key],
+                                          "code": error.get("code"), "errmsg": error.get("errmsg")})
+        return failed
+
+    def _flush_periodically(self):
+        """Background loop that flushes the buffer every flush_interval seconds."""
+        while not self._closed.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Sketch flush failed: {str(e)}")
+
+    def pending_count(self):
+        """
+        Returns the number of sketch documents with unflushed updates.
+
+        Returns:
+            int: Number of buffered sketch documents
+        """
+        with self._lock:
+            return len(self._pending) + len(self._tag_events)
+
+    def close(self):
+        """
+        Stops the background timer and flushes everything still buffered,
+        retrying transient write errors until they succeed or are dead-lettered.
+        Safe to call more than once.
+
+        Returns:
+            list: The dead-lettered updates (also kept in `dead_letters`)
+        """
+        if self._closed.is_set():
+            return self.dead_letters
+        self._closed.set()
+        if self._timer is not None:
+            self._timer.join()
+        self.flush()
+        while self.pending_count():
+            time.sleep(min(self.flush_interval or 0.1, 1.0))
+            self.flush()
+        if self.dead_letters:
+            print(f"Sketch buffer closed with {len(self.dead_letters)} dead-lettered updates")
+        atexit.unregister(self.close)
+        return self.dead_letters
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+# One buffer per (client, database) in this process, started by sketch_buffer()
+_SKETCH_BUFFERS = {}
+_SKETCH_BUFFERS_LOCK = threading.Lock()
+
+
+def sketch_buffer(db, **options):
+    """
+    Returns the process-wide SketchWriteBuffer of a database, creating it on first use.
+
+    Args:
+        db: MongoDB database connection object (a tagged database resolves to the one behind it)
+        **options: SketchWriteBuffer options, used when the buffer is created
+
+    Returns:
+        SketchWriteBuffer: The shared buffer
+    """
+    db = untagged(db)
+    key = (id(db.client), db.name)
+    with _SKETCH_BUFFERS_LOCK:
+        if key not in _SKETCH_BUFFERS:
+            _SKETCH_BUFFERS[key] = SketchWriteBuffer(db, **options)
+        return _SKETCH_BUFFERS[key]
+
+
+def record_enrollment_activity(db, enrollment, tags=None, buffer=None):
+    """
+    Adds an enrollment write to the day's engagement sketches: the student as active
+    (per course and overall), its completion status and its course tags.
+
+    Args:
+        db: MongoDB database connection object
+        enrollment: The enrollment document that was written
+        tags: Tags of the enrolled course (looked up when omitted)
+        buffer: SketchWriteBuffer to queue the updates in; without one they are
+            written now in one unordered bulk write
+
+    Returns:
+        BulkWriteResult: Result of the sketch updates, or None when buffered
+    """
+    bucket = _bucket(enrollment.get("lastAccessed") or enrollment.get("enrollmentDate"))
+    course_id = enrollment["courseId"]
+    updates = _activity_updates(bucket, course_id, enrollment["studentId"])
+    if enrollment.get("completionStatus") is not None:
+        updates.append(_kll_update("completion", bucket, course_id, enrollment["completionStatus"]))
+
+    if tags is None and buffer is not None:
+        # The buffer resolves the tags of every pending course in one query at flush time
+        buffer.add(updates, tag_events=[(bucket, course_id)])
+        return None
+    if tags is None:
+        course = db.courses.find_one({"courseId": course_id}, {"tags": 1, "_id": 0})
+        tags = course.get("tags", []) if course else []
+    if tags:
+        updates.append(_cms_update("tag_popularity", bucket, "all", tags))
+    return _write_updates(db, updates, buffer)
+
+
+def record_submission_activity(db, submission, course_id, buffer=None):
+    """
+    Adds a submission write to the day's engagement sketches: the student as active
+    and, for graded submissions, the grade.
+
+    Args:
+        db: MongoDB database connection object
+        submission: The submission document that was written
+        course_id: Course of the submission's assignment
+        buffer: SketchWriteBuffer to queue the updates in (default: write now)
+
+    Returns:
+        BulkWriteResult: Result of the sketch updates, or None when buffered
+    """
+    bucket = _bucket(submission.get("submittedDate"))
+    updates = _activity_updates(bucket, course_id, submission["studentId"])
+    if submission.get("isGraded") and submission.get("grade") is not None:
+        updates.append(_kll_update("grades", bucket, course_id, submission["grade"]))
+    return _write_updates(db, updates, buffer)
+
+
+def record_progress_activity(db, enrollments, buffer=None):
+    """
+    Counts students as active on the day of their progress events (lastAccessed),
+    so daily active students include students who only study. Completion values
+    are left out: a progress stream would add many values per enrollment per day.
+
+    Args:
+        db: MongoDB database connection object
+        enrollments: Documents with studentId, courseId and lastAccessed
+        buffer: SketchWriteBuffer to queue the updates in (default: write now)
+
+    Returns:
+        BulkWriteResult: Result of the sketch updates, or None when buffered or empty
+    """
+    updates = [update for enrollment in enrollments if enrollment.get("courseId") and enrollment.get("studentId")
+               for update in _activity_updates(_bucket(enrollment.get("lastAccessed")),
+                                                enrollment["courseId"], enrollment["studentId"])]
+    if not updates:
+        return None
+    return _write_updates(db, updates, buffer)
+
+
+def record_grade(db, course_id, grade, graded_at=None, buffer=None):
+    """
+    Adds a newly assigned grade to the day's grade quantile sketch.
+    Sketches cannot forget values, so only first-time grades should be recorded.
+
+    Args:
+        db: MongoDB database connection object
+        course_id: Course of the graded assignment
+        grade: The grade assigned
+        graded_at: When the grade was assigned (default: now)
+        buffer: SketchWriteBuffer to queue the update in (default: write now)
+    """
+    _write_updates(db, [_kll_update("grades", _bucket(graded_at), course_id, grade)], buffer)
+
+
+def compact_quantile_sketches(db, max_retries=5):
+    """
+    Compacts every stored KLL sketch. Writes already compact level 0 once it
+    outgrows k; this folds in whatever is left, e.g. before archiving old buckets.
+    Uses optimistic concurrency, so it is safe to run while writes continue.
+
+    Args:
+        db: MongoDB database connection object
+        max_retries: Attempts per sketch when a concurrent write wins (default: 5)
+
+    Returns:
+        int: Number of sketches compacted
+    """
+    collection = db[SKETCH_COLLECTION]
+    return sum(_compact_sketch(collection, doc["_id"], max_retries)
+               for doc in collection.find({"metric": {"$in": ["grades", "completion"]}}, {"_id": 1}))
+
+
+def build_engagement_sketches(db):
+    """
+    Rebuilds every engagement sketch from the enrollments and submissions in one pass each,
+    archived ones included: archival leaves the sketches as they are, so a rebuild must not
+    drop what they already count. Used for the initial backfill; afterwards the record_*
+    hooks keep the sketches current.
+
+    Args:
+        db: MongoDB database connection object
+
+    Returns:
+        int: Number of sketch documents written
+    """
+    create_sketch_indexes(db)
+    sketches = {}
+
+    def sketch(metric, bucket, scope):
+        key = (metric, bucket, scope)
+        if key not in sketches:
+            sketches[key] = SKETCH_TYPES[METRICS[metric]]()
+        return sketches[key]
+
+    course_tags = {c["courseId"]: c.get("tags", []) for c in db.courses.find({}, {"courseId": 1, "tags": 1})}
+    assignment_courses = {a["assignmentId"]: a["courseId"]
+                          for a in db.assignments.find({}, {"assignmentId": 1, "courseId": 1})}
+
+    enrollments = (enrollment for name in ("enrollments", archive_name("enrollments"))
+                   for enrollment in db[name].find({}, {"studentId": 1, "courseId": 1, "completionStatus": 1,
+                                                        "lastAccessed": 1, "enrollmentDate": 1}))
+    for enrollment in enrollments:
+        bucket = _bucket(enrollment.get("lastAccessed") or enrollment.get("enrollmentDate"))
+        sketch("active_students", bucket, enrollment["courseId"]).add(enrollment["studentId"])
+        sketch("active_students", bucket, "all").add(enrollment["studentId"])
+        if enrollment.get("completionStatus") is not None:
+            sketch("completion", bucket, enrollment["courseId"]).add(enrollment["completionStatus"])
+        for tag in course_tags.get(enrollment["courseId"], []):
+            sketch("tag_popularity", bucket, "all").add(tag)
+
+    submissions = (submission for name in ("submissions", archive_name("submissions"))
+                   for submission in db[name].find({}, {"studentId": 1, "assignmentId": 1, "submittedDate": 1,
+                                                        "grade": 1, "isGraded": 1}))
+    for submission in submissions:
+        course_id = assignment_courses.get(submission["assignmentId"])
+        if course_id is None:
+            continue
+        bucket = _bucket(submission.get("submittedDate"))
+        sketch("active_students", bucket, course_id).add(submission["studentId"])
+        sketch("active_students", bucket, "all").add(submission["studentId"])
+        if submission.get("isGraded") and submission.get("grade") is not None:
+            sketch("grades", bucket, course_id).add(submission["grade"])
+
+    requests = [
+        UpdateOne(_sketch_filter(metric, bucket, scope),
+                  {"$set": {METRICS[metric]: s.to_document()}}, upsert=True)
+        for (metric, bucket, scope), s in sketches.items()
+    ]
+    if requests:
+        db[SKETCH_COLLECTION].bulk_write(requests, ordered=False)
+    return len(requests)
+
+
+def merge_sketches(db, metric, start_date, end_date, scope="all"):
+    """
+    Merges the stored day buckets of one metric into a single sketch.
+
+    Args:
+        db: MongoDB database connection object
+        metric: One of METRICS
+        start_date: First day to include (datetime)
+        end_date: Last day to include (datetime)
+        scope: courseId or "all" (default: "all")
+
+    Returns:
+        HyperLogLog, KLLSketch or CountMinSketch: The merged sketch
+    """
+    sketch_type = METRICS[metric]
+    merged = SKETCH_TYPES[sketch_type]()
+    for doc in db[SKETCH_COLLECTION].find(
+        {"metric": metric, "scope": scope, "bucket": {"$gte": _bucket(start_date), "$lte": _bucket(end_date)}},
+        {sketch_type: 1}
+    ):
+        merged.merge(SKETCH_TYPES[sketch_type].from_document(doc.get(sketch_type, {})))
+    return merged
+
+
+def distinct_active_students(db, start_date, end_date=None, course_id=None):
+    """
+    Estimates how many distinct students were active over a range of days.
+
+    Args:
+        db: MongoDB database connection object
+        start_date: First day to include (datetime)
+        end_date: Last day to include (default: start_date)
+        course_id: Restrict to one course (default: all courses)
+
+    Returns:
+        int: Estimated distinct active students
+    """
+    return merge_sketches(db, "active_students", start_date, end_date or start_date,
+                          course_id or "all").estimate()
+
+
+def daily_active_students(db, start_date, end_date, course_id=None):
+    """
+    Estimates distinct active students for each day in a range.
+
+    Args:
+        db: MongoDB database connection object
+        start_date: First day (datetime)
+        end_date: Last day (datetime)
+        course_id: Restrict to one course (default: all courses)
+
+    Returns:
+        dict: Day (YYYY-MM-DD) -> estimated distinct active students
+    """
+    days = {}
+    for doc in db[SKETCH_COLLECTION].find(
+        {"metric": "active_students", "scope": course_id or "all",
+         "bucket": {"$gte": _bucket(start_date), "$lte": _bucket(end_date)}}
+    ).sort("bucket", ASCENDING):
+        days[doc["bucket"]] = HyperLogLog.from_document(doc["hll"]).estimate()
+    return days
+
+
+def grade_quantiles(db, start_date, end_date, course_id, fractions=(0.25, 0.5, 0.75, 0.9)):
+    """
+    Estimates grade quantiles of a course over a range of days.
+
+    Args:
+        db: MongoDB database connection object
+        start_date: First day to include (datetime)
+        end_date: Last day to include (datetime)
+        course_id: ID of the course
+        fractions: Quantiles to return (default: quartiles and p90)
+
+    Returns:
+        dict: Fraction -> estimated grade
+    """
+    return merge_sketches(db, "grades", start_date, end_date, course_id).quantiles(fractions)
+
+
+def completion_quantiles(db, start_date, end_date, course_id, fractions=(0.25, 0.5, 0.75, 0.9)):
+    """
+    Estimates completion-status quantiles of a course over a range of days.
+
+    Args:
+        db: MongoDB database connection object
+        start_date: First day to include (datetime)
+        end_date: Last day to include (datetime)
+        course_id: ID of the course
+        fractions: Quantiles to return (default: quartiles and p90)
+
+    Returns:
+        dict: Fraction -> estimated completion percentage
+    """
+    return merge_sketches(db, "completion", start_date, end_date, course_id).quantiles(fractions)
+
+
+def tag_popularity(db, start_date, end_date, tags=None):
+    """
+    Estimates how many enrollment events each tag received over a range of days.
+
+    Args:
+        db: MongoDB database connection object
+        start_date: First day to include (datetime)
+        end_date: Last day to include (datetime)
+        tags: Tags to estimate (default: every tag used by a course)
+
+    Returns:
+        list: (tag, estimated count) tuples, most popular first
+    """
+    if tags is None:
+        tags = db.courses.distinct("tags")
+    sketch = merge_sketches(db, "tag_popularity", start_date, end_date)
+    return sorted(((tag, sketch.estimate(tag)) for tag in tags), key=lambda t: t[1], reverse=True)
+
+# Example usage:
+# build_engagement_sketches(db)                                   # one-off backfill
+# distinct_active_students(db, datetime(2024, 6, 1), datetime(2024, 6, 30))
+# daily_active_students(db, datetime(2024, 6, 1), datetime(2024, 6, 7), course_id="course001")
+# grade_quantiles(db, datetime(2024, 1, 1), datetime(2024, 12, 31), "course001")
+# tag_popularity(db, datetime(2024, 1, 1), datetime(2024, 12, 31))[:5]
+# compact_quantile_sketches(db)                                   # optional maintenance
+# with SketchWriteBuffer(db, flush_interval=1.0) as sketches:      # or sketch_buffer(db)
+#     record_grade(db, "course001", 87, buffer=sketches)
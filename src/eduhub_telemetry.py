@@ -0,0 +1,271 @@
+# Import Useful Libraries
+import time
+from datetime import datetime, timezone
+
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+
+from eduhub_indexes import TELEMETRY_RETENTION_DAYS, ensure_index, retention_manifest
+
+# One document per snapshot:
+# {takenAt, cache: {...wiredTiger cache counters}, collections: {name: {size, storageSize, count,
+#  totalIndexSize, indexSizes, indexes: {index name: {ops, since, hosts: [{host, ops, since}]}}}}}
+# On a sharded cluster the sizes are summed over the shards and an index's ops over the
+# hosts that report it; `since` is the latest counter restart among them.
+TELEMETRY_COLLECTION = "telemetry_snapshots"
+
+# Storage statistics that add up across shards
+_SUMMED_STORAGE_STATS = ("count", "size", "storageSize", "totalIndexSize")
+
+# serverStatus wiredTiger.cache counters kept in each snapshot
+_CACHE_METRICS = {
+    "bytes currently in the cache": "bytesInCache",
+    "maximum bytes configured": "maxBytes",
+    "tracked dirty bytes in the cache": "dirtyBytes",
+    "pages requested from the cache": "pagesRequested",
+    "pages read into cache": "pagesReadIntoCache",
+    "bytes read into cache": "bytesReadIntoCache",
+}
+
+# Working set considered to fit while it stays under this share of the cache
+WORKING_SET_CACHE_SHARE = 0.8
+
+
+def create_telemetry_indexes(db, retention_days=TELEMETRY_RETENTION_DAYS):
+    """
+    Creates the snapshot index, expiring snapshots after retention_days.
+
+    Args:
+        db: MongoDB database connection object
+        retention_days: Days snapshots are kept (default: TELEMETRY_RETENTION_DAYS)
+
+    Returns:
+        str: Name of the index created
+    """
+    manifest = retention_manifest(telemetry_retention_days=retention_days)
+    return ensure_index(db, TELEMETRY_COLLECTION, "telemetry_taken_at_idx", manifest)
+
+
+def _collection_stats(collection):
+    """
+    Size, storage and index sizes from $collStats, plus per-index accesses from
+    $indexStats. Both return one document per shard (and $indexStats one per host)
+    on a sharded cluster; these are added up.
+    """
+    stats = {}
+    try:
+        shards = [row["storageStats"] for row in collection.aggregate([{"$collStats": {"storageStats": {}}}])]
+        if shards:
+            stats = {key: sum(shard.get(key) or 0 for shard in shards) for key in _SUMMED_STORAGE_STATS}
+            stats["avgObjSize"] = stats["size"] / stats["count"] if stats["count"] else 0
+            stats["indexSizes"] = {}
+            for shard in shards:
+                for index, size in (shard.get("indexSizes") or {}).items():
+                    stats["indexSizes"][index] = stats["indexSizes"].get(index, 0) + size
+    except (OperationFailure, KeyError):
+        pass
+    try:
+        indexes = {}
+        for row in collection.aggregate([{"$indexStats": {}}]):
+            usage = indexes.setdefault(row["name"], {"ops": 0, "since": None, "hosts": []})
+            usage["ops"] += row["accesses"]["ops"]
+            usage["since"] = max(filter(None, (usage["since"], row["accesses"]["since"])), default=None)
+            usage["hosts"].append({"host": row.get("host"), "ops": row["accesses"]["ops"],
+                                   "since": row["accesses"]["since"]})
+        stats["indexes"] = indexes
+    except OperationFailure:
+        stats["indexes"] = {}
+    return stats
+
+
+def _default_collections(db):
+    """Every collection of the database, derived and archive collections included (not views)."""
+    names = db.list_collection_names(filter={"type": "collection", "name": {"$not": {"$regex": r"^system\."}}})
+    return sorted(names)
+
+
+def _cache_stats(db):
+    """WiredTiger cache counters from serverStatus, or {} if unavailable."""
+    try:
+        status = db.client.admin.command("serverStatus", wiredTiger=1)
+    except OperationFailure:
+        return {}
+    cache = status.get("wiredTiger", {}).get("cache", {})
+    return {name: cache[metric] for metric, name in _CACHE_METRICS.items() if metric in cache}
+
+
+def take_telemetry_snapshot(db, collections=None, store=True):
+    """
+    Captures index usage, collection sizes and cache metrics at one point in time.
+
+    Args:
+        db: MongoDB database connection object
+        collections: Collection names (default: every collection of the database)
+        store: Insert the snapshot into telemetry_snapshots (default: True)
+
+    Returns:
+        dict: The snapshot
+    """
+    snapshot = {
+        "takenAt": datetime.now(timezone.utc),
+        "cache": _cache_stats(db),
+        "collections": {name: _collection_stats(db[name]) for name in (collections or _default_collections(db))},
+    }
+    if store:
+        db[TELEMETRY_COLLECTION].insert_one(snapshot)
+        snapshot.pop("_id", None)
+    return snapshot
+
+
+def collect_telemetry(db, interval_seconds=300, count=12, collections=None):
+    """
+    Takes `count` snapshots, interval_seconds apart.
+
+    Args:
+        db: MongoDB database connection object
+        interval_seconds: Seconds between snapshots (default: 300)
+        count: Number of snapshots (default: 12, one hour at the default interval)
+        collections: Collection names (default: every collection of the database)
+
+    Returns:
+        list: The snapshots taken
+    """
+    snapshots = []
+    for i in range(count):
+        snapshots.append(take_telemetry_snapshot(db, collections))
+        if i < count - 1:
+            time.sleep(interval_seconds)
+    return snapshots
+
+
+def _ops_delta(before, after):
+    """Index operations between two $indexStats readings; counters restart with each host."""
+    if before is not None and "hosts" in before and "hosts" in after:
+        previous = {host["host"]: host for host in before["hosts"]}
+        return sum(_ops_delta(previous.get(host["host"]), host) for host in after["hosts"])
+    if before is None or before.get("since") != after.get("since"):
+        return after["ops"]
+    return after["ops"] - before["ops"]
+
+
+def telemetry_report(db, start=None, end=None, first=None, last=None):
+    """
+    Compares two snapshots: index hit rates over the interval, index-to-data
+    ratios, cache hit rate and whether the working set fits in the cache.
+
+    Args:
+        db: MongoDB database connection object
+        start / end: Use the first and last stored snapshots in this time range
+            (default: the two most recent snapshots)
+        first / last: Snapshots to compare instead of stored ones
+
+    Returns:
+        dict: Report with interval, indexes, collections, cache and working_set
+    """
+    if first is None or last is None:
+        snapshots = db[TELEMETRY_COLLECTION]
+        if start or end:
+            query = {"takenAt": {op: value for op, value in (("$gte", start), ("$lte", end)) if value}}
+            first = snapshots.find_one(query, {"_id": 0}, sort=[("takenAt", ASCENDING)])
+            last = snapshots.find_one(query, {"_id": 0}, sort=[("takenAt", DESCENDING)])
+        else:
+            recent = list(snapshots.find({}, {"_id": 0}).sort("takenAt", DESCENDING).limit(2))
+            last, first = (recent + [None, None])[:2]
+    if last is None:
+        raise ValueError("No telemetry snapshots: run take_telemetry_snapshot() first")
+    first = first or {"collections": {}, "cache": {}, "takenAt": None}
+    hours = ((last["takenAt"] - first["takenAt"]).total_seconds() / 3600) if first["takenAt"] else None
+
+    indexes, collections = [], []
+    total_data = total_indexes = 0
+    for name, stats in last["collections"].items():
+        before = first["collections"].get(name, {}).get("indexes", {})
+        deltas = {index: _ops_delta(before.get(index), usage) for index, usage in stats.get("indexes", {}).items()}
+        collection_ops = sum(deltas.values())
+        for index, ops in sorted(deltas.items(), key=lambda item: -item[1]):
+            indexes.append({
+                "collection": name,
+                "index": index,
+                "ops": ops,
+                "ops_per_hour": ops / hours if hours else None,
+                "share": ops / collection_ops if collection_ops else 0.0,
+                "size_bytes": (stats.get("indexSizes") or {}).get(index),
+            })
+        size, index_size = stats.get("size") or 0, stats.get("totalIndexSize") or 0
+        total_data += size
+        total_indexes += index_size
+        collections.append({
+            "collection": name,
+            "documents": stats.get("count"),
+            "size_bytes": size,
+            "storage_bytes": stats.get("storageSize"),
+            "index_bytes": index_size,
+            "index_to_data": index_size / size if size else None,
+        })
+
+    cache, previous = last.get("cache", {}), first.get("cache", {})
+    requested = cache.get("pagesRequested", 0) - previous.get("pagesRequested", 0)
+    read_in = cache.get("pagesReadIntoCache", 0) - previous.get("pagesReadIntoCache", 0)
+    cache_report = {
+        "max_bytes": cache.get("maxBytes"),
+        "used_bytes": cache.get("bytesInCache"),
+        "dirty_bytes": cache.get("dirtyBytes"),
+        "hit_rate": 1 - read_in / requested if requested > 0 else None,
+    }
+
+    budget = int((cache.get("maxBytes") or 0) * WORKING_SET_CACHE_SHARE)
+    if not budget:
+        verdict = "unknown (no cache metrics)"
+    elif total_indexes + total_data <= budget:
+        verdict = "fits: indexes and data"
+    elif total_indexes <= budget:
+        verdict = "partially: indexes fit, data does not"
+    else:
+        verdict = "does not fit: indexes alone exceed the cache"
+    return {
+        "interval": {"from": first["takenAt"], "to": last["takenAt"], "hours": hours},
+        "indexes": indexes,
+        "collections": collections,
+        "cache": cache_report,
+        "working_set": {"data_bytes": total_data, "index_bytes": total_indexes,
+                        "cache_budget_bytes": budget or None, "verdict": verdict},
+    }
+
+
+def print_telemetry_report(report):
+    """
+    Prints a telemetry_report() in a formatted way.
+
+    Args:
+        report: Dictionary returned from telemetry_report()
+    """
+    interval = report["interval"]
+    span = f"{interval['hours']:.2f} h" if interval["hours"] else "since server start"
+    print(f"\n=== Index Telemetry ({span}) ===")
+    print(f"{'Collection':<14} {'Index':<32} {'Ops':>10} {'Ops/h':>10} {'Share':>7} {'Size':>12}")
+    for row in report["indexes"]:
+        per_hour = f"{row['ops_per_hour']:.1f}" if row["ops_per_hour"] is not None else "n/a"
+        print(f"{row['collection']:<14} {row['index']:<32} {row['ops']:>10} {per_hour:>10} "
+              f"{row['share']:>7.1%} {str(row['size_bytes']):>12}")
+    unused = [f"{row['collection']}.{row['index']}" for row in report["indexes"]
+              if row["ops"] == 0 and row["index"] != "_id_"]
+    if unused:
+        print("Not used in this interval: " + ", ".join(unused))
+
+    print(f"\n{'Collection':<14} {'Documents':>10} {'Data':>12} {'Storage':>12} {'Indexes':>12} {'Idx/Data':>9}")
+    for row in report["collections"]:
+        ratio = f"{row['index_to_data']:.2f}" if row["index_to_data"] is not None else "n/a"
+        print(f"{row['collection']:<14} {str(row['documents']):>10} {row['size_bytes']:>12} "
+              f"{str(row['storage_bytes']):>12} {row['index_bytes']:>12} {ratio:>9}")
+
+    cache, working_set = report["cache"], report["working_set"]
+    print("\n=== Cache & Working Set ===")
+    hit_rate = f"{cache['hit_rate']:.2%}" if cache["hit_rate"] is not None else "n/a"
+    print(f"Cache: {cache['used_bytes']} of {cache['max_bytes']} bytes used, hit rate {hit_rate}")
+    print(f"Working set: {working_set['index_bytes']} index + {working_set['data_bytes']} data bytes "
+          f"vs budget {working_set['cache_budget_bytes']} -> {working_set['verdict']}")
+
+# Example usage:
+# create_telemetry_indexes(db)
+# take_telemetry_snapshot(db)        # e.g. from cron, or collect_telemetry(db, 300, 12)
+# print_telemetry_report(telemetry_report(db))
@@ -0,0 +1,326 @@
+# Import Useful Libraries
+import re
+import time
+from datetime import datetime
+
+from bson import json_util
+from bson.decimal128 import Decimal128
+
+# Python types accepted for each $jsonSchema bsonType. bool is a subclass of int,
+# so number checks exclude it explicitly, as the server does.
+BSON_TYPES = {
+    "object": (dict,),
+    "array": (list, tuple),
+    "string": (str,),
+    "date": (datetime,),
+    "bool": (bool,),
+    "number": (int, float, Decimal128),
+    "int": (int,),
+    "long": (int,),
+    "double": (float,),
+    "decimal": (Decimal128,),
+}
+_NUMERIC_TYPES = ("number", "int", "long", "double", "decimal")
+
+_MISSING = object()
+
+
+class _CodeWriter:
+    """Accumulates generated source lines plus the constants they reference."""
+
+    def __init__(self):
+        self.lines = []
+        self.constants = {}
+        self._counter = 0
+
+    def emit(self, indent, line):
+        self.lines.append("    " * indent + line)
+
+    def constant(self, prefix, value):
+        self._counter += 1
+        name = f"_{prefix}{self._counter}"
+        self.constants[name] = value
+        return name
+
+    def variable(self, prefix):
+        self._counter += 1
+        return f"{prefix}{self._counter}"
+
+
+def _type_condition(var, bson_type, writer):
+    """Returns a Python expression that is True when `var` does NOT have the bsonType."""
+    types = bson_type if isinstance(bson_type, list) else [bson_type]
+    python_types = tuple(t for name in types for t in BSON_TYPES[name])
+    condition = f"not isinstance({var}, {writer.constant('types', python_types)})"
+    if any(name in _NUMERIC_TYPES for name in types) and "bool" not in types:
+        condition = f"({condition} or isinstance({var}, bool))"
+    return condition
+
+
+def _compile_node(schema, var, path, writer, indent):
+    """Emits the checks for one schema node against the value held in `var`."""
+    message = schema.get("description")
+
+    def fail(reason):
+        text = f"{path}: {message or reason}" if path else (message or reason)
+        writer.emit(indent + 1, f"return {text!r}")
+
+    bson_type = schema.get("bsonType")
+    if bson_type:
+        writer.emit(indent, f"if {_type_condition(var, bson_type, writer)}:")
+        fail(f"must be of type {bson_type}")
+
+    if "enum" in schema:
+        values = schema["enum"]
+        allowed = writer.constant("enum", tuple(values))  # tuple: values may be unhashable
+        writer.emit(indent, f"if {var} not in {allowed}:")
+        fail(f"must be one of {values}")
+
+    # Numeric and string keywords only apply to values of that type
+    for keyword, operator in (("minimum", "<"), ("maximum", ">")):
+        if keyword in schema:
+            # Decimal128 does not compare with Python numbers, so only int/float are range-checked
+            guard = f"isinstance({var}, (int, float)) and " if bson_type in _NUMERIC_TYPES else \
+                f"isinstance({var}, (int, float)) and not isinstance({var}, bool) and "
+            writer.emit(indent, f"if {guard}{var} {operator} {schema[keyword]!r}:")
+            fail(f"{keyword} is {schema[keyword]}")
+
+    if "pattern" in schema:
+        regex = writer.constant("re", re.compile(schema["pattern"]))
+        guard = "" if bson_type == "string" else f"isinstance({var}, str) and "
+        writer.emit(indent, f"if {guard}{regex}.search({var}) is None:")
+        fail(f"must match {schema['pattern']!r}")
+
+    if "required" in schema or "properties" in schema:
+        object_indent = indent
+        if bson_type != "object":
+            writer.emit(indent, f"if isinstance({var}, dict):")
+            object_indent += 1
+        for field in schema.get("required", []):
+            writer.emit(object_indent, f"if {field!r} not in {var}:")
+            writer.emit(object_indent + 1, f"return {(path + '.' if path else '') + 'missing required field ' + repr(field)!r}")
+        for field, field_schema in schema.get("properties", {}).items():
+            field_var = writer.variable("v")
+            writer.emit(object_indent, f"{field_var} = {var}.get({field!r}, _MISSING)")
+            writer.emit(object_indent, f"if {field_var} is not _MISSING:")
+            before = len(writer.lines)
+            _compile_node(field_schema, field_var, f"{path}.{field}" if path else field, writer, object_indent + 1)
+            if len(writer.lines) == before:
+                writer.emit(object_indent + 1, "pass")
+
+    if "items" in schema:
+        item_var = writer.variable("item")
+        items_indent = indent
+        if bson_type != "array":
+            writer.emit(indent, f"if isinstance({var}, (list, tuple)):")
+            items_indent += 1
+        writer.emit(items_indent, f"for {item_var} in {var}:")
+        before = len(writer.lines)
+        _compile_node(schema["items"], item_var, f"{path}[]", writer, items_indent + 1)
+        if len(writer.lines) == before:
+            writer.emit(items_indent + 1, "pass")
+
+
+def compile_validator(validator, name="document"):
+    """
+    Compiles a {"$jsonSchema": ...} validator into a Python checker function.
+    The checker is generated as straight-line Python source once, so checking a
+    document does not walk the schema.
+
+    Supports the keywords the EduHub validators use: bsonType, required, properties,
+    enum, minimum, maximum, pattern and items.
+
+    Args:
+        validator: Validator document as passed to create_collection(validator=...)
+        name: Name used for the generated function and in error messages
+
+    Returns:
+        function: check(document) -> None if valid, otherwise an error message string
+    """
+    schema = validator.get("$jsonSchema", validator)
+    writer = _CodeWriter()
+    writer.emit(0, f"def check_{name}(doc):")
+    _compile_node(schema, "doc", "", writer, 1)
+    writer.emit(1, "return None")
+
+    namespace = {"_MISSING": _MISSING, **writer.constants}
+    source = "\n".join(writer.lines)
+    exec(compile(source, f"<validator {name}>", "exec"), namespace)
+    checker = namespace[f"check_{name}"]
+    checker.source = source
+    return checker
+
+
+def compile_validators(validators):
+    """
+    Compiles every collection's validator.
+
+    Args:
+        validators: Collection name -> validator document
+
+    Returns:
+        dict: Collection name -> checker function
+    """
+    return {name: compile_validator(validator, name) for name, validator in validators.items()}
+
+
+def validate_document_interpreted(schema, value, path=""):
+    """
+    Reference implementation that walks the schema for every document.
+    Used to cross-check and benchmark the compiled checkers.
+
+    Args:
+        schema: $jsonSchema node
+        value: Value to check
+        path: Field path used in error messages
+
+    Returns:
+        str: Error message, or None if the value is valid
+    """
+    schema = schema.get("$jsonSchema", schema)
+    message = schema.get("description")
+
+    def error(reason):
+        return f"{path}: {message or reason}" if path else (message or reason)
+
+    bson_type = schema.get("bsonType")
+    if bson_type:
+        types = bson_type if isinstance(bson_type, list) else [bson_type]
+        python_types = tuple(t for name in types for t in BSON_TYPES[name])
+        is_number = any(name in _NUMERIC_TYPES for name in types) and "bool" not in types
+        if not isinstance(value, python_types) or (is_number and isinstance(value, bool)):
+            return error(f"must be of type {bson_type}")
+    if "enum" in schema and value not in schema["enum"]:
+        return error(f"must be one of {schema['enum']}")
+    numeric = isinstance(value, (int, float)) and not isinstance(value, bool)
+    if numeric and "minimum" in schema and value < schema["minimum"]:
+        return error(f"minimum is {schema['minimum']}")
+    if numeric and "maximum" in schema and value > schema["maximum"]:
+        return error(f"maximum is {schema['maximum']}")
+    if isinstance(value, str) and "pattern" in schema and re.search(schema["pattern"], value) is None:
+        return error(f"must match {schema['pattern']!r}")
+    if isinstance(value, dict):
+        for field in schema.get("required", []):
+            if field not in value:
+                return f"{path + '.' if path else ''}missing required field {field!r}"
+        for field, field_schema in schema.get("properties", {}).items():
+            if field in value:
+                result = validate_document_interpreted(field_schema, value[field],
+                                                       f"{path}.{field}" if path else field)
+                if result:
+                    return result
+    if isinstance(value, (list, tuple)) and "items" in schema:
+        for item in value:
+            result = validate_document_interpreted(schema["items"], item, f"{path}[]")
+            if result:
+                return result
+    return None
+
+
+def partition_documents(checker, documents):
+    """
+    Splits documents into valid ones and (document, error) rejects.
+
+    Args:
+        checker: Function returned by compile_validator()
+        documents: Documents to check
+
+    Returns:
+        tuple: (valid_documents, rejected) where rejected is a list of (document, error)
+    """
+    valid, rejected = [], []
+    for document in documents:
+        error = checker(document)
+        if error is None:
+            valid.append(document)
+        else:
+            rejected.append((document, error))
+    return valid, rejected
+
+
+def write_rejects(reject_file, collection_name, rejected):
+    """
+    Appends rejected documents to a JSON-lines reject file.
+
+    Args:
+        reject_file: Path of the reject file
+        collection_name: Collection the documents were meant for
+        rejected: List of (document, error) tuples
+    """
+    if not rejected:
+        return
+    with open(reject_file, "a") as f:
+        for document, error in rejected:
+            f.write(json_util.dumps({"collection": collection_name, "error": error, "document": document}))
+            f.write("\n")
+
+
+def validated_insert_many(collection, checker, documents, reject_file=None, ordered=True):
+    """
+    Inserts only the documents that pass the compiled checker; invalid ones are
+    never sent to the server, so they cannot abort an ordered batch.
+
+    Args:
+        collection: MongoDB collection object
+        checker: Function returned by compile_validator()
+        documents: Documents to insert
+        reject_file: JSON-lines file receiving rejected documents (default: not written)
+        ordered: Passed through to insert_many (default: True)
+
+    Returns:
+        tuple: (InsertManyResult or None, rejected) where rejected is a list of (document, error)
+    """
+    valid, rejected = partition_documents(checker, documents)
+    if reject_file:
+        write_rejects(reject_file, collection.name, rejected)
+    result = collection.insert_many(valid, ordered=ordered) if valid else None
+    return result, rejected
+
+
+def benchmark_validators(validators, documents_by_collection, repeat=20):
+    """
+    Measures documents checked per second by the compiled and interpreted validators.
+
+    Args:
+        validators: Collection name -> validator document
+        documents_by_collection: Collection name -> list of documents to check
+        repeat: How many times each document list is checked (default: 20)
+
+    Returns:
+        dict: Collection name -> {"compiled": docs/s, "interpreted": docs/s, "speedup": x}
+    """
+    checkers = compile_validators(validators)
+    results = {}
+    for name, documents in documents_by_collection.items():
+        if name not in validators or not documents:
+            continue
+        total = len(documents) * repeat
+
+        start_time = time.perf_counter()
+        for _ in range(repeat):
+            for document in documents:
+                checkers[name](document)
+        compiled_time = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        for _ in range(repeat):
+            for document in documents:
+                validate_document_interpreted(validators[name], document)
+        interpreted_time = time.perf_counter() - start_time
+
+        results[name] = {
+            "compiled": round(total / compiled_time),
+            "interpreted": round(total / interpreted_time),
+            "speedup": round(interpreted_time / compiled_time, 1),
+        }
+
+    print("\n=== Validator Throughput (docs/s) ===")
+    for name, result in results.items():
+        print(f"{name}: compiled {result['compiled']:,}, interpreted {result['interpreted']:,} "
+              f"({result['speedup']}x)")
+    return results
+
+# Example usage:
+# checkers = compile_validators(COLLECTION_VALIDATORS)
+# checkers["users"]({"userId": "user999", "email": "not-an-email"})
+# print(checkers["users"].source)
@@ -0,0 +1,721 @@
+# Import Useful Libraries
+import contextlib
+import contextvars
+import functools
+import hashlib
+import inspect
+import json
+import threading
+import time
+import uuid
+from collections import Counter, deque
+
+from pymongo import CursorType, DESCENDING, MongoClient
+
+# Operations slower than this (milliseconds) are written to system.profile
+SLOW_QUERY_MS = 100
+
+# Every query issued through tag_queries carries
+# {"app": QUERY_TAG_APP, "fn": <function>, "shape": <query shape hash>, "rid": <request id>}
+QUERY_TAG_APP = "eduhub"
+
+# Set to False to run tag_queries functions on the plain database: no comments, no client timings.
+# Databases whose client is not a pymongo MongoClient (e.g. mongomock, which rejects `comment`) are never tagged.
+QUERY_TAGGING = True
+
+# Methods that accept a `comment`; through a tagged database they are tagged and timed
+_COMMENTED_COLLECTION_METHODS = frozenset({
+    "find", "find_one", "find_raw_batches", "aggregate", "aggregate_raw_batches", "count_documents",
+    "estimated_document_count", "distinct", "insert_one", "insert_many", "update_one", "update_many",
+    "replace_one", "delete_one", "delete_many", "find_one_and_update", "find_one_and_delete",
+    "find_one_and_replace", "bulk_write", "create_index", "create_indexes", "drop_index", "drop_indexes",
+    "index_information", "list_indexes", "drop",
+})
+_COMMENTED_DATABASE_METHODS = frozenset({
+    "aggregate", "command", "list_collection_names", "list_collections", "drop_collection",
+})
+# Methods returning a cursor, timed until the cursor is exhausted or closed
+_CURSOR_METHODS = frozenset({"find", "find_raw_batches", "aggregate", "aggregate_raw_batches",
+                             "list_indexes", "list_collections"})
+
+_request_id = contextvars.ContextVar("eduhub_request_id", default=None)
+
+
+@contextlib.contextmanager
+def request_context(request_id=None):
+    """
+    Tags every query issued inside the block with one request id, e.g. the id
+    of the web request being served. Tagged functions called outside a request
+    context get a new request id per call.
+
+    Args:
+        request_id: Request id (default: a new random one)
+
+    Yields:
+        str: The request id
+    """
+    token = _request_id.set(request_id or uuid.uuid4().hex[:16])
+    try:
+        yield _request_id.get()
+    finally:
+        _request_id.reset(token)
+
+
+def query_comment(function, shape_hash=None, request_id=None):
+    """
+    Builds the comment tag attached to a query.
+
+    Args:
+        function: Name of the function issuing the query
+        shape_hash: query_shape_hash() of the query (optional)
+        request_id: Request id (default: the current request_context)
+
+    Returns:
+        dict: Comment stored by the server in logs and system.profile
+    """
+    comment = {"app": QUERY_TAG_APP, "fn": function}
+    if shape_hash:
+        comment["shape"] = shape_hash
+    request_id = request_id or _request_id.get()
+    if request_id:
+        comment["rid"] = request_id
+    return comment
+
+
+def query_key(comment):
+    """Key joining client timings and profiler entries: "<function>:<shape hash>"."""
+    return f"{comment.get('fn', '(untagged)')}:{comment.get('shape', '')}"
+
+
+def _call_shape(method, collection, args, kwargs):
+    """Query shape of a driver call, from its positional and keyword arguments."""
+    def arg(position, name):
+        return args[position] if len(args) > position else kwargs.get(name)
+
+    if method in ("find", "find_one", "find_raw_batches"):
+        return query_shape(method, collection, arg(0, "filter"), sort=kwargs.get("sort"),
+                           projection=arg(1, "projection"))
+    if method in ("aggregate", "aggregate_raw_batches"):
+        return query_shape(method, collection, pipeline=arg(0, "pipeline"))
+    if method == "count_documents":
+        return query_shape(method, collection, arg(0, "filter"))
+    if method == "distinct":
+        return query_shape(f"distinct:{arg(0, 'key')}", collection, arg(1, "filter"))
+    if method in ("update_one", "update_many", "find_one_and_update"):
+        return query_shape(method, collection, arg(0, "filter"), update=arg(1, "update"))
+    if method in ("replace_one", "delete_one", "delete_many", "find_one_and_delete", "find_one_and_replace"):
+        return query_shape(method, collection, arg(0, "filter"))
+    if method == "bulk_write":
+        return dict(query_shape(method, collection),
+                    requests=sorted({type(request).__name__ for request in arg(0, "requests") or []}))
+    if method == "command":
+        command = arg(0, "command")
+        return query_shape(f"command:{command if isinstance(command, str) else next(iter(command))}", collection)
+    return query_shape(method, collection)
+
+
+class QueryTimings:
+    """
+    Client-side time of every tagged call, aggregated under query_key() (the
+    same key the slow-query report carries) and kept per call for the most
+    recent calls.
+    """
+
+    def __init__(self, max_recent=10000):
+        self._lock = threading.Lock()
+        self.max_recent = max_recent
+        self.reset()
+
+    def reset(self):
+        self.by_key = {}
+        self.recent = deque(maxlen=self.max_recent)
+
+    def record(self, comment, method, shape, millis):
+        key = query_key(comment)
+        with self._lock:
+            entry = self.by_key.setdefault(key, {
+                "key": key, "function": comment["fn"], "shape_hash": comment.get("shape"), "method": method,
+                "shape": shape, "count": 0, "total_ms": 0.0, "max_ms": 0.0,
+            })
+            entry["count"] += 1
+            entry["total_ms"] += millis
+            entry["max_ms"] = max(entry["max_ms"], millis)
+            self.recent.append({"key": key, "request_id": comment.get("rid"), "method": method, "millis": millis})
+
+    def summary(self):
+        """Aggregated timings ranked by total time."""
+        with self._lock:
+            entries = [dict(entry, avg_ms=entry["total_ms"] / entry["count"]) for entry in self.by_key.values()]
+        return sorted(entries, key=lambda entry: -entry["total_ms"])
+
+    def for_request(self, request_id):
+        """The recent calls of one request, in order."""
+        with self._lock:
+            return [call for call in self.recent if call["request_id"] == request_id]
+
+
+# Shared by every tagged database
+CLIENT_TIMINGS = QueryTimings()
+
+
+class _TimedCursor:
+    """
+    Cursor that adds the time spent fetching from it to the call's timing once
+    it is exhausted, closed, explained or garbage-collected.
+    """
+
+    def __init__(self, cursor, done, elapsed):
+        self._cursor = cursor
+        self._done = done
+        self._elapsed = elapsed
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        start_time = time.perf_counter()
+        try:
+            return next(self._cursor)
+        except StopIteration:
+            self._finish()
+            raise
+        finally:
+            self._elapsed += time.perf_counter() - start_time
+
+    next = __next__
+
+    def _finish(self):
+        if self._done is not None:
+            done, self._done = self._done, None
+            done(self._elapsed)
+
+    def close(self):
+        self._cursor.close()
+        self._finish()
+
+    def explain(self):
+        start_time = time.perf_counter()
+        try:
+            return self._cursor.explain()
+        finally:
+            self._elapsed += time.perf_counter() - start_time
+            self._finish()
+
+    def __del__(self):
+        # Abandoned before the end (break, a single next(), ...): record what was fetched
+        self._finish()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __getitem__(self, index):
+        return self._cursor[index]
+
+    def __getattr__(self, name):
+        attr = getattr(self._cursor, name)
+        if not inspect.ismethod(attr):
+            return attr
+
+        @functools.wraps(attr)
+        def chained(*args, **kwargs):
+            # sort(), limit(), hint(), ... return the cursor itself
+            result = attr(*args, **kwargs)
+            return self if result is self._cursor else result
+        return chained
+
+
+def _tagged_call(target, method, attr, function, timings):
+    """Wraps one driver method: shape, comment and client timing."""
+    @functools.wraps(attr)
+    def tagged(*args, **kwargs):
+        shape = _call_shape(method, target.name, args, kwargs)
+        comment = query_comment(function, query_shape_hash(shape))
+        kwargs.setdefault("comment", comment)
+        start_time = time.perf_counter()
+        try:
+            result = attr(*args, **kwargs)
+        except Exception:
+            timings.record(comment, method, shape, (time.perf_counter() - start_time) * 1000)
+            raise
+        elapsed = time.perf_counter() - start_time
+        if method in _CURSOR_METHODS:
+            return _TimedCursor(result, lambda seconds: timings.record(comment, method, shape, seconds * 1000),
+                                elapsed)
+        timings.record(comment, method, shape, elapsed * 1000)
+        return result
+    return tagged
+
+
+class _TaggedCollection:
+    """Collection whose driver calls are tagged and timed on behalf of one function."""
+
+    def __init__(self, collection, function, timings):
+        self._collection = collection
+        self._function = function
+        self._timings = timings
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if name in _COMMENTED_COLLECTION_METHODS:
+            return _tagged_call(self._collection, name, attr, self._function, self._timings)
+        if name == "with_options":
+            return lambda *args, **kwargs: _TaggedCollection(attr(*args, **kwargs), self._function, self._timings)
+        return attr
+
+
+class _TaggedDatabase:
+    """Database handing out tagged collections; everything else is the wrapped database."""
+
+    def __init__(self, db, function, timings=None):
+        self._db = db
+        self._function = function
+        self._timings = timings or CLIENT_TIMINGS
+
+    def __getattr__(self, name):
+        attr = getattr(self._db, name)
+        if name in _COMMENTED_DATABASE_METHODS:
+            return _tagged_call(self._db, name, attr, self._function, self._timings)
+        if name == "get_collection":
+            return lambda *args, **kwargs: _TaggedCollection(attr(*args, **kwargs), self._function, self._timings)
+        if name == "with_options":
+            return lambda *args, **kwargs: _TaggedDatabase(attr(*args, **kwargs), self._function, self._timings)
+        if not name.startswith("_") and hasattr(attr, "insert_one"):
+            return _TaggedCollection(attr, self._function, self._timings)
+        return attr
+
+    def __getitem__(self, name):
+        return _TaggedCollection(self._db[name], self._function, self._timings)
+
+
+def untagged(db):
+    """The database behind a tagged database (or db itself)."""
+    return db._db if isinstance(db, _TaggedDatabase) else db
+
+
+def _taggable(db):
+    """Whether calls on db can carry a comment: tagging is on and the client is a real MongoClient."""
+    return QUERY_TAGGING and isinstance(getattr(db, "client", None), MongoClient)
+
+
+def tag_queries(func=None, *, db_arg="db"):
+    """
+    Decorator routing every database call the function makes through its
+    database argument through a thin wrapper that:
+      - attaches query_comment(<function name>, <query shape hash>, <request id>)
+      - records the client-side time in CLIENT_TIMINGS under the same key
+    so profiler entries, server logs and client timings can be joined.
+    A database argument left as None means the module-level connection
+    (the `db` global of the function's module). Nested tagged calls are
+    tagged with the inner function and share the request id. With
+    QUERY_TAGGING off, or a client other than MongoClient, the function
+    gets the plain database.
+
+    Args:
+        func: Function to wrap
+        db_arg: Name of the database parameter (default: "db")
+    """
+    if func is None:
+        return functools.partial(tag_queries, db_arg=db_arg)
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        bound = signature.bind(*args, **kwargs)
+        db = bound.arguments.get(db_arg)
+        if db is None:
+            db = func.__globals__.get("db")
+        if db is not None and _taggable(untagged(db)):
+            bound.arguments[db_arg] = _TaggedDatabase(untagged(db), func.__name__)
+        elif db is not None:
+            bound.arguments[db_arg] = untagged(db)
+        if _request_id.get() is not None:
+            return func(*bound.args, **bound.kwargs)
+        with request_context():
+            return func(*bound.args, **bound.kwargs)
+    return wrapper
+
+
+def enable_profiler(db, slow_ms=SLOW_QUERY_MS, sample_rate=1.0):
+    """
+    Turns the database profiler on for operations slower than slow_ms.
+    slowms is server-wide (it also sets the slow-operation log threshold).
+
+    Args:
+        db: MongoDB database connection object
+        slow_ms: Threshold in milliseconds (default: SLOW_QUERY_MS)
+        sample_rate: Fraction of slow operations profiled (default: 1.0)
+
+    Returns:
+        dict: The previous settings, for restore_profiler()
+    """
+    previous = db.command("profile", -1)
+    db.command("profile", 1, slowms=slow_ms, sampleRate=sample_rate)
+    return {"level": previous["was"], "slowms": previous["slowms"], "sampleRate": previous.get("sampleRate", 1.0)}
+
+
+def restore_profiler(db, previous):
+    """
+    Restores the profiler settings returned by enable_profiler().
+
+    Args:
+        db: MongoDB database connection object
+        previous: Settings returned by enable_profiler()
+    """
+    db.command("profile", previous["level"], slowms=previous["slowms"], sampleRate=previous["sampleRate"])
+
+
+def _profile_query(db, since):
+    query = {"ns": {"$ne": f"{db.name}.system.profile"}}
+    if since is not None:
+        query["ts"] = {"$gt": since}
+    return query
+
+
+def latest_profile_timestamp(db):
+    """Timestamp of the newest system.profile entry, or None."""
+    latest = db.system.profile.find_one({}, {"ts": 1}, sort=[("$natural", DESCENDING)])
+    return latest["ts"] if latest else None
+
+
+def read_profile(db, since=None):
+    """
+    Reads the profiled operations recorded after `since`.
+
+    Args:
+        db: MongoDB database connection object
+        since: Only entries with a later ts (default: all)
+
+    Returns:
+        list: Operation summaries (see summarize_operation)
+    """
+    return [summarize_operation(op) for op in db.system.profile.find(_profile_query(db, since))]
+
+
+def tail_profile(db, since=None, stop_event=None, poll_seconds=1.0):
+    """
+    Follows system.profile with a tailable cursor, yielding new entries until
+    stop_event is set. system.profile is capped, so the cursor waits for new
+    entries instead of ending; it is reopened after `since` if it dies.
+
+    Args:
+        db: MongoDB database connection object
+        since: Only entries with a later ts (default: entries written from now on)
+        stop_event: threading.Event that ends the generator (default: never)
+        poll_seconds: Seconds each wait for new entries lasts (default: 1.0)
+
+    Yields:
+        dict: Raw system.profile entries
+    """
+    stop_event = stop_event or threading.Event()
+    since = since if since is not None else latest_profile_timestamp(db)
+    while not stop_event.is_set():
+        cursor = db.system.profile.find(_profile_query(db, since), cursor_type=CursorType.TAILABLE_AWAIT)
+        cursor.max_await_time_ms(int(poll_seconds * 1000))
+        while cursor.alive and not stop_event.is_set():
+            op = cursor.try_next()
+            if op is not None:
+                since = op["ts"]
+                yield op
+        cursor.close()
+        # A tailable cursor on an empty collection dies immediately
+        stop_event.wait(poll_seconds)
+
+
+def _filter_shape(value):
+    """Query filter with every value replaced by "?"."""
+    if isinstance(value, dict):
+        return {key: _filter_shape(inner) for key, inner in sorted(value.items())}
+    if isinstance(value, list) and value and all(isinstance(inner, dict) for inner in value):
+        return [_filter_shape(inner) for inner in value]
+    return "?"
+
+
+def _stage_shape(value):
+    """Pipeline stage with field paths and names kept and other literals replaced by "?"."""
+    if isinstance(value, dict):
+        return {key: _filter_shape(inner) if key == "$match" else _stage_shape(inner)
+                for key, inner in sorted(value.items())}
+    if isinstance(value, list):
+        return [_stage_shape(inner) for inner in value]
+    return value if isinstance(value, str) else "?"
+
+
+def query_shape(operation, collection, filter=None, pipeline=None, sort=None, projection=None, update=None):
+    """
+    Normalizes a query to its shape: the same query with different values has
+    the same shape.
+
+    Args:
+        operation: "find", "aggregate", "count", "update", ...
+        collection: Collection name
+        filter / pipeline / sort / projection: Query parts (optional)
+        update: Update document or pipeline (only operators and fields are kept)
+
+    Returns:
+        dict: The shape
+    """
+    shape = {"op": operation, "coll": collection}
+    if filter:
+        shape["filter"] = _filter_shape(filter)
+    if pipeline:
+        shape["pipeline"] = [_stage_shape(stage) for stage in pipeline]
+    if sort:
+        shape["sort"] = sorted(sort) if isinstance(sort, dict) else [key for key, _ in sort]
+    if projection:
+        shape["projection"] = sorted(projection)
+    if update:
+        shape["update"] = ([next(iter(stage)) for stage in update] if isinstance(update, list)
+                           else {op: sorted(fields) if isinstance(fields, dict) else "?"
+                                 for op, fields in sorted(update.items())})
+    return shape
+
+
+def query_shape_hash(shape):
+    """Short stable hash of a query shape."""
+    return hashlib.sha1(json.dumps(shape, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:12]
+
+
+def _profile_shape(op):
+    """Query shape of a system.profile entry."""
+    command = op.get("originatingCommand") if op.get("op") == "getmore" else op.get("command")
+    command = command or {}
+    collection = op.get("ns", "").split(".", 1)[-1]
+    if "find" in command:
+        return query_shape("find", collection, command.get("filter"), sort=command.get("sort"),
+                           projection=command.get("projection"))
+    if "aggregate" in command:
+        return query_shape("aggregate", collection, pipeline=command.get("pipeline"))
+    if "count" in command:
+        return query_shape("count", collection, command.get("query"))
+    if "distinct" in command:
+        return query_shape("distinct:" + command["distinct"], collection, command.get("query"))
+    if "findAndModify" in command or "findandmodify" in command:
+        return query_shape("findAndModify", collection, command.get("query"), sort=command.get("sort"),
+                           update=command.get("update"))
+    if op.get("op") in ("update", "remove"):
+        return query_shape(op["op"], collection, command.get("q"), update=command.get("u"))
+    return query_shape(op.get("op", "command"), collection)
+
+
+def _tag_of(op):
+    """The eduhub comment tag of a profile entry, or {}."""
+    for source in (op.get("command"), op.get("originatingCommand"), op):
+        comment = (source or {}).get("comment")
+        if isinstance(comment, dict) and comment.get("app") == QUERY_TAG_APP:
+            return comment
+    return {}
+
+
+def summarize_operation(op):
+    """
+    Reduces a system.profile entry to its shape, issuing function and plan summary.
+
+    Args:
+        op: Raw system.profile entry
+
+    Returns:
+        dict: ts, ns, op, function, request_id, key, shape, shape_hash, millis and the plan counters
+    """
+    shape = _profile_shape(op)
+    tag = _tag_of(op)
+    # The client-side shape hash in the comment lets the entry join CLIENT_TIMINGS
+    shape_hash = tag.get("shape") or query_shape_hash(shape)
+    return {
+        "ts": op.get("ts"),
+        "ns": op.get("ns"),
+        "op": op.get("op"),
+        "function": tag.get("fn", "(untagged)"),
+        "request_id": tag.get("rid"),
+        "key": query_key(dict(tag, shape=shape_hash)),
+        "shape": shape,
+        "shape_hash": shape_hash,
+        "millis": op.get("millis", 0),
+        "plan": op.get("planSummary", "n/a"),
+        "keys_examined": op.get("keysExamined", 0),
+        "docs_examined": op.get("docsExamined", 0),
+        "returned": op.get("nreturned", op.get("nModified", op.get("ndeleted", 0))),
+        "in_memory_sort": bool(op.get("hasSortStage")),
+        "used_disk": bool(op.get("usedDisk")),
+    }
+
+
+def slow_query_report(operations, top=None):
+    """
+    Groups slow operations by query shape, ranked by total time.
+
+    Args:
+        operations: Summaries from read_profile(), tail_profile() + summarize_operation(),
+            or the watchdog
+        top: Keep only the first `top` shapes (default: all)
+
+    Returns:
+        list: One entry per shape with count, total/avg/max ms, functions, plans
+            and examined-to-returned ratios
+    """
+    groups = {}
+    for operation in operations:
+        group = groups.setdefault(operation["shape_hash"], {
+            "shape_hash": operation["shape_hash"], "ns": operation["ns"], "shape": operation["shape"],
+            "count": 0, "total_ms": 0, "max_ms": 0, "keys_examined": 0, "docs_examined": 0, "returned": 0,
+            "in_memory_sorts": 0, "used_disk": 0, "functions": Counter(), "plans": Counter(),
+        })
+        group["count"] += 1
+        group["total_ms"] += operation["millis"]
+        group["max_ms"] = max(group["max_ms"], operation["millis"])
+        for key in ("keys_examined", "docs_examined", "returned"):
+            group[key] += operation[key]
+        group["in_memory_sorts"] += operation["in_memory_sort"]
+        group["used_disk"] += operation["used_disk"]
+        group["functions"][operation["function"]] += 1
+        group["plans"][operation["plan"]] += 1
+
+    ranked = sorted(groups.values(), key=lambda group: -group["total_ms"])
+    for group in ranked:
+        group["avg_ms"] = group["total_ms"] / group["count"]
+        group["docs_per_returned"] = group["docs_examined"] / max(group["returned"], 1)
+        group["functions"] = dict(group["functions"].most_common())
+        group["plans"] = dict(group["plans"].most_common())
+    return ranked[:top] if top else ranked
+
+
+def join_client_server(operations, timings=None):
+    """
+    Joins profiled operations with the client-side timings recorded under the
+    same query_key(), showing how much of the client time the server accounts for.
+
+    Args:
+        operations: Operation summaries (read_profile(), the watchdog, ...)
+        timings: QueryTimings (default: CLIENT_TIMINGS)
+
+    Returns:
+        list: {key, function, shape_hash, client_calls, client_avg_ms, server_ops,
+            server_avg_ms}, ranked by client time
+    """
+    server = {}
+    for operation in operations:
+        entry = server.setdefault(operation["key"], {"count": 0, "total_ms": 0})
+        entry["count"] += 1
+        entry["total_ms"] += operation["millis"]
+    joined = []
+    for client in (timings or CLIENT_TIMINGS).summary():
+        profiled = server.get(client["key"], {"count": 0, "total_ms": 0})
+        joined.append({
+            "key": client["key"],
+            "function": client["function"],
+            "shape_hash": client["shape_hash"],
+            "client_calls": client["count"],
+            "client_avg_ms": client["avg_ms"],
+            "server_ops": profiled["count"],
+            "server_avg_ms": profiled["total_ms"] / profiled["count"] if profiled["count"] else None,
+        })
+    return joined
+
+
+def print_slow_query_report(report, top=10):
+    """
+    Prints a slow_query_report() in a formatted way.
+
+    Args:
+        report: List returned from slow_query_report()
+        top: Number of shapes printed (default: 10)
+    """
+    print(f"\n=== Slow Query Shapes ({len(report)}) ===")
+    for rank, group in enumerate(report[:top], 1):
+        print(f"{rank}. [{group['shape_hash']}] {group['ns']}  x{group['count']}  "
+              f"total {group['total_ms']} ms, avg {group['avg_ms']:.1f} ms, max {group['max_ms']} ms")
+        print("   functions: " + ", ".join(f"{fn} x{count}" for fn, count in group["functions"].items()))
+        print("   plans: " + ", ".join(f"{plan} x{count}" for plan, count in group["plans"].items()))
+        warnings = []
+        if any(plan.startswith("COLLSCAN") for plan in group["plans"]):
+            warnings.append("collection scan")
+        if group["docs_per_returned"] > 10:
+            warnings.append(f"{group['docs_per_returned']:.0f} docs examined per document returned")
+        if group["in_memory_sorts"]:
+            warnings.append(f"in-memory sort x{group['in_memory_sorts']}")
+        if group["used_disk"]:
+            warnings.append(f"spilled to disk x{group['used_disk']}")
+        if warnings:
+            print("   ⚠ " + "; ".join(warnings))
+        print(f"   shape: {json.dumps(group['shape'], default=str)}")
+
+
+def start_slow_query_watchdog(db, slow_ms=SLOW_QUERY_MS, sample_rate=1.0, stop_event=None,
+                              on_operation=None, max_operations=10000):
+    """
+    Enables the profiler and tails system.profile on a daemon thread. The
+    previous profiler settings are restored when stop_event is set.
+
+    Args:
+        db: MongoDB database connection object
+        slow_ms: Profiler threshold in milliseconds (default: SLOW_QUERY_MS)
+        sample_rate: Fraction of slow operations profiled (default: 1.0)
+        stop_event: threading.Event that stops the watchdog (default: a new one)
+        on_operation: Called with each operation summary, e.g. to log it (optional)
+        max_operations: Most recent summaries kept (default: 10000)
+
+    Returns:
+        tuple: (thread, stop_event, operations); pass operations to slow_query_report()
+    """
+    db = untagged(db)
+    stop_event = stop_event or threading.Event()
+    operations = deque(maxlen=max_operations)
+    since = latest_profile_timestamp(db)
+    previous = enable_profiler(db, slow_ms, sample_rate)
+
+    def loop():
+        try:
+            for op in tail_profile(db, since, stop_event):
+                summary = summarize_operation(op)
+                operations.append(summary)
+                if on_operation:
+                    on_operation(summary)
+        except Exception as e:
+            print(f"Slow-query watchdog stopped: {e}")
+        finally:
+            restore_profiler(db, previous)
+
+    thread = threading.Thread(target=loop, name="eduhub-slow-query-watchdog", daemon=True)
+    thread.start()
+    return thread, stop_event, operations
+
+
+@contextlib.contextmanager
+def capture_slow_queries(db, slow_ms=SLOW_QUERY_MS, sample_rate=1.0):
+    """
+    Profiles the operations slower than slow_ms issued inside a block.
+
+    Args:
+        db: MongoDB database connection object
+        slow_ms: Profiler threshold in milliseconds (default: SLOW_QUERY_MS)
+        sample_rate: Fraction of slow operations profiled (default: 1.0)
+
+    Yields:
+        list: Filled with the slow_query_report() of the block when it exits
+    """
+    db = untagged(db)
+    report = []
+    since = latest_profile_timestamp(db)
+    previous = enable_profiler(db, slow_ms, sample_rate)
+    try:
+        yield report
+    finally:
+        restore_profiler(db, previous)
+    report.extend(slow_query_report(read_profile(db, since)))
+
+# Example usage:
+# with capture_slow_queries(db, slow_ms=20) as report:
+#     analyze_learning_trends(db)
+# print_slow_query_report(report)
+#
+# thread, stop, operations = start_slow_query_watchdog(db, slow_ms=100)
+# ...  # application traffic
+# stop.set(); thread.join()
+# print_slow_query_report(slow_query_report(operations))
+#
+# with request_context("req-42"):
+#     get_students_in_course(db, "course001")
+# CLIENT_TIMINGS.for_request("req-42")
+# join_client_server(read_profile(db))
@@ -0,0 +1,57 @@
+# Import Useful Libraries
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+mongomock = pytest.importorskip("mongomock")
+
+
+@pytest.fixture
+def db():
+    """Empty in-process database; tests insert the fixture documents they need."""
+    return mongomock.MongoClient()["eduhub_test"]
+
+
+@pytest.fixture
+def lookup_pipelines(monkeypatch):
+    """
+    mongomock runs $lookup with localField/foreignField but not combined with a
+    pipeline (MongoDB 5.0+), which the optimizer and the outline pipeline emit; run those
+    the way the server does.
+    """
+    import mongomock.aggregate as aggregate
+
+    simple_lookup = aggregate._handle_lookup_stage
+
+    def lookup(in_collection, database, options):
+        if "pipeline" not in options:
+            return simple_lookup(in_collection, database, options)
+        foreign = list(database[options["from"]].find())
+        joined = []
+        for document in in_collection:
+            local = document.get(options["localField"])
+            local = local if isinstance(local, list) else [local]
+            matches = [f for f in foreign if f.get(options["foreignField"]) in local]
+            document = dict(document)
+            document[options["as"]] = list(aggregate.process_pipeline(matches, database, options["pipeline"], None))
+            joined.append(document)
+        return joined
+
+    monkeypatch.setitem(aggregate._PIPELINE_HANDLERS, "$lookup", lookup)
+
+
+@pytest.fixture(autouse=True)
+def union_with(monkeypatch):
+    """mongomock has no $unionWith, which the rebuilds of derived stores use to read the archive collections."""
+    import mongomock.aggregate as aggregate
+
+    def union(in_collection, database, options):
+        options = {"coll": options} if isinstance(options, str) else options
+        other = aggregate.process_pipeline(list(database[options["coll"]].find()), database,
+                                           options.get("pipeline", []), None)
+        return list(in_collection) + list(other)
+
+    monkeypatch.setitem(aggregate._PIPELINE_HANDLERS, "$unionWith", union)
@@ -0,0 +1,102 @@
+# Import Useful Libraries
+import pytest
+
+from eduhub_analytics import (CourseEnrollmentStat, InstructorStat, compute_course_enrollment_stats,
+                              compute_instructor_analytics, compute_student_performance)
+
+
+@pytest.fixture(autouse=True)
+def round_operator(monkeypatch):
+    """mongomock has no $round, which every analytics pipeline uses in its final $project."""
+    import mongomock.aggregate as aggregate
+
+    arithmetic = aggregate._Parser._handle_arithmetic_operator
+
+    def handle(parser, operator, values):
+        if operator != "$round":
+            return arithmetic(parser, operator, values)
+        number = parser.parse(values[0])
+        return None if number is None else round(number, values[1])
+
+    monkeypatch.setattr(aggregate, "arithmetic_operators", aggregate.arithmetic_operators | {"$round"})
+    monkeypatch.setattr(aggregate._Parser, "_handle_arithmetic_operator", handle)
+
+
+@pytest.fixture
+def db(db, lookup_pipelines):
+    db.users.insert_many([
+        {"userId": "user001", "firstName": "Ada", "lastName": "Lovelace"},
+        {"userId": "user002", "firstName": "Alan", "lastName": "Turing"},
+        {"userId": "user003", "firstName": "Grace", "lastName": "Hopper"},
+        {"userId": "user010", "firstName": "Edsger", "lastName": "Dijkstra"},
+        {"userId": "user011", "firstName": "Barbara", "lastName": "Liskov"},
+    ])
+    db.courses.insert_many([
+        {"courseId": "course001", "title": "Python", "category": "Programming", "instructorId": "user010",
+         "price": 100},
+        {"courseId": "course002", "title": "Algorithms", "category": "Theory", "instructorId": "user010",
+         "price": 50},
+        {"courseId": "course003", "title": "Abstraction", "category": "Theory", "instructorId": "user011",
+         "price": 300},
+    ])
+    db.enrollments.insert_many([
+        {"studentId": "user001", "courseId": "course001", "completionStatus": 100},
+        {"studentId": "user002", "courseId": "course001", "completionStatus": 50},
+        {"studentId": "user003", "courseId": "course001", "completionStatus": 20},
+        {"studentId": "user001", "courseId": "course002", "completionStatus": 40},
+        {"studentId": "user002", "courseId": "course002", "completionStatus": 35},
+        {"studentId": "user003", "courseId": "course003", "completionStatus": 90},
+    ])
+    db.submissions.insert_many([
+        {"studentId": "user001", "courseId": "course001", "grade": 90},
+        {"studentId": "user001", "courseId": "course002", "grade": 80},
+        {"studentId": "user002", "courseId": "course001", "grade": 70.125},
+    ])
+    return db
+
+
+def test_rows_map_pipeline_fields_to_attributes():
+    document = {"courseId": "course001", "courseTitle": "Python", "category": "Programming",
+                "totalEnrollments": 3, "averageGrade": 85.0, "averageCompletion": 56.67}
+    stat = CourseEnrollmentStat.from_document(document)
+    assert (stat.course_title, stat.total_enrollments, stat.average_completion) == ("Python", 3, 56.67)
+    assert stat.to_dict() == document
+
+    # Missing fields (e.g. an instructor without graded submissions) come back as None
+    stat = InstructorStat.from_document({"instructorId": "user011", "totalRevenue": 300})
+    assert (stat.instructor_id, stat.total_revenue, stat.avg_course_rating) == ("user011", 300, None)
+
+
+@pytest.mark.parametrize("optimize", [False, True])
+def test_course_enrollment_report(db, optimize):
+    report = compute_course_enrollment_stats(db, optimize=optimize)
+    assert [(c.course_id, c.total_enrollments) for c in report.courses] == [
+        ("course001", 3), ("course002", 2), ("course003", 1)]
+    assert report.most_popular.course_title == "Python"
+    assert report.most_popular.category == "Programming"
+    assert report.most_popular.average_completion == 56.67
+    assert report.execution["course_enrollment"]["mode"] == "single"
+
+
+@pytest.mark.parametrize("optimize", [False, True])
+def test_student_performance_report(db, optimize):
+    report = compute_student_performance(db, optimize=optimize)
+    assert report.top_student.student_name == "Ada Lovelace"
+    assert (report.top_student.average_grade, report.top_student.courses_enrolled) == (85.0, 2)
+
+    grace = next(s for s in report.students if s.student_id == "user003")
+    assert (grace.average_grade, grace.courses_with_submissions, grace.submission_count) == (None, 0, 0)
+    assert [(c.course_id, c.average_completion, c.total_students) for c in report.course_completion] == [
+        ("course003", 90.0, 1), ("course001", 56.67, 3), ("course002", 37.5, 2)]
+    assert set(report.execution) == {"student_performance", "course_completion"}
+
+
+@pytest.mark.parametrize("optimize", [False, True])
+def test_instructor_report(db, optimize):
+    report = compute_instructor_analytics(db, optimize=optimize)
+    assert [i.instructor_id for i in report.instructors] == ["user010", "user011"]
+
+    dijkstra = report.find("Edsger Dijkstra")
+    assert (dijkstra.total_students, dijkstra.total_revenue, dijkstra.courses_taught) == (5, 400, 2)
+    assert report.find("Barbara Liskov").total_revenue == 300
+    assert report.find("Nobody") is None
@@ -0,0 +1,112 @@
+# Import Useful Libraries
+from datetime import datetime
+
+import pytest
+
+import eduhub_archive
+from eduhub_archive import (ArchivePolicy, _FileArchive, create_archive_views, read_archive_file, run_archival,
+                            source_collection)
+from eduhub_buckets import rebuild_submission_buckets
+from eduhub_gradebook import GRADEBOOK_COLLECTION, rebuild_gradebook, record_grade_change_in_gradebook
+
+
+@pytest.fixture
+def views(db, monkeypatch):
+    """Records view definitions; mongomock has no views, so each becomes a plain collection."""
+    created = {}
+    create_collection = db.create_collection
+
+    def create_view(name, viewOn=None, pipeline=None, **kwargs):
+        created[name] = (viewOn, pipeline)
+        return create_collection(name, **kwargs)
+
+    monkeypatch.setattr(db, "create_collection", create_view)
+    monkeypatch.setattr(eduhub_archive, "_views_ready", set())
+    return created
+
+
+def test_include_archived_creates_missing_views_once(db, views):
+    assert source_collection(db, "enrollments").name == "enrollments"
+    assert views == {}
+
+    assert source_collection(db, "enrollments", include_archived=True).name == "enrollments_all"
+    assert views == {
+        "enrollments_all": ("enrollments", [{"$unionWith": "enrollments_archive"}]),
+        "submissions_all": ("submissions", [{"$unionWith": "submissions_archive"}]),
+    }
+
+    views.clear()
+    # A hot source can still $lookup the views; they are already there
+    assert source_collection(db, "courses", include_archived=True).name == "courses"
+    assert views == {}
+
+
+def test_run_archival_keeps_existing_views(db, views):
+    db.enrollments.insert_one({"enrollmentId": "enroll001", "studentId": "user001", "courseId": "course001",
+                               "enrollmentDate": datetime(2020, 1, 1)})
+    create_archive_views(db)
+    db.enrollments_all.insert_one({"marker": True})
+    views.clear()
+
+    summary = run_archival(db, ArchivePolicy(horizon_days=365), now=datetime(2024, 1, 1))
+    assert summary["enrollments"] == 1
+    assert views == {}
+    assert db.enrollments_all.count_documents({"marker": True}) == 1
+
+    # Recreating on request replaces them
+    assert create_archive_views(db) == ["enrollments_all", "submissions_all"]
+    assert db.enrollments_all.count_documents({}) == 0
+
+
+@pytest.fixture
+def graded(db, views):
+    db.assignments.insert_many([{"assignmentId": f"assign00{i}", "courseId": "course001"} for i in (1, 2)])
+    db.submissions.insert_many([
+        {"submissionId": "sub001", "assignmentId": "assign001", "studentId": "user001",
+         "submittedDate": datetime(2020, 1, 1), "grade": 60, "isGraded": True},
+        {"submissionId": "sub002", "assignmentId": "assign002", "studentId": "user001",
+         "submittedDate": datetime(2023, 12, 1), "grade": 90, "isGraded": True},
+    ])
+    return db
+
+
+def test_derived_stores_keep_archived_submissions(graded):
+    db = graded
+    rebuild_gradebook(db)
+    assert rebuild_submission_buckets(db) == 1
+    row = db[GRADEBOOK_COLLECTION].find_one({}, {"_id": 0, "averageGrade": 1, "submissionCount": 1})
+    assert row == {"averageGrade": 75.0, "submissionCount": 2}
+
+    assert run_archival(db, ArchivePolicy(horizon_days=365), now=datetime(2024, 1, 1))["submissions"] == 1
+    assert rebuild_gradebook(db) == 1
+    assert db[GRADEBOOK_COLLECTION].find_one({}, {"_id": 0, "averageGrade": 1, "submissionCount": 1}) == row
+    rebuild_submission_buckets(db)
+    assert db.submission_buckets.find_one()["count"] == 2
+
+    # A regrade on a gradebook without the row recomputes it over both collections
+    db[GRADEBOOK_COLLECTION].delete_many({})
+    previous = db.submissions.find_one_and_update({"submissionId": "sub002"}, {"$set": {"grade": 100}})
+    record_grade_change_in_gradebook(db, previous, 100)
+    assert db[GRADEBOOK_COLLECTION].find_one()["averageGrade"] == 80.0
+
+
+def test_file_archive_keeps_documents_that_stayed_hot(db, tmp_path):
+    db.submissions.insert_many([{"submissionId": "sub001"}, {"submissionId": "sub002"}])
+    documents = list(db.submissions.find())
+    archive = _FileArchive(str(tmp_path), db.submissions)
+    archive.stage(documents)
+    # sub002 changed after it was read, so the delete's re-check kept it hot
+    db.submissions.delete_one({"submissionId": "sub001"})
+    assert archive.commit(documents) == 1
+    assert [d["submissionId"] for d in read_archive_file(archive.path)] == ["sub001"]
+    assert not (tmp_path / "submissions.pending.jsonl.gz").exists()
+
+
+def test_file_archive_settles_an_interrupted_batch(db, views, tmp_path):
+    db.submissions.insert_many([{"submissionId": "sub001"}, {"submissionId": "sub002"}])
+    _FileArchive(str(tmp_path), db.submissions).stage(list(db.submissions.find()))
+    db.submissions.delete_many({})  # the run stopped between the delete and the append
+
+    summary = run_archival(db, ArchivePolicy(target="file", archive_dir=str(tmp_path)), now=datetime(2024, 1, 1))
+    assert summary["submissions"] == 2
+    assert sorted(d["submissionId"] for d in read_archive_file(summary["files"][0])) == ["sub001", "sub002"]
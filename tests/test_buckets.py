@@ -0,0 +1,88 @@
+# Import Useful Libraries
+from datetime import datetime
+
+import pytest
+from mongomock.collection import Collection
+
+import eduhub_buckets
+from eduhub_buckets import (SUBMISSION_BUCKETS_COLLECTION, append_submission_to_bucket, bucket_settings,
+                            disable_submission_buckets, enable_submission_buckets)
+
+
+@pytest.fixture
+def db(db):
+    db.assignments.insert_one({"assignmentId": "assign001", "courseId": "course001"})
+    db.submissions.insert_many([
+        {"submissionId": f"sub{i:03d}", "assignmentId": "assign001", "studentId": "user001",
+         "submittedDate": datetime(2024, 1, i + 1), "grade": 80 + i, "isGraded": True}
+        for i in range(3)
+    ])
+    return db
+
+
+def _new_process(monkeypatch):
+    """Forgets everything this process read, as another process would."""
+    monkeypatch.setattr(eduhub_buckets, "_bucket_settings_cache", {})
+
+
+@pytest.fixture
+def no_settings_wait(monkeypatch):
+    """Other processes see the mode at once, so enabling need not wait out their caches."""
+    monkeypatch.setattr(eduhub_buckets, "BUCKET_SETTINGS_CACHE_SECONDS", 0)
+
+
+def test_mode_is_shared_through_the_database(db, monkeypatch, no_settings_wait):
+    assert bucket_settings(db) is None
+    enable_submission_buckets(db, bucket_size=2)
+    assert bucket_settings(db) == {"bucketSize": 2}
+
+    _new_process(monkeypatch)
+    assert bucket_settings(db) == {"bucketSize": 2}
+
+    disable_submission_buckets(db)
+    assert bucket_settings(db) is None
+
+
+def test_other_processes_pick_up_changes_after_cache_expiry(db, monkeypatch):
+    assert bucket_settings(db) is None
+    # Another process enables the buckets
+    db[eduhub_buckets.SETTINGS_COLLECTION].insert_one({"_id": "submission_buckets", "enabled": True,
+                                                       "bucketSize": 10})
+    assert bucket_settings(db) is None
+
+    monkeypatch.setattr(eduhub_buckets, "BUCKET_SETTINGS_CACHE_SECONDS", -1)
+    assert bucket_settings(db) == {"bucketSize": 10}
+
+
+def test_appends_respect_stored_bucket_size(db, no_settings_wait):
+    enable_submission_buckets(db, bucket_size=2)
+    assert db[SUBMISSION_BUCKETS_COLLECTION].count_documents({}) == 2
+
+    submission = {"submissionId": "sub100", "assignmentId": "assign001", "studentId": "user001",
+                  "submittedDate": datetime(2024, 2, 1), "grade": 90, "isGraded": True}
+    append_submission_to_bucket(db, submission, "course001", bucket_settings(db)["bucketSize"])
+    counts = sorted(b["count"] for b in db[SUBMISSION_BUCKETS_COLLECTION].find())
+    assert counts == [2, 2]
+
+
+def test_rebuild_keeps_live_buckets_and_rescans_concurrent_submissions(db, monkeypatch, no_settings_wait):
+    enable_submission_buckets(db, bucket_size=2)
+    live_counts = []
+    bulk_write = Collection.bulk_write
+
+    def bulk_write_during_a_submission(collection, requests, **kwargs):
+        live_counts.append(db[SUBMISSION_BUCKETS_COLLECTION].count_documents({}))
+        # Another process submits while the rebuild runs and appends to the live buckets
+        submission = {"submissionId": "sub100", "assignmentId": "assign001", "studentId": "user001",
+                      "submittedDate": datetime(2024, 2, 1), "grade": 90, "isGraded": True}
+        db.submissions.insert_one(dict(submission))
+        append_submission_to_bucket(db, submission, "course001", 2)
+        monkeypatch.setattr(Collection, "bulk_write", bulk_write)
+        return bulk_write(collection, requests, **kwargs)
+
+    monkeypatch.setattr(Collection, "bulk_write", bulk_write_during_a_submission)
+    enable_submission_buckets(db, bucket_size=2)
+    assert live_counts == [2]
+    submission_ids = [s["submissionId"] for b in db[SUBMISSION_BUCKETS_COLLECTION].find() for s in b["submissions"]]
+    assert sorted(submission_ids) == ["sub000", "sub001", "sub002", "sub100"]
+    assert db.list_collection_names().count(SUBMISSION_BUCKETS_COLLECTION) == 1
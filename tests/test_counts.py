@@ -0,0 +1,82 @@
+# Import Useful Libraries
+import pytest
+from pymongo.errors import OperationFailure
+
+from eduhub_counts import TOTAL, collection_counts, collection_totals
+
+
+@pytest.fixture
+def db(db):
+    db.enrollments.insert_many([
+        {"enrollmentId": f"enroll{i:03d}", "courseId": f"course00{i % 3 + 1}", "completionStatus": i * 10}
+        for i in range(10)
+    ])
+    return db
+
+
+class _Collection:
+    """
+    Runs pipelines on mongomock, answering a leading $collStats as the server
+    does (one document per shard) or refusing it, as views and older servers do.
+    """
+
+    def __init__(self, collection, shard_counts=None):
+        self.collection = collection
+        self.name = collection.name
+        self.shard_counts = shard_counts
+        self.pipelines = []
+
+    def aggregate(self, pipeline, session=None):
+        self.pipelines.append(pipeline)
+        if "$collStats" not in pipeline[0]:
+            return self.collection.aggregate(pipeline)
+        if self.shard_counts is None:
+            raise OperationFailure("$collStats is not allowed on a view", 166)
+        union = pipeline[1]["$unionWith"]
+        return iter([{"count": count} for count in self.shard_counts] +
+                    list(self.collection.aggregate(union["pipeline"])))
+
+    def estimated_document_count(self):
+        return self.collection.estimated_document_count()
+
+    def count_documents(self, query, session=None):
+        self.pipelines.append(query)
+        return self.collection.count_documents(query)
+
+
+COUNTS = {"python": {"courseId": "course001"}, "completed": {"completionStatus": {"$gte": 50}}}
+
+
+def test_counts_and_first_documents_come_from_one_facet(db):
+    collection = _Collection(db.enrollments)
+    result = collection_counts(collection, COUNTS, first={
+        "first_python": ({"courseId": "course001"}, {"_id": 0, "enrollmentId": 1}),
+        "missing": ({"courseId": "course404"}, None),
+    })
+    assert result == {"python": 4, "completed": 5, "first_python": {"enrollmentId": "enroll000"}, "missing": None}
+    [pipeline] = collection.pipelines
+    assert pipeline[0] == {"$match": {"$or": [COUNTS["python"], COUNTS["completed"],
+                                              {"courseId": "course001"}, {"courseId": "course404"}]}}
+    assert "$facet" in pipeline[1]
+
+
+def test_total_is_summed_over_shards_in_the_same_command(db):
+    collection = _Collection(db.enrollments, shard_counts=[6, 4])
+    assert collection_counts(collection, COUNTS, total=True) == {"python": 4, "completed": 5, TOTAL: 10}
+    assert len(collection.pipelines) == 1
+
+
+def test_total_falls_back_without_collstats(db):
+    collection = _Collection(db.enrollments)
+    assert collection_counts(collection, COUNTS, total=True) == {"python": 4, "completed": 5, TOTAL: 10}
+
+
+def test_single_count_and_total_only_skip_the_facet(db):
+    collection = _Collection(db.enrollments)
+    assert collection_counts(collection, {"python": COUNTS["python"]}) == {"python": 4}
+    assert collection.pipelines == [COUNTS["python"]]
+    assert collection_counts(db.enrollments, total=True) == {TOTAL: 10}
+    assert collection_totals(db, ["enrollments", "users"]) == {"enrollments": 10, "users": 0}
+
+    with pytest.raises(ValueError):
+        collection_counts(db.enrollments, {TOTAL: {}})
@@ -0,0 +1,46 @@
+# Import Useful Libraries
+import copy
+from datetime import datetime, timezone
+
+import pytest
+
+from eduhub_dates import benchmark_date_parsing, convert_date_fields, parse_iso_utc, parse_iso_utc_uncached
+
+UTC = timezone.utc
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("2024-01-15T00:00:00Z", datetime(2024, 1, 15, tzinfo=UTC)),
+    ("2024-01-15T02:30:00+02:30", datetime(2024, 1, 15, tzinfo=UTC)),
+    ("2024-01-15T00:00:00", datetime(2024, 1, 15, tzinfo=UTC)),
+    ("2024-01-15T00:00:00.250Z", datetime(2024, 1, 15, 0, 0, 0, 250000, tzinfo=UTC)),
+])
+def test_parses_to_aware_utc(value, expected):
+    parsed = parse_iso_utc_uncached(value)
+    assert parsed == expected and parsed.tzinfo is UTC
+    assert parse_iso_utc(value) == expected
+
+
+@pytest.mark.parametrize("method", ["cached", "vectorized"])
+def test_convert_date_fields_leaves_other_values_alone(method):
+    converted = datetime(2023, 6, 1, tzinfo=UTC)
+    documents = [
+        {"enrollmentDate": "2024-01-15T00:00:00Z", "lastAccessed": "2024-02-01T12:00:00Z"},
+        {"enrollmentDate": converted, "lastAccessed": ""},
+        {"enrollmentDate": "2024-01-15T00:00:00Z"},
+    ]
+    original = copy.deepcopy(documents)
+    assert convert_date_fields(documents, ["enrollmentDate", "lastAccessed"], method=method) is documents
+    assert documents == [
+        {"enrollmentDate": datetime(2024, 1, 15, tzinfo=UTC), "lastAccessed": datetime(2024, 2, 1, 12, tzinfo=UTC)},
+        original[1],
+        {"enrollmentDate": datetime(2024, 1, 15, tzinfo=UTC)},
+    ]
+    assert all(doc["enrollmentDate"].utcoffset().total_seconds() == 0 for doc in documents)
+
+
+def test_benchmark_reports_every_method(capsys):
+    results = benchmark_date_parsing(n=200, distinct=20, chunk_size=50)
+    assert set(results) == {"strptime (current)", "fromisoformat", "fromisoformat + cache", "pandas vectorized"}
+    assert results["strptime (current)"]["speedup"] == 1.0
+    assert "200 timestamps (20 distinct)" in capsys.readouterr().out
@@ -0,0 +1,81 @@
+# Import Useful Libraries
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from pymongo.errors import DocumentTooLarge
+
+import eduhub_execution
+from eduhub_execution import ExecutionPolicy, _merge_partials, _run_after_group, scatter_gather
+
+AFTER_GROUP = [{"$match": {"n": {"$gte": 2}}}, {"$sort": {"_id": 1}}]
+
+
+class _DocumentsTooLarge:
+    """Database whose aggregate() fails client-side the way PyMongo does for an oversized command."""
+
+    def __init__(self, db):
+        self.db = db
+        self.aggregate_calls = 0
+
+    def aggregate(self, *args, **kwargs):
+        self.aggregate_calls += 1
+        raise DocumentTooLarge("BSON document too large")
+
+    def __getitem__(self, name):
+        return self.db[name]
+
+
+@pytest.fixture
+def rows():
+    return [{"_id": f"course{i:03d}", "n": i % 4, "padding": "x" * 1000} for i in range(50)]
+
+
+def test_oversized_documents_stage_falls_back_to_scratch(db, rows):
+    database = _DocumentsTooLarge(db)
+    documents = _run_after_group(database, rows, AFTER_GROUP, ExecutionPolicy())
+    assert database.aggregate_calls == 1
+    assert [d["_id"] for d in documents] == [r["_id"] for r in rows if r["n"] >= 2]
+    assert not [name for name in db.list_collection_names() if name.startswith("tmp_report_")]
+
+
+def test_rows_above_threshold_skip_documents_stage(db, rows, monkeypatch):
+    monkeypatch.setattr(eduhub_execution, "DOCUMENTS_STAGE_MAX_BYTES", 10_000)
+    database = _DocumentsTooLarge(db)
+    documents = _run_after_group(database, rows, AFTER_GROUP, ExecutionPolicy())
+    assert database.aggregate_calls == 0
+    assert len(documents) == len([r for r in rows if r["n"] >= 2])
+
+
+def test_min_max_merge_uses_bson_order():
+    plan = {"low": "$min", "high": "$max"}
+    oid = ObjectId()
+    chunks = [
+        [{"_id": "a", "low": "text", "high": 5}],
+        [{"_id": "a", "low": 7, "high": datetime(2024, 1, 1)}],
+        [{"_id": "a", "low": None, "high": oid}],
+        [{"_id": "a", "low": [1], "high": True}],
+    ]
+    merged, = _merge_partials(chunks, plan)
+    assert merged["low"] == 7
+    assert merged["high"] == datetime(2024, 1, 1)
+
+
+def test_scatter_gather_merges_mixed_types(db, monkeypatch):
+    monkeypatch.setattr(eduhub_execution, "DOCUMENTS_STAGE_MAX_BYTES", 0)  # mongomock has no db.aggregate
+    db.submissions.insert_many(
+        [{"assignmentId": f"assign{i % 3}", "grade": i} for i in range(30)]
+        + [{"assignmentId": "assign0", "grade": "incomplete"}, {"assignmentId": "assign1", "grade": "A"}]
+    )
+    stages = [
+        {"$group": {"_id": "$assignmentId", "n": {"$sum": 1}, "low": {"$min": "$grade"}, "high": {"$max": "$grade"}}},
+        {"$sort": {"_id": 1}},
+    ]
+    # Split on grade so each range holds one type (mongomock's own $min/$max cannot mix them)
+    documents, info = scatter_gather(db.submissions, stages, field="grade", partitions=3)
+    assert info["partitions"] > 1
+    assert documents == [
+        {"_id": "assign0", "n": 11, "low": 0, "high": "incomplete"},
+        {"_id": "assign1", "n": 11, "low": 1, "high": "A"},
+        {"_id": "assign2", "n": 10, "low": 2, "high": 29},
+    ]
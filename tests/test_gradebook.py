@@ -0,0 +1,54 @@
+# Import Useful Libraries
+from datetime import datetime
+
+import pytest
+
+from eduhub_gradebook import (GRADEBOOK_COLLECTION, get_course_grade_averages, get_student_rankings,
+                              rebuild_gradebook, record_grade_change_in_gradebook, record_submission_in_gradebook)
+
+
+@pytest.fixture
+def db(db):
+    db.assignments.insert_many([{"assignmentId": f"assign00{i}", "courseId": "course001"} for i in (1, 2, 3)])
+    db.submissions.insert_many([
+        {"submissionId": "sub001", "assignmentId": "assign001", "studentId": "user001",
+         "submittedDate": datetime(2024, 1, 1), "grade": 90, "isGraded": True},
+        {"submissionId": "sub002", "assignmentId": "assign002", "studentId": "user001",
+         "submittedDate": datetime(2024, 1, 2), "grade": 85, "isGraded": True},
+        {"submissionId": "sub003", "assignmentId": "assign003", "studentId": "user001",
+         "submittedDate": datetime(2024, 1, 3), "grade": 81, "isGraded": True},
+    ])
+    return db
+
+
+def _row(db):
+    return db[GRADEBOOK_COLLECTION].find_one({"studentId": "user001", "courseId": "course001"}, {"_id": 0})
+
+
+def test_rebuild_rounds_the_average(db):
+    assert rebuild_gradebook(db) == 1
+    assert _row(db) == {"studentId": "user001", "courseId": "course001", "submissionCount": 3, "gradeSum": 256,
+                        "gradedCount": 3, "averageGrade": 85.33, "lastSubmissionDate": datetime(2024, 1, 3)}
+    assert rebuild_gradebook(db) == 1
+    assert get_student_rankings(db) == [
+        {"studentId": "user001", "averageGrade": 85.33, "submissionCount": 3, "coursesWithSubmissions": 1}]
+    assert get_course_grade_averages(db) == [
+        {"courseId": "course001", "averageGrade": 85.33, "gradedCount": 3, "students": 1}]
+
+
+def test_regrade_without_a_backfill_rebuilds_the_row(db):
+    previous = db.submissions.find_one_and_update({"submissionId": "sub003"}, {"$set": {"grade": 82}})
+    record_grade_change_in_gradebook(db, previous, 82)
+    assert _row(db)["averageGrade"] == 85.67
+    assert db[GRADEBOOK_COLLECTION].count_documents({}) == 1
+
+
+def test_incremental_updates_keep_the_rounded_average(db):
+    rebuild_gradebook(db)
+    submission = {"submissionId": "sub004", "assignmentId": "assign001", "studentId": "user001",
+                  "submittedDate": datetime(2024, 1, 4), "grade": 100, "isGraded": True}
+    db.submissions.insert_one(submission)
+    record_submission_in_gradebook(db, submission)
+    row = _row(db)
+    assert (row["gradeSum"], row["gradedCount"], row["averageGrade"]) == (356, 4, 89.0)
+    assert row["lastSubmissionDate"] == datetime(2024, 1, 4)
@@ -0,0 +1,134 @@
+# Import Useful Libraries
+import copy
+import json
+import os
+
+import pytest
+from bson import json_util
+
+from eduhub_import import (CONTENT_HASH_FIELD, CollectionCheckpointStore, FileCheckpointStore, iter_export_documents,
+                           resumable_load_data_to_collections, sync_data_to_collections)
+
+with open(os.path.join(os.path.dirname(__file__), "..", "data", "sample_data.json")) as f:
+    SAMPLE = json.load(f)
+
+EXPORT = {
+    "users": [{"userId": f"user{i:03d}", "firstName": "Zoë", "email": f"u{i}@x.io"} for i in range(5)],
+    "meta": {"exportedAt": "2024-01-01"},
+    "courses": [],
+    "lessons": [{"lessonId": "lesson001", "courseId": "course001", "title": "Ünïcode [brackets], \"quotes\""}],
+}
+
+
+@pytest.fixture
+def export(tmp_path):
+    path = tmp_path / "export.json"
+    path.write_text(json.dumps(EXPORT, indent=2, ensure_ascii=False), encoding="utf-8")
+    return str(path)
+
+
+def _load(export, db, **kwargs):
+    return resumable_load_data_to_collections(export, target_db=db, validate=False, **kwargs)
+
+
+def test_reader_streams_elements_and_resumes_at_their_offsets(export):
+    # A tiny chunk size makes values and multi-byte characters straddle buffer refills
+    read = list(iter_export_documents(export, chunk_size=7))
+    assert [(name, doc) for name, doc, _ in read] == [
+        ("users", doc) for doc in EXPORT["users"]] + [("lessons", EXPORT["lessons"][0])]
+
+    for index, (name, _, offset) in enumerate(read):
+        resumed = list(iter_export_documents(export, name, offset, chunk_size=7))
+        assert resumed == read[index + 1:]
+
+
+class _CrashingStore(FileCheckpointStore):
+    """Checkpoint store whose process dies before recording the given batch."""
+
+    def __init__(self, path, crash_at):
+        super().__init__(path)
+        self.crash_at = crash_at
+
+    def save(self, import_id, state):
+        if state["batch"] == self.crash_at:
+            raise KeyboardInterrupt
+        super().save(import_id, state)
+
+
+def test_interrupted_import_resumes_at_its_checkpoint(export, db, tmp_path):
+    checkpoint_path = str(tmp_path / "export.checkpoint.json")
+    with pytest.raises(KeyboardInterrupt):
+        _load(export, db, batch_size=2, checkpoint_store=_CrashingStore(checkpoint_path, crash_at=2))
+    assert db.users.count_documents({}) == 4  # batch 2 was written, its checkpoint was not
+
+    state = _load(export, db, batch_size=2, checkpoint_store=FileCheckpointStore(checkpoint_path))
+    assert state["completed"] and state["batch"] == 4
+    assert state["counts"]["users"] == {"upserted": 3, "matched": 2, "rejected": 0}
+    assert db.users.count_documents({}) == 5
+    assert db.lessons.find_one({}, {"_id": 0}) == EXPORT["lessons"][0]
+
+
+def test_rerunning_a_completed_import_writes_nothing(export, db):
+    store = CollectionCheckpointStore(db)
+    first = _load(export, db, checkpoint_store=store)
+    db.users.delete_many({"userId": "user000"})
+    assert _load(export, db, checkpoint_store=store) == first
+    assert db.users.count_documents({}) == 4
+
+
+def test_server_rejections_are_recorded_not_raised(export, db, tmp_path):
+    db.users.create_index("email", unique=True)
+    db.users.insert_one({"userId": "user999", "email": "u3@x.io"})
+    reject_file = str(tmp_path / "rejects.jsonl")
+
+    state = _load(export, db, checkpoint_store=CollectionCheckpointStore(db), reject_file=reject_file)
+    assert state["completed"]
+    assert state["counts"]["users"]["rejected"] == 1
+    assert db.users.count_documents({}) == 5
+    with open(reject_file) as f:
+        rejects = [json_util.loads(line) for line in f]
+    assert [(r["collection"], r["document"]["userId"]) for r in rejects] == [("users", "user003")]
+
+
+def _sync(db, tmp_path, export, **kwargs):
+    path = tmp_path / "daily.json"
+    path.write_text(json.dumps(export))
+    return sync_data_to_collections(str(path), target_db=db, reject_file=str(tmp_path / "rejects.jsonl"), **kwargs)
+
+
+@pytest.fixture
+def daily():
+    return {"users": copy.deepcopy(SAMPLE["users"][:3]), "courses": copy.deepcopy(SAMPLE["courses"][:2])}
+
+
+def test_sync_writes_only_what_changed(db, tmp_path, daily):
+    assert _sync(db, tmp_path, daily)["users"]["inserted"] == 3
+    assert _sync(db, tmp_path, daily) == {
+        name: {"unchanged": len(records), "inserted": 0, "updated": 0, "deleted": 0, "rejected": 0, "fieldsSet": 0}
+        for name, records in daily.items()}
+
+    stored = db.users.find_one({"userId": "user002"})
+    daily["users"][0]["lastName"] = "Adesanya-Bello"
+    del daily["users"][0]["profile"]
+    stats = _sync(db, tmp_path, daily)["users"]
+    assert (stats["updated"], stats["unchanged"], stats["fieldsSet"]) == (1, 2, 2)  # lastName and contentHash
+    user = db.users.find_one({"userId": "user001"})
+    assert user["lastName"] == "Adesanya-Bello" and "profile" not in user
+    assert db.users.find_one({"userId": "user002"}) == stored
+
+
+def test_sync_deletes_missing_records_and_dry_run_writes_nothing(db, tmp_path, daily):
+    _sync(db, tmp_path, daily)
+    hashes = {user["userId"]: user[CONTENT_HASH_FIELD] for user in db.users.find()}
+    daily["users"] = daily["users"][1:] + [dict(daily["users"][1], email="again@x.io")]
+    daily["users"][0]["isActive"] = False
+
+    preview = _sync(db, tmp_path, daily, delete_missing=True, dry_run=True)["users"]
+    assert (preview["updated"], preview["deleted"], preview["rejected"]) == (1, 1, 1)
+    assert {user["userId"]: user[CONTENT_HASH_FIELD] for user in db.users.find()} == hashes
+
+    stats = _sync(db, tmp_path, daily, delete_missing=True)["users"]
+    assert stats == preview
+    assert sorted(user["userId"] for user in db.users.find()) == ["user002", "user003"]
+    assert db.users.find_one({"userId": "user002"})["isActive"] is False
+    assert db.courses.count_documents({}) == 2
@@ -0,0 +1,132 @@
+# Import Useful Libraries
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+from eduhub_indexes import INDEX_MANIFEST, _definition, plan_indexes, reconcile_indexes, retention_manifest
+
+
+class _IndexedCollection:
+    """
+    Index catalog with the server's createIndexes rules, which mongomock does not
+    enforce (it also drops partialFilterExpression): a name holds one definition
+    and a definition one name.
+    """
+
+    def __init__(self):
+        self.indexes = {"_id_": {"key": [("_id", 1)], "v": 2}}
+        self.builds = []
+
+    def index_information(self):
+        return {name: dict(info) for name, info in self.indexes.items()}
+
+    def create_indexes(self, models, **kwargs):
+        for model in models:
+            spec = dict(model.document)
+            name, keys = spec.pop("name"), list(spec.pop("key").items())
+            spec.pop("hidden", None)
+            wanted = _definition(keys, spec)
+            for other, info in self.indexes.items():
+                if _definition(info["key"], info) != wanted:
+                    if other == name:
+                        raise OperationFailure("An existing index has the same name", 86)
+                elif other != name:
+                    raise OperationFailure(f"Index already exists with a different name: {other}", 85)
+            self.indexes[name] = dict(spec, key=keys, v=2)
+            self.builds.append(name)
+
+    def drop_index(self, name):
+        del self.indexes[name]
+
+    def aggregate(self, pipeline):
+        raise OperationFailure("$indexStats is not available", 40415)
+
+
+def _manifest(options):
+    return {"users": [("active_students_partial", [("isActive", ASCENDING), ("role", ASCENDING)], options)]}
+
+
+def test_rebuild_of_a_changed_option_converges():
+    db = {"users": _IndexedCollection()}
+    old, new = _manifest({"partialFilterExpression": {"role": "student"}}), _manifest(
+        {"partialFilterExpression": {"role": "student", "isActive": True}})
+    reconcile_indexes(db, old, apply=True, hidden_build=False)
+    assert [action["action"] for action in plan_indexes(db, old)] == ["ok"]
+
+    # Rolling: the new definition is built before the old index goes, and keeps its temporary name
+    report = reconcile_indexes(db, new, apply=True, hidden_build=False)
+    assert report["applied"] == ["rebuild users.active_students_partial"]
+    assert set(db["users"].indexes) == {"_id_", "active_students_partial__reconcile"}
+    assert [(action["action"], action["existing"]) for action in plan_indexes(db, new)] == [
+        ("equivalent", "active_students_partial__reconcile")]
+
+    report = reconcile_indexes(db, new, apply=True, hidden_build=False, rename_equivalent=True)
+    assert report["applied"] == ["equivalent users.active_students_partial"]
+    assert set(db["users"].indexes) == {"_id_", "active_students_partial"}
+    assert [action["action"] for action in plan_indexes(db, new)] == ["ok"]
+
+
+def test_rebuild_with_rename_finishes_under_the_manifest_name():
+    db = {"users": _IndexedCollection()}
+    db["users"].create_indexes([IndexModel([("isActive", ASCENDING), ("role", ASCENDING)],
+                                           name="active_students_partial", sparse=True)])
+
+    reconcile_indexes(db, _manifest({"partialFilterExpression": {"role": "student"}}), apply=True,
+                      hidden_build=False, rename_equivalent=True)
+    assert db["users"].builds[1:] == ["active_students_partial__reconcile", "active_students_partial"]
+    assert db["users"].indexes["active_students_partial"]["partialFilterExpression"] == {"role": "student"}
+    assert set(db["users"].indexes) == {"_id_", "active_students_partial"}
+
+
+class _DuplicatedCollection(_IndexedCollection):
+    """Holds documents sharing a key, so every unique build fails."""
+
+    def create_indexes(self, models, **kwargs):
+        if any(model.document.get("unique") for model in models):
+            raise OperationFailure("E11000 duplicate key error", 11000)
+        super().create_indexes(models, **kwargs)
+
+
+def test_unique_rebuild_over_duplicates_keeps_the_old_index():
+    db = {"enrollments": _DuplicatedCollection()}
+    old = {"enrollments": [("enrollment_id_idx", [("enrollmentId", ASCENDING)], {})]}
+    new = {"enrollments": [("enrollment_id_idx", [("enrollmentId", ASCENDING)], {"unique": True})]}
+    reconcile_indexes(db, old, apply=True, hidden_build=False)
+
+    report = reconcile_indexes(db, new, apply=True, hidden_build=False)
+    assert report["applied"] == []
+    assert [(collection, name) for collection, name, _ in report["failed"]] == [("enrollments", "enrollment_id_idx")]
+    assert set(db["enrollments"].indexes) == {"_id_", "enrollment_id_idx"}
+
+
+def test_create_functions_build_the_manifest_indexes(db):
+    from eduhub_archive import ArchivePolicy, create_archive_indexes
+    from eduhub_buckets import create_bucket_indexes
+    from eduhub_gradebook import create_gradebook_indexes
+    from eduhub_outlines import create_outline_indexes
+    from eduhub_sketches import create_sketch_indexes
+    from eduhub_telemetry import create_telemetry_indexes
+
+    create_gradebook_indexes(db)
+    create_outline_indexes(db)
+    create_bucket_indexes(db)
+    create_sketch_indexes(db)
+    create_archive_indexes(db, ArchivePolicy(retention_days=365))
+    create_telemetry_indexes(db, retention_days=7)
+
+    derived = ("gradebook", "course_outlines", "submission_buckets", "engagement_sketches",
+               "enrollments_archive", "submissions_archive", "telemetry_snapshots")
+    manifest = retention_manifest(archive_retention_days=365, telemetry_retention_days=7)
+    actions = plan_indexes(db, {name: manifest[name] for name in derived})
+    assert {action["action"] for action in actions} == {"ok"}
+
+    # Without the retention configuration the TTLs differ from the manifest defaults
+    actions = plan_indexes(db, {name: INDEX_MANIFEST[name] for name in derived})
+    assert sorted((a["collection"], a["name"], a["action"]) for a in actions if a["action"] != "ok") == [
+        ("enrollments_archive", "archive_ttl_idx", "extra"),
+        ("submissions_archive", "archive_ttl_idx", "extra"),
+        ("telemetry_snapshots", "telemetry_taken_at_idx", "rebuild"),
+    ]
+
+    # Turning retention off drops the archive TTL again
+    create_archive_indexes(db, ArchivePolicy())
+    assert "archive_ttl_idx" not in db.enrollments_archive.index_information()
@@ -0,0 +1,67 @@
+# Import Useful Libraries
+import pytest
+
+from eduhub_gradebook import GRADEBOOK_COLLECTION
+from eduhub_leaderboards import (heap_top_k, top_courses_by_enrollments, top_instructors_by_revenue,
+                                 top_students_by_grade)
+
+
+@pytest.fixture
+def db(db):
+    db.users.insert_many([
+        {"userId": "user001", "firstName": "Ada", "lastName": "Lovelace"},
+        {"userId": "user002", "firstName": "Alan", "lastName": "Turing"},
+        {"userId": "user003", "firstName": "Grace", "lastName": "Hopper"},
+        {"userId": "user010", "firstName": "Edsger", "lastName": "Dijkstra"},
+        {"userId": "user011", "firstName": "Barbara", "lastName": "Liskov"},
+    ])
+    db.courses.insert_many([
+        {"courseId": "course001", "title": "Python", "instructorId": "user010", "price": 100},
+        {"courseId": "course002", "title": "Algorithms", "instructorId": "user010", "price": 50},
+        {"courseId": "course003", "title": "Abstraction", "instructorId": "user011", "price": 300},
+    ])
+    db.enrollments.insert_many(
+        [{"studentId": f"user00{i}", "courseId": "course001"} for i in (1, 2, 3)]
+        + [{"studentId": f"user00{i}", "courseId": "course002"} for i in (1, 2)]
+        + [{"studentId": "user003", "courseId": "course003"}]
+    )
+    # user001: 85.0 over 2 courses, user002: 85.0 over 1, user003: 70.333...
+    db[GRADEBOOK_COLLECTION].insert_many([
+        {"studentId": "user001", "courseId": "course001", "gradeSum": 170, "gradedCount": 2, "submissionCount": 2},
+        {"studentId": "user001", "courseId": "course002", "gradeSum": 85, "gradedCount": 1, "submissionCount": 1},
+        {"studentId": "user002", "courseId": "course001", "gradeSum": 170, "gradedCount": 2, "submissionCount": 2},
+        {"studentId": "user003", "courseId": "course001", "gradeSum": 211, "gradedCount": 3, "submissionCount": 3},
+        {"studentId": "user003", "courseId": "course003", "gradeSum": 0, "gradedCount": 0, "submissionCount": 1},
+    ])
+    return db
+
+
+def test_heap_keeps_the_k_largest_and_breaks_ties_by_arrival():
+    documents = [{"id": i, "score": score} for i, score in enumerate([5, 9, 7, 9, 1, 7])]
+    assert [d["id"] for d in heap_top_k(iter(documents), 3, lambda d: d["score"])] == [1, 3, 2]
+    assert heap_top_k(iter(documents), 10, lambda d: d["score"]) == sorted(
+        documents, key=lambda d: d["score"], reverse=True)
+    assert heap_top_k(iter([]), 3, lambda d: d["score"]) == []
+
+
+@pytest.mark.parametrize("server_side", [True, False])
+def test_top_students_by_grade(db, server_side):
+    assert top_students_by_grade(db, 2, server_side=server_side) == [
+        {"studentId": "user001", "averageGrade": 85.0, "submissionCount": 3, "studentName": "Ada Lovelace"},
+        {"studentId": "user002", "averageGrade": 85.0, "submissionCount": 2, "studentName": "Alan Turing"},
+    ]
+    assert top_students_by_grade(db, 5, server_side=server_side)[-1]["averageGrade"] == 70.33
+
+
+@pytest.mark.parametrize("server_side", [True, False])
+def test_top_courses_and_instructors(db, server_side):
+    courses = top_courses_by_enrollments(db, 2, server_side=server_side)
+    assert [(c["courseTitle"], c["totalEnrollments"]) for c in courses] == [("Python", 3), ("Algorithms", 2)]
+
+    instructors = top_instructors_by_revenue(db, 5, server_side=server_side)
+    assert instructors == [
+        {"instructorId": "user010", "totalRevenue": 400, "totalStudents": 5, "coursesTaught": 2,
+         "instructorName": "Edsger Dijkstra"},
+        {"instructorId": "user011", "totalRevenue": 300, "totalStudents": 1, "coursesTaught": 1,
+         "instructorName": "Barbara Liskov"},
+    ]
@@ -0,0 +1,20 @@
+# Import Useful Libraries
+from eduhub_loadtest import get_standin_database, run_load_test, summarize_samples
+
+
+def test_short_load_on_the_standin_has_no_errors():
+    report = run_load_test(get_standin_database(), concurrency=2, duration=0.5, interval=0.1)
+    assert report["overall"]["operations"] > 0
+    assert report["error_types"] == {}
+    assert report["overall"]["error_rate"] == 0.0
+    assert set(report["by_operation"]) == {"enroll_student_in_course", "update_assignment_grade",
+                                           "add_lesson_to_course", "find_active_students"}
+
+
+def test_partial_last_bucket_uses_its_own_width():
+    samples = [(0.1, "find_active_students", 0.01, None), (0.5, "find_active_students", 0.01, None),
+               (1.1, "find_active_students", 0.01, "TimeoutError"), (1.2, "find_active_students", 0.01, None)]
+    report = summarize_samples(samples, 0.0, 1.25, 1.0, {})
+    assert [(bucket["t"], bucket["throughput"]) for bucket in report["timeline"]] == [(0.0, 2.0), (1.0, 8.0)]
+    assert report["overall"]["throughput"] == 3.2
+    assert report["error_types"] == {"TimeoutError": 1}
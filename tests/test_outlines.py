@@ -0,0 +1,73 @@
+# Import Useful Libraries
+import pytest
+
+from eduhub_outlines import (MIGRATION_COLLECTION, OUTLINE_COLLECTION, add_lesson_to_outline, get_course_outline,
+                             get_course_page, migrate_course_outlines, update_outline_course_fields,
+                             update_outline_instructor, verify_course_outlines)
+from eduhub_queries import add_lesson_to_course, create_new_course
+
+
+@pytest.fixture
+def db(db):
+    db.users.insert_one({"userId": "user010", "firstName": "Grace", "lastName": "Hopper",
+                         "role": "instructor", "profile": {"bio": "Compilers"}})
+    db.courses.insert_one({"courseId": "course001", "title": "Python", "description": "Intro",
+                           "category": "programming", "level": "beginner", "price": 10,
+                           "isPublished": False, "tags": ["python"], "instructorId": "user010"})
+    db.lessons.insert_one({"lessonId": "lesson001", "courseId": "course001", "title": "Setup", "sequence": 1})
+    # The outline as migrate_course_outlines() stores it
+    outline = get_course_page(db, "course001")
+    db[OUTLINE_COLLECTION].insert_one({**outline, "courseId": "course001"})
+    return db
+
+
+def test_course_field_changes_reach_outline(db):
+    update_outline_course_fields(db, "course001", {"title": "Python", "isPublished": True, "updatedAt": 1})
+    update_outline_course_fields(db, "course001", {"tags": ["python", "beginner"]})
+    outline = get_course_outline(db, "course001")
+    assert outline["isPublished"] is True
+    assert outline["tags"] == ["python", "beginner"]
+    assert "updatedAt" not in outline
+
+
+def test_instructor_changes_reach_outline(db):
+    update_outline_instructor(db, "user010", {"firstName": "Grace", "lastName": "Murray Hopper",
+                                              "profile": {"bio": "COBOL"}})
+    assert get_course_outline(db, "course001")["instructor"] == {
+        "userId": "user010", "name": "Grace Murray Hopper", "bio": "COBOL"}
+
+    update_outline_instructor(db, "user010", {"firstName": "Grace", "lastName": "Hopper", "profile": {}})
+    assert "bio" not in get_course_outline(db, "course001")["instructor"]
+
+
+def test_added_lesson_matches_page(db):
+    lesson = {"lessonId": "lesson002", "courseId": "course001", "title": "Loops", "sequence": 2}
+    db.lessons.insert_one(dict(lesson))
+    add_lesson_to_outline(db, lesson)
+    # No duration: the summary omits it instead of storing null, as the pipeline does
+    assert get_course_outline(db, "course001")["lessons"] == get_course_page(db, "course001")["lessons"]
+
+
+def test_new_course_has_an_outline_for_its_lessons(db, lookup_pipelines):
+    db.users.insert_one({"userId": "user012", "firstName": "Nneka", "lastName": "Onyemaobi",
+                         "role": "instructor", "profile": {"bio": "ML"}})
+    create_new_course(db)
+    assert get_course_outline(db, "course009") == get_course_page(db, "course009")
+
+    add_lesson_to_course(db)
+    outline = get_course_outline(db, "course009")
+    assert [lesson["lessonId"] for lesson in outline["lessons"]] == ["lesson026"]
+    assert outline == get_course_page(db, "course009")
+
+
+def test_resumed_migration_backfills_courses_behind_it(db, lookup_pipelines):
+    db[OUTLINE_COLLECTION].delete_many({})
+    assert migrate_course_outlines(db) == 1
+    assert db[MIGRATION_COLLECTION].find_one({"_id": OUTLINE_COLLECTION})["lastCourseId"] == "course001"
+
+    # Created after the ordered pass went past its courseId
+    db.courses.insert_one({"courseId": "course000", "title": "Git", "instructorId": "user010"})
+    assert migrate_course_outlines(db) == 1
+    assert get_course_outline(db, "course000") == get_course_page(db, "course000")
+    assert migrate_course_outlines(db) == 0
+    assert verify_course_outlines(db) == {"missing": [], "stale": [], "orphaned": []}
@@ -0,0 +1,85 @@
+# Import Useful Libraries
+import pytest
+
+from eduhub_pipelines import Pipeline, check_equivalence, optimize_pipeline
+
+
+@pytest.fixture
+def db(db, lookup_pipelines):
+    db.users.insert_many([
+        {"userId": "user001", "role": "student", "firstName": "Ada"},
+        {"userId": "user002", "role": "student", "firstName": "Alan"},
+        {"userId": "user003", "role": "student", "firstName": "Grace"},
+        {"userId": "user004", "role": "instructor", "firstName": "Edsger"},
+    ])
+    db.submissions.insert_many([
+        {"submissionId": "sub001", "studentId": "user001", "assignmentId": "assign001", "grade": 95},
+        {"submissionId": "sub002", "studentId": "user001", "assignmentId": "assign002", "grade": 72},
+        {"submissionId": "sub003", "studentId": "user002", "assignmentId": "assign001", "grade": 91},
+        {"submissionId": "sub004", "studentId": "user002", "assignmentId": "assign002", "grade": 90},
+        {"submissionId": "sub005", "studentId": "user002", "assignmentId": "assign003", "grade": 40},
+    ])
+    return db
+
+
+def _submissions_lookup():
+    return Pipeline().match({"role": "student"}).lookup("submissions", "userId", "studentId", "subs")
+
+
+def _lookup_stage(stages):
+    return next(stage["$lookup"] for stage in stages if "$lookup" in stage)
+
+
+def _assert_equivalent(db, stages):
+    result = check_equivalence(db.users, stages)
+    assert result["equivalent"], result
+    return result
+
+
+def test_size_of_filter_reads_joined_documents(db):
+    stages = _submissions_lookup().project({
+        "userId": 1,
+        "highGrades": {"$size": {"$filter": {"input": "$subs", "cond": {"$gte": ["$$this.grade", 90]}}}},
+    }).sort({"userId": 1}).build(optimize=False)
+
+    assert "pipeline" not in _lookup_stage(optimize_pipeline(stages))
+    _assert_equivalent(db, stages)
+    assert [d["highGrades"] for d in db.users.aggregate(optimize_pipeline(stages))] == [1, 2, 0]
+
+
+@pytest.mark.parametrize("expression", [
+    {"$size": {"$map": {"input": "$subs", "in": "$$this.grade"}}},
+    {"$size": {"$setUnion": ["$subs.assignmentId", []]}},
+    {"$size": ["$subs.grade"]},
+])
+def test_size_of_other_expressions_keeps_fields(db, expression):
+    stages = _submissions_lookup().project({"userId": 1, "n": expression}).build(optimize=False)
+    lookup = _lookup_stage(optimize_pipeline(stages))
+    projections = [s["$project"] for s in lookup.get("pipeline", []) if "$project" in s]
+    assert projections != [{"_id": 1}]
+    _assert_equivalent(db, stages)
+
+
+def test_direct_size_is_count_only(db):
+    stages = _submissions_lookup().project({"userId": 1, "submissions": {"$size": "$subs"}}).build(optimize=False)
+    result = _assert_equivalent(db, stages)
+    assert _lookup_stage(optimize_pipeline(stages))["pipeline"] == [{"$project": {"_id": 1}}]
+    assert "pruned 'subs' lookup to ['_id']" in result["rewrites"]
+
+
+def test_joined_filter_moves_into_lookup(db):
+    stages = (_submissions_lookup().unwind("$subs").match({"subs.grade": {"$gte": 90}})
+              .group({"_id": "$userId", "best": {"$max": "$subs.grade"}, "n": {"$sum": 1}})
+              .build(optimize=False))
+    optimized = optimize_pipeline(stages)
+    assert {"$match": {"grade": {"$gte": 90}}} in _lookup_stage(optimized)["pipeline"]
+    assert not any("$match" in stage and "subs.grade" in stage["$match"] for stage in optimized)
+    _assert_equivalent(db, stages)
+
+
+def test_root_filter_moves_ahead_of_lookup(db):
+    stages = (Pipeline().lookup("submissions", "userId", "studentId", "subs").match({"role": "student"})
+              .project({"userId": 1, "firstName": 1, "n": {"$size": "$subs"}}).build(optimize=False))
+    optimized = optimize_pipeline(stages)
+    assert "$match" in optimized[0]
+    _assert_equivalent(db, stages)
@@ -0,0 +1,64 @@
+# Import Useful Libraries
+import itertools
+import threading
+from types import SimpleNamespace
+
+from pymongo.collection import Collection
+
+from eduhub_profiling import COMMAND_TIMER, profile_section
+
+_request_ids = itertools.count(1)
+
+
+def _command(name, micros):
+    """Sends one synthetic command through COMMAND_TIMER, as the driver would."""
+    event = SimpleNamespace(connection_id=("localhost", 27017), request_id=next(_request_ids),
+                            command_name=name, duration_micros=micros)
+    COMMAND_TIMER.started(event)
+    COMMAND_TIMER.succeeded(event)
+
+
+def test_nested_sections_share_inner_commands():
+    with profile_section("outer") as outer:
+        _command("find", 1000)
+        with profile_section("inner") as inner:
+            _command("aggregate", 2000)
+    _command("find", 4000)  # outside any section
+
+    assert outer["commands"] == {"find": 1, "aggregate": 1}
+    assert outer["command_ms"] == {"find": 1.0, "aggregate": 2.0}
+    assert inner["commands"] == {"aggregate": 1}
+
+
+def test_concurrent_sections_stay_apart():
+    reports = {}
+    barrier = threading.Barrier(4)
+
+    def run(name, count):
+        with profile_section(name) as report:
+            barrier.wait()
+            for _ in range(count):
+                _command(name, 100)
+            barrier.wait()
+        reports[name] = report
+
+    threads = [threading.Thread(target=run, args=(f"t{i}", i + 1)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert {name: report["commands"] for name, report in reports.items()} == {
+        f"t{i}": {f"t{i}": i + 1} for i in range(4)
+    }
+
+
+def test_driver_is_unpatched_after_last_section():
+    original = Collection.__dict__["find"]
+    first = profile_section("first")
+    first.__enter__()
+    with profile_section("second"):
+        assert Collection.__dict__["find"] is not original
+    assert Collection.__dict__["find"] is not original
+    first.__exit__(None, None, None)
+    assert Collection.__dict__["find"] is original
@@ -0,0 +1,131 @@
+# Import Useful Libraries
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+from eduhub_progress import EnrollmentProgressBuffer
+
+
+@pytest.fixture
+def buffer(db):
+    db.enrollments.insert_many([
+        {"enrollmentId": "enroll001", "studentId": "user001", "courseId": "course001", "completionStatus": 10},
+        {"enrollmentId": "enroll002", "studentId": "user002", "courseId": "course001", "completionStatus": 50},
+    ])
+    with EnrollmentProgressBuffer(db, flush_interval=None, flush_on_exit=False, sketches=False) as progress:
+        yield progress
+
+
+def test_events_are_merged_with_max(db, buffer):
+    buffer.record("enroll001", completion_status=40)
+    buffer.record("enroll001", completion_status=35)
+    buffer.record("enroll002", completion_status=20)
+
+    assert buffer.flush() == 2
+    assert db.enrollments.find_one({"enrollmentId": "enroll001"})["completionStatus"] == 40
+    assert db.enrollments.find_one({"enrollmentId": "enroll002"})["completionStatus"] == 50
+
+
+def test_failed_flush_requeues_whole_batch(db, buffer, monkeypatch):
+    buffer.record("enroll001", completion_status=40)
+    buffer.record("enroll002", completion_status=60)
+
+    def unreachable(*args, **kwargs):
+        raise AutoReconnect("primary stepped down")
+
+    monkeypatch.setattr(buffer.collection, "bulk_write", unreachable)
+    with pytest.raises(AutoReconnect):
+        buffer.flush()
+    assert buffer.pending_count() == 2
+    assert buffer.stats["errors"] == 2
+
+    monkeypatch.undo()
+    buffer.record("enroll001", completion_status=30)
+    assert buffer.flush() == 2
+    assert db.enrollments.find_one({"enrollmentId": "enroll001"})["completionStatus"] == 40
+    assert db.enrollments.find_one({"enrollmentId": "enroll002"})["completionStatus"] == 60
+
+
+def test_naive_and_aware_timestamps_mix(buffer):
+    buffer.record("enroll001", last_accessed=datetime(2024, 1, 1, 12, 0))
+    buffer.record("enroll001")
+    buffer.record("enroll001", last_accessed=datetime(2024, 1, 2, tzinfo=timezone.utc))
+    assert buffer.pending_count() == 1
+
+
+def _bulk_write_error(write_errors=(), write_concern_errors=()):
+    return BulkWriteError({"writeErrors": list(write_errors), "writeConcernErrors": list(write_concern_errors),
+                           "nMatched": 0})
+
+
+def test_permanent_write_errors_are_dead_lettered(buffer, monkeypatch):
+    buffer.record("enroll001", completion_status=140)
+    buffer.record("enroll002", completion_status=60)
+
+    def reject(requests, ordered):
+        raise _bulk_write_error([{"index": 0, "code": 121, "errmsg": "Document failed validation"}])
+
+    monkeypatch.setattr(buffer.collection, "bulk_write", reject)
+    assert buffer.flush() == 2
+    assert buffer.pending_count() == 0
+    assert buffer.dead_letters == [{"enrollmentId": "enroll001", "update": {
+        "completionStatus": 140, "lastAccessed": buffer.dead_letters[0]["update"]["lastAccessed"]},
+        "code": 121, "errmsg": "Document failed validation"}]
+    assert buffer.stats["dead_lettered"] == 1
+
+
+def test_transient_write_errors_are_retried_up_to_the_cap(buffer, monkeypatch):
+    buffer.max_retries = 2
+    buffer.record("enroll001", completion_status=40)
+
+    def conflict(requests, ordered):
+        raise _bulk_write_error([{"index": 0, "code": 112, "errmsg": "WriteConflict"}])
+
+    monkeypatch.setattr(buffer.collection, "bulk_write", conflict)
+    for pending in (1, 1, 0):
+        buffer.flush()
+        assert buffer.pending_count() == pending
+    assert buffer.stats["retried"] == 2
+    assert [letter["code"] for letter in buffer.dead_letters] == [112]
+
+
+def test_close_drains_retries_and_returns_dead_letters(db, monkeypatch):
+    db.enrollments.insert_one({"enrollmentId": "enroll001", "completionStatus": 10})
+    progress = EnrollmentProgressBuffer(db, flush_interval=None, flush_on_exit=False)
+    progress.record("enroll001", completion_status=40)
+    bulk_write, calls = progress.collection.bulk_write, []
+
+    def conflict_once(requests, ordered):
+        calls.append(len(requests))
+        if len(calls) == 1:
+            raise _bulk_write_error([{"index": 0, "code": 112, "errmsg": "WriteConflict"}])
+        return bulk_write(requests, ordered=ordered)
+
+    monkeypatch.setattr(progress.collection, "bulk_write", conflict_once)
+    assert progress.close() == []
+    assert calls == [1, 1]
+    assert db.enrollments.find_one({"enrollmentId": "enroll001"})["completionStatus"] == 40
+
+
+def test_write_concern_errors_are_reported(buffer, monkeypatch):
+    buffer.record("enroll001", completion_status=40)
+
+    def unreplicated(requests, ordered):
+        raise _bulk_write_error(write_concern_errors=[{"code": 64, "errmsg": "waiting for replication timed out"}])
+
+    monkeypatch.setattr(buffer.collection, "bulk_write", unreplicated)
+    buffer.flush()
+    assert buffer.stats["write_concern_errors"] == 1
+    assert list(buffer.write_concern_errors) == [{"code": 64, "errmsg": "waiting for replication timed out"}]
+    assert buffer.pending_count() == 0 and buffer.dead_letters == []
+
+
+def test_enrollments_and_progress_store_the_same_utc_instants(db):
+    from eduhub_queries import enroll_student_in_course
+
+    before = datetime.now(timezone.utc).replace(tzinfo=None)
+    enroll_student_in_course(db, "enroll009", "user001", "course001")
+    stored = db.enrollments.find_one({"enrollmentId": "enroll009"})
+    assert before - timedelta(seconds=1) <= stored["lastAccessed"] <= before + timedelta(seconds=5)
+    assert stored["enrollmentDate"] == stored["lastAccessed"]
@@ -0,0 +1,80 @@
+# Import Useful Libraries
+import pytest
+
+from eduhub_outlines import OUTLINE_COLLECTION
+from eduhub_queries import update_user_profile
+
+
+class _CountingCollection:
+    """Collection counting the driver calls made through it."""
+
+    def __init__(self, collection, calls):
+        self._collection = collection
+        self._calls = calls
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            self._calls.append(f"{self._collection.name}.{name}")
+            return attr(*args, **kwargs)
+        return call
+
+
+class _CountingDatabase:
+    """Database whose collections count their calls: one call is one round trip."""
+
+    def __init__(self, db):
+        self._db = db
+        self.calls = []
+
+    def __getattr__(self, name):
+        attr = getattr(self._db, name)
+        return _CountingCollection(attr, self.calls) if hasattr(attr, "insert_one") else attr
+
+    def __getitem__(self, name):
+        return _CountingCollection(self._db[name], self.calls)
+
+
+@pytest.fixture
+def db(db):
+    db.users.insert_many([
+        {"userId": "user001", "role": "student", "firstName": "Ada", "lastName": "Adesanya", "email": "a@x.io",
+         "profile": {"bio": "Student", "skills": ["SQL"], "avatar": "a.png"}},
+        {"userId": "user002", "role": "instructor", "firstName": "Grace", "lastName": "Hopper", "email": "g@x.io",
+         "profile": {"bio": "Teacher", "skills": ["COBOL"]}},
+    ])
+    db[OUTLINE_COLLECTION].insert_one({"courseId": "course001",
+                                       "instructor": {"userId": "user002", "name": "Grace Hopper", "bio": "Teacher"}})
+    return db
+
+
+def test_student_update_is_one_round_trip(db):
+    counting = _CountingDatabase(db)
+    result, user = update_user_profile(counting, "user001")
+    assert counting.calls == ["users.find_one_and_update"]
+    assert (result.matched_count, result.modified_count) == (1, 1)
+    assert user == {"role": "student", "firstName": "Ada", "lastName": "Adesanya-Jones",
+                    "profile": {"bio": "Computer science graduate specializing in AI",
+                                "skills": ["Python", "Java", "Machine Learning"]}}
+    assert db.users.find_one({"userId": "user001"})["profile"]["avatar"] == "a.png"
+
+
+def test_instructor_update_refreshes_the_outlines(db):
+    counting = _CountingDatabase(db)
+    update_user_profile(counting, "user002", {"firstName": "Rear Admiral Grace"})
+    assert counting.calls == ["users.find_one_and_update", f"{OUTLINE_COLLECTION}.update_many"]
+    instructor = db[OUTLINE_COLLECTION].find_one({"courseId": "course001"})["instructor"]
+    assert instructor["name"] == "Rear Admiral Grace Adesanya-Jones"
+
+
+def test_replacing_the_whole_profile_does_not_collide_with_its_sub_paths(db):
+    profile = {"bio": "Retired", "skills": ["Compilers"]}
+    result, user = update_user_profile(db, "user002", {"profile": profile})
+    assert result.modified_count == 1
+    assert user["profile"] == profile
+    stored = db.users.find_one({"userId": "user002"}, {"_id": 0, "profile": 1, "lastName": 1})
+    assert stored == {"profile": profile, "lastName": "Adesanya-Jones"}
+    assert db[OUTLINE_COLLECTION].find_one({"courseId": "course001"})["instructor"]["bio"] == "Retired"
@@ -0,0 +1,187 @@
+# Import Useful Libraries
+import pytest
+from pymongo import DeleteMany, InsertOne, ReturnDocument, UpdateOne
+
+import eduhub_gradebook
+import eduhub_progress
+import eduhub_queries
+from eduhub_sharding import (QUERY_SHAPES, LocalShardedCluster, RoutedCollection, RoutedDatabase, analyze_shard_key,
+                             classify_filter)
+
+SHARD_KEY = ("courseId", "studentId")
+
+
+@pytest.fixture
+def enrollments():
+    return [
+        {"enrollmentId": f"enroll{c:02d}{s:02d}", "courseId": f"course{c:03d}", "studentId": f"user{s:03d}"}
+        for c in range(1, 9) for s in range(1, 6)
+    ]
+
+
+@pytest.fixture
+def cluster(enrollments):
+    return LocalShardedCluster(enrollments, SHARD_KEY, num_shards=4)
+
+
+@pytest.fixture
+def unsharded(db, enrollments):
+    db.enrollments.insert_many([dict(doc) for doc in enrollments])
+    return db.enrollments
+
+
+def _ids(documents):
+    return sorted(doc["enrollmentId"] for doc in documents)
+
+
+@pytest.mark.parametrize("query_filter, routing", [
+    ({"courseId": "course001"}, "targeted"),
+    ({"courseId": {"$eq": "course001"}}, "targeted"),
+    ({"courseId": {"$in": ["course001", "course007"]}}, "targeted"),
+    ({"$and": [{"studentId": "user001"}, {"courseId": {"$in": ["course002"]}}]}, "targeted"),
+    ({"studentId": "user001"}, "scatter-gather"),
+    ({"studentId": {"$in": ["user001", "user002"]}}, "scatter-gather"),
+    ({"courseId": {"$in": []}}, "scatter-gather"),
+    ({"courseId": {"$gt": "course004"}}, "scatter-gather"),
+    ({}, "scatter-gather"),
+    (None, "scatter-gather"),
+])
+def test_classify_filter(query_filter, routing):
+    assert classify_filter(SHARD_KEY, query_filter) == routing
+
+
+def test_in_on_leading_key_is_targeted_for_student_key():
+    assert classify_filter(("studentId",), {"studentId": {"$in": ["user001", "user004"]}}) == "targeted"
+
+
+def test_chunks_cover_all_documents(cluster, enrollments):
+    distribution = cluster.shard_distribution()
+    assert sum(distribution) == len(enrollments)
+    assert all(distribution)
+
+
+def test_equality_contacts_one_shard(cluster, unsharded):
+    query_filter = {"courseId": "course003"}
+    assert _ids(cluster.find(query_filter)) == _ids(unsharded.find(query_filter))
+    assert cluster.shards_contacted[-1] == 1
+
+
+def test_in_contacts_only_owning_shards(cluster, unsharded):
+    query_filter = {"courseId": {"$in": ["course001", "course002"]}}
+    assert _ids(cluster.find(query_filter)) == _ids(unsharded.find(query_filter))
+    assert cluster.shards_contacted[-1] < len(cluster.shards)
+
+    query_filter = {"courseId": {"$in": ["course001", "course008"]}}
+    assert cluster.count_documents(query_filter) == unsharded.count_documents(query_filter)
+    assert cluster.shards_contacted[-1] == 2
+
+
+def test_non_shard_key_filter_broadcasts(cluster, unsharded):
+    query_filter = {"studentId": "user002"}
+    assert _ids(cluster.find(query_filter)) == _ids(unsharded.find(query_filter))
+    assert cluster.shards_contacted[-1] == len(cluster.shards)
+
+
+def test_writes_route_to_owning_shard(cluster, unsharded):
+    cluster.insert_one({"enrollmentId": "enroll-new", "courseId": "course005", "studentId": "user009"})
+    assert cluster.shards_contacted[-1] == 1
+    assert cluster.find_one({"courseId": "course005", "studentId": "user009"})["enrollmentId"] == "enroll-new"
+
+    result = cluster.update_one({"courseId": "course005", "studentId": "user009"}, {"$set": {"grade": 1}})
+    assert result.modified_count == 1
+    assert cluster.delete_one({"courseId": "course005", "studentId": "user009"}).deleted_count == 1
+    assert cluster.count_documents({}) == unsharded.count_documents({})
+
+
+def test_routed_collection_summary(cluster):
+    routed = RoutedCollection(cluster, cluster.shard_key)
+    routed.find({"courseId": "course001"})
+    routed.find({"courseId": {"$in": ["course001", "course006"]}})
+    routed.aggregate([{"$match": {"studentId": "user001"}}, {"$group": {"_id": "$courseId"}}])
+
+    summary = routed.routing_summary()
+    assert summary["total"] == 3
+    assert summary["targeted"] == 2
+    assert summary["scatter_gather"] == 1
+    assert cluster.shards_contacted[-1] == len(cluster.shards)
+
+
+def test_analyze_shard_key(unsharded):
+    shapes = [
+        {"function": "by_course", "equality": ("courseId",), "weight": 3},
+        {"function": "by_student", "equality": ("studentId",), "weight": 1},
+    ]
+    analysis = analyze_shard_key(unsharded.database, "enrollments", SHARD_KEY, shapes)
+    assert analysis["cardinality"] == 40
+    assert analysis["targeted_functions"] == ["by_course"]
+    assert analysis["targeted_ratio"] == 0.75
+
+
+def test_single_document_writes_are_classified(unsharded):
+    routed = RoutedCollection(unsharded, SHARD_KEY)
+    updated = routed.find_one_and_update({"courseId": "course001", "studentId": "user001"},
+                                         {"$set": {"completionStatus": 50}}, return_document=ReturnDocument.AFTER)
+    assert updated["completionStatus"] == 50
+    assert routed.find_one_and_delete({"enrollmentId": "enroll0102"})["courseId"] == "course001"
+    routed.find_one_and_replace({"courseId": "course002", "studentId": "user001"},
+                                {"enrollmentId": "enroll0201", "courseId": "course002", "studentId": "user001"})
+    assert routed.update_many({"studentId": "user003"}, {"$set": {"flag": True}}).modified_count == 8
+    assert routed.delete_many({"courseId": {"$in": ["course008"]}}).deleted_count == 5
+    routed.insert_many([{"enrollmentId": "new1", "courseId": "course009", "studentId": "user001"},
+                        {"enrollmentId": "new2", "courseId": "course009", "studentId": "user002"}])
+
+    assert routed.routing_summary()["by_operation"] == {
+        "delete_many (targeted)": 1,
+        "find_one_and_delete (scatter-gather)": 1,
+        "find_one_and_replace (targeted)": 1,
+        "find_one_and_update (targeted)": 1,
+        "insert_many (targeted)": 2,
+        "update_many (scatter-gather)": 1,
+    }
+
+
+def test_bulk_write_routes_each_request(unsharded):
+    routed = RoutedCollection(unsharded, SHARD_KEY)
+    result = routed.bulk_write([
+        InsertOne({"enrollmentId": "new1", "courseId": "course009", "studentId": "user001"}),
+        UpdateOne({"enrollmentId": "enroll0101"}, {"$set": {"completionStatus": 10}}),
+        DeleteMany({"courseId": "course002"}),
+    ])
+    assert (result.inserted_count, result.modified_count, result.deleted_count) == (1, 1, 5)
+    summary = routed.routing_summary()
+    assert summary["by_operation"] == {"bulk_write (scatter-gather)": 1, "bulk_write (targeted)": 2}
+    assert routed.observed_query_shapes() == [
+        {"function": "bulk_write", "equality": ("courseId",), "weight": 1},
+        {"function": "bulk_write", "equality": ("courseId", "studentId"), "weight": 1},
+        {"function": "bulk_write", "equality": ("enrollmentId",), "weight": 1},
+    ]
+
+
+def test_cluster_multi_document_writes(cluster, unsharded):
+    assert cluster.update_many({"courseId": "course002"}, {"$set": {"flag": True}}) == 5
+    assert cluster.shards_contacted[-1] == 1
+    assert cluster.find_one_and_delete({"enrollmentId": "enroll0301"})["courseId"] == "course003"
+    assert cluster.shards_contacted[-1] == len(cluster.shards)
+    assert cluster.delete_many({"studentId": "user005"}) == 8
+    assert cluster.count_documents({}) == unsharded.count_documents({}) - 9
+
+
+def test_query_functions_are_routed(db, enrollments):
+    db.enrollments.insert_many([dict(doc) for doc in enrollments])
+    db.submissions.insert_one({"submissionId": "sub001", "studentId": "user001", "assignmentId": "assign001",
+                               "grade": 70, "isGraded": True})
+    routed_db = RoutedDatabase(db)
+    eduhub_queries.update_assignment_grade(routed_db, "sub001", "user001", grade=90)
+    eduhub_queries.delete_enrollment(routed_db, "enroll0101")
+
+    summary = routed_db.routing_summary()
+    assert summary["submissions"]["by_operation"]["find_one_and_update (targeted)"] == 1
+    assert summary["enrollments"]["by_operation"]["find_one_and_delete (scatter-gather)"] == 1
+
+
+def test_query_shapes_name_existing_functions():
+    modules = (eduhub_queries, eduhub_progress, eduhub_gradebook)
+    for shapes in QUERY_SHAPES.values():
+        for shape in shapes:
+            name = shape["function"].split(" ")[0].split(".")[0]
+            assert any(hasattr(module, name) for module in modules), name
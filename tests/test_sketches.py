@@ -0,0 +1,104 @@
+# Import Useful Libraries
+from datetime import datetime
+
+import pytest
+
+from pymongo.errors import BulkWriteError
+
+import eduhub_sketches
+from eduhub_progress import EnrollmentProgressBuffer
+from eduhub_sketches import (KLL_K, SKETCH_COLLECTION, KLLSketch, SketchWriteBuffer, daily_active_students,
+                             grade_quantiles, record_enrollment_activity, record_grade, sketch_buffer, tag_popularity)
+
+DAY = datetime(2024, 6, 1)
+
+
+@pytest.fixture
+def buffer(db):
+    db.courses.insert_one({"courseId": "course001", "tags": ["python", "databases"]})
+    with SketchWriteBuffer(db, flush_interval=None, flush_on_exit=False) as sketches:
+        yield sketches
+
+
+def test_buffer_defers_writes_until_flush(db, buffer):
+    for student in ("user001", "user002", "user001"):
+        record_enrollment_activity(db, {"studentId": student, "courseId": "course001",
+                                        "completionStatus": 10, "enrollmentDate": DAY}, buffer=buffer)
+    assert db[SKETCH_COLLECTION].count_documents({}) == 0
+
+    # active_students per course and overall, completion, tag_popularity
+    assert buffer.flush() == 4
+    assert dict(tag_popularity(db, DAY, DAY)) == {"python": 3, "databases": 3}
+    completion = db[SKETCH_COLLECTION].find_one({"metric": "completion"})
+    assert completion["kll"]["n"] == 3
+
+
+def test_level_zero_is_compacted_inline(db, buffer):
+    for grade in range(3 * KLL_K):
+        record_grade(db, "course001", grade % 100, DAY, buffer=buffer)
+    buffer.flush()
+    sketch = KLLSketch.from_document(db[SKETCH_COLLECTION].find_one({"metric": "grades"})["kll"])
+    assert sketch.n == 3 * KLL_K
+    assert len(sketch.levels[0]) <= KLL_K
+    assert buffer.stats["compacted"] == 1
+
+    for grade in range(KLL_K + 1):
+        record_grade(db, "course002", grade, DAY)
+    sketch = KLLSketch.from_document(db[SKETCH_COLLECTION].find_one({"scope": "course002"})["kll"])
+    assert len(sketch.levels[0]) <= KLL_K
+
+    median = grade_quantiles(db, DAY, DAY, "course001", fractions=(0.5,))[0.5]
+    assert 40 <= median <= 60
+
+
+def _rejecting(codes):
+    """bulk_write failing the first request with each code in turn, then succeeding."""
+    codes = list(codes)
+
+    def bulk_write(requests, ordered):
+        code = codes.pop(0) if codes else None
+        if code is None:
+            return None
+        raise BulkWriteError({"writeErrors": [{"index": 0, "code": code, "errmsg": "rejected"}],
+                              "writeConcernErrors": [], "nMatched": 0})
+    return bulk_write
+
+
+def test_permanent_write_errors_are_dead_lettered(db, buffer, monkeypatch):
+    record_grade(db, "course001", 80, DAY, buffer=buffer)
+    monkeypatch.setattr(buffer.collection, "bulk_write", _rejecting([121]))
+    buffer.flush()
+    assert buffer.pending_count() == 0
+    assert [(letter["sketch"]["metric"], letter["code"]) for letter in buffer.dead_letters] == [("grades", 121)]
+    assert buffer.stats["dead_lettered"] == 1
+
+
+def test_transient_write_errors_are_retried_up_to_the_cap(db, buffer, monkeypatch):
+    buffer.max_retries = 1
+    record_grade(db, "course001", 80, DAY, buffer=buffer)
+    monkeypatch.setattr(buffer.collection, "bulk_write", _rejecting([112, 112]))
+    buffer.flush()
+    assert buffer.pending_count() == 1
+    buffer.flush()
+    assert buffer.pending_count() == 0
+    assert buffer.stats["retried"] == 1
+    assert [letter["code"] for letter in buffer.dead_letters] == [112]
+
+
+def test_progress_flushes_count_students_as_active(db, monkeypatch):
+    monkeypatch.setattr(eduhub_sketches, "_SKETCH_BUFFERS", {})
+    db.enrollments.insert_many([
+        {"enrollmentId": f"enroll00{i}", "studentId": f"user00{i}", "courseId": "course001", "completionStatus": 0}
+        for i in (1, 2, 3)
+    ])
+    with EnrollmentProgressBuffer(db, flush_interval=None, flush_on_exit=False) as progress:
+        progress.record("enroll001", completion_status=20, last_accessed=datetime(2024, 6, 2, 9))
+        progress.record("enroll002", last_accessed=datetime(2024, 6, 2, 18))
+        progress.record("enroll003", last_accessed=datetime(2024, 6, 3, 8))
+    sketch_buffer(db).close()
+
+    assert daily_active_students(db, datetime(2024, 6, 2), datetime(2024, 6, 3)) == {
+        "2024-06-02": 2, "2024-06-03": 1}
+    assert daily_active_students(db, datetime(2024, 6, 2), datetime(2024, 6, 2), "course001") == {"2024-06-02": 2}
+    # Progress values are not completion samples
+    assert db[SKETCH_COLLECTION].count_documents({"metric": "completion"}) == 0
@@ -0,0 +1,97 @@
+# Import Useful Libraries
+from datetime import datetime, timedelta
+
+from pymongo.errors import OperationFailure
+
+from eduhub_telemetry import take_telemetry_snapshot, telemetry_report
+
+START = datetime(2024, 1, 1)
+
+
+class _ShardedCollection:
+    """Answers $collStats with one document per shard and $indexStats with one per host, as mongos does."""
+
+    def __init__(self, shards, index_ops):
+        self.shards = shards
+        self.index_ops = index_ops  # {(index name, host): (ops, since)}
+
+    def aggregate(self, pipeline):
+        if "$collStats" in pipeline[0]:
+            return iter([{"shard": shard, "storageStats": stats} for shard, stats in self.shards.items()])
+        return iter([{"name": name, "host": host, "accesses": {"ops": ops, "since": since}}
+                     for (name, host), (ops, since) in self.index_ops.items()])
+
+
+class _Admin:
+    def __init__(self, cache):
+        self.cache = cache
+
+    def command(self, name, **kwargs):
+        if self.cache is None:
+            raise OperationFailure("serverStatus is not allowed", 13)
+        return {"wiredTiger": {"cache": self.cache}}
+
+
+class _Client:
+    def __init__(self, cache):
+        self.admin = _Admin(cache)
+
+
+class _Database:
+    def __init__(self, collections, cache=None):
+        self.collections = collections
+        self.client = _Client(cache)
+        self.listed = None
+
+    def __getitem__(self, name):
+        return self.collections[name]
+
+    def list_collection_names(self, filter=None):
+        self.listed = filter
+        return list(self.collections)
+
+
+def _submissions(ops_a, ops_b, since_b=START):
+    shards = {
+        "shard-a": {"count": 30, "size": 3000, "storageSize": 1000, "totalIndexSize": 400,
+                    "indexSizes": {"_id_": 100, "submission_student_idx": 300}},
+        "shard-b": {"count": 10, "size": 1000, "storageSize": 500, "totalIndexSize": 200,
+                    "indexSizes": {"_id_": 50, "submission_student_idx": 150}},
+    }
+    return _ShardedCollection(shards, {("submission_student_idx", "a:27018"): (ops_a, START),
+                                       ("submission_student_idx", "b:27018"): (ops_b, since_b)})
+
+
+def test_snapshot_adds_up_shards_and_covers_every_collection():
+    db = _Database({"submissions": _submissions(5, 7), "gradebook": _ShardedCollection({}, {})})
+    snapshot = take_telemetry_snapshot(db, store=False)
+
+    assert set(snapshot["collections"]) == {"gradebook", "submissions"}
+    assert db.listed["type"] == "collection"
+    stats = snapshot["collections"]["submissions"]
+    assert (stats["count"], stats["size"], stats["storageSize"], stats["totalIndexSize"]) == (40, 4000, 1500, 600)
+    assert stats["avgObjSize"] == 100
+    assert stats["indexSizes"] == {"_id_": 150, "submission_student_idx": 450}
+    assert stats["indexes"]["submission_student_idx"]["ops"] == 12
+    assert len(stats["indexes"]["submission_student_idx"]["hosts"]) == 2
+    assert snapshot["cache"] == {}
+
+
+def test_report_counts_ops_per_host_across_a_restart():
+    cache = {"maximum bytes configured": 10_000, "bytes currently in the cache": 2_000,
+             "pages requested from the cache": 100, "pages read into cache": 10}
+    first = take_telemetry_snapshot(_Database({"submissions": _submissions(5, 7)}, cache), store=False)
+    first["takenAt"] = START
+
+    # Host b restarted: its counter starts again from zero
+    restarted = START + timedelta(minutes=30)
+    cache = dict(cache, **{"pages requested from the cache": 300, "pages read into cache": 30})
+    last = take_telemetry_snapshot(_Database({"submissions": _submissions(9, 4, restarted)}, cache), store=False)
+    last["takenAt"] = START + timedelta(hours=2)
+
+    report = telemetry_report(None, first=first, last=last)
+    [row] = [row for row in report["indexes"] if row["index"] == "submission_student_idx"]
+    assert (row["ops"], row["ops_per_hour"], row["size_bytes"]) == (8, 4.0, 450)
+    assert report["collections"][0]["index_to_data"] == 0.15
+    assert report["cache"]["hit_rate"] == 0.9
+    assert report["working_set"]["verdict"] == "fits: indexes and data"
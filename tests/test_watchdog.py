@@ -0,0 +1,82 @@
+# Import Useful Libraries
+import gc
+
+import pytest
+from pymongo import MongoClient
+
+import eduhub_watchdog
+from eduhub_queries import get_courses_by_category
+from eduhub_watchdog import QueryTimings, _TaggedDatabase, _tagged_call, tag_queries
+
+
+@tag_queries
+def _database_seen(db):
+    return db
+
+
+@pytest.fixture
+def client():
+    client = MongoClient(connect=False)  # never contacted: the tests only look at the wrapper
+    yield client
+    client.close()
+
+
+def test_tagged_functions_run_on_mongomock(db):
+    db.courses.insert_many([
+        {"courseId": "course001", "title": "Pandas", "category": "Data Science", "level": "beginner", "price": 10},
+        {"courseId": "course002", "title": "React", "category": "Web", "level": "advanced", "price": 20},
+    ])
+    assert _database_seen(db) is db
+    assert [course["title"] for course in get_courses_by_category(db, "Data Science")] == ["Pandas"]
+
+
+def test_tagging_can_be_turned_off(client, monkeypatch):
+    assert isinstance(_database_seen(client.eduhub), _TaggedDatabase)
+    monkeypatch.setattr(eduhub_watchdog, "QUERY_TAGGING", False)
+    assert _database_seen(client.eduhub) == client.eduhub
+    assert _database_seen(_TaggedDatabase(client.eduhub, "caller")) == client.eduhub
+
+
+class _Cursor:
+    def __init__(self, documents):
+        self._documents = iter(documents)
+
+    def __next__(self):
+        return next(self._documents)
+
+    def explain(self):
+        return {"queryPlanner": {}}
+
+    def close(self):
+        pass
+
+
+class _Collection:
+    name = "courses"
+
+    def find(self, *args, **kwargs):
+        return _Cursor([{"n": 1}, {"n": 2}])
+
+
+def _find(timings):
+    return _tagged_call(_Collection(), "find", _Collection().find, "caller", timings)
+
+
+def test_abandoned_cursor_is_timed():
+    timings = QueryTimings()
+    cursor = _find(timings)({"category": "Web"})
+    assert next(cursor) == {"n": 1}
+    assert timings.summary() == []
+    del cursor
+    gc.collect()
+    assert [entry["count"] for entry in timings.summary()] == [1]
+
+
+def test_explained_cursor_is_timed_once():
+    timings = QueryTimings()
+    cursor = _find(timings)({"category": "Web"})
+    assert cursor.explain() == {"queryPlanner": {}}
+    assert [entry["count"] for entry in timings.summary()] == [1]
+    cursor.close()
+    del cursor
+    assert [(entry["method"], entry["count"]) for entry in timings.summary()] == [("find", 1)]